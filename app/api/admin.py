@@ -0,0 +1,140 @@
+"""Administrative API endpoints."""
+import secrets
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Header, status
+from fastapi.responses import FileResponse
+
+from app.core.database import slow_query_log
+from app.core.exceptions import DNSBaseError, NotFoundError
+from app.core.profiling import profile_store
+from app.core.settings import settings
+from app.core.tasks import task_scheduler
+from app.core.tracing import RingBufferExporter, tracer
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Check the X-Admin-Token header against ``ADMIN_TOKEN``.
+    
+    Without a configured token the endpoints are closed, unless
+    ``ADMIN_API_OPEN`` explicitly opens them (for local development).
+    
+    Raises:
+        DNSBaseError: 403 if the token is missing or wrong, or none is configured
+    """
+    if settings.ADMIN_TOKEN is None:
+        if settings.ADMIN_API_OPEN:
+            return
+        raise DNSBaseError(
+            detail="Admin endpoints are disabled until ADMIN_TOKEN is configured",
+            status_code=status.HTTP_403_FORBIDDEN,
+            error_code="ADMIN_TOKEN_NOT_CONFIGURED",
+        )
+    if x_admin_token is None or not secrets.compare_digest(
+        x_admin_token, settings.ADMIN_TOKEN
+    ):
+        raise DNSBaseError(
+            detail="A valid X-Admin-Token header is required",
+            status_code=status.HTTP_403_FORBIDDEN,
+            error_code="ADMIN_TOKEN_REQUIRED",
+        )
+
+
+router = APIRouter(tags=["Admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/admin/tasks")
+async def list_tasks() -> Dict[str, Any]:
+    """List background jobs, their last run and whether this worker leads.
+    
+    Returns:
+        This worker's lease holder ID, leadership and the registered jobs
+    """
+    return {
+        "holder": task_scheduler.lease.holder,
+        "is_leader": task_scheduler.is_leader,
+        "jobs": [job.snapshot() for job in task_scheduler.jobs.values()],
+    }
+
+
+@router.post("/admin/tasks/{name}/run")
+async def run_task(name: str) -> Dict[str, Any]:
+    """Run a background job now, on this worker, regardless of leadership.
+    
+    Args:
+        name: Job name
+        
+    Returns:
+        The job with the outcome of this run
+        
+    Raises:
+        NotFoundError: If no job has this name
+    """
+    if name not in task_scheduler.jobs:
+        raise NotFoundError(
+            detail=f"Task '{name}' not found",
+            error_code="TASK_NOT_FOUND",
+        )
+    return await task_scheduler.run_job(name)
+
+
+@router.get("/admin/slow-queries")
+async def list_slow_queries() -> Dict[str, Any]:
+    """List the most recent slow statements of this worker, newest first.
+    
+    Returns:
+        The threshold and the slow statements, each with the query plan
+        captured for its shape and whether that plan scans a whole table
+    """
+    return slow_query_log.snapshot()
+
+
+@router.delete("/admin/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_slow_queries() -> None:
+    """Forget the recorded slow statements and captured plans."""
+    slow_query_log.clear()
+
+
+@router.get("/admin/traces/{trace_id}")
+async def get_trace(trace_id: str) -> List[Dict[str, Any]]:
+    """List the buffered spans of one trace, in start order.
+    
+    Args:
+        trace_id: Trace ID, as in a traced response's traceresponse header
+        
+    Returns:
+        The trace's spans still held by the in-memory exporter
+        
+    Raises:
+        NotFoundError: If no span of the trace is buffered
+    """
+    buffer = tracer.exporter(RingBufferExporter)
+    spans = buffer.trace(trace_id) if buffer is not None else []
+    if not spans:
+        raise NotFoundError(
+            detail=f"Trace '{trace_id}' not found",
+            error_code="TRACE_NOT_FOUND",
+        )
+    return [span.to_dict() for span in spans]
+
+
+@router.get("/admin/profiles/{profile_id}", response_class=FileResponse)
+async def get_profile(profile_id: str) -> FileResponse:
+    """Download a request profile in collapsed-stack format.
+    
+    Args:
+        profile_id: ID from a profiled response's X-Profile-Id header
+        
+    Returns:
+        The profile, one ``frame;frame;frame count`` line per stack
+        
+    Raises:
+        NotFoundError: If no profile has this ID, or it was pruned
+    """
+    path = profile_store.path(profile_id)
+    if path is None:
+        raise NotFoundError(
+            detail=f"Profile '{profile_id}' not found",
+            error_code="PROFILE_NOT_FOUND",
+        )
+    return FileResponse(path, media_type="text/plain; charset=utf-8")
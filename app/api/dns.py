@@ -1,22 +1,62 @@
 """DNS API endpoints."""
+from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError as PydanticValidationError
+from sqlalchemy import delete, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
-from app.core import tasks
-from app.core.database import get_db_session
-from app.core.resolver import resolve_hostname, ResolutionError
+from app.core import resolver
+from app.core.database import (
+    get_db_session,
+    get_read_connection,
+    get_read_session,
+    wants_primary,
+)
+from app.core.expiry import record_expiry
+from app.core.idempotency import idempotency_store
+from app.core.resolver import ResolutionError
+from app.core.sharding import scatter_gather, shard_for_id
+from app.core.snapshot import note_changes, zone_index
+from app.core.stats import track, type_counts
+from app.core.statements import CNAMES_BY_HOSTNAME
+from app.core.tracing import tracer
 from app.core.validators import (
     validate_hostname,
     validate_record_value,
     validate_no_conflicting_records,
     detect_cname_chain_loop
 )
-from app.models import Host, HostCreate, HostRead, Record, RecordCreate, RecordRead, RecordType
+from app.models import (
+    Host,
+    HostCreate,
+    HostRead,
+    HostUpdate,
+    Record,
+    RecordCreate,
+    RecordRead,
+    RecordType,
+    RecordUpdate,
+    canonicalize_hostname,
+)
 from app.core.exceptions import (
     NotFoundError,
     ConflictError,
+    DNSError,
+    PreconditionFailedError,
     RecordValidationError,
     HostnameValidationError,
     CNAMELoopError,
@@ -25,13 +65,68 @@ from app.core.exceptions import (
 
 router = APIRouter(tags=["DNS"])
 
+
+def _etag(version: int) -> str:
+    """Build the ETag header value for a row version."""
+    return f'"{version}"'
+
+
+def _parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Extract the expected row version from an If-Match header.
+    
+    Args:
+        if_match: Raw If-Match header value
+        
+    Returns:
+        The expected version, or None if the header is absent or ``*``
+        
+    Raises:
+        PreconditionFailedError: If the header is not a version ETag
+    """
+    if if_match is None:
+        return None
+    tag = if_match.strip()
+    if tag == "*":
+        return None
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise PreconditionFailedError(
+            detail=f"Malformed If-Match header: {if_match}",
+            error_code="INVALID_IF_MATCH"
+        )
+
+
+def _check_version(current: int, expected: Optional[int]) -> None:
+    """Raise a 412 if the client-supplied version is stale."""
+    if expected is not None and current != expected:
+        raise PreconditionFailedError(
+            detail=f"Version mismatch: expected {expected}, current is {current}",
+            error_code="VERSION_MISMATCH"
+        )
+
+def _check_expires_at(expires_at: Optional[datetime]) -> None:
+    """Reject an expiry time that has already passed."""
+    if expires_at is not None and expires_at <= datetime.utcnow():
+        raise RecordValidationError(
+            detail=f"expires_at must be in the future: {expires_at.isoformat()}",
+            error_code="INVALID_EXPIRES_AT"
+        )
+
 # Host endpoints
 @router.post("/hosts/", response_model=HostRead, status_code=status.HTTP_201_CREATED)
-async def create_host(host: HostCreate, session: Session = Depends(get_db_session)):
+async def create_host(
+    host: HostCreate,
+    idempotency_key: Optional[str] = Header(default=None),
+    session: Session = Depends(get_db_session)
+):
     """Create a new host.
     
     Args:
         host: Host data to create
+        idempotency_key: Optional Idempotency-Key; retries replay the stored response
         session: Database session
         
     Returns:
@@ -41,16 +136,34 @@ async def create_host(host: HostCreate, session: Session = Depends(get_db_sessio
         HostnameValidationError: If hostname format is invalid
         ConflictError: If host already exists
         RecordValidationError: If there's an error creating the host
+        IdempotencyConflictError: If the key is in flight or reused with another payload
     """
+    if idempotency_key:
+        return await idempotency_store.execute(
+            session,
+            idempotency_key,
+            scope="POST /hosts/",
+            payload=host,
+            handler=lambda: _create_host(host, session),
+            response_model=HostRead,
+            status_code=status.HTTP_201_CREATED,
+        )
+    return _create_host(host, session)
+
+def _create_host(host: HostCreate, session: Session) -> Host:
+    """Validate and insert a host."""
     # Validate hostname
-    if not validate_hostname(host.hostname):
+    canonical = canonicalize_hostname(host.hostname)
+    if not validate_hostname(canonical):
         raise HostnameValidationError(
             detail=f"Invalid hostname format: {host.hostname}",
             error_code="INVALID_HOSTNAME"
         )
     
-    # Check if host already exists
-    existing = session.exec(select(Host).where(Host.hostname == host.hostname)).first()
+    # Check if host already exists, in any spelling
+    existing = session.exec(
+        select(Host.id).where(Host.canonical_hostname == canonical)
+    ).first()
     if existing:
         raise ConflictError(
             detail=f"Hostname '{host.hostname}' already exists",
@@ -60,8 +173,11 @@ async def create_host(host: HostCreate, session: Session = Depends(get_db_sessio
     # Create and save host
     db_host = Host.model_validate(host)
     session.add(db_host)
+    track(session, hosts=1)
     
     try:
+        session.flush()
+        note_changes(session, [db_host.id])
         session.commit()
         session.refresh(db_host)
         return db_host
@@ -73,18 +189,199 @@ async def create_host(host: HostCreate, session: Session = Depends(get_db_sessio
         )
 
 @router.get("/hosts/", response_model=List[HostRead])
-async def list_hosts(session: Session = Depends(get_db_session)):
-    """List all hosts."""
-    result = session.exec(select(Host)).all()
-    return result
+async def list_hosts(
+    after: Optional[int] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    session: Session = Depends(get_read_session)
+):
+    """List hosts in ID order.
+    
+    Pass the last ID of a page as ``after`` to fetch the next page. With
+    sharding enabled every shard returns its own page and the pages are
+    merged.
+    """
+    stmt = select(Host).order_by(Host.id)
+    if after is not None:
+        stmt = stmt.where(Host.id > after)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return scatter_gather(session, stmt, limit)
+
+@router.get("/hosts/{host_id}", response_model=HostRead)
+async def get_host(
+    host_id: int, response: Response, session: Session = Depends(get_read_session)
+):
+    """Get a single host; the ETag carries its current version."""
+    host = session.get(Host, host_id)
+    if not host:
+        raise NotFoundError(
+            detail=f"Host with ID {host_id} not found",
+            error_code="HOST_NOT_FOUND"
+        )
+    response.headers["ETag"] = _etag(host.version)
+    return host
+
+@router.patch("/hosts/{host_id}", response_model=HostRead)
+async def update_host(
+    host_id: int,
+    changes: HostUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(default=None),
+    session: Session = Depends(get_db_session)
+):
+    """Update a host with optimistic concurrency.
+    
+    The change is validated against the version that was read and then
+    applied with a single ``UPDATE ... WHERE id = ? AND version = ?``, so no
+    row lock is held while validating.
+    
+    Args:
+        host_id: ID of the host to update
+        changes: Fields to change
+        response: Response used to set the new ETag
+        if_match: Expected version ETag (optional)
+        session: Database session
+        
+    Returns:
+        Updated host data
+        
+    Raises:
+        NotFoundError: If host is not found
+        PreconditionFailedError: If the host was modified concurrently
+        HostnameValidationError: If the new hostname is invalid
+        ConflictError: If the new hostname already exists
+        CNAMELoopError: If the rename would close a CNAME loop
+    """
+    expected_version = _parse_if_match(if_match)
+    host = session.get(Host, host_id)
+    if not host:
+        raise NotFoundError(
+            detail=f"Host with ID {host_id} not found",
+            error_code="HOST_NOT_FOUND"
+        )
+    _check_version(host.version, expected_version)
+    read_version = host.version
+    
+    values = changes.model_dump(exclude_unset=True)
+    new_hostname = values.get("hostname")
+    if new_hostname is not None and new_hostname != host.hostname:
+        canonical = canonicalize_hostname(new_hostname)
+        if not validate_hostname(canonical):
+            raise HostnameValidationError(
+                detail=f"Invalid hostname format: {new_hostname}",
+                error_code="INVALID_HOSTNAME"
+            )
+        existing = session.exec(
+            select(Host.id).where(
+                Host.canonical_hostname == canonical, Host.id != host_id
+            )
+        ).first()
+        if existing:
+            raise ConflictError(
+                detail=f"Hostname '{new_hostname}' already exists",
+                error_code="HOST_EXISTS"
+            )
+        shards = session.info.get("shard_set")
+        home = str(shard_for_id(host_id))
+        if shards is not None and shards.owner(new_hostname) != home:
+            raise ConflictError(
+                detail=(
+                    f"Hostname '{new_hostname}' belongs to another shard; "
+                    "recreate the host instead"
+                ),
+                error_code="CROSS_SHARD_RENAME"
+            )
+        # A CNAME chain from this host that reaches the new name would loop
+        cname = session.exec(
+            select(Record)
+            .where(Record.host_id == host_id)
+            .where(Record.type == RecordType.CNAME)
+        ).first()
+        if cname and detect_cname_chain_loop(session, cname.value, {canonical}):
+            raise CNAMELoopError(
+                detail="Renaming the host would create a CNAME loop",
+                error_code="CNAME_LOOP_DETECTED"
+            )
+        values["canonical_hostname"] = canonical
+    elif "hostname" in values and new_hostname is None:
+        values.pop("hostname")
+    
+    try:
+        result = session.execute(
+            update(Host)
+            .where(Host.id == host_id, Host.version == read_version)
+            .values(**values, version=Host.version + 1, updated_at=datetime.utcnow())
+        )
+        if result.rowcount == 0:
+            raise PreconditionFailedError(
+                detail=f"Host with ID {host_id} was modified concurrently",
+                error_code="VERSION_MISMATCH"
+            )
+        track(session)
+        note_changes(session, [host_id])
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise ConflictError(
+            detail=f"Hostname '{new_hostname}' already exists",
+            error_code="HOST_EXISTS"
+        )
+    
+    session.refresh(host)
+    response.headers["ETag"] = _etag(host.version)
+    return host
+
+@router.delete("/hosts/{host_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_host(
+    host_id: int,
+    if_match: Optional[str] = Header(default=None),
+    session: Session = Depends(get_db_session)
+):
+    """Delete a host and its records.
+    
+    Raises:
+        NotFoundError: If host is not found
+        PreconditionFailedError: If the host was modified concurrently
+    """
+    expected_version = _parse_if_match(if_match)
+    condition = [Host.id == host_id]
+    if expected_version is not None:
+        condition.append(Host.version == expected_version)
+    
+    # Both statements carry the version predicate, so a stale delete is a no-op
+    deleted_types = session.execute(
+        delete(Record)
+        .where(Record.host_id.in_(select(Host.id).where(*condition)))
+        .returning(Record.type)
+    ).scalars().all()
+    result = session.execute(delete(Host).where(*condition))
+    if result.rowcount == 0:
+        if session.get(Host, host_id) is None:
+            raise NotFoundError(
+                detail=f"Host with ID {host_id} not found",
+                error_code="HOST_NOT_FOUND"
+            )
+        raise PreconditionFailedError(
+            detail=f"Host with ID {host_id} was modified concurrently",
+            error_code="VERSION_MISMATCH"
+        )
+    track(session, hosts=-1, records=type_counts(deleted_types, sign=-1))
+    note_changes(session, [host_id])
+    session.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 # Record endpoints
 @router.post("/records/", response_model=RecordRead, status_code=status.HTTP_201_CREATED)
-async def create_record(record: RecordCreate, session: Session = Depends(get_db_session)):
+async def create_record(
+    record: RecordCreate,
+    idempotency_key: Optional[str] = Header(default=None),
+    session: Session = Depends(get_db_session)
+):
     """Create a new DNS record.
     
     Args:
         record: Record data to create
+        idempotency_key: Optional Idempotency-Key; retries replay the stored response
         session: Database session
         
     Returns:
@@ -95,9 +392,25 @@ async def create_record(record: RecordCreate, session: Session = Depends(get_db_
         RecordValidationError: If record validation fails
         RecordConflictError: If record conflicts with existing records
         CNAMELoopError: If CNAME record would create a loop
+        IdempotencyConflictError: If the key is in flight or reused with another payload
     """
+    if idempotency_key:
+        return await idempotency_store.execute(
+            session,
+            idempotency_key,
+            scope="POST /records/",
+            payload=record,
+            handler=lambda: _create_record(record, session),
+            response_model=RecordRead,
+            status_code=status.HTTP_201_CREATED,
+        )
+    return _create_record(record, session)
+
+def _create_record(record: RecordCreate, session: Session) -> Record:
+    """Validate and insert a DNS record."""
     # Check if host exists
-    host = session.get(Host, record.host_id)
+    with tracer.span("create_record.host_lookup", host_id=record.host_id):
+        host = session.get(Host, record.host_id)
     if not host:
         raise NotFoundError(
             detail=f"Host with ID {record.host_id} not found",
@@ -105,19 +418,24 @@ async def create_record(record: RecordCreate, session: Session = Depends(get_db_
         )
     
     # Validate record
-    if not validate_record_value(record.type, record.value):
+    with tracer.span("create_record.validate_value", record_type=record.type.value):
+        valid = validate_record_value(record.type, record.value)
+    if not valid:
         raise RecordValidationError(
             detail=f"Invalid {record.type} record value: {record.value}",
             error_code="INVALID_RECORD_VALUE"
         )
+    _check_expires_at(record.expires_at)
     
     # Check for conflicts
-    if not validate_no_conflicting_records(
-        session=session,
-        host_id=record.host_id,
-        record_type=record.type,
-        record_value=record.value
-    ):
+    with tracer.span("create_record.conflict_check"):
+        no_conflict = validate_no_conflicting_records(
+            session=session,
+            host_id=record.host_id,
+            record_type=record.type,
+            record_value=record.value
+        )
+    if not no_conflict:
         raise RecordConflictError(
             detail=f"A record of type {record.type} with value {record.value} already exists for this host",
             error_code="RECORD_CONFLICT"
@@ -125,7 +443,11 @@ async def create_record(record: RecordCreate, session: Session = Depends(get_db_
     
     # Check for CNAME loops if this is a CNAME record
     if record.type == RecordType.CNAME:
-        if detect_cname_chain_loop(session, record.value):
+        with tracer.span("create_record.loop_detection"):
+            loop = detect_cname_chain_loop(
+                session, record.value, {host.canonical_hostname}
+            )
+        if loop:
             raise CNAMELoopError(
                 detail="CNAME record would create a loop",
                 error_code="CNAME_LOOP_DETECTED"
@@ -134,10 +456,14 @@ async def create_record(record: RecordCreate, session: Session = Depends(get_db_
     # Create and save the record
     db_record = Record.model_validate(record)
     session.add(db_record)
+    track(session, records={record.type.value: 1})
+    note_changes(session, [record.host_id])
     
     try:
-        session.commit()
+        with tracer.span("create_record.commit"):
+            session.commit()
         session.refresh(db_record)
+        record_expiry.schedule(db_record.id, db_record.expires_at)
         return db_record
     except Exception as e:
         session.rollback()
@@ -147,26 +473,208 @@ async def create_record(record: RecordCreate, session: Session = Depends(get_db_
         )
 
 @router.get("/records/", response_model=List[RecordRead])
-async def list_records(session: Session = Depends(get_db_session)):
-    """List all DNS records."""
-    result = session.exec(select(Record)).all()
-    return result
+async def list_records(
+    after: Optional[int] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    session: Session = Depends(get_read_session)
+):
+    """List DNS records in ID order, paginated like ``list_hosts``."""
+    stmt = select(Record).order_by(Record.id)
+    if after is not None:
+        stmt = stmt.where(Record.id > after)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return scatter_gather(session, stmt, limit)
+
+@router.get("/records/{record_id}", response_model=RecordRead)
+async def get_record(
+    record_id: int, response: Response, session: Session = Depends(get_read_session)
+):
+    """Get a single DNS record; the ETag carries its current version."""
+    record = session.get(Record, record_id)
+    if not record:
+        raise NotFoundError(
+            detail=f"Record with ID {record_id} not found",
+            error_code="RECORD_NOT_FOUND"
+        )
+    response.headers["ETag"] = _etag(record.version)
+    return record
+
+@router.patch("/records/{record_id}", response_model=RecordRead)
+async def update_record(
+    record_id: int,
+    changes: RecordUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(default=None),
+    session: Session = Depends(get_db_session)
+):
+    """Update a DNS record with optimistic concurrency.
+    
+    The merged record goes through the same value, conflict and CNAME loop
+    checks as ``create_record`` and is then written with a single
+    ``UPDATE ... WHERE id = ? AND version = ?``.
+    
+    Args:
+        record_id: ID of the record to update
+        changes: Fields to change
+        response: Response used to set the new ETag
+        if_match: Expected version ETag (optional)
+        session: Database session
+        
+    Returns:
+        Updated record data
+        
+    Raises:
+        NotFoundError: If record is not found
+        PreconditionFailedError: If the record was modified concurrently
+        RecordValidationError: If record validation fails
+        RecordConflictError: If record conflicts with existing records
+        CNAMELoopError: If CNAME record would create a loop
+    """
+    expected_version = _parse_if_match(if_match)
+    record = session.get(Record, record_id)
+    if not record:
+        raise NotFoundError(
+            detail=f"Record with ID {record_id} not found",
+            error_code="RECORD_NOT_FOUND"
+        )
+    _check_version(record.version, expected_version)
+    read_version = record.version
+    
+    # Re-run the schema validators on the merged record
+    merged = {
+        "type": record.type,
+        "value": record.value,
+        "ttl": record.ttl,
+        "priority": record.priority,
+        "host_id": record.host_id,
+        "expires_at": record.expires_at,
+        **changes.model_dump(exclude_unset=True),
+    }
+    try:
+        candidate = RecordCreate.model_validate(merged)
+    except PydanticValidationError as e:
+        raise RequestValidationError(e.errors())
+    
+    if not validate_record_value(candidate.type, candidate.value):
+        raise RecordValidationError(
+            detail=f"Invalid {candidate.type} record value: {candidate.value}",
+            error_code="INVALID_RECORD_VALUE"
+        )
+    if candidate.expires_at != record.expires_at:
+        _check_expires_at(candidate.expires_at)
+    
+    if not validate_no_conflicting_records(
+        session=session,
+        host_id=candidate.host_id,
+        record_type=candidate.type,
+        record_value=candidate.value,
+        record_id=record_id
+    ):
+        raise RecordConflictError(
+            detail=(
+                f"A record of type {candidate.type} with value {candidate.value} "
+                "already exists for this host"
+            ),
+            error_code="RECORD_CONFLICT"
+        )
+    
+    if candidate.type == RecordType.CNAME:
+        host = session.get(Host, candidate.host_id)
+        if host is None:
+            raise NotFoundError(
+                detail=f"Host with ID {candidate.host_id} not found",
+                error_code="HOST_NOT_FOUND"
+            )
+        if detect_cname_chain_loop(session, candidate.value, {host.canonical_hostname}):
+            raise CNAMELoopError(
+                detail="CNAME record would create a loop",
+                error_code="CNAME_LOOP_DETECTED"
+            )
+    
+    result = session.execute(
+        update(Record)
+        .where(Record.id == record_id, Record.version == read_version)
+        .values(
+            type=candidate.type,
+            value=candidate.value,
+            ttl=candidate.ttl,
+            priority=candidate.priority,
+            expires_at=candidate.expires_at,
+            version=Record.version + 1,
+            updated_at=datetime.utcnow(),
+        )
+    )
+    if result.rowcount == 0:
+        raise PreconditionFailedError(
+            detail=f"Record with ID {record_id} was modified concurrently",
+            error_code="VERSION_MISMATCH"
+        )
+    changed_types = None
+    if candidate.type != record.type:
+        changed_types = {record.type.value: -1, candidate.type.value: 1}
+    track(session, records=changed_types)
+    note_changes(session, [record.host_id, candidate.host_id])
+    session.commit()
+    
+    session.refresh(record)
+    record_expiry.schedule(record.id, record.expires_at)
+    response.headers["ETag"] = _etag(record.version)
+    return record
+
+@router.delete("/records/{record_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_record(
+    record_id: int,
+    if_match: Optional[str] = Header(default=None),
+    session: Session = Depends(get_db_session)
+):
+    """Delete a DNS record.
+    
+    Raises:
+        NotFoundError: If record is not found
+        PreconditionFailedError: If the record was modified concurrently
+    """
+    expected_version = _parse_if_match(if_match)
+    stmt = delete(Record).where(Record.id == record_id)
+    if expected_version is not None:
+        stmt = stmt.where(Record.version == expected_version)
+    
+    deleted = session.execute(stmt.returning(Record.type, Record.host_id)).all()
+    if not deleted:
+        if session.get(Record, record_id) is None:
+            raise NotFoundError(
+                detail=f"Record with ID {record_id} not found",
+                error_code="RECORD_NOT_FOUND"
+            )
+        raise PreconditionFailedError(
+            detail=f"Record with ID {record_id} was modified concurrently",
+            error_code="VERSION_MISMATCH"
+        )
+    track(session, records=type_counts((row.type for row in deleted), sign=-1))
+    note_changes(session, [row.host_id for row in deleted])
+    session.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 # DNS resolution endpoints
 @router.get("/resolve/{hostname}")
 async def resolve_hostname(
+    request: Request,
     hostname: str,
     type: Optional[RecordType] = None,
     follow_cname: bool = True,
-    session: Session = Depends(get_db_session)
+    conn: Connection = Depends(get_read_connection)
 ):
     """Resolve a hostname to its DNS records.
     
+    Hosts are served from the zone index when it holds them, unless the
+    client asked to read its own writes from the primary.
+    
     Args:
+        request: Incoming request
         hostname: Hostname to resolve
         type: Optional record type to filter by
         follow_cname: Whether to follow CNAME records
-        session: Database session
+        conn: Read-only database connection
         
     Returns:
         Dict containing resolution results
@@ -176,7 +684,13 @@ async def resolve_hostname(
         DNSError: If there's an error during resolution
     """
     try:
-        return resolve_hostname(session, hostname, record_type=type)
+        return resolver.resolve_hostname(
+            conn,
+            hostname,
+            record_type=type,
+            follow_cname=follow_cname,
+            index=None if wants_primary(request) else zone_index.get,
+        )
     except ResolutionError as e:
         raise NotFoundError(
             detail=str(e),
@@ -195,14 +709,14 @@ async def resolve_hostname(
 async def get_cname_chain(
     hostname: str,
     max_depth: int = 10,
-    session: Session = Depends(get_db_session)
+    conn: Connection = Depends(get_read_connection)
 ):
     """Get the full CNAME chain for a hostname.
     
     Args:
         hostname: Starting hostname
         max_depth: Maximum depth to follow CNAMEs
-        session: Database session
+        conn: Read-only database connection
         
     Returns:
         Dict containing the CNAME chain and resolution status
@@ -213,7 +727,7 @@ async def get_cname_chain(
     """
     try:
         chain = []
-        current = hostname
+        current = canonicalize_hostname(hostname)
         visited = set()
         
         for _ in range(max_depth):
@@ -227,12 +741,9 @@ async def get_cname_chain(
             visited.add(current)
             
             # Get all CNAME records for the current hostname
-            stmt = select(Record).where(
-                Record.host_id == Host.id,
-                Host.hostname == current,
-                Record.type == RecordType.CNAME
-            )
-            cname_records = session.exec(stmt).all()
+            cname_records = conn.execute(
+                CNAMES_BY_HOSTNAME, {"hostname": current}
+            ).all()
             
             if not cname_records:
                 return {
@@ -254,7 +765,7 @@ async def get_cname_chain(
                 "cname": cname.value,
                 "ttl": cname.ttl
             })
-            current = cname.value
+            current = canonicalize_hostname(cname.value)
         
         return {
             "hostname": hostname,
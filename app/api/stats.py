@@ -0,0 +1,34 @@
+"""Statistics API endpoints."""
+from typing import Any, Dict, List, Literal
+
+from fastapi import APIRouter
+
+from app.core.stats import dns_stats
+
+router = APIRouter(tags=["Stats"])
+
+
+@router.get("/stats")
+async def get_stats() -> Dict[str, Any]:
+    """Get current host and record counts, CNAME chain depths and write rate.
+    
+    Served from in-memory counters: the counts shared by all workers, last
+    recounted at ``reconciled_at``, plus this worker's writes since then.
+    ``writes_per_minute`` covers the writes of all workers.
+    """
+    return dns_stats.snapshot()
+
+
+@router.get("/stats/history")
+async def get_stats_history(
+    resolution: Literal["minute", "hour"] = "minute"
+) -> List[Dict[str, Any]]:
+    """Get sampled statistics, oldest first.
+    
+    Args:
+        resolution: ``minute`` for the last hour, ``hour`` for the last week
+        
+    Returns:
+        List of samples with counts and the number of writes in each interval
+    """
+    return dns_stats.history(resolution)
@@ -0,0 +1 @@
+"""Command-line tools for operating the Mini DNS API."""
@@ -0,0 +1,303 @@
+"""Generate a synthetic zone with realistic shapes, for benchmarks and load tests.
+
+Hosts come in three kinds, mixed by ``--mix``:
+
+* address hosts, with a number of A records drawn from ``--a-fanout``
+* mail domains, with A records like address hosts plus one of
+  ``--mx-sets`` shared MX sets, as many domains use the same mail provider
+* CNAME hosts, whose chain length is drawn from ``--chain-depth`` (at most
+  ``MAX_CNAME_CHAIN_LENGTH``)
+
+A CNAME of depth ``d`` points at a CNAME of depth ``d - 1`` and depth 1
+points at an address host, so chains never loop and have exactly their
+drawn length. Targets are picked with Zipf-skewed popularity
+(``--suffix-skew``), so many chains share the same tails, like customer
+names converging on a few CDN edge hosts. The mail hosts named by the MX
+sets are generated too, with one A record each.
+
+The same ``--seed`` and options always produce the same zone. Hosts are
+generated as a stream and either written as a dump (``--out``, the format
+of ``app.cli.zone``) or loaded straight into the database through the bulk
+load path, in one transaction.
+
+Usage:
+    python -m app.cli.generate --hosts 1000000 [--out zone.jsonl] [--seed 0]
+        [--mix a=70,mx=10,cname=20] [--a-fanout 1=70,2=20,4=8,8=2]
+        [--chain-depth 1=60,2=25,3=10,5=5] [--mx-sets 50] [--suffix-skew 1.2]
+        [--database-url URL]
+"""
+import argparse
+import bisect
+import contextlib
+import itertools
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List
+
+from app.core.bulk import bulk_load
+from app.core.database import build_engine
+from app.core.exceptions import BulkLoadError
+from app.core.migrations import migrate
+from app.core.settings import SQLITE_PROFILES, settings
+from app.core.validators import MAX_CNAME_CHAIN_LENGTH
+
+DOMAINS = 1000
+# Common TTLs and how often zones use them
+TTLS = ((300, 30), (3600, 50), (86400, 20))
+
+
+def _weights(value: str) -> Dict[str, float]:
+    """``key=weight,key=weight`` as a dict."""
+    weights = {}
+    for part in value.split(","):
+        key, _, weight = part.partition("=")
+        weights[key.strip()] = float(weight)
+    return weights
+
+
+def _int_weights(value: str) -> Dict[int, float]:
+    return {int(key): weight for key, weight in _weights(value).items()}
+
+
+def _split(total: int, weights: Dict[Any, float]) -> Dict[Any, int]:
+    """Share ``total`` out by weight, exactly, largest remainders first."""
+    weight_sum = sum(weights.values())
+    exact = {key: total * weight / weight_sum for key, weight in weights.items()}
+    counts = {key: int(share) for key, share in exact.items()}
+    by_remainder = sorted(exact, key=lambda key: exact[key] - counts[key], reverse=True)
+    for key in by_remainder[:total - sum(counts.values())]:
+        counts[key] += 1
+    return counts
+
+
+class _Choice:
+    """Weighted random choice with the cumulative weights computed once."""
+
+    def __init__(self, weights: Dict[Any, float], rng: random.Random):
+        self.values = list(weights)
+        self.cumulative = list(itertools.accumulate(weights.values()))
+        self.rng = rng
+
+    def pick(self) -> Any:
+        return self.values[
+            bisect.bisect(self.cumulative, self.rng.random() * self.cumulative[-1])
+        ]
+
+
+@dataclass
+class ZoneShape:
+    """Options of a synthetic zone."""
+    hosts: int
+    mix: Dict[str, float] = field(
+        default_factory=lambda: {"a": 70, "mx": 10, "cname": 20}
+    )
+    a_fanout: Dict[int, float] = field(
+        default_factory=lambda: {1: 70, 2: 20, 4: 8, 8: 2}
+    )
+    chain_depth: Dict[int, float] = field(
+        default_factory=lambda: {1: 60, 2: 25, 3: 10, 5: 5}
+    )
+    mx_sets: int = 50
+    suffix_skew: float = 1.2
+    seed: int = 0
+
+    def validate(self) -> None:
+        """Raise ValueError for options no zone can satisfy."""
+        if set(self.mix) - {"a", "mx", "cname"}:
+            raise ValueError("--mix kinds are a, mx and cname")
+        if not any(self.mix.get(kind, 0) > 0 for kind in ("a", "mx")):
+            raise ValueError("--mix needs address or mail hosts for chains to end at")
+        if min(self.a_fanout) < 1:
+            raise ValueError("--a-fanout counts must be at least 1")
+        shortest, longest = min(self.chain_depth), max(self.chain_depth)
+        if not 1 <= shortest <= longest <= MAX_CNAME_CHAIN_LENGTH:
+            raise ValueError(
+                f"--chain-depth must be between 1 and {MAX_CNAME_CHAIN_LENGTH}"
+            )
+        if self.mx_sets < 1:
+            raise ValueError("--mx-sets must be at least 1")
+
+
+class ZoneGenerator:
+    """Stream the hosts of a zone in the dump format of ``app.core.bulk``."""
+
+    def __init__(self, shape: ZoneShape):
+        shape.validate()
+        self.shape = shape
+        self.rng = random.Random(shape.seed)
+        kinds = _split(shape.hosts, shape.mix)
+        self.address_hosts = kinds.get("a", 0)
+        self.mail_domains = kinds.get("mx", 0)
+        # Chains end at address hosts and mail domains alike
+        self.chain_ends = self.address_hosts + self.mail_domains
+        self.cnames_by_depth = _split(kinds.get("cname", 0), shape.chain_depth)
+        deepest = max((d for d, n in self.cnames_by_depth.items() if n), default=0)
+        for depth in range(1, deepest):
+            # Chains of depth d run through a CNAME at every shallower depth
+            self.cnames_by_depth[depth] = max(self.cnames_by_depth.get(depth, 0), 1)
+        self._fanout = _Choice(shape.a_fanout, self.rng)
+        self._ttls = _Choice(dict(TTLS), self.rng)
+        self._addresses = 0
+        # Totals of what ``hosts`` has yielded so far
+        self.host_count = 0
+        self.record_count = 0
+
+    def _zipf_index(self, n: int) -> int:
+        """An index below ``n``; low indices are picked far more often."""
+        s, u = self.shape.suffix_skew, self.rng.random()
+        if s == 1.0:
+            return min(int(n ** u), n) - 1
+        rank = ((n ** (1 - s) - 1) * u + 1) ** (1 / (1 - s))
+        return min(max(int(rank), 1), n) - 1
+
+    def _a_records(self, count: int) -> List[Dict[str, Any]]:
+        ttl = self._ttls.pick()
+        records = []
+        for _ in range(count):
+            n = self._addresses % (1 << 24)
+            self._addresses += 1
+            records.append({
+                "type": "A", "value": f"10.{n >> 16}.{n >> 8 & 255}.{n & 255}",
+                "ttl": ttl, "priority": None,
+            })
+        return records
+
+    @staticmethod
+    def _mail_host(mx_set: int, index: int) -> str:
+        return f"mx{index + 1}.mail{mx_set}.example.net"
+
+    def _mx_set(self, mx_set: int) -> List[Dict[str, Any]]:
+        # Sets 0, 3, 6, ... have one server, then two, then three
+        return [
+            {"type": "MX", "value": self._mail_host(mx_set, i), "ttl": 3600,
+             "priority": 10 * (i + 1)}
+            for i in range(mx_set % 3 + 1)
+        ]
+
+    def chain_end(self, i: int) -> str:
+        """Hostname of the ``i``-th address host or mail domain."""
+        label = "host" if i < self.address_hosts else "mail"
+        return f"{label}{i}.zone{i % DOMAINS}.example"
+
+    def cname(self, depth: int, i: int) -> str:
+        return f"c{depth}-{i}.zone{i % DOMAINS}.example"
+
+    def hosts(self) -> Iterator[Dict[str, Any]]:
+        """Every host with its records, mail servers first, then by chain depth."""
+        for host in self._hosts():
+            self.host_count += 1
+            self.record_count += len(host["records"])
+            yield host
+
+    def _hosts(self) -> Iterator[Dict[str, Any]]:
+        for mx_set in range(self.shape.mx_sets):
+            for i in range(mx_set % 3 + 1):
+                yield {
+                    "hostname": self._mail_host(mx_set, i),
+                    "records": self._a_records(1),
+                }
+
+        for i in range(self.chain_ends):
+            records = self._a_records(self._fanout.pick())
+            if i >= self.address_hosts:
+                records += self._mx_set(self.rng.randrange(self.shape.mx_sets))
+            yield {"hostname": self.chain_end(i), "records": records}
+
+        for depth in sorted(self.cnames_by_depth):
+            for i in range(self.cnames_by_depth[depth]):
+                if depth == 1:
+                    target = self.chain_end(self._zipf_index(self.chain_ends))
+                else:
+                    below = self.cnames_by_depth[depth - 1]
+                    target = self.cname(depth - 1, self._zipf_index(below))
+                ttl = self._ttls.pick()
+                yield {"hostname": self.cname(depth, i), "records": [
+                    {"type": "CNAME", "value": target, "ttl": ttl, "priority": None}
+                ]}
+
+    def dump(self) -> Iterator[str]:
+        for host in self.hosts():
+            yield json.dumps(host) + "\n"
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--hosts", type=int, required=True, help="hosts besides the mail servers"
+    )
+    parser.add_argument("--mix", type=_weights, default="a=70,mx=10,cname=20",
+                        help="weights of address hosts, mail domains and CNAME hosts")
+    parser.add_argument("--a-fanout", type=_int_weights, default="1=70,2=20,4=8,8=2",
+                        help="weights of A record counts per address host")
+    parser.add_argument(
+        "--chain-depth",
+        type=_int_weights,
+        default="1=60,2=25,3=10,5=5",
+        help="weights of CNAME chain lengths",
+    )
+    parser.add_argument(
+        "--mx-sets", type=int, default=50, help="distinct shared MX sets"
+    )
+    parser.add_argument("--suffix-skew", type=float, default=1.2,
+                        help="Zipf exponent of CNAME target popularity")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--out", help="write a dump here (- for stdout) instead of loading"
+    )
+    parser.add_argument("--database-url", default=settings.SQLALCHEMY_DATABASE_URI)
+    args = parser.parse_args(argv)
+
+    shape = ZoneShape(
+        hosts=args.hosts,
+        mix=args.mix,
+        a_fanout=args.a_fanout,
+        chain_depth=args.chain_depth,
+        mx_sets=args.mx_sets,
+        suffix_skew=args.suffix_skew,
+        seed=args.seed,
+    )
+    try:
+        generator = ZoneGenerator(shape)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    started = time.perf_counter()
+    if args.out:
+        out = (
+            contextlib.nullcontext(sys.stdout)
+            if args.out == "-"
+            else open(args.out, "w")
+        )
+        with out as stream:
+            stream.writelines(generator.dump())
+        print(
+            f"Generated {generator.host_count} hosts and "
+            f"{generator.record_count} records in {time.perf_counter() - started:.1f}s",
+            file=sys.stderr,
+        )
+        return
+
+    if settings.db.DB_SHARD_URLS:
+        parser.error("bulk loads into a sharded deployment are not supported")
+    # Generated zones are disposable, so trade durability for load speed
+    engine = build_engine(args.database_url, pragmas=SQLITE_PROFILES["fast"])
+    migrate(engine)
+    try:
+        result = bulk_load(engine, enumerate(generator.hosts(), start=1))
+    except BulkLoadError as exc:
+        print(exc.detail, file=sys.stderr)
+        for error in exc.extra["errors"]:
+            print(f"  {error}", file=sys.stderr)
+        sys.exit(1)
+    print(
+        f"Loaded {result.hosts_inserted} hosts and {result.records_inserted} records "
+        f"in {time.perf_counter() - started:.1f}s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Move hosts to their owning shard after the shard count changed.
+
+Run this after adding shard URLs to ``DB_SHARD_URLS``. Keep
+``DB_SHARD_PREVIOUS_COUNT`` set to the old count on the API workers until
+the run finishes, so lookups also check each host's old shard while it
+moves. Each host is locked on its old shard, copied with its records to
+the new owner and then deleted from the old one, one host at a time, so
+the service stays online throughout and writes to a moving host wait for
+the move instead of being lost. A moved host and its records get new IDs,
+because IDs encode their shard. Hostnames and CNAME targets are unchanged.
+
+Usage:
+    python -m app.cli.reshard --previous-count 2 [--shard-url URL ...] [--dry-run]
+"""
+import argparse
+from typing import List, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.horizontal_shard import set_shard_id
+
+from app.core.database import build_shard_set
+from app.core.settings import settings
+from app.core.sharding import ShardSet, shard_for_id
+from app.models import Host, Record
+
+
+def move_host(shard_set: ShardSet, host_id: int) -> Optional[int]:
+    """Move one host and its records to the shard that owns its hostname.
+    
+    The host stays locked on its old shard for the whole move: rewriting its
+    row takes SQLite's write lock, and ``FOR UPDATE`` blocks record writes
+    to it on server databases. The copy is committed before the old
+    rows are deleted, so the hostname stays resolvable; if that last step
+    fails, the next run replaces the copy's records.
+    
+    Args:
+        shard_set: Shards to move between
+        host_id: ID of the host on its current shard
+        
+    Returns:
+        The host's new ID, or None if it was already on its owner
+    """
+    with shard_set.session() as source, shard_set.session() as target:
+        # A no-op write, to take the write lock before anything is read
+        fenced = source.execute(
+            update(Host)
+            .where(Host.id == host_id)
+            .values(version=Host.version, updated_at=Host.updated_at)
+        ).rowcount
+        if not fenced:
+            return None
+        host = source.execute(
+            select(Host).where(Host.id == host_id).with_for_update()
+        ).scalars().one()
+        owner = shard_set.owner(host.hostname)
+        if owner == str(shard_for_id(host_id)):
+            source.rollback()
+            return None
+        records = source.execute(
+            select(Record).where(Record.host_id == host_id).with_for_update()
+        ).scalars().all()
+        
+        # An earlier interrupted run may already have copied the host, with
+        # records that have changed since
+        copy = target.execute(
+            select(Host)
+            .where(Host.canonical_hostname == host.canonical_hostname)
+            .options(set_shard_id(owner))
+        ).scalars().first()
+        if copy is None:
+            copy = Host(
+                hostname=host.hostname,
+                description=host.description,
+                created_at=host.created_at,
+                updated_at=host.updated_at,
+                version=host.version,
+            )
+            target.add(copy)
+            target.flush()
+        else:
+            target.execute(delete(Record).where(Record.host_id == copy.id))
+        for record in records:
+            target.add(Record(
+                type=record.type,
+                value=record.value,
+                ttl=record.ttl,
+                priority=record.priority,
+                host_id=copy.id,
+                created_at=record.created_at,
+                updated_at=record.updated_at,
+                expires_at=record.expires_at,
+                version=record.version,
+            ))
+        target.commit()
+        
+        # Delete exactly what was copied, and make sure nothing else arrived
+        source.execute(
+            delete(Record).where(
+                Record.host_id == host_id, Record.id.in_([r.id for r in records])
+            )
+        )
+        left = source.execute(
+            select(func.count()).select_from(Record).where(Record.host_id == host_id)
+        ).scalar()
+        if left:
+            source.rollback()
+            raise RuntimeError(
+                f"{left} records were written to {host.hostname} during its move; "
+                "run the reshard again"
+            )
+        source.execute(delete(Host).where(Host.id == host_id))
+        source.commit()
+        return copy.id
+
+
+def reshard(
+    shard_set: ShardSet, batch_size: int = 500, dry_run: bool = False
+) -> int:
+    """Move every misplaced host to its owning shard.
+    
+    Returns:
+        Number of hosts moved (or that would be moved with ``dry_run``)
+    """
+    moved = 0
+    for shard_id in shard_set.writers:
+        cursor = 0
+        while True:
+            with shard_set.session() as session:
+                batch = session.execute(
+                    select(Host.id, Host.hostname)
+                    .where(Host.id > cursor)
+                    .order_by(Host.id)
+                    .limit(batch_size)
+                    .options(set_shard_id(shard_id))
+                ).all()
+            if not batch:
+                break
+            cursor = batch[-1].id
+            for row in batch:
+                if shard_set.owner(row.hostname) == shard_id:
+                    continue
+                if not dry_run:
+                    move_host(shard_set, row.id)
+                moved += 1
+        print(f"shard {shard_id}: scanned, {moved} hosts moved so far")
+    return moved
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--shard-url", action="append", dest="shard_urls",
+        help="shard database URL, in order (default: DB_SHARD_URLS)",
+    )
+    parser.add_argument(
+        "--previous-count", type=int, help="shard count before the change"
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="count hosts to move without moving them"
+    )
+    args = parser.parse_args(argv)
+
+    urls = args.shard_urls or settings.db.DB_SHARD_URLS
+    if not urls:
+        parser.error("no shards configured; pass --shard-url or set DB_SHARD_URLS")
+    shard_set = build_shard_set(urls, previous_count=args.previous_count)
+    shard_set.create_all()
+    moved = reshard(shard_set, batch_size=args.batch_size, dry_run=args.dry_run)
+    print(
+        f"{'Would move' if args.dry_run else 'Moved'} {moved} hosts across "
+        f"{shard_set.count} shards"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,36 @@
-"""Core functionality for the Mini DNS API."""
+"""Core functionality for the Mini DNS API.
 
-from app.core.database import (
-    create_db_and_tables,
-    drop_all_tables,
-    engine,
-    get_db_session,
-    get_session,
-    init_db,
-)
-from app.core.settings import settings
+Names are imported on first use, so importing a light submodule such as
+``app.core.settings`` does not build the database engines.
+"""
+from importlib import import_module
+from typing import Any
 
-__all__ = [
-    "create_db_and_tables",
-    "drop_all_tables",
-    "engine",
-    "get_db_session",
-    "get_session",
-    "init_db",
-    "settings",
-]
+_EXPORTS = {
+    "create_db_and_tables": "app.core.database",
+    "drop_all_tables": "app.core.database",
+    "engine": "app.core.database",
+    "get_db_session": "app.core.database",
+    "get_read_connection": "app.core.database",
+    "get_read_session": "app.core.database",
+    "get_session": "app.core.database",
+    "get_task_session": "app.core.database",
+    "init_db": "app.core.database",
+    "read_engine": "app.core.database",
+    "shard_set": "app.core.database",
+    "settings": "app.core.settings",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(__all__)
@@ -0,0 +1,533 @@
+"""Bulk import and restore of hosts and records.
+
+A load streams its rows into a temporary staging table, checks them with a
+handful of set-based queries, and merges them into ``host`` and ``record``
+with two ``INSERT ... SELECT`` statements, all in one transaction. Nothing
+is written unless the whole load is valid.
+
+On Postgres the staging table is filled with ``COPY ... FROM STDIN``
+(psycopg2 or psycopg 3); on other databases with chunked ``executemany``
+inserts. Validation and merging are the same SQL on every backend.
+
+Per-row format checks (hostname syntax, record values, TTL range, MX
+priority) run in Python while rows stream in. Rules that depend on other
+rows run in SQL against staged and existing data together, comparing
+canonical hostnames:
+
+* a hostname appears at most once in a load, in any spelling
+* a record is not a duplicate of a staged or existing record
+* a CNAME is the only record of its host
+* no CNAME chain loops or exceeds ``MAX_CNAME_CHAIN_LENGTH``
+
+The dump format is JSON Lines, one host per line::
+
+    {"hostname": "www.example.com", "description": null,
+     "records": [{"type": "CNAME", "value": "example.com", "ttl": 300,
+                  "priority": null}]}
+"""
+import io
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    and_,
+    case,
+    cast,
+    distinct,
+    exists,
+    func,
+    literal,
+    or_,
+    select,
+    union_all,
+)
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.exceptions import BulkLoadError
+from app.core.validators import (
+    MAX_CNAME_CHAIN_LENGTH,
+    validate_hostnames,
+    validate_record_values,
+)
+from app.models import Host, Record, RecordType, ZoneChange, canonicalize_hostname
+
+CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+
+host_table = Host.__table__
+record_table = Record.__table__
+change_table = ZoneChange.__table__
+
+_staging = MetaData()
+
+# One row per record, or a single row with NULL record columns for a host
+# without records. ``line`` is the dump line the row came from.
+zone_stage = Table(
+    "zone_stage",
+    _staging,
+    Column("line", Integer, nullable=False),
+    Column("hostname", String(253), nullable=False),
+    Column("canonical_hostname", String(253), nullable=False),
+    Column("description", String(255)),
+    Column("type", String(10)),
+    Column("value", String(1000)),
+    Column("ttl", Integer),
+    Column("priority", Integer),
+    prefixes=["TEMPORARY"],
+)
+
+
+@dataclass
+class BulkLoadResult:
+    """Outcome of a bulk load."""
+    hosts_staged: int = 0
+    records_staged: int = 0
+    hosts_inserted: int = 0
+    records_inserted: int = 0
+    errors: List[str] = field(default_factory=list)
+
+
+def read_dump(stream: IO[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(line_number, host)`` pairs from a JSON Lines dump."""
+    for line_number, line in enumerate(stream, start=1):
+        if line.strip():
+            yield line_number, json.loads(line)
+
+
+def write_dump(conn: Connection, stream: IO[str], batch_size: int = CHUNK_SIZE) -> int:
+    """Write every host and its records to ``stream`` as JSON Lines.
+
+    Hosts are read in canonical hostname order, one keyset page at a time.
+
+    Returns:
+        Number of hosts written
+    """
+    written = 0
+    cursor = ""
+    while True:
+        hosts = conn.execute(
+            select(
+                host_table.c.id,
+                host_table.c.hostname,
+                host_table.c.canonical_hostname,
+                host_table.c.description,
+            )
+            .where(host_table.c.canonical_hostname > cursor)
+            .order_by(host_table.c.canonical_hostname)
+            .limit(batch_size)
+        ).all()
+        if not hosts:
+            return written
+        records: Dict[int, List[Dict[str, Any]]] = {}
+        for row in conn.execute(
+            select(
+                record_table.c.host_id,
+                record_table.c.type,
+                record_table.c.value,
+                record_table.c.ttl,
+                record_table.c.priority,
+            )
+            .where(record_table.c.host_id.in_([h.id for h in hosts]))
+            .order_by(record_table.c.id)
+        ):
+            records.setdefault(row.host_id, []).append({
+                "type": row.type.value,
+                "value": row.value,
+                "ttl": row.ttl,
+                "priority": row.priority,
+            })
+        for host in hosts:
+            stream.write(json.dumps({
+                "hostname": host.hostname,
+                "description": host.description,
+                "records": records.get(host.id, []),
+            }) + "\n")
+        written += len(hosts)
+        cursor = hosts[-1].canonical_hostname
+
+
+def _csv_line(row: tuple) -> bytes:
+    """Encode a row for COPY's CSV format.
+
+    Strings are always quoted so an empty string stays an empty string;
+    ``None`` is an unquoted empty field, which COPY reads as NULL.
+    """
+    fields = (
+        ""
+        if v is None
+        else str(v) if isinstance(v, int) else '"' + str(v).replace('"', '""') + '"'
+        for v in row
+    )
+    return (",".join(fields) + "\n").encode()
+
+
+class _CopyBuffer(io.RawIOBase):
+    """Read-only file over CSV lines, encoded lazily as COPY reads them."""
+
+    def __init__(self, rows: Iterable[tuple]):
+        self._lines = map(_csv_line, rows)
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._pending) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._pending += line
+        if size < 0:
+            size = len(self._pending)
+        chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
+
+    def readinto(self, buffer) -> int:
+        chunk = self.read(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def _copy_rows(conn: Connection, table: Table, rows: Iterable[tuple]) -> None:
+    """Stream rows into a staging table with Postgres ``COPY``."""
+    columns = ", ".join(c.name for c in table.columns)
+    sql = f"COPY {table.name} ({columns}) FROM STDIN WITH (FORMAT csv)"
+    dbapi_conn = conn.connection.dbapi_connection
+    with dbapi_conn.cursor() as cursor:
+        if conn.dialect.driver == "psycopg":
+            with cursor.copy(sql) as copy:
+                for row in rows:
+                    copy.write_row(row)
+        else:
+            cursor.copy_expert(sql, _CopyBuffer(rows))
+
+
+def _insert_rows(conn: Connection, table: Table, rows: Iterable[tuple]) -> None:
+    """Insert rows into a staging table with chunked ``executemany``.
+
+    Rows go to the driver as tuples in plain SQL, skipping SQLAlchemy's
+    per-row parameter processing, which the staging columns don't need.
+    """
+    placeholder = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+    columns = ", ".join(c.name for c in table.columns)
+    values = ", ".join([placeholder] * len(table.columns))
+    sql = f"INSERT INTO {table.name} ({columns}) VALUES ({values})"
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            return
+        conn.exec_driver_sql(sql, chunk)
+
+
+def _check_record(
+    line: int, hostname: str, record: Dict[str, Any], value_valid: bool
+) -> Optional[str]:
+    """Return a description of what is wrong with a record, if anything.
+
+    ``value_valid`` is the record's value verdict from ``validate_record_values``.
+    """
+    try:
+        record_type = RecordType(record.get("type"))
+    except ValueError:
+        return f"line {line}: {hostname}: unknown record type {record.get('type')!r}"
+    if not value_valid:
+        return (
+            f"line {line}: {hostname}: invalid {record_type.value} value "
+            f"{record.get('value')!r}"
+        )
+    ttl = record.get("ttl", 3600)
+    if not isinstance(ttl, int) or not 60 <= ttl <= 86400:
+        return f"line {line}: {hostname}: TTL must be between 60 and 86400"
+    priority = record.get("priority")
+    if (record_type == RecordType.MX) != (priority is not None):
+        return (
+            f"line {line}: {hostname}: priority is required for MX records and only "
+            "for them"
+        )
+    if priority is not None and not (
+        isinstance(priority, int) and 0 <= priority <= 65535
+    ):
+        return f"line {line}: {hostname}: priority must be between 0 and 65535"
+    return None
+
+
+def _stage_rows(
+    hosts: Iterable[Tuple[int, Dict[str, Any]]], result: BulkLoadResult
+) -> Iterator[tuple]:
+    """Check hosts in chunks and yield their staging rows.
+
+    Hostnames and record values of a chunk are validated as columns with
+    the batch validators. Invalid rows are reported in ``result.errors`` and
+    skipped.
+    """
+    hosts = iter(hosts)
+    while True:
+        chunk = list(islice(hosts, CHUNK_SIZE))
+        if not chunk:
+            return
+        canonical = [
+            (
+                canonicalize_hostname(host["hostname"])
+                if isinstance(host.get("hostname"), str)
+                else None
+            )
+            for _, host in chunk
+        ]
+        hostnames_valid = validate_hostnames(canonical).valid
+        records = [
+            (host.get("records") or []) if valid else []
+            for (_, host), valid in zip(chunk, hostnames_valid)
+        ]
+        flat = [record for host_records in records for record in host_records]
+        values_valid = iter(
+            validate_record_values(
+                [record.get("type") for record in flat],
+                [record.get("value") for record in flat],
+            ).valid
+        )
+
+        for (line, host), canonical_hostname, hostname_valid, host_records in zip(
+            chunk, canonical, hostnames_valid, records
+        ):
+            hostname = host.get("hostname")
+            if not hostname_valid:
+                result.errors.append(f"line {line}: invalid hostname {hostname!r}")
+                continue
+            description = host.get("description")
+            result.hosts_staged += 1
+            if not host_records:
+                yield (
+                    line,
+                    hostname,
+                    canonical_hostname,
+                    description,
+                    None,
+                    None,
+                    None,
+                    None,
+                )
+            for record in host_records:
+                error = _check_record(line, hostname, record, next(values_valid))
+                if error:
+                    result.errors.append(error)
+                    continue
+                value = record["value"]
+                if record["type"] != RecordType.A.value:
+                    value = value.lower()
+                result.records_staged += 1
+                yield (
+                    line,
+                    hostname,
+                    canonical_hostname,
+                    description,
+                    record["type"],
+                    value,
+                    record.get("ttl", 3600),
+                    record.get("priority"),
+                )
+
+
+def _set_based_errors(conn: Connection) -> List[str]:
+    """Check cross-row rules against staged and existing data in SQL."""
+    errors: List[str] = []
+    stage = zone_stage.c
+
+    for row in conn.execute(
+        select(
+            stage.canonical_hostname.label("hostname"),
+            func.max(stage.line).label("line"),
+        )
+        .group_by(stage.canonical_hostname)
+        .having(func.count(distinct(stage.line)) > 1)
+        .order_by(stage.canonical_hostname)
+        .limit(MAX_REPORTED_ERRORS)
+    ):
+        errors.append(
+            f"line {row.line}: {row.hostname}: hostname appears more than once"
+        )
+
+    # Every record the database will hold after the merge
+    combined = union_all(
+        select(stage.canonical_hostname.label("hostname"), stage.type, stage.value)
+        .where(stage.type.is_not(None)),
+        select(
+            host_table.c.canonical_hostname.label("hostname"),
+            cast(record_table.c.type, String).label("type"),
+            record_table.c.value,
+        ).select_from(
+            host_table.join(record_table, record_table.c.host_id == host_table.c.id)
+        ),
+    ).subquery("combined")
+
+    for row in conn.execute(
+        select(combined.c.hostname, combined.c.type, combined.c.value)
+        .group_by(combined.c.hostname, combined.c.type, combined.c.value)
+        .having(func.count() > 1)
+        .order_by(combined.c.hostname)
+        .limit(MAX_REPORTED_ERRORS)
+    ):
+        errors.append(f"{row.hostname}: duplicate {row.type} record {row.value!r}")
+
+    is_cname = case((combined.c.type == RecordType.CNAME.value, 1), else_=0)
+    for row in conn.execute(
+        select(combined.c.hostname)
+        .group_by(combined.c.hostname)
+        .having(and_(func.sum(is_cname) > 0, func.count() > 1))
+        .order_by(combined.c.hostname)
+        .limit(MAX_REPORTED_ERRORS)
+    ):
+        errors.append(f"{row.hostname}: a CNAME must be the only record of its host")
+
+    errors.extend(_cname_loop_errors(conn, combined))
+    return errors
+
+
+def _cname_loop_errors(conn: Connection, combined: Any) -> List[str]:
+    """Find CNAME loops and over-long chains with a recursive CTE.
+
+    Existing data is loop-free, so any loop passes through a staged CNAME.
+    Walking every chain that starts at a staged CNAME host therefore finds
+    them all. Like the resolver, a chain may take ``MAX_CNAME_CHAIN_LENGTH``
+    hops; the walk stops one hop later, which also bounds it on a loop.
+    """
+    edges = (
+        select(combined.c.hostname.label("source"), combined.c.value.label("target"))
+        .where(combined.c.type == RecordType.CNAME.value)
+        .cte("edges")
+    )
+    chain = (
+        select(
+            zone_stage.c.canonical_hostname.label("start"),
+            zone_stage.c.value.label("node"),
+            literal(1).label("depth"),
+        )
+        .where(zone_stage.c.type == RecordType.CNAME.value)
+        .cte("chain", recursive=True)
+    )
+    chain = chain.union_all(
+        select(chain.c.start, edges.c.target, chain.c.depth + 1)
+        .select_from(chain.join(edges, edges.c.source == chain.c.node))
+        .where(chain.c.node != chain.c.start)
+        .where(chain.c.depth <= MAX_CNAME_CHAIN_LENGTH)
+    )
+    rows = conn.execute(
+        select(distinct(chain.c.start).label("start"))
+        .where(
+            or_(
+                chain.c.node == chain.c.start,
+                chain.c.depth > MAX_CNAME_CHAIN_LENGTH,
+            )
+        )
+        .order_by(chain.c.start)
+        .limit(MAX_REPORTED_ERRORS)
+    )
+    return [
+        f"{row.start}: CNAME chain loops or is longer than {MAX_CNAME_CHAIN_LENGTH}"
+        for row in rows
+    ]
+
+
+def _merge(conn: Connection, result: BulkLoadResult) -> None:
+    """Insert staged hosts that don't exist yet, then all staged records.
+
+    Every loaded host is logged in ``zone_change``.
+    """
+    stage = zone_stage.c
+    now = literal(datetime.utcnow(), host_table.c.created_at.type)
+    result.hosts_inserted = conn.execute(
+        host_table.insert().from_select(
+            ["hostname", "canonical_hostname", "description", "created_at", "version"],
+            select(
+                func.max(stage.hostname),
+                stage.canonical_hostname,
+                func.max(stage.description),
+                now,
+                literal(1),
+            )
+            .where(
+                ~exists().where(
+                    host_table.c.canonical_hostname == stage.canonical_hostname
+                )
+            )
+            .group_by(stage.canonical_hostname),
+        )
+    ).rowcount
+    result.records_inserted = conn.execute(
+        record_table.insert().from_select(
+            ["type", "value", "ttl", "priority", "host_id", "created_at", "version"],
+            select(
+                cast(stage.type, record_table.c.type.type),
+                stage.value,
+                stage.ttl,
+                stage.priority,
+                host_table.c.id,
+                now,
+                literal(1),
+            )
+            .select_from(
+                zone_stage.join(
+                    host_table,
+                    host_table.c.canonical_hostname == stage.canonical_hostname,
+                )
+            )
+            .where(stage.type.is_not(None))
+        )
+    ).rowcount
+    # Log every loaded host so zone snapshots pick up the load
+    conn.execute(
+        change_table.insert().from_select(
+            ["host_id", "changed_at"],
+            select(host_table.c.id, now).where(
+                host_table.c.canonical_hostname.in_(select(stage.canonical_hostname))
+            ),
+        )
+    )
+
+
+def bulk_load(
+    engine: Engine, hosts: Iterable[Tuple[int, Dict[str, Any]]]
+) -> BulkLoadResult:
+    """Load hosts and records in one all-or-nothing transaction.
+
+    Hosts that already exist are kept, and the load's records for them are
+    added to the existing ones.
+
+    Args:
+        engine: Engine of the database to load into
+        hosts: ``(line_number, host)`` pairs, e.g. from ``read_dump``
+
+    Returns:
+        Counts of staged and inserted rows
+
+    Raises:
+        BulkLoadError: If any row is invalid; nothing is written
+    """
+    result = BulkLoadResult()
+    load = _copy_rows if engine.dialect.name == "postgresql" else _insert_rows
+    with engine.begin() as conn:
+        _staging.create_all(conn)
+        try:
+            load(conn, zone_stage, _stage_rows(hosts, result))
+            if not result.errors:
+                result.errors.extend(_set_based_errors(conn))
+            if not result.errors:
+                _merge(conn, result)
+        finally:
+            _staging.drop_all(conn)
+
+    if result.errors:
+        raise BulkLoadError(
+            detail=f"Bulk load rejected with {len(result.errors)} error(s)",
+            error_code="BULK_LOAD_REJECTED",
+            errors=result.errors[:MAX_REPORTED_ERRORS],
+        )
+    return result
@@ -1,25 +1,264 @@
 """Database configuration and session management."""
+import hashlib
+import itertools
+import logging
+import re
+import time
+from collections import deque
 from contextlib import contextmanager
-from typing import Generator, Optional
+from datetime import datetime
+from typing import Any, Dict, Generator, List, Optional
 
-from sqlalchemy import event
-from sqlalchemy.engine import Engine
-from sqlalchemy.exc import SQLAlchemyError
+from fastapi import Request
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.engine import Connection, Engine, make_url
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
 from sqlalchemy.orm import Session as SessionType
-from sqlmodel import SQLModel, create_engine, Session, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlmodel import SQLModel, create_engine, Session
 
+from app.core.instrumentation import current_request
+from app.core.pool import InstrumentedQueuePool, register_pool
 from app.core.settings import settings
+from app.core.sharding import ShardSet
 from app.models import BaseModel  # noqa: F401
 
-# Configure SQLAlchemy engine
-engine = create_engine(
-    settings.SQLALCHEMY_DATABASE_URI,
-    echo=settings.SQL_ECHO,
-    pool_pre_ping=settings.SQL_POOL_PRE_PING,
-    pool_size=settings.SQL_POOL_SIZE,
-    max_overflow=settings.SQL_MAX_OVERFLOW,
-    pool_timeout=settings.SQL_POOL_TIMEOUT,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.SQLALCHEMY_DATABASE_URI else {},
+
+def is_sqlite(url: str) -> bool:
+    """Return True if the URL points at SQLite."""
+    return url.startswith("sqlite")
+
+
+def is_memory_sqlite(url: str) -> bool:
+    """Return True for in-memory SQLite URLs, which cannot be opened twice."""
+    database = make_url(url).database
+    return not database or database == ":memory:" or "mode=memory" in database
+
+
+def sqlite_read_only_url(url: str) -> str:
+    """Turn a file-backed SQLite URL into a read-only URI-mode URL."""
+    database = make_url(url).database
+    return f"sqlite:///file:{database}?mode=ro&uri=true"
+
+
+def apply_sqlite_pragmas(
+    engine: Engine, pragmas: Dict[str, Any], read_only: bool = False
+) -> None:
+    """Apply PRAGMAs to every new connection of a SQLite engine.
+    
+    Args:
+        engine: SQLite engine to configure
+        pragmas: PRAGMA name/value pairs, e.g. from ``settings.db.SQLITE_PRAGMAS``
+        read_only: Skip PRAGMAs that write to the file and enable ``query_only``
+    """
+    statements = [
+        f"PRAGMA {name}={value}"
+        for name, value in pragmas.items()
+        if name != "journal_mode"
+    ]
+    if read_only:
+        statements.append("PRAGMA query_only=ON")
+    # journal_mode is stored in the file, so the writer sets it once rather
+    # than taking a lock for it on every new connection
+    first_connection = [] if read_only or "journal_mode" not in pragmas else [
+        f"PRAGMA journal_mode={pragmas['journal_mode']}"
+    ]
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        while first_connection:
+            cursor.execute(first_connection.pop())
+        cursor.close()
+
+
+def build_engine(
+    url: str,
+    read_only: bool = False,
+    pragmas: Optional[Dict[str, Any]] = None,
+    pool_size: int = settings.SQL_POOL_SIZE,
+    name: Optional[str] = None,
+) -> Engine:
+    """Create an engine with the configured pool and SQLite profile.
+    
+    Args:
+        url: Database URL
+        read_only: Open file-backed SQLite databases with ``mode=ro``
+        pragmas: SQLite PRAGMAs; defaults to the configured profile
+        pool_size: Connection pool size
+        name: Publish the pool's metrics under this name (see ``app.core.pool``)
+        
+    Returns:
+        A configured SQLAlchemy engine
+    """
+    sqlite = is_sqlite(url)
+    if sqlite and read_only:
+        url = sqlite_read_only_url(url)
+    # In-memory SQLite keeps its single-connection pool
+    pool_class = (
+        {} if sqlite and is_memory_sqlite(url) else {"poolclass": InstrumentedQueuePool}
+    )
+    new_engine = create_engine(
+        url,
+        **pool_class,
+        echo=settings.SQL_ECHO,
+        pool_pre_ping=settings.SQL_POOL_PRE_PING,
+        pool_size=pool_size,
+        max_overflow=settings.SQL_MAX_OVERFLOW,
+        pool_timeout=settings.SQL_POOL_TIMEOUT,
+        connect_args={"check_same_thread": False} if sqlite else {},
+    )
+    if sqlite:
+        apply_sqlite_pragmas(
+            new_engine,
+            settings.db.SQLITE_PRAGMAS if pragmas is None else pragmas,
+            read_only=read_only,
+        )
+    if name is not None:
+        register_pool(name, new_engine.pool)
+    return new_engine
+
+
+# Writer engine: all mutations go through this one
+engine = build_engine(settings.SQLALCHEMY_DATABASE_URI, name="writer")
+
+# Reader engine for GET endpoints. A file-backed SQLite database gets its own
+# read-only pool; in-memory SQLite and server databases share the writer.
+if is_sqlite(settings.SQLALCHEMY_DATABASE_URI) and not is_memory_sqlite(
+    settings.SQLALCHEMY_DATABASE_URI
+):
+    read_engine = build_engine(
+        settings.SQLALCHEMY_DATABASE_URI,
+        read_only=True,
+        pool_size=settings.db.DB_READ_POOL_SIZE,
+        name="reader",
+    )
+else:
+    read_engine = engine
+
+# Engine for background jobs, so they never compete with requests for the
+# request pools. In-memory SQLite cannot be opened twice and shares the writer.
+if is_sqlite(settings.SQLALCHEMY_DATABASE_URI) and is_memory_sqlite(
+    settings.SQLALCHEMY_DATABASE_URI
+):
+    task_engine = engine
+else:
+    task_engine = build_engine(
+        settings.SQLALCHEMY_DATABASE_URI,
+        pool_size=settings.TASK_EXECUTOR_WORKERS,
+        name="tasks",
+    )
+
+
+# Cookie set after a successful write; while present, reads go to the primary
+RECENT_WRITE_COOKIE = "dns_recent_write"
+# Request header that forces a read from the primary
+READ_YOUR_WRITES_HEADER = "x-read-your-writes"
+
+
+class ReplicaRouter:
+    """Health-aware round-robin selection of read replicas.
+    
+    A replica whose connection attempt fails is skipped for
+    ``retry_after`` seconds. When every replica is down, or the request asks
+    to read its own writes, reads go to the primary.
+    """
+
+    def __init__(self, primary: Engine, replicas: List[Engine], retry_after: float):
+        self.primary = primary
+        self.replicas = replicas
+        self.retry_after = retry_after
+        self._counter = itertools.count()
+        self._down_until: Dict[int, float] = {}
+
+    def healthy_replicas(self) -> List[Engine]:
+        """Return replicas not currently marked down, in round-robin order."""
+        if not self.replicas:
+            return []
+        now = time.monotonic()
+        start = next(self._counter)
+        count = len(self.replicas)
+        return [
+            self.replicas[(start + i) % count]
+            for i in range(count)
+            if self._down_until.get((start + i) % count, 0.0) <= now
+        ]
+
+    def mark_down(self, replica: Engine) -> None:
+        """Skip a replica until its retry window has passed."""
+        self._down_until[self.replicas.index(replica)] = (
+            time.monotonic() + self.retry_after
+        )
+
+    def connect(self, use_primary: bool = False) -> Connection:
+        """Open a connection on the chosen engine.
+        
+        Args:
+            use_primary: Bypass the replicas, e.g. for read-your-writes
+            
+        Returns:
+            An open connection to a healthy replica or to the primary
+        """
+        if not use_primary:
+            for replica in self.healthy_replicas():
+                try:
+                    return replica.connect()
+                except DBAPIError:
+                    self.mark_down(replica)
+        return self.primary.connect()
+
+
+def wants_primary(request: Request) -> bool:
+    """Return True if the request must see its own recent writes."""
+    flag = request.headers.get(READ_YOUR_WRITES_HEADER, "")
+    return (
+        flag.lower() in ("1", "true", "yes") or RECENT_WRITE_COOKIE in request.cookies
+    )
+
+
+# Replicas are opened read-only; with none configured the reader engine
+# (read-only SQLite or the primary itself) takes their place.
+replica_router = ReplicaRouter(
+    primary=engine,
+    replicas=[
+        build_engine(
+            url,
+            read_only=True,
+            pool_size=settings.db.DB_READ_POOL_SIZE,
+            name=f"replica-{i}",
+        )
+        for i, url in enumerate(settings.db.DB_REPLICA_URLS)
+    ] or [read_engine],
+    retry_after=settings.db.DB_REPLICA_RETRY_SECONDS,
+)
+
+
+def build_shard_set(
+    urls: List[str], previous_count: Optional[int] = None
+) -> ShardSet:
+    """Create writer and reader engines for each shard URL."""
+    writers = [build_engine(url, name=f"shard-{i}") for i, url in enumerate(urls)]
+    readers = [
+        build_engine(
+            url,
+            read_only=True,
+            pool_size=settings.db.DB_READ_POOL_SIZE,
+            name=f"shard-{i}-reader",
+        )
+        if is_sqlite(url) and not is_memory_sqlite(url)
+        else writer
+        for i, (url, writer) in enumerate(zip(urls, writers))
+    ]
+    return ShardSet(engine, writers, readers, previous_count=previous_count)
+
+
+# Host/record shards; None when everything lives in the single database
+shard_set: Optional[ShardSet] = (
+    build_shard_set(settings.db.DB_SHARD_URLS, settings.db.DB_SHARD_PREVIOUS_COUNT)
+    if settings.db.DB_SHARD_URLS
+    else None
 )
 
 
@@ -32,20 +271,267 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
         cursor.close()
 
 
-def create_db_and_tables() -> None:
-    """Create all database tables.
+# Placeholder lists of expanded IN clauses: (?, ?, ?) or (%(p_1)s, %(p_2)s)
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+_IN_LIST_RE = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+# Statements a query plan can be captured for
+_EXPLAINABLE_RE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+
+slow_query_logger = logging.getLogger("app.slow_queries")
+
+
+def normalize_sql(statement: str) -> str:
+    """The shape of a statement: whitespace collapsed, IN lists folded to ``(...)``."""
+    return _IN_LIST_RE.sub("(...)", _WHITESPACE_RE.sub(" ", statement).strip())
+
+
+def _plain(value: Any) -> Any:
+    """A parameter value as JSON can carry it."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+# Wraps the EXPLAIN of a slow statement inside the caller's transaction
+EXPLAIN_SAVEPOINT = "slow_query_explain"
+
+
+class SlowQueryLog:
+    """Statements slower than a threshold, kept in a bounded ring.
+    
+    Every engine's statements are timed by cursor execution hooks. A slow
+    statement is logged on the ``app.slow_queries`` logger and kept with
+    its shape, duration, parameters (unless redacted) and the endpoint that
+    ran it. The first time a shape is slow its query plan is captured with
+    ``EXPLAIN QUERY PLAN`` (SQLite) or ``EXPLAIN`` (other databases) on a
+    separate cursor, and plans that scan a whole table are flagged. The
+    EXPLAIN runs in a savepoint, so if it fails the caller's transaction is
+    rolled back to where it was rather than aborted.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: Optional[float] = settings.db.DB_SLOW_QUERY_THRESHOLD_MS,
+        size: int = settings.db.DB_SLOW_QUERY_LOG_SIZE,
+        max_plans: int = settings.db.DB_SLOW_QUERY_MAX_PLANS,
+        redact_parameters: bool = settings.db.DB_SLOW_QUERY_REDACT_PARAMETERS,
+    ):
+        self.threshold_ms = threshold_ms
+        self.redact_parameters = redact_parameters
+        self.max_plans = max_plans
+        self.entries: deque = deque(maxlen=size)
+        self.plans: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms is not None
+
+    def record(
+        self,
+        conn: Connection,
+        statement: str,
+        parameters: Any,
+        executemany: bool,
+        seconds: float,
+    ) -> None:
+        """Keep a statement that took ``seconds``, if that is over the threshold."""
+        duration_ms = seconds * 1000
+        if not self.enabled or duration_ms < self.threshold_ms:
+            return
+        shape = normalize_sql(statement)
+        if shape not in self.plans and len(self.plans) < self.max_plans:
+            sample = parameters[0] if executemany and parameters else parameters
+            self.plans[shape] = self._explain(conn, statement, sample)
+        request = current_request.get()
+        entry = {
+            "at": datetime.utcnow(),
+            "duration_ms": round(duration_ms, 3),
+            "statement": shape,
+            "parameters": (
+                None if self.redact_parameters else self._parameters(parameters)
+            ),
+            "endpoint": request.endpoint() if request is not None else "background",
+        }
+        self.entries.append(entry)
+        slow_query_logger.warning(
+            "Slow query (%.1f ms) in %s: %s",
+            duration_ms,
+            entry["endpoint"],
+            shape[:500],
+        )
+
+    @staticmethod
+    def _parameters(parameters: Any) -> Any:
+        if isinstance(parameters, dict):
+            return {name: _plain(value) for name, value in parameters.items()}
+        if isinstance(parameters, (list, tuple)):
+            return [SlowQueryLog._parameters(p) for p in parameters]
+        return _plain(parameters)
+
+    @staticmethod
+    def _explain(conn: Connection, statement: str, parameters: Any) -> Dict[str, Any]:
+        """The query plan of ``statement``, captured without running it."""
+        if not _EXPLAINABLE_RE.match(statement):
+            return {"plan": None, "full_scan": False, "error": "not explainable"}
+        sqlite = conn.dialect.name == "sqlite"
+        prefix = "EXPLAIN QUERY PLAN " if sqlite else "EXPLAIN "
+        try:
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(f"SAVEPOINT {EXPLAIN_SAVEPOINT}")
+                try:
+                    cursor.execute(prefix + statement, parameters or ())
+                    rows = cursor.fetchall()
+                except Exception:
+                    # On PostgreSQL a failed statement aborts the transaction
+                    cursor.execute(f"ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}")
+                    raise
+                finally:
+                    cursor.execute(f"RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            finally:
+                cursor.close()
+        except Exception as e:
+            return {"plan": None, "full_scan": False, "error": str(e)}
+        # SQLite rows are (id, parent, notused, detail); others one text column
+        plan = [row[-1] if sqlite else row[0] for row in rows]
+        if sqlite:
+            full_scan = any(
+                step.startswith("SCAN ") and step != "SCAN CONSTANT ROW"
+                for step in plan
+            )
+        else:
+            full_scan = any("Seq Scan" in step for step in plan)
+        return {"plan": plan, "full_scan": full_scan, "error": None}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Threshold and slow statements, newest first, each with its shape's plan."""
+        entries = list(self.entries)
+        entries.reverse()
+        return {
+            "threshold_ms": self.threshold_ms,
+            "parameters_redacted": self.redact_parameters,
+            "entries": [
+                {**entry, **self.plans.get(entry["statement"], {})} for entry in entries
+            ],
+        }
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.plans.clear()
+
+
+# Global slow query log
+slow_query_log = SlowQueryLog()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if slow_query_log.enabled:
+        conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _check_query_time(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("slow_query_started")
+    if started:
+        elapsed = time.perf_counter() - started.pop()
+        slow_query_log.record(conn, statement, parameters, executemany, elapsed)
+
+
+@event.listens_for(Engine, "handle_error")
+def _discard_query_timer(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("slow_query_started"):
+        conn.info["slow_query_started"].pop()
+
+
+def schema_fingerprint(engine: Engine) -> str:
+    """SHA-256 of the DDL every table and index compiles to on ``engine``."""
+    digest = hashlib.sha256()
+    for table in SQLModel.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=engine.dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            digest.update(
+                str(CreateIndex(index).compile(dialect=engine.dialect)).encode()
+            )
+    return digest.hexdigest()
+
+
+def missing_schema(engine: Engine) -> List[str]:
+    """Tables and ``table.column`` names of the models the live database lacks."""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    missing = []
+    for table in SQLModel.metadata.sorted_tables:
+        if table.name not in tables:
+            missing.append(table.name)
+            continue
+        live = {column["name"] for column in inspector.get_columns(table.name)}
+        missing.extend(
+            f"{table.name}.{column.name}"
+            for column in table.columns
+            if column.name not in live
+        )
+    return missing
+
+
+def ensure_schema(engine: Engine) -> bool:
+    """Migrate the schema unless the stored schema fingerprint is current.
     
-    This should be called during application startup.
+    Checking one row is much cheaper than ``migrate``, which inspects every
+    table, so workers starting against an up-to-date database skip it. The
+    fingerprint is only stored once the live tables have every column of
+    the models, so a database a migration failed to update is never marked
+    current.
+    
+    Returns:
+        True if ``migrate`` ran
+        
+    Raises:
+        RuntimeError: If the database still lacks tables or columns of the
+            models after migrating
     """
-    from app.models import BaseModel  # noqa: F811
+    from app.core.migrations import migrate
+    from app.models import SchemaVersion
     
-    SQLModel.metadata.create_all(engine)
+    fingerprint = schema_fingerprint(engine)
+    with engine.connect() as conn:
+        try:
+            stored = conn.execute(
+                select(SchemaVersion.fingerprint).where(SchemaVersion.id == 1)
+            ).scalar()
+        except DBAPIError:
+            # No schema_version table yet
+            stored = None
+    if stored == fingerprint:
+        return False
     
-    # If using SQLite, enable WAL mode for better concurrency
-    if "sqlite" in settings.SQLALCHEMY_DATABASE_URI:
-        with Session(engine) as session:
-            session.execute(text("PRAGMA journal_mode=WAL"))
-            session.commit()
+    migrate(engine)
+    missing = missing_schema(engine)
+    if missing:
+        raise RuntimeError(
+            f"Database {engine.url!r} is missing {', '.join(missing)} after "
+            "migrating; add a revision under app/migrations/versions"
+        )
+    with engine.begin() as conn:
+        conn.execute(delete(SchemaVersion))
+        conn.execute(insert(SchemaVersion).values(
+            id=1, fingerprint=fingerprint, applied_at=datetime.utcnow()
+        ))
+    return True
+
+
+def create_db_and_tables() -> None:
+    """Create all database tables, migrating existing ones to the models.
+    
+    This should be called during application startup. Databases whose
+    stored schema fingerprint matches the models are left untouched.
+    """
+    if shard_set is not None:
+        shard_set.create_all()
+    else:
+        ensure_schema(engine)
 
 
 def drop_all_tables() -> None:
@@ -67,9 +553,26 @@ def get_session() -> Generator[SessionType, None, None]:
             print(result.scalar())
     
     Yields:
-        SQLAlchemy Session object
+        SQLAlchemy Session object (a sharded session when sharding is enabled)
+    """
+    session = shard_set.session() if shard_set is not None else Session(engine)
+    try:
+        yield session
+        session.commit()
+    except SQLAlchemyError as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+
+@contextmanager
+def get_task_session() -> Generator[SessionType, None, None]:
+    """Session for background jobs, on ``task_engine`` (or the shards).
+    
+    Commits on success and rolls back on error, like ``get_session``.
     """
-    session = Session(engine)
+    session = shard_set.session() if shard_set is not None else Session(task_engine)
     try:
         yield session
         session.commit()
@@ -95,6 +598,47 @@ def get_db_session() -> Generator[SessionType, None, None]:
         yield session
 
 
+def get_read_session(request: Request) -> Generator[SessionType, None, None]:
+    """FastAPI dependency that provides a read-only database session.
+    
+    Used by GET endpoints. The session is bound to a replica chosen by
+    ``replica_router``, or to the primary when the request carries the
+    read-your-writes header or recent-write cookie. It is never committed.
+    """
+    if shard_set is not None:
+        with shard_set.session(read_only=True) as session:
+            yield session
+        return
+    
+    connection = replica_router.connect(use_primary=wants_primary(request))
+    session = Session(bind=connection)
+    try:
+        yield session
+    finally:
+        session.close()
+        connection.close()
+
+
+def get_read_connection(request: Request) -> Generator[Connection, None, None]:
+    """FastAPI dependency that provides a plain read-only connection.
+    
+    Used by the resolver endpoints, which run pre-built Core statements and
+    need neither a Session nor ORM objects. Routing matches
+    ``get_read_session``; with sharding enabled a read-only sharded session
+    is yielded instead, so CNAME chains are followed across shards.
+    """
+    if shard_set is not None:
+        with shard_set.session(read_only=True) as session:
+            yield session
+        return
+    
+    connection = replica_router.connect(use_primary=wants_primary(request))
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+
 def init_db() -> None:
     """Initialize the database.
     
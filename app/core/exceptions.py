@@ -2,10 +2,11 @@
 from typing import Any, Dict, Optional
 
 from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.requests import Request
 from fastapi.responses import JSONResponse
-from pydantic import ValidationError
+from pydantic import ValidationError as PydanticValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 
@@ -54,6 +55,17 @@ class RateLimitExceededError(DNSBaseError):
     default_detail = "Rate limit exceeded"
 
 
+class IdempotencyConflictError(ConflictError):
+    """Raised when an Idempotency-Key is in flight or reused with another payload."""
+    default_detail = "Idempotency key conflict"
+
+
+class PreconditionFailedError(DNSBaseError):
+    """Raised when an If-Match precondition does not hold."""
+    default_status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The resource has been modified since it was read"
+
+
 class DNSError(DNSBaseError):
     """Base exception for DNS-related errors."""
     default_status_code = status.HTTP_400_BAD_REQUEST
@@ -70,6 +82,11 @@ class HostnameValidationError(ValidationError):
     default_detail = "Invalid hostname format"
 
 
+class BulkLoadError(ValidationError):
+    """Raised when a bulk load is rejected; ``extra["errors"]`` lists the problems."""
+    default_detail = "Bulk load rejected"
+
+
 class CNAMELoopError(DNSError):
     """Raised when a CNAME loop is detected."""
     default_detail = "CNAME loop detected"
@@ -104,7 +121,7 @@ def validation_exception_handler(request: Request, exc: RequestValidationError)
                 "code": "ValidationError",
                 "message": "Invalid request data",
                 "status_code": status.HTTP_422_UNPROCESSABLE_ENTITY,
-                "details": exc.errors(),
+                "details": jsonable_encoder(exc.errors()),
             }
         },
     )
@@ -146,6 +163,6 @@ def setup_exception_handlers(app):
     app.add_exception_handler(HTTPException, http_exception_handler)
     app.add_exception_handler(StarletteHTTPException, http_exception_handler)
     app.add_exception_handler(RequestValidationError, validation_exception_handler)
-    app.add_exception_handler(ValidationError, validation_exception_handler)
+    app.add_exception_handler(PydanticValidationError, validation_exception_handler)
     app.add_exception_handler(DNSBaseError, dns_base_error_handler)
     app.add_exception_handler(Exception, generic_exception_handler)
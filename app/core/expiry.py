@@ -0,0 +1,240 @@
+"""Deadline-driven deletion of records with an ``expires_at`` time.
+
+Deadlines falling within the next ``RECORD_EXPIRY_HORIZON_SECONDS`` are
+kept in an in-memory min-heap. The worker sleeps until the earliest one (or
+until ``schedule`` brings a nearer deadline), so records are deleted within
+about a second of expiring rather than on a fixed sweep interval.
+
+Every worker runs the loop for the deadlines scheduled on it, so a record
+created or changed on any worker expires on time. The worker holding the
+scheduler lease (``leading``) also reloads the heap from the indexed
+``expires_at`` column every half horizon, which picks up deadlines further
+out, those of workers that died and those missed across a restart.
+
+Expired records are deleted in chunks of ``RECORD_EXPIRY_CHUNK_SIZE``, one
+short transaction per chunk, so a large batch never holds the SQLite
+write lock for long. Database work runs on ``executor``, off the event
+loop. Each delete re-checks ``expires_at`` so records whose expiry was
+pushed back survive, and only counts the rows it deleted itself, so the
+leader and the worker that scheduled a record can both expire it safely.
+"""
+import asyncio
+import heapq
+import logging
+from concurrent.futures import Executor
+from datetime import datetime, timedelta
+from typing import Callable, ContextManager, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.core.database import get_session
+from app.core.metrics import registry
+from app.core.settings import settings
+from app.core.snapshot import note_changes
+from app.core.stats import track, type_counts
+from app.models import Record
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on one sleep, so a clock jump is noticed reasonably soon
+MAX_SLEEP_SECONDS = 60.0
+
+
+class RecordExpiry:
+    """Heap of upcoming record deadlines and the worker that enforces them."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], ContextManager[Session]] = get_session,
+        horizon_seconds: int = settings.RECORD_EXPIRY_HORIZON_SECONDS,
+        chunk_size: int = settings.RECORD_EXPIRY_CHUNK_SIZE,
+        max_scheduled: int = settings.RECORD_EXPIRY_MAX_SCHEDULED,
+    ):
+        self.session_factory = session_factory
+        self.horizon = timedelta(seconds=horizon_seconds)
+        self.chunk_size = chunk_size
+        self.max_scheduled = max_scheduled
+        self._heap: List[Tuple[datetime, int]] = []
+        self._next_refill = datetime.min
+        self._wake: Optional[asyncio.Event] = None
+        # Whether this worker holds the lease and so refills from the database
+        self.leading = False
+        # Executor for database work; None means the event loop's default
+        self.executor: Optional[Executor] = None
+
+        self.expired = registry.counter(
+            "record_expiry_deleted_total", "Records deleted on expiry"
+        )
+        self.lag = registry.histogram(
+            "record_expiry_lag_seconds",
+            "Delay between a record's expiry time and its deletion",
+        )
+        registry.gauge(
+            "record_expiry_scheduled", "Record deadlines held in memory"
+        ).set_function(lambda: len(self._heap))
+        registry.gauge(
+            "record_expiry_backlog", "Scheduled records already past their expiry time"
+        ).set_function(self.backlog)
+
+    def backlog(self) -> int:
+        """Number of scheduled deadlines that have already passed."""
+        now = datetime.utcnow()
+        return sum(1 for deadline, _ in self._heap if deadline <= now)
+
+    def lead(self, leading: bool) -> None:
+        """Start or stop refilling the heap from the database."""
+        if leading and not self.leading:
+            self._next_refill = datetime.min
+            if self._wake is not None:
+                self._wake.set()
+        self.leading = leading
+
+    def schedule(self, record_id: int, expires_at: Optional[datetime]) -> None:
+        """Track a new or changed expiry time.
+
+        Deadlines within the horizon are expired by this worker, leading or
+        not. Later ones, and any past ``max_scheduled``, are left to the
+        leader's refills.
+        """
+        if expires_at is None or len(self._heap) >= self.max_scheduled:
+            return
+        if expires_at > datetime.utcnow() + self.horizon:
+            return
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (expires_at, record_id))
+        if self._wake is not None and (earliest is None or expires_at < earliest):
+            self._wake.set()
+
+    def load_deadlines(self, now: datetime) -> List[Tuple[datetime, int]]:
+        """Read every deadline up to ``now + horizon`` from the database."""
+        with self.session_factory() as session:
+            rows = session.execute(
+                select(Record.expires_at, Record.id)
+                .where(
+                    Record.expires_at.is_not(None),
+                    Record.expires_at <= now + self.horizon,
+                )
+                .order_by(Record.expires_at)
+                .limit(self.max_scheduled)
+            ).all()
+        return [(row.expires_at, row.id) for row in rows]
+
+    def refill(
+        self,
+        now: Optional[datetime] = None,
+        rows: Optional[List[Tuple[datetime, int]]] = None,
+    ) -> int:
+        """Reload the heap with every deadline up to ``now + horizon``.
+
+        Args:
+            now: Current time
+            rows: Deadlines already read with ``load_deadlines``
+
+        Returns:
+            Number of deadlines loaded
+        """
+        now = now or datetime.utcnow()
+        if rows is None:
+            rows = self.load_deadlines(now)
+        until = now + self.horizon
+        self._heap = list(rows)
+        heapq.heapify(self._heap)
+        if len(rows) == self.max_scheduled:
+            # Truncated: only deadlines before the last one loaded are complete
+            until = rows[-1][0] - timedelta(microseconds=1)
+        self._next_refill = min(now + self.horizon / 2, until)
+        return len(rows)
+
+    def pop_due(self, now: Optional[datetime] = None) -> List[int]:
+        """Remove and return the IDs of every scheduled record that has expired."""
+        now = now or datetime.utcnow()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[1])
+        return due
+
+    def delete_chunk(
+        self, record_ids: List[int], now: Optional[datetime] = None
+    ) -> int:
+        """Delete the records among ``record_ids`` that are still expired.
+
+        Returns:
+            Number of records deleted
+        """
+        now = now or datetime.utcnow()
+        with self.session_factory() as session:
+            # RETURNING names only the rows this delete removed, so a record
+            # another worker expired first is not counted twice
+            rows = session.execute(
+                delete(Record)
+                .where(Record.id.in_(record_ids), Record.expires_at <= now)
+                .returning(Record.id, Record.type, Record.expires_at, Record.host_id)
+            ).all()
+            if not rows:
+                return 0
+            track(
+                session,
+                records=type_counts((row.type for row in rows), sign=-1),
+                writes=len(rows),
+            )
+            note_changes(session, [row.host_id for row in rows])
+        for row in rows:
+            self.lag.observe((now - row.expires_at).total_seconds())
+        self.expired.inc(len(rows))
+        return len(rows)
+
+    async def expire_due(self) -> int:
+        """Delete every due record, one chunk per transaction.
+
+        Returns:
+            Number of records deleted
+        """
+        due = self.pop_due()
+        deleted = 0
+        for start in range(0, len(due), self.chunk_size):
+            deleted += await self._offload(
+                self.delete_chunk, due[start : start + self.chunk_size]
+            )
+        return deleted
+
+    async def _offload(self, fn: Callable, *args):
+        """Run blocking database work on ``executor``, off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, fn, *args
+        )
+
+    def seconds_until_next(self, now: Optional[datetime] = None) -> float:
+        """Time until the earliest deadline or the next refill, whichever is sooner."""
+        now = now or datetime.utcnow()
+        wake_at = self._next_refill if self.leading else datetime.max
+        if self._heap:
+            wake_at = min(wake_at, self._heap[0][0])
+        return max(0.0, min((wake_at - now).total_seconds(), MAX_SLEEP_SECONDS))
+
+    async def run(self) -> None:
+        """Enforce deadlines until cancelled, refilling while ``leading``."""
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                now = datetime.utcnow()
+                if self.leading and now >= self._next_refill:
+                    self.refill(now, await self._offload(self.load_deadlines, now))
+                await self.expire_due()
+            except Exception:
+                logger.exception("Error in record expiry")
+                self._next_refill = datetime.utcnow() + timedelta(
+                    seconds=MAX_SLEEP_SECONDS
+                )
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wake.wait(), timeout=self.seconds_until_next()
+                )
+            except asyncio.TimeoutError:
+                pass
+
+
+# Global record expiry instance
+record_expiry = RecordExpiry()
@@ -0,0 +1,316 @@
+"""Idempotency-Key support for POST endpoints.
+
+The first request carrying a key claims it by inserting a pending row into
+the ``idempotency_key`` table. Once the request succeeds its response is
+stored on that row, and retries with the same key and payload are answered
+from the stored response without re-running validation or touching the
+host/record tables. Duplicates that arrive while the first request is still
+in flight wait for it to finish. Failed requests release their claim so the
+client can retry.
+
+A claim is a lease: if the request holding it has not finished within
+``claim_lease_seconds`` (its worker crashed or was killed) a duplicate takes
+the claim over and runs the request itself, instead of every retry being
+refused until the key expires.
+"""
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, SQLModel
+
+from app.core.exceptions import IdempotencyConflictError
+from app.core.settings import settings
+from app.models import IdempotencyKey
+
+REPLAYED_HEADER = "Idempotency-Replayed"
+POLL_INTERVAL = 0.05
+PRUNE_EVERY = 256
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Hash a request payload so a reused key with a new body can be rejected."""
+    encoded = json.dumps(
+        jsonable_encoder(payload), sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Bounded, TTL-expiring store of responses keyed by Idempotency-Key."""
+
+    def __init__(
+        self,
+        ttl_seconds: int = settings.IDEMPOTENCY_TTL_SECONDS,
+        max_keys: int = settings.IDEMPOTENCY_MAX_KEYS,
+        cache_size: int = settings.IDEMPOTENCY_CACHE_SIZE,
+        wait_timeout: float = settings.IDEMPOTENCY_WAIT_TIMEOUT,
+        claim_lease_seconds: float = settings.IDEMPOTENCY_CLAIM_LEASE_SECONDS,
+    ):
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.claim_lease = timedelta(seconds=claim_lease_seconds)
+        self.max_keys = max_keys
+        self.cache_size = cache_size
+        self.wait_timeout = wait_timeout
+        # Completed responses: key -> (request_hash, status_code, body, expires_at)
+        self._cache: "OrderedDict[str, Tuple[str, int, Any, datetime]]" = OrderedDict()
+        # Per-key lock and waiter count so same-worker duplicates queue up
+        self._locks: Dict[str, List[Any]] = {}
+        self._claims = 0
+
+    async def execute(
+        self,
+        session: Session,
+        key: str,
+        scope: str,
+        payload: Any,
+        handler: Callable[[], Any],
+        response_model: Type[SQLModel],
+        status_code: int,
+    ) -> Any:
+        """Run ``handler`` at most once per key and replay its response afterwards.
+
+        Args:
+            session: Database session
+            key: Client-supplied Idempotency-Key
+            scope: Endpoint the key belongs to, e.g. ``"POST /hosts/"``
+            payload: Request body, used to detect key reuse
+            handler: Callable performing the actual request
+            response_model: Schema used to serialize the handler's result
+            status_code: Status code of a successful response
+
+        Returns:
+            The handler's result, or a JSONResponse replaying a stored response
+
+        Raises:
+            IdempotencyConflictError: If the key was used with a different
+                payload or the original request is still in flight
+        """
+        storage_key = f"{scope}:{key}"
+        request_hash = request_fingerprint(payload)
+
+        replay = self._replay_from_cache(storage_key, request_hash)
+        if replay is not None:
+            return replay
+
+        entry = self._locks.setdefault(storage_key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                replay = await self._claim_or_wait(session, storage_key, request_hash)
+                if replay is not None:
+                    return replay
+
+                try:
+                    result = handler()
+                except Exception:
+                    self._release(session, storage_key)
+                    raise
+
+                body = jsonable_encoder(response_model.model_validate(result))
+                self._complete(session, storage_key, request_hash, status_code, body)
+                return result
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[storage_key]
+
+    def prune(self, session: Session) -> int:
+        """Delete expired keys and trim the table to ``max_keys`` rows.
+
+        Returns:
+            Number of rows deleted
+        """
+        now = datetime.utcnow()
+        deleted = session.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now)
+        ).rowcount
+        total = session.execute(
+            select(func.count()).select_from(IdempotencyKey)
+        ).scalar_one()
+        if total > self.max_keys:
+            oldest = (
+                select(IdempotencyKey.key)
+                .where(IdempotencyKey.status_code.is_not(None))
+                .order_by(IdempotencyKey.created_at)
+                .limit(total - self.max_keys)
+            )
+            deleted += session.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.key.in_(oldest))
+            ).rowcount
+        session.commit()
+        return deleted
+
+    def clear_cache(self) -> None:
+        """Drop the in-process response cache."""
+        self._cache.clear()
+
+    def _replay_from_cache(
+        self, storage_key: str, request_hash: str
+    ) -> Optional[JSONResponse]:
+        entry = self._cache.get(storage_key)
+        if entry is None:
+            return None
+        stored_hash, status_code, body, expires_at = entry
+        if expires_at <= datetime.utcnow():
+            del self._cache[storage_key]
+            return None
+        self._cache.move_to_end(storage_key)
+        return self._replay(storage_key, request_hash, stored_hash, status_code, body)
+
+    async def _claim_or_wait(
+        self, session: Session, storage_key: str, request_hash: str
+    ) -> Optional[JSONResponse]:
+        """Claim the key, or return the stored response once it is available."""
+        deadline = asyncio.get_running_loop().time() + self.wait_timeout
+        while True:
+            row = session.get(IdempotencyKey, storage_key, populate_existing=True)
+            lease_start = datetime.utcnow() - self.claim_lease
+            if row is not None and row.expires_at <= datetime.utcnow():
+                session.delete(row)
+                session.commit()
+                row = None
+
+            if row is None:
+                if self._insert_claim(session, storage_key, request_hash):
+                    return None
+            elif row.status_code is None and row.created_at <= lease_start:
+                # The claim's owner died without completing or releasing it
+                if self._take_over_claim(session, row, request_hash):
+                    return None
+            elif row.status_code is not None:
+                body = json.loads(row.response_body)
+                self._remember(
+                    storage_key, row.request_hash, row.status_code, body, row.expires_at
+                )
+                return self._replay(
+                    storage_key, request_hash, row.request_hash, row.status_code, body
+                )
+            elif row.request_hash != request_hash:
+                self._raise_reused(storage_key)
+
+            # Another worker holds the claim; wait for it to finish
+            if asyncio.get_running_loop().time() >= deadline:
+                raise IdempotencyConflictError(
+                    detail=(
+                        "A request with this Idempotency-Key is still being processed"
+                    ),
+                    error_code="IDEMPOTENCY_KEY_IN_PROGRESS",
+                )
+            session.expire_all()
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def _insert_claim(
+        self, session: Session, storage_key: str, request_hash: str
+    ) -> bool:
+        now = datetime.utcnow()
+        session.add(
+            IdempotencyKey(
+                key=storage_key,
+                request_hash=request_hash,
+                created_at=now,
+                expires_at=now + self.ttl,
+            )
+        )
+        try:
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            return False
+
+        self._claims += 1
+        if self._claims % PRUNE_EVERY == 0:
+            self.prune(session)
+        return True
+
+    def _take_over_claim(
+        self, session: Session, row: IdempotencyKey, request_hash: str
+    ) -> bool:
+        """Claim a key whose pending claim has outlived its lease.
+
+        Only one of several duplicates can take over, as the claim time has
+        to still be the one that was read.
+        """
+        now = datetime.utcnow()
+        taken = session.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.key == row.key,
+                IdempotencyKey.status_code.is_(None),
+                IdempotencyKey.created_at == row.created_at,
+            )
+            .values(
+                request_hash=request_hash, created_at=now, expires_at=now + self.ttl
+            )
+        ).rowcount
+        session.commit()
+        return taken == 1
+
+    def _complete(
+        self,
+        session: Session,
+        storage_key: str,
+        request_hash: str,
+        status_code: int,
+        body: Any,
+    ) -> None:
+        row = session.get(IdempotencyKey, storage_key)
+        if row is None:
+            return
+        row.status_code = status_code
+        row.response_body = json.dumps(body)
+        session.add(row)
+        session.commit()
+        self._remember(storage_key, request_hash, status_code, body, row.expires_at)
+
+    def _release(self, session: Session, storage_key: str) -> None:
+        session.execute(delete(IdempotencyKey).where(IdempotencyKey.key == storage_key))
+        session.commit()
+
+    def _remember(
+        self,
+        storage_key: str,
+        request_hash: str,
+        status_code: int,
+        body: Any,
+        expires_at: datetime,
+    ) -> None:
+        self._cache[storage_key] = (request_hash, status_code, body, expires_at)
+        self._cache.move_to_end(storage_key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _replay(
+        self,
+        storage_key: str,
+        request_hash: str,
+        stored_hash: str,
+        status_code: int,
+        body: Any,
+    ) -> JSONResponse:
+        if stored_hash != request_hash:
+            self._raise_reused(storage_key)
+        return JSONResponse(
+            status_code=status_code,
+            content=body,
+            headers={REPLAYED_HEADER: "true"},
+        )
+
+    @staticmethod
+    def _raise_reused(storage_key: str) -> None:
+        raise IdempotencyConflictError(
+            detail="Idempotency-Key was already used with a different request payload",
+            status_code=422,
+            error_code="IDEMPOTENCY_KEY_REUSED",
+        )
+
+
+# Global idempotency store instance
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,103 @@
+"""Per-request instrumentation of database work.
+
+``MetricsMiddleware`` opens a ``RequestMetrics`` for every HTTP request and
+makes it current through a context variable. Cursor execution hooks on
+every ``Engine`` add each statement's duration to the current request, and
+count whether SQLAlchemy found the statement in its compiled cache. Each
+request also counts how often it ran every distinct statement, so N+1
+query patterns show up as one statement repeated many times.
+
+Sync endpoints and dependencies run in a thread pool with a copy of the
+request's context, so their queries are counted too. Queries run outside a
+request, such as those of background jobs, are ignored.
+"""
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+
+from app.core.metrics import registry
+
+
+@dataclass
+class RequestMetrics:
+    """Database work done on behalf of one request."""
+    queries: int = 0
+    db_seconds: float = 0.0
+    # Executions per distinct SQL statement
+    statements: Dict[str, int] = field(default_factory=dict)
+    # The request's ASGI scope, for naming the endpoint
+    scope: Optional[Dict[str, Any]] = None
+
+    def endpoint(self) -> str:
+        """Method and route template, e.g. ``GET /api/hosts/{host_id}``."""
+        if self.scope is None:
+            return "unknown"
+        return f"{self.scope['method']} {route_label(self.scope)}"
+
+    def most_repeated(self) -> Tuple[Optional[str], int]:
+        """The statement run most often and how often, or ``(None, 0)``."""
+        if not self.statements:
+            return None, 0
+        return max(self.statements.items(), key=lambda item: item[1])
+
+
+def route_label(scope: Dict[str, Any]) -> str:
+    """The matched route's path template, or ``unmatched``."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if scope.get("endpoint") is not None:
+        # A plain Starlette route such as /openapi.json; its path is fixed
+        return scope["path"]
+    return "unmatched"
+
+
+# The request being served in the current context, if any
+current_request: ContextVar[Optional[RequestMetrics]] = ContextVar(
+    "current_request", default=None
+)
+
+_statement_cache = {
+    CACHE_HIT: registry.counter(
+        "sqlalchemy_statement_cache_total",
+        "Statement compilations by cache outcome",
+        result="hit",
+    ),
+    CACHE_MISS: registry.counter(
+        "sqlalchemy_statement_cache_total",
+        "Statement compilations by cache outcome",
+        result="miss",
+    ),
+}
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_request.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    request = current_request.get()
+    if request is None:
+        return
+    started = conn.info["query_started"].pop()
+    request.queries += 1
+    request.db_seconds += time.perf_counter() - started
+    request.statements[statement] = request.statements.get(statement, 0) + 1
+    counter = _statement_cache.get(getattr(context, "cache_hit", None))
+    if counter is not None:
+        counter.inc()
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
@@ -0,0 +1,82 @@
+"""Lease-based leader election between API worker processes.
+
+Workers compete for a named row in ``scheduler_lease``. Taking or renewing
+the lease is a single conditional UPDATE that only succeeds when the row
+is already ours or has expired, so at most one worker holds it at a time.
+The holder renews it well before ``SCHEDULER_LEASE_SECONDS`` runs out. If
+it dies, another worker takes over once the lease expires. This works on
+SQLite and on server databases alike.
+"""
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, ContextManager
+
+from sqlalchemy import delete, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.database import get_task_session
+from app.core.settings import settings
+from app.models import SchedulerLease
+
+
+class LeaderLease:
+    """One worker's claim on a named lease."""
+
+    def __init__(
+        self,
+        name: str = "scheduler",
+        session_factory: Callable[[], ContextManager[Session]] = get_task_session,
+        ttl_seconds: int = settings.SCHEDULER_LEASE_SECONDS,
+    ):
+        self.name = name
+        self.session_factory = session_factory
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+
+    def try_acquire(self) -> bool:
+        """Take or renew the lease.
+
+        Returns:
+            True if this worker holds the lease afterwards
+        """
+        now = datetime.utcnow()
+        try:
+            with self.session_factory() as session:
+                taken = session.execute(
+                    update(SchedulerLease)
+                    .where(SchedulerLease.name == self.name)
+                    .where(
+                        or_(
+                            SchedulerLease.holder == self.holder,
+                            SchedulerLease.expires_at < now,
+                        )
+                    )
+                    .values(holder=self.holder, expires_at=now + self.ttl)
+                ).rowcount
+                if not taken and session.get(SchedulerLease, self.name) is None:
+                    session.add(SchedulerLease(
+                        name=self.name, holder=self.holder, expires_at=now + self.ttl
+                    ))
+                    session.flush()
+                    taken = 1
+        except IntegrityError:
+            # Another worker created the row first
+            taken = 0
+        self.is_leader = bool(taken)
+        return self.is_leader
+
+    def release(self) -> None:
+        """Give up the lease so another worker can take over immediately."""
+        if not self.is_leader:
+            return
+        with self.session_factory() as session:
+            session.execute(
+                delete(SchedulerLease)
+                .where(SchedulerLease.name == self.name)
+                .where(SchedulerLease.holder == self.holder)
+            )
+        self.is_leader = False
@@ -0,0 +1,278 @@
+"""In-process metrics: counters, gauges and histograms.
+
+Metrics are created through the global ``registry`` so that status and
+export endpoints can find them all. Each metric is identified by a name
+plus optional labels:
+
+    waits = registry.histogram(
+        "db_pool_checkout_wait_seconds", "Checkout wait", pool="writer"
+    )
+    waits.observe(0.004)
+
+All metrics are safe to update from several threads without locking.
+Every thread accumulates into its own cell, which only that thread
+writes, and reads sum the cells. Updates are therefore a dictionary
+lookup and an addition, and reads may miss updates that are in flight.
+``render_prometheus`` formats the registry in the Prometheus text
+exposition format.
+"""
+import bisect
+import math
+import threading
+from collections import deque
+from threading import get_ident
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from 1 ms to 30 s
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+# Number of most recent observations kept for quantiles
+DEFAULT_WINDOW = 1024
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _rank(ordered: List[float], q: float) -> Optional[float]:
+    """Nearest-rank ``q`` quantile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Cells:
+    """Per-thread accumulators of ``size`` numbers each.
+
+    A thread only ever writes its own cell, so updates need no lock. A
+    thread ID reused after its thread exits continues the old cell, which
+    keeps totals intact.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._cells: Dict[int, List[float]] = {}
+
+    def cell(self) -> List[float]:
+        """The calling thread's cell."""
+        cell = self._cells.get(get_ident())
+        if cell is None:
+            cell = self._cells[get_ident()] = [0] * self.size
+        return cell
+
+    def totals(self) -> List[float]:
+        """Element-wise sums over all cells."""
+        totals = [0] * self.size
+        for cell in list(self._cells.values()):
+            for i, value in enumerate(cell):
+                totals[i] += value
+        return totals
+
+
+class Counter:
+    """Monotonically increasing count."""
+    kind = "counter"
+
+    def __init__(self):
+        self._cells = _Cells(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Add ``amount`` to the counter."""
+        self._cells.cell()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._cells.totals()[0]
+
+
+class Gauge:
+    """Value that goes up and down, either set directly or read from a callback."""
+    kind = "gauge"
+
+    def __init__(self, fn: Optional[Callable[[], float]] = None):
+        self._value = 0.0
+        self._fn = fn
+        self._deltas = _Cells(1)
+
+    def set(self, value: float) -> None:
+        """Set the current value."""
+        self._value = value - self._deltas.totals()[0]
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Add ``amount`` to the current value."""
+        self._deltas.cell()[0] += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Subtract ``amount`` from the current value."""
+        self._deltas.cell()[0] -= amount
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        """Read the value from ``fn`` whenever it is collected."""
+        self._fn = fn
+
+    @property
+    def value(self) -> float:
+        if self._fn is not None:
+            return self._fn()
+        return self._value + self._deltas.totals()[0]
+
+
+class Histogram:
+    """Bucketed distribution with quantiles over the most recent observations.
+
+    Bucket counts, sum and count cover the whole process lifetime; the
+    quantiles are computed from the last ``window`` observations so they
+    track current behaviour.
+    """
+    kind = "histogram"
+
+    def __init__(
+        self, buckets: Sequence[float] = DEFAULT_BUCKETS, window: int = DEFAULT_WINDOW
+    ):
+        self.buckets = tuple(sorted(buckets))
+        # Per thread: one count per bucket plus +Inf, then the sum
+        self._sum_index = len(self.buckets) + 1
+        self._cells = _Cells(len(self.buckets) + 2)
+        # deque.append is atomic, so the window needs no lock either
+        self._recent: deque = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        cell = self._cells.cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[self._sum_index] += value
+        self._recent.append(value)
+
+    @property
+    def count(self) -> int:
+        return sum(self._cells.totals()[:self._sum_index])
+
+    @property
+    def sum(self) -> float:
+        return self._cells.totals()[self._sum_index]
+
+    def cumulative_buckets(self) -> List[Tuple[float, int]]:
+        """``(upper_bound, count <= bound)`` pairs, ending with ``+Inf``."""
+        total = 0
+        result = []
+        counts = self._cells.totals()
+        for bound, count in zip((*self.buckets, math.inf), counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q: float) -> Optional[float]:
+        """The ``q`` quantile of recent observations, or None if there are none."""
+        return _rank(sorted(self._recent), q)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """Count, sum and recent p50/p95/p99/max."""
+        recent = sorted(self._recent)
+        totals = self._cells.totals()
+        return {
+            "count": sum(totals[:self._sum_index]),
+            "sum": totals[self._sum_index],
+            "p50": _rank(recent, 0.50),
+            "p95": _rank(recent, 0.95),
+            "p99": _rank(recent, 0.99),
+            "max": recent[-1] if recent else None,
+        }
+
+
+class MetricsRegistry:
+    """Named metrics, created on first use and shared afterwards."""
+
+    def __init__(self):
+        self._metrics: Dict[Tuple[str, Labels], object] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _get(
+        self,
+        factory: Callable[[], object],
+        name: str,
+        help: str,
+        labels: Dict[str, str],
+    ):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = factory()
+                self._help.setdefault(name, help)
+            return metric
+
+    def counter(self, name: str, help: str = "", **labels: str) -> Counter:
+        """Get or create a counter."""
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str = "", **labels: str) -> Gauge:
+        """Get or create a gauge."""
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(
+        self,
+        name: str,
+        help: str = "",
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        **labels: str,
+    ) -> Histogram:
+        """Get or create a histogram."""
+        return self._get(lambda: Histogram(buckets), name, help, labels)
+
+    def collect(self) -> Iterator[Tuple[str, str, Labels, object]]:
+        """Yield ``(name, help, labels, metric)`` for every metric, sorted by name."""
+        with self._lock:
+            items = sorted(self._metrics.items(), key=lambda item: item[0])
+        for (name, labels), metric in items:
+            yield name, self._help.get(name, ""), labels, metric
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    return repr(float(value))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def render_prometheus(metrics: MetricsRegistry) -> str:
+    """All metrics of ``metrics`` in the Prometheus text exposition format (0.0.4)."""
+    lines: List[str] = []
+    previous = None
+    for name, help, labels, metric in metrics.collect():
+        if name != previous:
+            help_text = help.replace("\\", "\\\\").replace("\n", "\\n")
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            previous = name
+        if isinstance(metric, Histogram):
+            buckets = metric.cumulative_buckets()
+            for bound, count in buckets:
+                bucket_labels = labels + (("le", _format_value(bound)),)
+                lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+            lines.append(
+                f"{name}_sum{_format_labels(labels)} {_format_value(metric.sum)}"
+            )
+            # Taken from the +Inf bucket so the two always agree
+            lines.append(f"{name}_count{_format_labels(labels)} {buckets[-1][1]}")
+        else:
+            lines.append(
+                f"{name}{_format_labels(labels)} {_format_value(metric.value)}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+# Global metrics registry
+registry = MetricsRegistry()
@@ -0,0 +1,380 @@
+"""ASGI middleware for the Mini DNS API.
+
+Middleware here is written against the raw ASGI interface rather than
+``BaseHTTPMiddleware`` so it adds no extra task or body buffering per request.
+"""
+import json
+import logging
+import secrets
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from anyio import to_thread
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.database import RECENT_WRITE_COOKIE
+from app.core.exceptions import RateLimitExceededError, dns_base_error_handler
+from app.core.instrumentation import RequestMetrics, current_request, route_label
+from app.core.metrics import Histogram, registry
+from app.core.profiling import ProfileGate, ProfileStore, StackSampler, profile_store
+from app.core.ratelimit import RateLimiter, rate_limiter, retry_after
+from app.core.settings import settings
+from app.core.tracing import Tracer, parse_traceparent, tracer as default_tracer
+
+# One JSON line per request at INFO; query budget overruns at WARNING
+request_logger = logging.getLogger("app.requests")
+logger = logging.getLogger(__name__)
+
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+class RecentWriteCookieMiddleware:
+    """Mark clients that just wrote so their next reads go to the primary.
+    
+    A successful write response gets a short-lived cookie; while it is
+    present ``get_read_session`` bypasses the replicas, so a client reads
+    its own writes despite replication lag.
+    """
+
+    def __init__(
+        self, app: ASGIApp, max_age: int = settings.db.DB_RECENT_WRITE_SECONDS
+    ):
+        self.app = app
+        self.cookie = (
+            f"{RECENT_WRITE_COOKIE}=1; Max-Age={max_age}; "
+            "Path=/; HttpOnly; SameSite=Lax"
+        ).encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"set-cookie", self.cookie)
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+# Response size buckets in bytes, from 64 B to 4 MiB
+SIZE_BUCKETS = tuple(float(64 << (2 * i)) for i in range(9))
+# Queries per request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class MetricsMiddleware:
+    """Record latency, response size and database work per route.
+    
+    The route label is the matched path template, such as
+    ``/api/hosts/{host_id}``, so label cardinality stays bounded. Requests
+    that match no route share the ``unmatched`` label. Metric handles are
+    cached per label set, so a request costs a few histogram updates.
+    
+    Every response also gets a ``Server-Timing`` header with the request's
+    database time and query count. Each request is logged as one JSON line
+    on the ``app.requests`` logger, and requests over ``query_budget``
+    queries are logged as a warning naming their most repeated statement.
+    """
+
+    def __init__(
+        self, app: ASGIApp, query_budget: Optional[int] = settings.REQUEST_QUERY_BUDGET
+    ):
+        self.app = app
+        self.query_budget = query_budget
+        self.in_flight = registry.gauge(
+            "http_requests_in_flight", "HTTP requests being served"
+        )
+        self._series: Dict[Tuple[str, str, int], Tuple[Histogram, ...]] = {}
+
+    def _histograms(
+        self, method: str, route: str, status: int
+    ) -> Tuple[Histogram, ...]:
+        key = (method, route, status)
+        series = self._series.get(key)
+        if series is None:
+            labels = {"method": method, "route": route}
+            series = self._series[key] = (
+                registry.histogram(
+                    "http_request_duration_seconds", "HTTP request latency",
+                    status=str(status), **labels,
+                ),
+                registry.histogram(
+                    "http_response_size_bytes", "HTTP response body size",
+                    buckets=SIZE_BUCKETS, **labels,
+                ),
+                registry.histogram(
+                    "http_request_db_queries", "Database queries per HTTP request",
+                    buckets=QUERY_COUNT_BUCKETS, **labels,
+                ),
+                registry.histogram(
+                    "http_request_db_seconds",
+                    "Database time per HTTP request",
+                    **labels,
+                ),
+            )
+        return series
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request = RequestMetrics(scope=scope)
+        token = current_request.set(request)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = (
+                    f"db;dur={request.db_seconds * 1000:.2f};"
+                    f'desc="{request.queries} queries", '
+                    f"app;dur={(time.perf_counter() - started) * 1000:.2f}"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", timing.encode())
+                ]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        self.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.in_flight.dec()
+            current_request.reset(token)
+            route = route_label(scope)
+            duration, sizes, queries, db_time = self._histograms(
+                scope["method"], route, status
+            )
+            duration.observe(elapsed)
+            sizes.observe(size)
+            queries.observe(request.queries)
+            db_time.observe(request.db_seconds)
+            self._log(scope["method"], route, status, elapsed, request)
+
+    def _log(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        elapsed: float,
+        request: RequestMetrics,
+    ) -> None:
+        if request_logger.isEnabledFor(logging.INFO):
+            request_logger.info(json.dumps({
+                "method": method,
+                "route": route,
+                "status": status,
+                "duration_ms": round(elapsed * 1000, 2),
+                "queries": request.queries,
+                "db_ms": round(request.db_seconds * 1000, 2),
+            }))
+        if self.query_budget is not None and request.queries > self.query_budget:
+            statement, repeats = request.most_repeated()
+            request_logger.warning(
+                "%s %s ran %d queries, over the budget of %d; most repeated (%dx): %s",
+                method, route, request.queries, self.query_budget, repeats,
+                " ".join(statement.split())[:200],
+            )
+
+
+class ProfilingMiddleware:
+    """Profile single requests that ask for it with the profiling token.
+    
+    Requests whose ``X-Profile-Token`` header matches ``token`` run under a
+    ``StackSampler``, and the response carries the profile's ID in
+    ``X-Profile-Id``. When the profiler is busy or was started less than
+    the gate's interval ago, the request runs unprofiled and the response
+    says so in ``X-Profile-Skipped``. Without ``enabled`` and a token every
+    request passes straight through.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        enabled: bool = settings.PROFILING_ENABLED,
+        token: Optional[str] = settings.PROFILING_TOKEN,
+        store: ProfileStore = profile_store,
+        gate: Optional[ProfileGate] = None,
+    ):
+        self.app = app
+        self.token = token.encode() if enabled and token else None
+        self.store = store
+        self.gate = gate or ProfileGate()
+
+    def _requested(self, scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"x-profile-token":
+                return secrets.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.token is None or scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not self.gate.acquire():
+            async def send_skipped(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-profile-skipped", b"rate-limited")
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_skipped)
+            return
+
+        profile_id = self.store.new_id()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode())
+                ]
+            await send(message)
+
+        sampler = StackSampler()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            samples = sampler.stop()
+            try:
+                # Writing and pruning the profile directory is file I/O
+                await to_thread.run_sync(self.store.write, profile_id, samples)
+            except OSError:
+                logger.exception("Error writing profile %s", profile_id)
+            finally:
+                self.gate.release()
+
+
+class TracingMiddleware:
+    """Record a root span for every sampled request.
+    
+    A valid ``traceparent`` header continues the caller's trace, and its
+    sampled flag is honoured within the tracer's allowance (see
+    ``Tracer.should_sample``); other requests are sampled at the tracer's
+    rate. The root span is named after the method and matched route, and
+    the response of a traced request carries a ``traceresponse`` header
+    naming it. Unsampled requests pass straight through with no current
+    span, so spans inside them cost nothing.
+    """
+
+    def __init__(self, app: ASGIApp, tracer: Tracer = default_tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+        if not self.tracer.should_sample(parent):
+            await self.app(scope, receive, send)
+            return
+
+        with self.tracer.root_span(scope["method"], parent) as span:
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.attributes["http.status_code"] = message["status"]
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"traceresponse", span.traceparent().encode())
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = route_label(scope)
+                span.name = f"{scope['method']} {route}"
+                span.attributes["http.method"] = scope["method"]
+                span.attributes["http.route"] = route
+
+
+# Health checks and metric scrapes are never limited
+RATE_LIMIT_EXEMPT_PATHS = frozenset({"/health", "/metrics"})
+
+
+class RateLimitMiddleware:
+    """Refuse requests over their client's rate limit with a 429.
+    
+    Clients sending one of the configured ``api_keys`` in ``X-API-Key`` get
+    buckets of their own; everyone else, including clients sending unknown
+    keys, is limited by IP address, so rotating made-up keys buys nothing.
+    Writes and reads draw on separate budgets,
+    so a client creating records does not starve its own lookups. A refused
+    request gets the usual error body with code ``RATE_LIMIT_EXCEEDED`` and
+    a ``Retry-After`` header, and never reaches the app. Behind a proxy, run
+    uvicorn with ``--proxy-headers`` so the client address is the caller's.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        enabled: bool = settings.RATE_LIMIT_ENABLED,
+        limiter: RateLimiter = rate_limiter,
+        api_keys: Iterable[str] = settings.RATE_LIMIT_API_KEYS,
+    ):
+        self.app = app
+        self.limiter = limiter if enabled else None
+        self.api_keys = frozenset(key.encode() for key in api_keys)
+        self.refused = {
+            write: registry.counter(
+                "http_requests_rate_limited_total",
+                "Requests refused by the rate limiter",
+                kind="write" if write else "read",
+            )
+            for write in (False, True)
+        }
+
+    def _client(self, scope: Scope) -> str:
+        for name, value in scope["headers"]:
+            if name == b"x-api-key" and value in self.api_keys:
+                return "key:" + value.decode("latin-1")
+        client = scope.get("client")
+        return f"ip:{client[0]}" if client else "ip:unknown"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            self.limiter is None
+            or scope["type"] != "http"
+            or scope["path"] in RATE_LIMIT_EXEMPT_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        client = self._client(scope)
+        write = scope["method"] in WRITE_METHODS
+        if self.limiter.blocking:
+            wait = await to_thread.run_sync(self.limiter.check, client, write)
+        else:
+            wait = self.limiter.check(client, write)
+        if not wait:
+            await self.app(scope, receive, send)
+            return
+
+        self.refused[write].inc()
+        seconds = retry_after(wait)
+        response = dns_base_error_handler(None, RateLimitExceededError(
+            detail=f"Too many {'writes' if write else 'reads'}; retry in {seconds}s",
+            headers={"Retry-After": str(seconds)},
+            error_code="RATE_LIMIT_EXCEEDED",
+            retry_after=seconds,
+        ))
+        await response(scope, receive, send)
@@ -0,0 +1,74 @@
+"""Schema migrations, run with alembic.
+
+Revisions live in ``app/migrations/versions``; ``alembic.ini`` at the
+repository root points the ``alembic`` command at them. ``migrate`` runs
+on startup and brings a database to the latest revision:
+
+- an empty database gets the current models from ``create_all`` and is
+  stamped with the latest revision, as there is nothing to migrate;
+- a database created by ``create_all`` before migrations were added has
+  no ``alembic_version`` table and is stamped with the baseline revision,
+  the schema it was created with, before upgrading;
+- tables added after the baseline are created by ``create_all`` once the
+  revisions have run, so revisions only alter existing tables.
+"""
+import os
+from typing import Optional
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import SQLModel
+
+from app.models import BaseModel  # noqa: F401
+
+MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations"
+)
+
+# The schema ``create_all`` built before migrations were added
+BASELINE_REVISION = "0001"
+
+
+def alembic_config(connection: Optional[Connection] = None) -> Config:
+    """Alembic configuration running revisions on ``connection``.
+
+    Without a connection, ``app/migrations/env.py`` connects to the
+    application database.
+    """
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    config.attributes["connection"] = connection
+    return config
+
+
+def head_revision() -> str:
+    """The latest revision."""
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def current_revision(connection: Connection) -> Optional[str]:
+    """The revision a database is at, or None if it is not stamped."""
+    return MigrationContext.configure(connection).get_current_revision()
+
+
+def migrate(engine: Engine) -> None:
+    """Create or upgrade the schema to the latest revision.
+
+    Raises:
+        RuntimeError: If a revision cannot migrate the existing data
+    """
+    with engine.begin() as conn:
+        config = alembic_config(conn)
+        tables = set(inspect(conn).get_table_names())
+        if "host" not in tables:
+            SQLModel.metadata.create_all(conn)
+            command.stamp(config, "head")
+            return
+        if "alembic_version" not in tables:
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
+        SQLModel.metadata.create_all(conn)
@@ -0,0 +1,99 @@
+"""Prebuilt OpenAPI schema cache.
+
+FastAPI builds the OpenAPI schema on the first request for ``/openapi.json``
+or ``/docs``, walking every route and model. ``install_openapi_cache`` makes
+that first request read the schema from ``OPENAPI_CACHE_PATH`` instead.
+The cache is keyed by a fingerprint of the application sources and the
+FastAPI and pydantic versions. A stale or missing cache is rebuilt on
+first use and written back.
+
+Prebuild the cache at deploy time with::
+
+    python -m app.core.openapi
+"""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import fastapi
+import pydantic
+from fastapi import FastAPI
+
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+APP_ROOT = Path(__file__).resolve().parent.parent
+
+
+def source_fingerprint() -> str:
+    """SHA-256 over the application sources and the versions that shape the schema."""
+    digest = hashlib.sha256(
+        f"{settings.VERSION}:{fastapi.__version__}:{pydantic.VERSION}".encode()
+    )
+    for path in sorted(APP_ROOT.rglob("*.py")):
+        digest.update(str(path.relative_to(APP_ROOT)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def load_cached_schema(path: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """The cached schema, or None if it is missing, unreadable or stale."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("fingerprint") != fingerprint:
+        return None
+    return cached.get("schema")
+
+
+def store_schema(path: str, fingerprint: str, schema: Dict[str, Any]) -> None:
+    """Write the schema to the cache, replacing it atomically."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"fingerprint": fingerprint, "schema": schema}, f, separators=(",", ":")
+        )
+    os.replace(tmp_path, path)
+
+
+def install_openapi_cache(
+    app: FastAPI, path: Optional[str] = settings.OPENAPI_CACHE_PATH
+) -> None:
+    """Serve ``app``'s OpenAPI schema from the cache at ``path``."""
+    if not path:
+        return
+    build = app.openapi
+
+    def openapi() -> Dict[str, Any]:
+        if app.openapi_schema is None:
+            fingerprint = source_fingerprint()
+            schema = load_cached_schema(path, fingerprint)
+            if schema is None:
+                schema = build()
+                try:
+                    store_schema(path, fingerprint, schema)
+                except OSError as e:
+                    logger.warning("Could not write OpenAPI cache %s: %s", path, e)
+            app.openapi_schema = schema
+        return app.openapi_schema
+
+    app.openapi = openapi
+
+
+def prebuild(app: FastAPI, path: str = settings.OPENAPI_CACHE_PATH) -> None:
+    """Build ``app``'s schema and write it to the cache."""
+    app.openapi_schema = None
+    store_schema(path, source_fingerprint(), FastAPI.openapi(app))
+
+
+if __name__ == "__main__":
+    from app.main import app
+
+    prebuild(app)
+    print(f"Wrote OpenAPI schema cache to {settings.OPENAPI_CACHE_PATH}")
@@ -0,0 +1,146 @@
+"""Connection pool instrumentation.
+
+``InstrumentedQueuePool`` is a ``QueuePool`` that times every checkout and
+counts timeouts. Pools registered under a name with ``register_pool``
+publish their numbers to the metrics registry and appear in ``/status``:
+
+* ``db_pool_checkout_wait_seconds``: time spent getting a connection,
+  including opening a new one when the pool grows
+* ``db_pool_checked_out``, ``db_pool_overflow``, ``db_pool_size``: gauges
+* ``db_pool_checkouts_total``, ``db_pool_timeouts_total``: counters
+
+When the recent p95 checkout wait of a pool exceeds
+``DB_POOL_WAIT_WARN_SECONDS`` a warning is logged, at most once per
+``DB_POOL_WARN_INTERVAL_SECONDS``.
+"""
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from app.core.metrics import Counter, Histogram, registry
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    """Checkout metrics of one pool."""
+
+    def __init__(self, pool: "InstrumentedQueuePool", name: Optional[str] = None):
+        self.pool = pool
+        self.name = name
+        self.warn_threshold = settings.db.DB_POOL_WAIT_WARN_SECONDS
+        self.warn_interval = settings.db.DB_POOL_WARN_INTERVAL_SECONDS
+        self._next_check = 0.0
+        if name is None:
+            self.wait = Histogram()
+            self.checkouts = Counter()
+            self.timeouts = Counter()
+            return
+
+        self.wait = registry.histogram(
+            "db_pool_checkout_wait_seconds",
+            "Time spent waiting for a pooled connection",
+            pool=name,
+        )
+        self.checkouts = registry.counter(
+            "db_pool_checkouts_total", "Connections checked out of the pool", pool=name
+        )
+        self.timeouts = registry.counter(
+            "db_pool_timeouts_total",
+            "Checkouts that gave up after pool_timeout",
+            pool=name,
+        )
+        for metric, help, fn in (
+            (
+                "db_pool_checked_out",
+                "Connections currently checked out",
+                lambda: self.pool.checkedout(),
+            ),
+            (
+                "db_pool_overflow",
+                "Overflow connections in use",
+                lambda: max(self.pool.overflow(), 0),
+            ),
+            ("db_pool_size", "Configured pool size", lambda: self.pool.size()),
+        ):
+            registry.gauge(metric, help, pool=name).set_function(fn)
+
+    def record_checkout(self, waited: float) -> None:
+        """Record a successful checkout and warn if waits are running high."""
+        self.wait.observe(waited)
+        self.checkouts.inc()
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.warn_interval
+        p95 = self.wait.quantile(0.95)
+        if p95 is not None and p95 > self.warn_threshold:
+            logger.warning(
+                "Connection pool %s is saturated: p95 checkout wait %.3fs exceeds "
+                "%.3fs (%d checked out, pool size %d, overflow %d/%d, %d timeouts)",
+                self.name or "unnamed", p95, self.warn_threshold,
+                self.pool.checkedout(), self.pool.size(), max(self.pool.overflow(), 0),
+                self.pool._max_overflow, int(self.timeouts.value),
+            )
+
+    def record_timeout(self, waited: float) -> None:
+        """Record a checkout that timed out."""
+        self.wait.observe(waited)
+        self.timeouts.inc()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current pool state and checkout statistics."""
+        return {
+            "size": self.pool.size(),
+            "checked_out": self.pool.checkedout(),
+            "overflow": max(self.pool.overflow(), 0),
+            "max_overflow": self.pool._max_overflow,
+            "checkouts": int(self.checkouts.value),
+            "timeouts": int(self.timeouts.value),
+            "wait_seconds": self.wait.summary(),
+        }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool recording checkout wait time, timeouts and usage."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats(self)
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_timeout(time.perf_counter() - started)
+            raise
+        self.stats.record_checkout(time.perf_counter() - started)
+        return record
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        # Keep counting into the same metrics after engine.dispose()
+        pool = super().recreate()
+        pool.stats = self.stats
+        self.stats.pool = pool
+        return pool
+
+
+# Stats of the named pools shown in /status, by name
+pools: Dict[str, PoolStats] = {}
+
+
+def register_pool(name: str, pool: Any) -> None:
+    """Publish an instrumented pool's metrics under ``name``."""
+    if not isinstance(pool, InstrumentedQueuePool):
+        return
+    pool.stats = pools[name] = PoolStats(pool, name)
+
+
+def pool_status() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every registered pool, by name."""
+    return {name: stats.snapshot() for name, stats in pools.items()}
@@ -0,0 +1,147 @@
+"""On-demand profiling of single requests.
+
+With ``PROFILING_ENABLED`` set, a request carrying the ``PROFILING_TOKEN``
+in its ``X-Profile-Token`` header runs under a sampling profiler. A
+background thread samples the stacks of all other threads every
+``PROFILING_SAMPLE_INTERVAL_SECONDS``. Samples from the event loop and
+the thread pool cover the request, but also anything else those threads
+ran at the time, such as other requests or background jobs.
+
+Profiles are written in the collapsed-stack format understood by
+``flamegraph.pl`` and speedscope, one ``frame;frame;frame count`` line per
+distinct stack. They go to ``PROFILING_DIR``, which keeps only the newest
+``PROFILING_MAX_FILES`` profiles. At most one request is profiled at a
+time, and a new profile starts at most every
+``PROFILING_MIN_INTERVAL_SECONDS``.
+"""
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as CounterDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.settings import settings
+
+PROFILE_SUFFIX = ".collapsed"
+PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class StackSampler:
+    """Sample the stacks of all other threads from a background thread."""
+
+    def __init__(self, interval: float = settings.PROFILING_SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.samples: CounterDict = CounterDict()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start sampling."""
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Dict[str, int]:
+        """Stop sampling and return the sample count of every collapsed stack."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return dict(self.samples)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident not in names:
+                    names.update((t.ident, t.name) for t in threading.enumerate())
+                self.samples[_collapse(names.get(ident, str(ident)), frame)] += 1
+
+
+def _collapse(thread_name: str, frame) -> str:
+    """``thread;outermost;...;innermost`` for a frame and its callers."""
+    frames: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(
+            f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+        )
+        frame = frame.f_back
+    frames.append(thread_name)
+    return ";".join(reversed(frames))
+
+
+class ProfileStore:
+    """Directory of collapsed-stack profiles, pruned to the newest ``max_files``."""
+
+    def __init__(
+        self,
+        directory: str = settings.PROFILING_DIR,
+        max_files: int = settings.PROFILING_MAX_FILES,
+    ):
+        self.directory = Path(directory)
+        self.max_files = max_files
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def path(self, profile_id: str) -> Optional[Path]:
+        """Path of a stored profile, or None if the ID is malformed or unknown."""
+        if not PROFILE_ID_RE.match(profile_id):
+            return None
+        path = self.directory / f"{profile_id}{PROFILE_SUFFIX}"
+        return path if path.is_file() else None
+
+    def write(self, profile_id: str, samples: Dict[str, int]) -> Path:
+        """Write a profile, then drop the oldest ones beyond ``max_files``."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{profile_id}{PROFILE_SUFFIX}"
+        path.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in sorted(samples.items())),
+            encoding="utf-8",
+        )
+        self.prune()
+        return path
+
+    def prune(self) -> None:
+        profiles = sorted(
+            self.directory.glob(f"*{PROFILE_SUFFIX}"), key=lambda p: p.stat().st_mtime
+        )
+        for old in profiles[:max(len(profiles) - self.max_files, 0)]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+
+class ProfileGate:
+    """Global cap on profiling: one at a time, at most one start per interval."""
+
+    def __init__(self, min_interval: float = settings.PROFILING_MIN_INTERVAL_SECONDS):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def acquire(self) -> bool:
+        """Claim the profiler; False if it is busy or was started too recently."""
+        if not self._lock.acquire(blocking=False):
+            return False
+        now = time.monotonic()
+        if now < self._next_start:
+            self._lock.release()
+            return False
+        self._next_start = now + self.min_interval
+        return True
+
+    def release(self) -> None:
+        self._lock.release()
+
+
+# Global profile store
+profile_store = ProfileStore()
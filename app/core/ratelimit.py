@@ -0,0 +1,208 @@
+"""Token-bucket rate limiting per client.
+
+Every client (its ``X-API-Key`` when that is one of
+``RATE_LIMIT_API_KEYS``, else its IP address) has one bucket for reads and
+one for writes. A bucket holds up to ``burst`` tokens and refills
+at ``rate`` tokens a second; each request takes a token or is refused with
+the time until one is available.
+
+A bucket is stored as a single number: the time at which it is full again.
+Taking a token pushes that time ``1 / rate`` seconds later, and a request
+is allowed while the bucket would be full within ``(burst - 1) / rate``
+seconds. Refill needs no timer, so a check is O(1) and an idle bucket costs
+nothing but its entry. Once that time has passed the bucket is
+indistinguishable from a new one, so ``sweep`` drops it.
+
+``TokenBuckets`` keeps buckets in memory, split over shards that each have
+their own lock, so the event loop and the sweeping job rarely contend. As
+each worker has its own buckets, N workers allow a client up to N times its
+budget. ``SharedTokenBuckets`` keeps them in a SQLite file shared by the
+workers of a host instead, so limits hold across workers at the cost of a
+write per request.
+"""
+import math
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from app.core.settings import settings
+
+CREATE_TABLE = (
+    "CREATE TABLE IF NOT EXISTS rate_bucket "
+    "(key TEXT PRIMARY KEY, full_at REAL NOT NULL)"
+)
+# Take a token unless the bucket is empty; no row comes back when refused
+TAKE = """
+INSERT INTO rate_bucket (key, full_at) VALUES (:key, :now + :interval)
+ON CONFLICT (key) DO UPDATE SET full_at = max(full_at, :now) + :interval
+WHERE max(full_at, :now) - :now <= :tolerance
+RETURNING full_at
+"""
+# Slack for float rounding when comparing times, in seconds
+SLACK = 1e-9
+
+
+class Budget(NamedTuple):
+    """Sustained requests per second and the burst allowed on top."""
+    rate: float
+    burst: int
+
+    @property
+    def interval(self) -> float:
+        """Seconds one token takes to refill."""
+        return 1 / self.rate
+
+    @property
+    def tolerance(self) -> float:
+        """How far past now a bucket may be full again and still give a token."""
+        return (self.burst - 1) / self.rate
+
+
+class TokenBuckets:
+    """Token buckets by key, in this worker's memory."""
+
+    blocking = False
+
+    def __init__(
+        self,
+        shards: int = settings.RATE_LIMIT_SHARDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.shards: List[Tuple[Dict[str, float], threading.Lock]] = [
+            ({}, threading.Lock()) for _ in range(max(shards, 1))
+        ]
+        self.clock = clock
+
+    def take(self, key: str, budget: Budget) -> float:
+        """Take a token from ``key``'s bucket.
+
+        Returns:
+            0 if a token was taken, else seconds until one is available
+        """
+        buckets, lock = self.shards[hash(key) % len(self.shards)]
+        now = self.clock()
+        with lock:
+            full_at = max(buckets.get(key, now), now)
+            wait = full_at - now - budget.tolerance
+            if wait > SLACK:
+                return wait
+            buckets[key] = full_at + budget.interval
+        return 0.0
+
+    def sweep(self) -> int:
+        """Drop buckets that have refilled, returning how many were dropped."""
+        now = self.clock()
+        dropped = 0
+        for buckets, lock in self.shards:
+            with lock:
+                idle = [key for key, full_at in buckets.items() if full_at <= now]
+                for key in idle:
+                    del buckets[key]
+            dropped += len(idle)
+        return dropped
+
+    def __len__(self) -> int:
+        return sum(len(buckets) for buckets, _ in self.shards)
+
+
+class SharedTokenBuckets:
+    """Token buckets by key, in a SQLite file shared by all workers of a host.
+
+    Each check is one conditional UPSERT, so concurrent workers can never
+    hand out more tokens than the bucket holds. Connections are opened per
+    thread; calls block, so async callers should run them in a thread.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.clock = clock
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(CREATE_TABLE)
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, budget: Budget) -> float:
+        """Take a token from ``key``'s bucket.
+
+        Returns:
+            0 if a token was taken, else seconds until one is available
+        """
+        conn = self._connection()
+        now = self.clock()
+        params = {
+            "key": key,
+            "now": now,
+            "interval": budget.interval,
+            "tolerance": budget.tolerance + SLACK,
+        }
+        if conn.execute(TAKE, params).fetchone() is not None:
+            return 0.0
+        row = conn.execute(
+            "SELECT full_at FROM rate_bucket WHERE key = ?", (key,)
+        ).fetchone()
+        # The bucket may have refilled since; let the client retry right away
+        return max(row[0] - now - budget.tolerance, 0.0) if row else 0.0
+
+    def sweep(self) -> int:
+        """Drop buckets that have refilled, returning how many were dropped."""
+        return self._connection().execute(
+            "DELETE FROM rate_bucket WHERE full_at <= ?", (self.clock(),)
+        ).rowcount
+
+
+class RateLimiter:
+    """Separate read and write budgets per client over one bucket store."""
+
+    def __init__(
+        self,
+        buckets: Optional[Union[TokenBuckets, SharedTokenBuckets]] = None,
+        read: Budget = Budget(
+            settings.RATE_LIMIT_READS_PER_SECOND, settings.RATE_LIMIT_READ_BURST
+        ),
+        write: Budget = Budget(
+            settings.RATE_LIMIT_WRITES_PER_SECOND, settings.RATE_LIMIT_WRITE_BURST
+        ),
+    ):
+        self.buckets = buckets if buckets is not None else TokenBuckets()
+        self.read = read
+        self.write = write
+
+    @property
+    def blocking(self) -> bool:
+        """Whether checks block on I/O and belong off the event loop."""
+        return self.buckets.blocking
+
+    def check(self, client: str, write: bool) -> float:
+        """Take a token from ``client``'s read or write bucket.
+
+        Returns:
+            0 if the request may go ahead, else seconds until it may be retried
+        """
+        if write:
+            return self.buckets.take(f"write:{client}", self.write)
+        return self.buckets.take(f"read:{client}", self.read)
+
+    def sweep(self) -> int:
+        return self.buckets.sweep()
+
+
+def retry_after(wait: float) -> int:
+    """Whole seconds for a ``Retry-After`` header, at least 1."""
+    return max(math.ceil(wait - SLACK), 1)
+
+
+# Global rate limiter instance
+rate_limiter = RateLimiter(
+    SharedTokenBuckets(settings.RATE_LIMIT_SHARED_PATH)
+    if settings.RATE_LIMIT_SHARED_PATH else TokenBuckets()
+)
@@ -1,10 +1,25 @@
 """DNS resolution utilities."""
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
 
-from sqlmodel import Session, select
+from sqlalchemy.engine import Connection
+from sqlmodel import Session
 
-from app.core.validators import MAX_CNAME_CHAIN_LENGTH, detect_cname_chain_loop
-from app.models import Host, Record, RecordType
+from app.core.metrics import registry
+from app.core.snapshot import ZoneHost
+from app.core.statements import RECORDS_BY_HOSTNAME
+from app.core.tracing import tracer
+from app.core.validators import MAX_CNAME_CHAIN_LENGTH
+from app.models import RecordType, canonicalize_hostname
+
+# CNAME hops followed by successful resolutions
+resolution_hops = registry.histogram(
+    "resolver_cname_hops",
+    "CNAME hops followed per successful resolution",
+    buckets=range(MAX_CNAME_CHAIN_LENGTH + 1),
+)
+
+# Looks a host up without the database; None means "ask the database"
+ZoneLookup = Callable[[str], Optional[ZoneHost]]
 
 
 class ResolutionError(Exception):
@@ -13,22 +28,24 @@ class ResolutionError(Exception):
 
 
 def resolve_hostname_chain(
-    session: Session,
+    session: Union[Session, Connection],
     hostname: str,
     follow_cname: bool = True,
     max_depth: int = MAX_CNAME_CHAIN_LENGTH,
     _depth: int = 0,
-    _visited: Optional[Set[str]] = None
+    _visited: Optional[Set[str]] = None,
+    index: Optional[ZoneLookup] = None,
 ) -> Tuple[str, List[Dict]]:
     """Resolve a hostname to its final destination following CNAME chains.
     
     Args:
-        session: Database session
+        session: Database connection or session
         hostname: Hostname to resolve
         follow_cname: Whether to follow CNAME records
         max_depth: Maximum depth for CNAME chain resolution
         _depth: Current recursion depth (internal use)
         _visited: Set of visited hostnames (internal use)
+        index: Zone index lookup tried before the database for each hop
         
     Returns:
         Tuple of (canonical_name, list_of_records)
@@ -39,6 +56,7 @@ def resolve_hostname_chain(
     if _visited is None:
         _visited = set()
     
+    hostname = canonicalize_hostname(hostname)
     if _depth > max_depth:
         raise ResolutionError(f"Maximum CNAME chain length ({max_depth}) exceeded")
     
@@ -47,13 +65,16 @@ def resolve_hostname_chain(
     
     _visited.add(hostname)
     
-    # Find the host
-    host = session.exec(select(Host).where(Host.hostname == hostname)).first()
-    if not host:
-        raise ResolutionError(f"Hostname '{hostname}' not found")
-    
-    # Get all records for this host
-    records = session.exec(select(Record).where(Record.host_id == host.id)).all()
+    # Find the host and its records in the index, else in one query
+    with tracer.span("resolver.hop", hostname=hostname, depth=_depth):
+        host = index(hostname) if index is not None else None
+        if host is not None:
+            records = list(host.records)
+        else:
+            rows = session.execute(RECORDS_BY_HOSTNAME, {"hostname": hostname}).all()
+            if not rows:
+                raise ResolutionError(f"Hostname '{hostname}' not found")
+            records = [r for r in rows if r.type is not None]
     
     # If following CNAMEs, check for CNAME records
     if follow_cname:
@@ -65,12 +86,13 @@ def resolve_hostname_chain(
             cname = cname_records[0].value
             try:
                 return resolve_hostname_chain(
-                    session, cname, True, max_depth, _depth + 1, _visited
+                    session, cname, True, max_depth, _depth + 1, _visited, index
                 )
             except ResolutionError as e:
                 raise ResolutionError(f"Error resolving CNAME {hostname} -> {cname}: {str(e)}")
     
     # Return the records for this host
+    resolution_hops.observe(_depth)
     return hostname, [
         {"type": r.type, "value": r.value, "ttl": r.ttl, "priority": r.priority}
         for r in records
@@ -78,21 +100,29 @@ def resolve_hostname_chain(
 
 
 def resolve_hostname(
-    session: Session, hostname: str, record_type: Optional[RecordType] = None
+    session: Union[Session, Connection],
+    hostname: str,
+    record_type: Optional[RecordType] = None,
+    follow_cname: bool = True,
+    index: Optional[ZoneLookup] = None,
 ) -> Dict:
     """Resolve a hostname to its DNS records.
     
     Args:
-        session: Database session
+        session: Database connection or session
         hostname: Hostname to resolve
         record_type: Optional record type to filter by
+        follow_cname: Whether to follow CNAME records
+        index: Zone index lookup tried before the database for each hop
         
     Returns:
         Dict containing resolution results
     """
     try:
         # First try to resolve the hostname
-        canonical_name, all_records = resolve_hostname_chain(session, hostname)
+        canonical_name, all_records = resolve_hostname_chain(
+            session, hostname, follow_cname, index=index
+        )
         
         # Filter by record type if specified
         if record_type:
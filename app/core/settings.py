@@ -1,9 +1,38 @@
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from pydantic import Field, PostgresDsn, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from sqlalchemy.engine.url import URL
 
+# SQLite PRAGMA sets applied to every new connection.
+# cache_size is negative KiB, mmap_size is bytes.
+SQLITE_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Durable after every commit, SQLite defaults otherwise
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "temp_store": "DEFAULT",
+        "mmap_size": 0,
+    },
+    # WAL + NORMAL only risks the last commits on power loss, never corruption
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+        "mmap_size": 268435456,
+    },
+    # For bulk loads and benchmarks; an OS crash can lose recent commits
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -256000,
+        "temp_store": "MEMORY",
+        "mmap_size": 1073741824,
+    },
+}
+
 
 class DatabaseSettings(BaseSettings):
     """Database settings."""
@@ -19,6 +48,54 @@ class DatabaseSettings(BaseSettings):
     DB_POOL_SIZE: int = 5
     DB_MAX_OVERFLOW: int = 10
     DB_POOL_TIMEOUT: int = 30
+    # Warn when a pool's recent p95 checkout wait exceeds this
+    DB_POOL_WAIT_WARN_SECONDS: float = 0.1
+    DB_POOL_WARN_INTERVAL_SECONDS: float = 60.0
+
+    # SQLite performance profile (see SQLITE_PROFILES) and per-PRAGMA overrides
+    DB_SQLITE_PROFILE: str = "balanced"
+    DB_SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    DB_SQLITE_CACHE_SIZE: Optional[int] = None
+    DB_SQLITE_MMAP_SIZE: Optional[int] = None
+    DB_READ_POOL_SIZE: int = 10
+
+    # Read replicas for GET endpoints; writes always go to the primary
+    DB_REPLICA_URLS: list[str] = []
+    DB_REPLICA_RETRY_SECONDS: float = 30.0
+    DB_RECENT_WRITE_SECONDS: int = 5
+
+    # Hostname-hash sharding of hosts/records; empty means a single database.
+    # DB_SHARD_PREVIOUS_COUNT is set while a resharding run moves hosts.
+    DB_SHARD_URLS: list[str] = []
+    DB_SHARD_PREVIOUS_COUNT: Optional[int] = None
+
+    # Slow query log: statements slower than the threshold are kept in a
+    # ring of this size, with a query plan per new statement shape.
+    # None disables it.
+    DB_SLOW_QUERY_THRESHOLD_MS: Optional[float] = 100.0
+    DB_SLOW_QUERY_LOG_SIZE: int = 200
+    DB_SLOW_QUERY_MAX_PLANS: int = 500
+    DB_SLOW_QUERY_REDACT_PARAMETERS: bool = True
+
+    @field_validator("DB_SQLITE_PROFILE")
+    def validate_sqlite_profile(cls, v: str) -> str:
+        """Validate the SQLite profile is a known one."""
+        if v not in SQLITE_PROFILES:
+            raise ValueError(
+                f"DB_SQLITE_PROFILE must be one of: {', '.join(SQLITE_PROFILES)}"
+            )
+        return v
+
+    @property
+    def SQLITE_PRAGMAS(self) -> Dict[str, Any]:
+        """PRAGMAs for the selected SQLite profile, with overrides applied."""
+        pragmas = {"busy_timeout": self.DB_SQLITE_BUSY_TIMEOUT_MS}
+        pragmas.update(SQLITE_PROFILES[self.DB_SQLITE_PROFILE])
+        if self.DB_SQLITE_CACHE_SIZE is not None:
+            pragmas["cache_size"] = self.DB_SQLITE_CACHE_SIZE
+        if self.DB_SQLITE_MMAP_SIZE is not None:
+            pragmas["mmap_size"] = self.DB_SQLITE_MMAP_SIZE
+        return pragmas
 
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
@@ -58,6 +135,90 @@ class Settings(BaseSettings):
     # Database
     db: DatabaseSettings = Field(default_factory=DatabaseSettings)
 
+    # Idempotency-Key handling for POST endpoints. A request still pending
+    # after the claim lease is presumed dead and its key can be taken over.
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_MAX_KEYS: int = 100_000
+    IDEMPOTENCY_CACHE_SIZE: int = 1024
+    IDEMPOTENCY_WAIT_TIMEOUT: float = 10.0
+    IDEMPOTENCY_CLAIM_LEASE_SECONDS: float = 30.0
+
+    # Record expiry: deadlines within the horizon are kept in memory and
+    # fired on time; expired records are deleted in chunks of this size.
+    RECORD_EXPIRY_HORIZON_SECONDS: int = 300
+    RECORD_EXPIRY_CHUNK_SIZE: int = 500
+    RECORD_EXPIRY_MAX_SCHEDULED: int = 100_000
+
+    # Statistics: the shared counts are recounted this often, and each worker
+    # publishes its writes and re-reads the counts at the refresh interval.
+    STATS_RECONCILE_SECONDS: int = 300
+    STATS_REFRESH_SECONDS: int = 10
+
+    # Background jobs run in a bounded thread pool with their own DB pool.
+    # Leader-only jobs run on whichever worker holds the scheduler lease.
+    TASK_EXECUTOR_WORKERS: int = 2
+    TASK_JITTER_RATIO: float = 0.1
+    SCHEDULER_LEASE_SECONDS: int = 30
+
+    # Zone snapshots: the leader checkpoints all hosts and records to this
+    # file; workers map it at startup and replay the change log after it.
+    # Changes are replayed once they are older than the settle time.
+    ZONE_SNAPSHOT_PATH: Optional[str] = "zone.snapshot"
+    ZONE_SNAPSHOT_INTERVAL_SECONDS: int = 3600
+    ZONE_REPLAY_INTERVAL_SECONDS: int = 5
+    ZONE_CHANGE_SETTLE_SECONDS: float = 5.0
+    ZONE_CHANGE_RETENTION_SECONDS: int = 86400
+
+    # Prebuilt OpenAPI schema, rebuilt on first use when the sources change
+    OPENAPI_CACHE_PATH: Optional[str] = "openapi.cache.json"
+
+    # Requests running more database queries than this are logged as a
+    # warning with their most repeated statement; None disables the check
+    REQUEST_QUERY_BUDGET: Optional[int] = 25
+
+    # On-demand profiling of requests sending PROFILING_TOKEN in the
+    # X-Profile-Token header (see app.core.profiling)
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKEN: Optional[str] = None
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_FILES: int = 50
+    PROFILING_MIN_INTERVAL_SECONDS: float = 10.0
+    PROFILING_SAMPLE_INTERVAL_SECONDS: float = 0.001
+
+    # Tracing (see app.core.tracing): requests without a traceparent header
+    # are sampled at this rate, 0 turns tracing off unless a caller asks
+    # for it. A caller's sampled flag is honoured for at most
+    # TRACING_PARENT_SAMPLES_PER_SECOND requests a second, or always with
+    # TRACING_TRUST_PARENT (for callers behind a trusted gateway).
+    # Exporters by name: "memory" (ring buffer) and "jsonl" (file).
+    TRACING_SAMPLE_RATE: float = 0.0
+    TRACING_TRUST_PARENT: bool = False
+    TRACING_PARENT_SAMPLES_PER_SECOND: float = 10.0
+    TRACING_EXPORTERS: list[str] = ["memory"]
+    TRACING_BUFFER_SIZE: int = 2000
+    TRACING_FILE: str = "traces.jsonl"
+
+    # Token-bucket rate limits per client (an X-API-Key listed in
+    # RATE_LIMIT_API_KEYS, else the IP address), with separate budgets for
+    # reads and writes (see app.core.ratelimit). Idle buckets are swept every
+    # RATE_LIMIT_SWEEP_SECONDS. With a shared path the workers of a host keep
+    # their buckets in that SQLite file, so the limits hold across workers
+    # rather than per worker.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_READS_PER_SECOND: float = 100.0
+    RATE_LIMIT_READ_BURST: int = 200
+    RATE_LIMIT_WRITES_PER_SECOND: float = 20.0
+    RATE_LIMIT_WRITE_BURST: int = 50
+    RATE_LIMIT_SHARDS: int = 16
+    RATE_LIMIT_SWEEP_SECONDS: int = 60
+    RATE_LIMIT_SHARED_PATH: Optional[str] = None
+    RATE_LIMIT_API_KEYS: list[str] = []
+
+    # Required in the X-Admin-Token header of /api/admin endpoints. Without
+    # it they refuse every request unless ADMIN_API_OPEN opens them to all.
+    ADMIN_TOKEN: Optional[str] = None
+    ADMIN_API_OPEN: bool = False
+
     # Convenience properties
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
@@ -97,6 +258,30 @@ class Settings(BaseSettings):
             raise ValueError("ENVIRONMENT must be one of: development, testing, production")
         return v
 
+    @field_validator("TRACING_EXPORTERS")
+    def validate_tracing_exporters(cls, v: list[str]) -> list[str]:
+        """Validate every tracing exporter is a known one."""
+        unknown = set(v) - {"memory", "jsonl"}
+        if unknown:
+            raise ValueError(f"Unknown TRACING_EXPORTERS: {', '.join(sorted(unknown))}")
+        return v
+
+    @field_validator("RATE_LIMIT_READS_PER_SECOND", "RATE_LIMIT_WRITES_PER_SECOND")
+    def validate_rate_limit_rate(cls, v: float) -> float:
+        """Validate rate limits refill at a positive rate."""
+        if v <= 0:
+            raise ValueError(
+                "Rate limits must allow a positive number of requests per second"
+            )
+        return v
+
+    @field_validator("RATE_LIMIT_READ_BURST", "RATE_LIMIT_WRITE_BURST")
+    def validate_rate_limit_burst(cls, v: int) -> int:
+        """Validate rate limit bursts allow at least one request."""
+        if v < 1:
+            raise ValueError("Rate limit bursts must be at least 1")
+        return v
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -0,0 +1,304 @@
+"""Hostname-hash sharding of hosts and records across several databases.
+
+Hosts live on the shard chosen by a jump consistent hash of their hostname,
+and records live with their host. Everything else (idempotency keys and
+other service tables) stays on the primary database.
+
+Row IDs are global: the low bits of every host and record ID encode the
+shard it was created on (``id % SHARD_ID_STRIDE``), so a lookup by ID goes
+straight to one shard and IDs never collide across shards. The high bits
+come from a per-shard ``id_sequence`` row, so concurrent writers on a shard
+never collide either.
+
+Routing is done by a SQLAlchemy ``ShardedSession``. Queries that pin a
+hostname or an ID run on one shard, and any other host/record query runs
+on every shard with the results concatenated. ``scatter_gather`` merges
+per-shard keyset pages in ID order.
+
+While a resharding run is in progress (``previous_count`` is set), a
+hostname lookup also checks the shard that owned it under the old count,
+so hosts stay resolvable while they move.
+"""
+import hashlib
+import heapq
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.horizontal_shard import ShardedSession, set_shard_id
+from sqlalchemy.orm import ORMExecuteState, Session
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.elements import BindParameter, ColumnClause
+from sqlalchemy.sql.operators import eq
+from sqlalchemy.sql.util import find_tables
+from sqlmodel import Session as SQLModelSession
+
+from app.models import Host, IdSequence, Record, canonicalize_hostname
+
+SHARD_ID_STRIDE = 1024
+PRIMARY_SHARD = "primary"
+
+host_table = Host.__table__
+record_table = Record.__table__
+SHARDED_TABLES = frozenset({host_table, record_table})
+ID_COLUMNS = (host_table.c.id, record_table.c.id, record_table.c.host_id)
+HOSTNAME_COLUMNS = (host_table.c.hostname, host_table.c.canonical_hostname)
+sequence_table = IdSequence.__table__
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash (Lamping & Veach).
+
+    Growing from N to N+1 buckets moves only 1/(N+1) of the keys, all of
+    them onto the new bucket.
+    """
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+def shard_for_hostname(hostname: str, count: int) -> int:
+    """Return the index of the shard owning ``hostname`` among ``count`` shards.
+
+    Placement follows the canonical hostname, so every spelling of a name
+    maps to the same shard.
+    """
+    digest = hashlib.blake2b(
+        canonicalize_hostname(hostname).encode(), digest_size=8
+    ).digest()
+    return jump_hash(int.from_bytes(digest, "big"), count)
+
+
+def shard_for_id(row_id: int) -> int:
+    """Return the index of the shard a host or record ID was created on."""
+    return row_id % SHARD_ID_STRIDE
+
+
+class ShardedModelSession(ShardedSession, SQLModelSession):
+    """ShardedSession that also offers SQLModel's ``exec()``."""
+
+
+def _comparisons(statement: Any, parameters: Dict[str, Any]) -> Iterator[tuple]:
+    """Yield ``(column, value)`` for every ``column = value`` in a statement."""
+    found: List[tuple] = []
+
+    def visit_binary(binary):
+        if binary.operator is not eq:
+            return
+        left, right = binary.left, binary.right
+        if isinstance(right, ColumnClause) and isinstance(left, BindParameter):
+            left, right = right, left
+        if isinstance(left, ColumnClause) and isinstance(right, BindParameter):
+            value = (
+                right.value if right.value is not None else parameters.get(right.key)
+            )
+            if value is not None:
+                found.append((left, value))
+
+    visitors.traverse(statement, {}, {"binary": visit_binary})
+    return iter(found)
+
+
+class ShardSet:
+    """The shard engines plus the routing rules between them."""
+
+    def __init__(
+        self,
+        primary: Engine,
+        writers: List[Engine],
+        readers: Optional[List[Engine]] = None,
+        previous_count: Optional[int] = None,
+    ):
+        if len(writers) > SHARD_ID_STRIDE:
+            raise ValueError(f"At most {SHARD_ID_STRIDE} shards are supported")
+        self.primary = primary
+        self.writers = {str(i): e for i, e in enumerate(writers)}
+        self.readers = {str(i): e for i, e in enumerate(readers or writers)}
+        self.previous_count = previous_count
+
+    @property
+    def count(self) -> int:
+        """Number of shards."""
+        return len(self.writers)
+
+    def owner(self, hostname: str) -> str:
+        """Shard ID owning a hostname under the current shard count."""
+        return str(shard_for_hostname(hostname, self.count))
+
+    def candidates(self, hostname: str) -> List[str]:
+        """Shards that may hold a hostname, including its pre-reshard owner."""
+        shards = [self.owner(hostname)]
+        if self.previous_count:
+            previous = str(shard_for_hostname(hostname, self.previous_count))
+            if previous not in shards:
+                shards.append(previous)
+        return shards
+
+    def create_all(self) -> None:
+        """Create or migrate the schema on the primary and on every shard."""
+        from app.core.database import ensure_schema
+
+        for engine in (self.primary, *self.writers.values()):
+            ensure_schema(engine)
+        for engine in self.writers.values():
+            for table in (host_table, record_table):
+                seed_sequence(engine, table)
+
+    def session(self, read_only: bool = False) -> ShardedModelSession:
+        """Open a session that routes host/record statements across shards."""
+        shards = self.readers if read_only else self.writers
+        session = ShardedModelSession(
+            shard_chooser=self._shard_chooser,
+            identity_chooser=self._identity_chooser,
+            execute_chooser=lambda ctx: self._execute_chooser(ctx, shards),
+            shards={PRIMARY_SHARD: self.primary, **shards},
+        )
+        session.info["shard_set"] = self
+        event.listen(session, "before_flush", lambda s, ctx, objs: self.assign_ids(s))
+        return session
+
+    def allocate_ids(
+        self, session: Session, table: Any, shard_id: str, count: int = 1
+    ) -> int:
+        """Reserve ``count`` global IDs for ``table`` on a shard.
+
+        The reservation runs on the session's own connection to the shard,
+        so the sequence row stays locked until the transaction ends and
+        concurrent writers on the shard wait rather than share IDs. IDs of
+        a rolled-back transaction are not reused.
+
+        Returns:
+            The first reserved ID; the others follow ``SHARD_ID_STRIDE`` apart
+        """
+        conn = session.connection(bind_arguments={"shard_id": shard_id})
+        reserved = conn.execute(
+            update(sequence_table)
+            .where(sequence_table.c.name == table.name)
+            .values(next_value=sequence_table.c.next_value + count)
+            .returning(sequence_table.c.next_value)
+        ).scalar()
+        if reserved is None:
+            raise RuntimeError(
+                f"No ID sequence for {table.name} on shard {shard_id}; "
+                "run ShardSet.create_all() first"
+            )
+        return (reserved - count) * SHARD_ID_STRIDE + int(shard_id)
+
+    def assign_ids(self, session: Session) -> None:
+        """Give pending hosts and records a global ID on their shard.
+
+        Hosts are handled first so records added in the same flush can
+        point at them. IDs are reserved once per table and shard.
+        """
+        pending = [
+            obj
+            for obj in session.new
+            if isinstance(obj, (Host, Record)) and obj.id is None
+        ]
+        for model in (Host, Record):
+            groups: Dict[str, List[Any]] = {}
+            for obj in pending:
+                if not isinstance(obj, model):
+                    continue
+                if (
+                    isinstance(obj, Record)
+                    and obj.host_id is None
+                    and obj.host is not None
+                ):
+                    obj.host_id = obj.host.id
+                groups.setdefault(self._shard_chooser(None, obj), []).append(obj)
+            for shard_id, objs in groups.items():
+                first = self.allocate_ids(session, model.__table__, shard_id, len(objs))
+                for i, obj in enumerate(objs):
+                    obj.id = first + i * SHARD_ID_STRIDE
+
+    def _shard_chooser(self, mapper, instance, clause=None) -> str:
+        if isinstance(instance, Host):
+            if instance.id is not None:
+                return str(shard_for_id(instance.id))
+            return self.owner(instance.hostname)
+        if isinstance(instance, Record):
+            return str(shard_for_id(instance.host_id))
+        return PRIMARY_SHARD
+
+    def _identity_chooser(self, mapper, primary_key, **kw) -> List[str]:
+        if mapper.local_table in SHARDED_TABLES:
+            return [str(shard_for_id(primary_key[0]))]
+        return [PRIMARY_SHARD]
+
+    def _execute_chooser(
+        self, orm_context: ORMExecuteState, shards: Dict[str, Engine]
+    ) -> List[str]:
+        statement = orm_context.statement
+        tables = set(find_tables(statement, include_crud=True, include_joins=True))
+        if not tables & SHARDED_TABLES:
+            return [PRIMARY_SHARD]
+
+        parameters = orm_context.parameters
+        if isinstance(parameters, list):
+            parameters = parameters[0] if parameters else {}
+        for column, value in _comparisons(statement, parameters or {}):
+            if any(column.shares_lineage(c) for c in HOSTNAME_COLUMNS):
+                return self.candidates(value)
+            if any(column.shares_lineage(c) for c in ID_COLUMNS):
+                return [str(shard_for_id(value))]
+        return list(shards)
+
+
+def seed_sequence(engine: Engine, table: Any) -> None:
+    """Create a shard's ID sequence row for ``table`` if it has none.
+
+    The sequence starts past the shard's highest existing ID. Workers
+    starting together may race to create it; the loser's insert fails on
+    the primary key and the winner's row is kept.
+    """
+    with engine.connect() as conn:
+        exists = conn.execute(
+            select(sequence_table.c.name).where(sequence_table.c.name == table.name)
+        ).first()
+        if exists:
+            return
+        current = conn.execute(select(func.max(table.c.id))).scalar()
+    start = (current // SHARD_ID_STRIDE if current is not None else 0) + 1
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                insert(sequence_table).values(name=table.name, next_value=start)
+            )
+    except IntegrityError:
+        pass
+
+
+def scatter_gather(
+    session: Session,
+    statement: Any,
+    limit: Optional[int] = None,
+    key: Any = lambda row: row.id,
+) -> List[Any]:
+    """Run an ID-ordered keyset page on every shard and merge the pages.
+
+    Args:
+        session: Session from ``ShardSet.session()``, or any plain session
+        statement: Select ordered by ID, already filtered by the cursor and limited
+        limit: Page size
+        key: Sort key of a result row
+
+    Returns:
+        The first ``limit`` rows across all shards in global ID order
+    """
+    shard_set: Optional[ShardSet] = session.info.get("shard_set")
+    if shard_set is None:
+        return session.execute(statement).scalars().all()
+
+    pages: Iterable[List[Any]] = (
+        session.execute(statement.options(set_shard_id(shard_id))).scalars().all()
+        for shard_id in shard_set.writers
+    )
+    merged = heapq.merge(*pages, key=key)
+    return list(
+        merged if limit is None else (row for _, row in zip(range(limit), merged))
+    )
@@ -0,0 +1,582 @@
+"""Binary zone snapshots and the in-memory zone index built on them.
+
+Every write logs the IDs of the hosts it touched in ``zone_change`` with
+``note_changes``, in the same transaction. A change's ``serial`` orders it
+against every other change. The leader periodically checkpoints all hosts
+and records into a snapshot file tagged with the serial it includes.
+
+Snapshot layout (little-endian)::
+
+    header   magic "DNSZ", format version, serial, host count,
+             index offset, creation time, CRC-32 of everything after it
+    hosts    per host: id, hostname length, record count, hostname,
+             then per record: id, type, ttl, priority, value length, value
+    index    one offset per host, sorted by hostname
+
+Hosts are stored and looked up under their canonical hostname.
+
+Workers map the file with ``mmap`` and binary-search the index, so opening
+a snapshot costs one checksum pass no matter how many records it holds.
+Changes with a higher serial are replayed into a small overlay by
+reloading the hosts they name. Reads check the overlay first.
+
+The resolver looks hosts up in the index and falls back to the database
+for any name the index does not hold. Hosts this worker changed are
+skipped until a replay has reloaded them, so a worker always sees its own
+writes; writes made by other workers show up within one replay interval,
+much like replica lag.
+
+Snapshots are per database and are not used when sharding is enabled.
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.database import get_task_session, shard_set
+from app.core.metrics import registry
+from app.core.settings import settings
+from app.models import Host, Record, RecordType, ZoneChange, canonicalize_hostname
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"DNSZ"
+FORMAT_VERSION = 2
+# magic, version, reserved, serial, host count, index offset, created (epoch), crc32
+HEADER = struct.Struct("<4sHHQQQdI")
+# host id, hostname length, record count
+HOST = struct.Struct("<QHH")
+# record id, type, ttl, priority, value length
+RECORD = struct.Struct("<QBIiH")
+OFFSET = struct.Struct("<Q")
+# Record types by their code in the file; only ever append to this
+RECORD_TYPES: Tuple[RecordType, ...] = tuple(RecordType)
+TYPE_CODES = {record_type: code for code, record_type in enumerate(RECORD_TYPES)}
+NO_PRIORITY = -1
+# Host IDs per query when reloading changed hosts
+RELOAD_CHUNK = 500
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is truncated, corrupt or of another version."""
+    pass
+
+
+class ZoneRecord(NamedTuple):
+    """A record as held in the zone index."""
+    id: int
+    type: RecordType
+    value: str
+    ttl: int
+    priority: Optional[int]
+
+
+class ZoneHost(NamedTuple):
+    """A host and its records as held in the zone index."""
+    id: int
+    hostname: str
+    records: Tuple[ZoneRecord, ...]
+
+
+def note_changes(session: Session, host_ids: Iterable[int]) -> None:
+    """Log that hosts were created, changed or deleted.
+
+    Call this in the transaction making the change, so the log entry
+    commits (or rolls back) together with it.
+    """
+    if session.info.get("shard_set") is not None:
+        return
+    now = datetime.utcnow()
+    rows = [{"host_id": host_id, "changed_at": now} for host_id in set(host_ids)]
+    if rows:
+        session.execute(insert(ZoneChange), rows)
+        zone_index.mark_changed(row["host_id"] for row in rows)
+
+
+def settled_serial(session: Session, settle_seconds: float) -> int:
+    """Highest serial below which no transaction can still commit a change.
+
+    Serials are handed out before commit, so on a database with concurrent
+    writers a change can become visible after one with a higher serial.
+    Changes are only treated as complete once they are ``settle_seconds`` old.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settle_seconds)
+    pending = session.execute(
+        select(func.min(ZoneChange.serial)).where(ZoneChange.changed_at > cutoff)
+    ).scalar()
+    if pending is not None:
+        return pending - 1
+    return session.execute(select(func.max(ZoneChange.serial))).scalar() or 0
+
+
+def _host_rows(session: Session, *where):
+    """Hosts joined with their records, one row per record (or per empty host).
+
+    Runs on the session's connection, skipping ORM result processing.
+    """
+    return session.connection().execute(
+        select(
+            Host.id,
+            Host.canonical_hostname,
+            Record.id.label("record_id"),
+            Record.type,
+            Record.value,
+            Record.ttl,
+            Record.priority,
+        )
+        .outerjoin(Record, Record.host_id == Host.id)
+        .where(*where)
+        .order_by(Host.canonical_hostname, Record.id)
+        .execution_options(stream_results=True, max_row_buffer=10_000)
+    )
+
+
+def _group_hosts(rows) -> Iterable[ZoneHost]:
+    """Turn rows from ``_host_rows`` into one ``ZoneHost`` per host."""
+    current: Optional[Tuple[int, str]] = None
+    records: List[ZoneRecord] = []
+    for host_id, hostname, record_id, record_type, value, ttl, priority in rows:
+        if current is not None and current[0] != host_id:
+            yield ZoneHost(current[0], current[1], tuple(records))
+            records = []
+        current = (host_id, hostname)
+        if record_id is not None:
+            records.append(
+                ZoneRecord(record_id, RecordType(record_type), value, ttl, priority)
+            )
+    if current is not None:
+        yield ZoneHost(current[0], current[1], tuple(records))
+
+
+def _encode_host(host: ZoneHost) -> Tuple[bytes, bytes]:
+    """Encode a host; returns its hostname and its bytes in the file."""
+    name = host.hostname.encode()
+    parts = [HOST.pack(host.id, len(name), len(host.records)), name]
+    for record in host.records:
+        value = record.value.encode()
+        priority = NO_PRIORITY if record.priority is None else record.priority
+        parts.append(RECORD.pack(
+            record.id, TYPE_CODES[record.type], record.ttl, priority, len(value)
+        ))
+        parts.append(value)
+    return name, b"".join(parts)
+
+
+def write_snapshot(
+    session: Session,
+    path: str,
+    settle_seconds: float = settings.ZONE_CHANGE_SETTLE_SECONDS,
+) -> int:
+    """Write every host and record to ``path``, replacing it atomically.
+
+    Returns:
+        Serial of the last change the snapshot is known to include
+    """
+    serial = settled_serial(session, settle_seconds)
+    names: List[bytes] = []
+    offsets: List[int] = []
+    in_order = True
+    crc = 0
+    position = HEADER.size
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(bytes(HEADER.size))
+            for host in _group_hosts(_host_rows(session)):
+                name, blob = _encode_host(host)
+                in_order = in_order and (not names or names[-1] < name)
+                names.append(name)
+                offsets.append(position)
+                f.write(blob)
+                crc = zlib.crc32(blob, crc)
+                position += len(blob)
+
+            # The database collation may not sort hostnames bytewise
+            if not in_order:
+                offsets = [offset for _, offset in sorted(zip(names, offsets))]
+            index = struct.pack(f"<{len(offsets)}Q", *offsets)
+            f.write(index)
+            crc = zlib.crc32(index, crc)
+
+            f.seek(0)
+            f.write(
+                HEADER.pack(
+                    MAGIC,
+                    FORMAT_VERSION,
+                    0,
+                    serial,
+                    len(offsets),
+                    position,
+                    time.time(),
+                    crc,
+                )
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return serial
+
+
+def prune_changes(session: Session, serial: int, retention_seconds: float) -> int:
+    """Delete logged changes included in the snapshot at ``serial``.
+
+    The change at ``serial`` itself is kept so the highest serial handed
+    out stays visible, and changes newer than ``retention_seconds`` are kept
+    for workers that read snapshots from another machine.
+
+    Returns:
+        Number of changes deleted
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=retention_seconds)
+    return session.execute(
+        delete(ZoneChange).where(
+            ZoneChange.serial < serial, ZoneChange.changed_at < cutoff
+        )
+    ).rowcount
+
+
+class ZoneSnapshot:
+    """A snapshot file mapped into memory."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size < HEADER.size:
+                raise SnapshotError(f"{path} is truncated")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+        magic, version, _, serial, hosts, index_offset, created, crc = (
+            HEADER.unpack_from(self._map)
+        )
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a zone snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(
+                f"{path} has format version {version}, expected {FORMAT_VERSION}"
+            )
+        if index_offset + hosts * OFFSET.size != len(self._map):
+            raise SnapshotError(f"{path} is truncated")
+        view = memoryview(self._map)
+        body = view[HEADER.size:]
+        try:
+            if zlib.crc32(body) != crc:
+                raise SnapshotError(f"{path} failed its checksum")
+        finally:
+            body.release()
+            view.release()
+
+        self.path = path
+        self.serial = serial
+        self.hosts = hosts
+        self.created_at = datetime.utcfromtimestamp(created)
+        self._index_offset = index_offset
+
+    def _name_at(self, position: int) -> Tuple[int, bytes]:
+        """Offset and hostname of the host at ``position`` in the index."""
+        (offset,) = OFFSET.unpack_from(
+            self._map, self._index_offset + position * OFFSET.size
+        )
+        _, name_length, _ = HOST.unpack_from(self._map, offset)
+        start = offset + HOST.size
+        return offset, self._map[start:start + name_length]
+
+    def find(self, hostname: str) -> Optional[ZoneHost]:
+        """Look up a host by binary search over the hostname index."""
+        key = hostname.encode()
+        low, high = 0, self.hosts
+        while low < high:
+            middle = (low + high) // 2
+            if self._name_at(middle)[1] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.hosts:
+            return None
+        offset, name = self._name_at(low)
+        return self._decode(offset) if name == key else None
+
+    def _decode(self, offset: int) -> ZoneHost:
+        host_id, name_length, record_count = HOST.unpack_from(self._map, offset)
+        position = offset + HOST.size
+        hostname = self._map[position:position + name_length].decode()
+        position += name_length
+        records = []
+        for _ in range(record_count):
+            record_id, type_code, ttl, priority, value_length = RECORD.unpack_from(
+                self._map, position
+            )
+            position += RECORD.size
+            value = self._map[position:position + value_length].decode()
+            position += value_length
+            records.append(ZoneRecord(
+                record_id,
+                RECORD_TYPES[type_code],
+                value,
+                ttl,
+                None if priority == NO_PRIORITY else priority,
+            ))
+        return ZoneHost(host_id, hostname, tuple(records))
+
+
+@dataclass
+class _IndexState:
+    """Snapshot plus the hosts changed since; swapped as a whole on reload."""
+    snapshot: Optional[ZoneSnapshot] = None
+    # Current version of every host changed since the snapshot, by hostname
+    overlay: Dict[str, ZoneHost] = field(default_factory=dict)
+    # Current hostname of every changed host (None once deleted), by ID
+    touched: Dict[int, Optional[str]] = field(default_factory=dict)
+
+
+class ZoneIndex:
+    """All hosts and records, served from a snapshot plus replayed changes."""
+
+    def __init__(
+        self,
+        path: Optional[str] = settings.ZONE_SNAPSHOT_PATH,
+        session_factory: Callable[[], ContextManager[Session]] = get_task_session,
+        settle_seconds: float = settings.ZONE_CHANGE_SETTLE_SECONDS,
+        retention_seconds: float = settings.ZONE_CHANGE_RETENTION_SECONDS,
+    ):
+        self.path = path
+        self.session_factory = session_factory
+        self.settle_seconds = settle_seconds
+        self.retention_seconds = retention_seconds
+        # Every change up to this serial is reflected in the index
+        self.serial = 0
+        self.replayed_at: Optional[datetime] = None
+        self._state = _IndexState()
+        # Hosts changed by this worker and not yet replayed, by ID, with
+        # the monotonic time they were marked
+        self._changed: Dict[int, float] = {}
+        # warm, replay and checkpoint run on startup and in background jobs
+        self._lock = threading.RLock()
+
+        self.replayed = registry.counter(
+            "zone_index_changes_replayed_total",
+            "Logged changes applied to the zone index",
+        )
+        registry.gauge(
+            "zone_index_serial", "Last change serial reflected in the zone index"
+        ).set_function(lambda: self.serial)
+        registry.gauge(
+            "zone_index_overlay_hosts",
+            "Hosts changed since the zone snapshot was taken",
+        ).set_function(lambda: len(self._state.overlay))
+        self.hits = registry.counter(
+            "zone_index_lookups_total", "Zone index lookups by result", result="hit"
+        )
+        self.misses = registry.counter(
+            "zone_index_lookups_total", "Zone index lookups by result", result="miss"
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Whether snapshots are configured and usable with this database setup."""
+        return bool(self.path) and shard_set is None
+
+    def get(self, hostname: str) -> Optional[ZoneHost]:
+        """Look up a host and its records without touching the database.
+
+        Returns:
+            The host, or None when the index does not hold it (it may still
+            exist in the database)
+        """
+        host = self._find(canonicalize_hostname(hostname))
+        if host is None or host.id in self._changed:
+            self.misses.inc()
+            return None
+        self.hits.inc()
+        return host
+
+    def _find(self, hostname: str) -> Optional[ZoneHost]:
+        state = self._state
+        host = state.overlay.get(hostname)
+        if host is not None:
+            return host
+        if state.snapshot is None:
+            return None
+        host = state.snapshot.find(hostname)
+        # A changed host that still has this name would be in the overlay
+        if host is None or host.id in state.touched:
+            return None
+        return host
+
+    def mark_changed(self, host_ids: Iterable[int]) -> None:
+        """Stop serving hosts this worker is changing until they are replayed."""
+        now = time.monotonic()
+        for host_id in host_ids:
+            self._changed[host_id] = now
+
+    def status(self) -> Dict[str, Any]:
+        """Snapshot and replay position, for ``/status``."""
+        snapshot = self._state.snapshot
+        return {
+            "enabled": self.enabled,
+            "serial": self.serial,
+            "snapshot_serial": snapshot.serial if snapshot else None,
+            "snapshot_hosts": snapshot.hosts if snapshot else 0,
+            "snapshot_created_at": snapshot.created_at if snapshot else None,
+            "overlay_hosts": len(self._state.overlay),
+            "replayed_at": self.replayed_at,
+        }
+
+    def warm(self) -> None:
+        """Map the snapshot (writing one if there is no usable file) and catch up."""
+        if not self.enabled:
+            return
+        with self._lock:
+            try:
+                self._install(ZoneSnapshot(self.path))
+            except FileNotFoundError:
+                # First boot, or the snapshot was removed
+                logger.info("Writing the first zone snapshot to %s", self.path)
+                self.checkpoint()
+            except (OSError, SnapshotError) as e:
+                logger.warning("Rebuilding zone snapshot %s: %s", self.path, e)
+                self.checkpoint()
+            self.replay()
+
+    def checkpoint(self) -> int:
+        """Write a fresh snapshot, switch to it and prune the change log.
+
+        Returns:
+            Serial of the new snapshot
+        """
+        if not self.enabled:
+            return self.serial
+        with self._lock:
+            with self.session_factory() as session:
+                serial = write_snapshot(session, self.path, self.settle_seconds)
+                prune_changes(session, serial, self.retention_seconds)
+            self._install(ZoneSnapshot(self.path))
+        return serial
+
+    def replay(self) -> int:
+        """Apply changes logged after ``serial``, switching to a newer snapshot first.
+
+        Returns:
+            Number of changes applied
+        """
+        if not self.enabled:
+            return 0
+        with self._lock:
+            return self._replay()
+
+    def _replay(self) -> int:
+        # Changes marked before this were committed (or rolled back) by
+        # the time the change log is read below, given the settle time
+        started = time.monotonic() - self.settle_seconds
+        self._reload_if_replaced()
+        with self.session_factory() as session:
+            oldest, latest = session.execute(
+                select(func.min(ZoneChange.serial), func.max(ZoneChange.serial))
+            ).one()
+            if (latest or 0) < self.serial or (
+                oldest is not None and oldest > self.serial + 1
+            ):
+                # The snapshot belongs to another database, or changes we
+                # still need have been pruned
+                stale = True
+            else:
+                stale = False
+                changes = session.execute(
+                    select(ZoneChange.serial, ZoneChange.host_id, ZoneChange.changed_at)
+                    .where(ZoneChange.serial > self.serial)
+                    .order_by(ZoneChange.serial)
+                ).all()
+                hosts = self._load_hosts(
+                    session, {change.host_id for change in changes}
+                )
+        if stale:
+            logger.warning(
+                "Zone snapshot serial %s does not match the change log; rebuilding",
+                self.serial,
+            )
+            self.checkpoint()
+            return 0
+
+        state = self._state
+        for host_id in {change.host_id for change in changes}:
+            previous = state.touched.get(host_id)
+            if previous is not None:
+                entry = state.overlay.get(previous)
+                if entry is not None and entry.id == host_id:
+                    del state.overlay[previous]
+            host = hosts.get(host_id)
+            if host is not None:
+                state.overlay[host.hostname] = host
+            state.touched[host_id] = host.hostname if host else None
+
+        # Only advance past changes that can no longer be joined by a lower
+        # serial; later ones are simply reapplied on the next replay
+        cutoff = datetime.utcnow() - timedelta(seconds=self.settle_seconds)
+        for change in changes:
+            if change.changed_at > cutoff:
+                break
+            self.serial = change.serial
+        for host_id, marked in list(self._changed.items()):
+            if marked <= started:
+                self._changed.pop(host_id, None)
+        self.replayed.inc(len(changes))
+        self.replayed_at = datetime.utcnow()
+        return len(changes)
+
+    def _install(self, snapshot: ZoneSnapshot) -> None:
+        # Old maps are closed once the last reader drops them
+        self._state = _IndexState(snapshot)
+        self.serial = snapshot.serial
+
+    def _reload_if_replaced(self) -> None:
+        """Switch to the snapshot file if another worker has replaced it."""
+        current = self._state.snapshot
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        if current is not None and current.identity == (stat.st_ino, stat.st_mtime_ns):
+            return
+        try:
+            snapshot = ZoneSnapshot(self.path)
+        except (OSError, SnapshotError) as e:
+            logger.warning("Ignoring zone snapshot %s: %s", self.path, e)
+            return
+        if current is None or snapshot.serial > current.serial:
+            self._install(snapshot)
+
+    @staticmethod
+    def _load_hosts(session: Session, host_ids: Iterable[int]) -> Dict[int, ZoneHost]:
+        """Current version of each host that still exists, by ID."""
+        host_ids = sorted(host_ids)
+        hosts: Dict[int, ZoneHost] = {}
+        for start in range(0, len(host_ids), RELOAD_CHUNK):
+            chunk = host_ids[start:start + RELOAD_CHUNK]
+            for host in _group_hosts(_host_rows(session, Host.id.in_(chunk))):
+                hosts[host.id] = host
+        return hosts
+
+
+# Global zone index instance
+zone_index = ZoneIndex()
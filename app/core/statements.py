@@ -0,0 +1,48 @@
+"""Pre-built SQLAlchemy Core statements for the read hot paths.
+
+The resolver and validators run these with bound parameters on a plain
+connection (or session) and get plain rows back. Hostname parameters are
+matched against the unique ``canonical_hostname`` index, so callers pass
+``canonicalize_hostname(hostname)``. Building the statements
+once at import time means each call skips statement construction, hits
+SQLAlchemy's compiled-statement cache, and never hydrates ORM objects.
+"""
+from sqlalchemy import bindparam, select
+
+from app.models import Host, Record, RecordType
+
+host_table = Host.__table__
+record_table = Record.__table__
+
+# One row per record of the host, or a single row with NULL record columns
+# when the host exists without records. No rows means no such host.
+RECORDS_BY_HOSTNAME = (
+    select(
+        host_table.c.id.label("host_id"),
+        record_table.c.type,
+        record_table.c.value,
+        record_table.c.ttl,
+        record_table.c.priority,
+    )
+    .select_from(
+        host_table.outerjoin(record_table, record_table.c.host_id == host_table.c.id)
+    )
+    .where(host_table.c.canonical_hostname == bindparam("hostname"))
+)
+
+# CNAME records of a host, by hostname
+CNAMES_BY_HOSTNAME = (
+    select(record_table.c.value, record_table.c.ttl)
+    .select_from(
+        host_table.join(record_table, record_table.c.host_id == host_table.c.id)
+    )
+    .where(host_table.c.canonical_hostname == bindparam("hostname"))
+    .where(record_table.c.type == RecordType.CNAME)
+)
+
+# All records of a host, by host ID
+RECORDS_BY_HOST_ID = select(
+    record_table.c.id,
+    record_table.c.type,
+    record_table.c.value,
+).where(record_table.c.host_id == bindparam("host_id"))
@@ -0,0 +1,366 @@
+"""Incrementally maintained DNS statistics with a downsampled history.
+
+The counts every worker serves come from one shared ``stats_counts`` row.
+``reconcile`` recounts hosts, records and CNAME chain depths from the
+database and stores them in that row, stamped with the time the count
+started. Every worker loads the row at startup and ``refresh`` re-reads it
+periodically, so all workers serve the same recount.
+
+On top of the shared counts each worker adds its own committed changes.
+Write paths record them with ``track(session, ...)``; the deltas are kept on
+the session and applied only once it commits, so rolled-back writes never
+show up. Applied deltas are timestamped and kept until counts taken after
+them are installed. A recount therefore never loses a change committed
+while it ran, and its drift is measured against what was served at the
+moment it started counting. Changes made by other workers show up with the
+next recount; drift also covers writes from offline tools such as bulk
+loads. The recount is also the only place the CNAME chain depth
+distribution is computed, because one CNAME change can move the depth of
+every chain passing through it.
+
+Writes are counted globally: ``refresh`` adds this worker's writes to the
+row's running total and reads back everyone's. ``writes_per_minute`` and the
+history's ``writes`` are differences of that total.
+
+``sample`` appends a snapshot to a fixed-size ring buffer once a minute.
+Every 60 minute samples are rolled up into one hourly sample in a second
+ring, so the history covers a week in constant memory. Reading the
+current stats or the history never touches the database.
+"""
+import threading
+import time
+from collections import Counter as CounterDict
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.validators import MAX_CNAME_CHAIN_LENGTH
+from app.models import Host, Record, RecordType, StatsCounts
+from app.models.stats_counts import STATS_COUNTS_ID
+
+MINUTE_SAMPLES = 60
+HOUR_SAMPLES = 24 * 7
+# Window of the rolling writes-per-minute figure
+WRITE_WINDOW_SECONDS = 60
+
+PENDING_KEY = "dns_stats_pending"
+
+
+class DNSStats:
+    """Host/record counters, write rate and history."""
+
+    def __init__(self):
+        self.hosts = 0
+        self.records_by_type: Dict[str, int] = _zero_counts()
+        self.cname_chain_depths: Dict[int, int] = {}
+        self.updated_at: Optional[datetime] = None
+        self.reconciled_at: Optional[datetime] = None
+        # Shared counts as of reconciled_at
+        self._base_hosts = 0
+        self._base_records: Dict[str, int] = _zero_counts()
+        # (committed at, hosts, records) applied since the shared counts
+        self._deltas: Deque[Tuple[datetime, int, Dict[str, int]]] = deque()
+        # Global write total as last read, plus this worker's writes not in it
+        self._shared_writes = 0
+        self._flushing_writes = 0
+        self._unflushed_writes = 0
+        # (monotonic time, global write total) at each refresh
+        self._write_readings: Deque[Tuple[float, int]] = deque()
+        self._sampled_writes: Optional[int] = None
+        self._samples_since_rollup = 0
+        self.minutes: Deque[Dict[str, Any]] = deque(maxlen=MINUTE_SAMPLES)
+        self.hours: Deque[Dict[str, Any]] = deque(maxlen=HOUR_SAMPLES)
+        self._lock = threading.Lock()
+
+    def apply(
+        self, hosts: int = 0, records: Optional[Dict[str, int]] = None, writes: int = 0
+    ) -> None:
+        """Apply changes committed by this worker to the counters."""
+        now = datetime.utcnow()
+        records = records or {}
+        with self._lock:
+            if hosts or records:
+                self._deltas.append((now, hosts, records))
+                self.hosts += hosts
+                _add_counts(self.records_by_type, records)
+            self._unflushed_writes += writes
+            self.updated_at = now
+
+    def writes_per_minute(self) -> int:
+        """Writes committed by all workers in about the last 60 seconds."""
+        cutoff = time.monotonic() - WRITE_WINDOW_SECONDS
+        with self._lock:
+            readings = self._write_readings
+            while len(readings) > 1 and readings[1][0] <= cutoff:
+                readings.popleft()
+            since = readings[0][1] if readings else 0
+            return self._total_writes() - since
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current counters."""
+        writes_per_minute = self.writes_per_minute()
+        with self._lock:
+            return {
+                "hosts": self.hosts,
+                "records": sum(self.records_by_type.values()),
+                "records_by_type": dict(self.records_by_type),
+                "cname_chain_depths": {
+                    str(k): v for k, v in sorted(self.cname_chain_depths.items())
+                },
+                "writes_per_minute": writes_per_minute,
+                "updated_at": self.updated_at,
+                "reconciled_at": self.reconciled_at,
+            }
+
+    def sample(self, now: Optional[datetime] = None) -> None:
+        """Append a minute sample, rolling up an hourly one every 60 samples."""
+        with self._lock:
+            total = self._total_writes()
+            writes = total - (self._sampled_writes or 0)
+            self._sampled_writes = total
+            self.minutes.append({
+                "timestamp": now or datetime.utcnow(),
+                "hosts": self.hosts,
+                "records": sum(self.records_by_type.values()),
+                "records_by_type": dict(self.records_by_type),
+                "writes": writes,
+            })
+        self._samples_since_rollup += 1
+        if self._samples_since_rollup == MINUTE_SAMPLES:
+            self._samples_since_rollup = 0
+            last_hour = list(self.minutes)
+            self.hours.append(
+                {**last_hour[-1], "writes": sum(s["writes"] for s in last_hour)}
+            )
+
+    def history(self, resolution: str = "minute") -> List[Dict[str, Any]]:
+        """Samples at ``minute`` or ``hour`` resolution, oldest first."""
+        return list(self.minutes if resolution == "minute" else self.hours)
+
+    def load(self, session: Session, max_age_seconds: float) -> None:
+        """Install the shared counts before this worker serves any stats.
+
+        The counts are recounted first if there are none yet or they are
+        older than ``max_age_seconds``.
+        """
+        row = session.get(StatsCounts, STATS_COUNTS_ID)
+        stale_before = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+        if row is None or row.counted_at < stale_before:
+            self.reconcile(session)
+        self.refresh(session)
+
+    def refresh(self, session: Session) -> None:
+        """Add this worker's writes to the shared total and read the shared row."""
+        with self._lock:
+            writes, self._unflushed_writes = self._unflushed_writes, 0
+            self._flushing_writes += writes
+        try:
+            flushed = session.execute(
+                update(StatsCounts)
+                .where(StatsCounts.id == STATS_COUNTS_ID)
+                .values(writes=StatsCounts.writes + writes)
+            ).rowcount
+            session.commit()
+            row = session.get(StatsCounts, STATS_COUNTS_ID, populate_existing=True)
+        except Exception:
+            self._unflush(writes)
+            raise
+        if row is None or not flushed:
+            # Nothing to add the writes to until the first recount
+            self._unflush(writes)
+            return
+        with self._lock:
+            self._flushing_writes -= writes
+            self._shared_writes = row.writes
+            self._write_readings.append((time.monotonic(), self._total_writes()))
+            if self._sampled_writes is None:
+                self._sampled_writes = self._total_writes()
+            self._install(
+                row.hosts,
+                row.records_by_type,
+                {int(k): v for k, v in row.cname_chain_depths.items()},
+                row.counted_at,
+            )
+
+    def reconcile(self, session: Session) -> Dict[str, int]:
+        """Recount hosts, records and CNAME chain depths into the shared row.
+
+        Returns:
+            Drift per counter that was corrected: counted minus what this
+            worker served when the count started
+        """
+        counted_at = datetime.utcnow()
+        hosts = session.execute(select(func.count()).select_from(Host)).scalar()
+        by_type = _zero_counts()
+        for record_type, count in session.execute(
+            select(Record.type, func.count()).group_by(Record.type)
+        ):
+            by_type[RecordType(record_type).value] = count
+        depths = self._chain_depths(session)
+        self._store(session, hosts, by_type, depths, counted_at)
+
+        with self._lock:
+            served_hosts, served_records = self._served_at(counted_at)
+            drift = {"hosts": hosts - served_hosts}
+            drift.update(
+                {t: n - served_records.get(t, 0) for t, n in by_type.items()}
+            )
+            self._install(hosts, by_type, depths, counted_at)
+        return {name: delta for name, delta in drift.items() if delta}
+
+    def _total_writes(self) -> int:
+        return self._shared_writes + self._flushing_writes + self._unflushed_writes
+
+    def _unflush(self, writes: int) -> None:
+        with self._lock:
+            self._flushing_writes -= writes
+            self._unflushed_writes += writes
+
+    def _served_at(self, moment: datetime) -> Tuple[int, Dict[str, int]]:
+        """Counts this worker served at ``moment``, from its base and deltas."""
+        hosts, records = self._base_hosts, dict(self._base_records)
+        for committed_at, delta_hosts, delta_records in self._deltas:
+            if committed_at > moment:
+                break
+            hosts += delta_hosts
+            _add_counts(records, delta_records)
+        return hosts, records
+
+    def _install(
+        self,
+        hosts: int,
+        by_type: Dict[str, int],
+        depths: Dict[int, int],
+        counted_at: datetime,
+    ) -> None:
+        """Serve counts taken at ``counted_at`` plus the deltas committed since."""
+        if self.reconciled_at is not None and counted_at < self.reconciled_at:
+            return
+        while self._deltas and self._deltas[0][0] <= counted_at:
+            self._deltas.popleft()
+        self._base_hosts = hosts
+        self._base_records = {**_zero_counts(), **by_type}
+        self.cname_chain_depths = depths
+        self.reconciled_at = counted_at
+        self.hosts = hosts
+        self.records_by_type = dict(self._base_records)
+        for _, delta_hosts, delta_records in self._deltas:
+            self.hosts += delta_hosts
+            _add_counts(self.records_by_type, delta_records)
+
+    @staticmethod
+    def _store(
+        session: Session,
+        hosts: int,
+        by_type: Dict[str, int],
+        depths: Dict[int, int],
+        counted_at: datetime,
+    ) -> None:
+        """Write counts to the shared row, creating it on the first recount."""
+        values = {
+            "hosts": hosts,
+            "records_by_type": by_type,
+            "cname_chain_depths": {str(k): v for k, v in depths.items()},
+            "counted_at": counted_at,
+        }
+        statement = (
+            update(StatsCounts)
+            .where(StatsCounts.id == STATS_COUNTS_ID)
+            .values(**values)
+        )
+        if not session.execute(statement).rowcount:
+            session.add(StatsCounts(**values))
+            try:
+                session.commit()
+                return
+            except IntegrityError:
+                # Another worker created the row first
+                session.rollback()
+                session.execute(statement)
+        session.commit()
+
+    @staticmethod
+    def _chain_depths(session: Session) -> Dict[int, int]:
+        """Number of CNAME hosts per chain depth, up to ``MAX_CNAME_CHAIN_LENGTH``."""
+        host, record = Host.__table__, Record.__table__
+        chain = (
+            select(
+                host.c.canonical_hostname.label("start"),
+                record.c.value.label("node"),
+                literal(1).label("depth"),
+            )
+            .select_from(host.join(record, record.c.host_id == host.c.id))
+            .where(record.c.type == RecordType.CNAME)
+            .cte("chain", recursive=True)
+        )
+        next_host = host.alias("next_host")
+        next_record = record.alias("next_record")
+        chain = chain.union_all(
+            select(chain.c.start, next_record.c.value, chain.c.depth + 1)
+            .select_from(
+                chain.join(
+                    next_host, next_host.c.canonical_hostname == chain.c.node
+                ).join(next_record, next_record.c.host_id == next_host.c.id)
+            )
+            .where(next_record.c.type == RecordType.CNAME)
+            .where(chain.c.depth < MAX_CNAME_CHAIN_LENGTH)
+        )
+        per_host = (
+            select(func.max(chain.c.depth).label("depth"))
+            .group_by(chain.c.start)
+            .subquery()
+        )
+        return dict(
+            CounterDict(depth for (depth,) in session.execute(select(per_host.c.depth)))
+        )
+
+
+def _zero_counts() -> Dict[str, int]:
+    return {t.value: 0 for t in RecordType}
+
+
+def _add_counts(counts: Dict[str, int], deltas: Dict[str, int]) -> None:
+    for record_type, delta in deltas.items():
+        counts[record_type] = counts.get(record_type, 0) + delta
+
+
+def type_counts(types: Iterable[RecordType], sign: int = 1) -> Dict[str, int]:
+    """Count record types, e.g. ``type_counts(deleted, sign=-1)`` for ``track``."""
+    return {RecordType(t).value: sign * n for t, n in CounterDict(types).items()}
+
+
+def track(
+    session: Session,
+    hosts: int = 0,
+    records: Optional[Dict[str, int]] = None,
+    writes: int = 1,
+) -> None:
+    """Queue a change to the counters, applied when ``session`` commits.
+
+    Args:
+        session: Session the write happens in
+        hosts: Change in the number of hosts
+        records: Change in the number of records, by type value
+        writes: Number of write operations
+    """
+    pending = session.info.setdefault(PENDING_KEY, [])
+    pending.append((hosts, records or {}, writes))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session: Session) -> None:
+    for hosts, records, writes in session.info.pop(PENDING_KEY, ()):
+        dns_stats.apply(hosts=hosts, records=records, writes=writes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
+
+
+# Global statistics instance
+dns_stats = DNSStats()
@@ -1,32 +1,118 @@
-"""Background tasks for the DNS API."""
+"""Background tasks for the DNS API.
+
+Jobs are plain synchronous functions run on a bounded thread pool with
+their own database pool (``get_task_session``), so a slow job never blocks
+the event loop or takes connections from request handlers. Each run starts
+after a random jitter of up to ``TASK_JITTER_RATIO`` of its interval, so
+workers started together do not hit the database together.
+
+Jobs marked ``leader_only`` run only on the worker holding the scheduler
+lease (see ``app.core.leader``). Record expiry runs on every worker for
+the deadlines set there, and only the lease holder reloads deadlines from
+the database. The statistics recount is leader-only too: it fills the row
+all workers read, and every worker refreshes its copy of that row. Zone
+change replay runs on every worker, because each keeps its own zone index.
+"""
 import asyncio
-from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from app.core.database import get_task_session
+from app.core.expiry import record_expiry
+from app.core.idempotency import idempotency_store
+from app.core.leader import LeaderLease
+from app.core.metrics import registry
+from app.core.ratelimit import rate_limiter
+from app.core.settings import settings
+from app.core.snapshot import zone_index
+from app.core.stats import dns_stats
+
+logger = logging.getLogger(__name__)
 
-from sqlmodel import Session, select
 
-from app.core.database import get_session
-from app.models import Record
+@dataclass
+class Job:
+    """A periodic job and the outcome of its last run."""
+    name: str
+    func: Callable[[], Any]
+    interval: float
+    leader_only: bool = False
+    runs: int = 0
+    last_started: Optional[datetime] = None
+    last_duration: Optional[float] = None
+    last_status: Optional[str] = None
+    last_error: Optional[str] = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Job settings and last run, for the admin API."""
+        return {
+            "name": self.name,
+            "interval_seconds": self.interval,
+            "leader_only": self.leader_only,
+            "runs": self.runs,
+            "last_started": self.last_started,
+            "last_duration_seconds": self.last_duration,
+            "last_status": self.last_status,
+            "last_error": self.last_error,
+        }
 
 
 class TaskScheduler:
     """Background task scheduler for periodic tasks."""
-    
-    def __init__(self):
+
+    def __init__(
+        self,
+        lease: Optional[LeaderLease] = None,
+        max_workers: int = settings.TASK_EXECUTOR_WORKERS,
+        jitter_ratio: float = settings.TASK_JITTER_RATIO,
+    ):
+        self.lease = lease or LeaderLease()
+        self.max_workers = max_workers
+        self.jitter_ratio = jitter_ratio
+        self.jobs: Dict[str, Job] = {}
         self.tasks: Dict[str, asyncio.Task[Any]] = {}
         self.running = False
-    
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @property
+    def is_leader(self) -> bool:
+        """Whether this worker currently holds the scheduler lease."""
+        return self.lease.is_leader
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], Any],
+        interval: float,
+        leader_only: bool = False,
+    ) -> Job:
+        """Register a synchronous job to run every ``interval`` seconds."""
+        job = self.jobs[name] = Job(name, func, interval, leader_only)
+        return job
+
     async def start(self) -> None:
         """Start all scheduled tasks."""
         if self.running:
             return
-            
+
         self.running = True
-        self.tasks["expire_records"] = asyncio.create_task(self._expire_records_worker())
-        self.tasks["update_stats"] = asyncio.create_task(self._update_stats_worker())
-    
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="task"
+        )
+        record_expiry.session_factory = get_task_session
+        record_expiry.executor = self.executor
+        self.tasks["lease"] = asyncio.create_task(self._lease_worker())
+        for job in self.jobs.values():
+            self.tasks[job.name] = asyncio.create_task(self._job_worker(job))
+
     async def stop(self) -> None:
-        """Stop all scheduled tasks."""
+        """Stop all scheduled tasks and give up the lease."""
         self.running = False
         for task in self.tasks.values():
             task.cancel()
@@ -34,59 +120,123 @@ class TaskScheduler:
                 await task
             except asyncio.CancelledError:
                 pass
-    
-    async def _expire_records_worker(self) -> None:
-        """Background worker to clean up expired records."""
-        while self.running:
+        self.tasks.clear()
+        if self.executor is None:
+            return
+        try:
+            await self._offload(self.lease.release)
+        except Exception:
+            logger.exception("Error releasing scheduler lease")
+        self.executor.shutdown(wait=True)
+        self.executor = None
+
+    async def run_job(self, name: str) -> Dict[str, Any]:
+        """Run a job now, waiting for a run already in progress to finish first.
+
+        Args:
+            name: Registered job name
+
+        Returns:
+            The job's snapshot after the run
+
+        Raises:
+            KeyError: If no job is registered under ``name``
+        """
+        job = self.jobs[name]
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            job.last_started = datetime.utcnow()
+            started = time.perf_counter()
             try:
-                await self._expire_records()
+                await self._offload(job.func)
+                job.last_status, job.last_error = "success", None
             except Exception as e:
-                print(f"Error in expire_records_worker: {e}")
-            
-            # Run every hour
-            await asyncio.sleep(3600)
-    
-    async def _update_stats_worker(self) -> None:
-        """Background worker to update statistics."""
+                job.last_status, job.last_error = "error", str(e)
+                logger.exception("Error in %s", name)
+            job.last_duration = time.perf_counter() - started
+            job.runs += 1
+        registry.histogram(
+            "task_run_seconds", "Duration of background job runs", job=name
+        ).observe(job.last_duration)
+        registry.counter(
+            "task_runs_total", "Background job runs", job=name, status=job.last_status
+        ).inc()
+        return job.snapshot()
+
+    async def _offload(self, func: Callable[[], Any]) -> Any:
+        """Run ``func`` on the job executor (or the loop's default one)."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func)
+
+    def _jitter(self, interval: float) -> float:
+        return random.uniform(0, interval * self.jitter_ratio)
+
+    async def _job_worker(self, job: Job) -> None:
+        """Run ``job`` every interval, skipping runs while another worker leads."""
+        await asyncio.sleep(self._jitter(job.interval))
         while self.running:
-            try:
-                await self._update_stats()
-            except Exception as e:
-                print(f"Error in update_stats_worker: {e}")
-            
-            # Run every 5 minutes
-            await asyncio.sleep(300)
-    
-    async def _expire_records(self) -> None:
-        """Expire records that are past their TTL."""
-        with get_session() as session:
-            # Get all records with TTL that have expired
-            expired = session.exec(
-                select(Record)
-                .where(Record.updated_at < datetime.utcnow() - timedelta(seconds=Record.ttl))
-            ).all()
-            
-            if expired:
-                # In a real implementation, we might archive or delete expired records
-                print(f"Found {len(expired)} expired records")
-    
-    async def _update_stats(self) -> None:
-        """Update statistics about DNS records."""
-        with get_session() as session:
-            # Example: Count records by type
-            record_types = session.exec(
-                select(Record.type, func.count(Record.id))
-                .group_by(Record.type)
-            ).all()
-            
-            stats = {
-                "record_counts": {r[0]: r[1] for r in record_types},
-                "timestamp": datetime.utcnow().isoformat(),
-            }
-            
-            # In a real implementation, we'd store these stats somewhere
-            print(f"Updated stats: {stats}")
+            if self.is_leader or not job.leader_only:
+                await self.run_job(job.name)
+            await asyncio.sleep(job.interval + self._jitter(job.interval))
+
+    async def _lease_worker(self) -> None:
+        """Renew the scheduler lease and run record expiry, refilling while leading."""
+        expiry = asyncio.create_task(record_expiry.run())
+        try:
+            while self.running:
+                try:
+                    await self._offload(self.lease.try_acquire)
+                except Exception:
+                    self.lease.is_leader = False
+                    logger.exception("Error in lease_worker")
+                record_expiry.lead(self.is_leader)
+
+                # Renew well before the lease runs out
+                await asyncio.sleep(self.lease.ttl.total_seconds() / 3)
+        finally:
+            record_expiry.lead(False)
+            expiry.cancel()
+
+
+def _prune_idempotency_keys() -> None:
+    """Drop expired Idempotency-Key responses."""
+    with get_task_session() as session:
+        idempotency_store.prune(session)
+
+
+def _reconcile_stats() -> None:
+    """Recount the shared statistics from the database."""
+    with get_task_session() as session:
+        drift = dns_stats.reconcile(session)
+    if drift:
+        logger.warning("Corrected stats drift: %s", drift)
+
+
+def _refresh_stats() -> None:
+    """Share this worker's writes and pick up the latest recount."""
+    with get_task_session() as session:
+        dns_stats.refresh(session)
 
 
 # Global task scheduler instance
 task_scheduler = TaskScheduler()
+task_scheduler.add_job(
+    "prune_idempotency_keys", _prune_idempotency_keys, 600, leader_only=True
+)
+task_scheduler.add_job(
+    "reconcile_stats",
+    _reconcile_stats,
+    settings.STATS_RECONCILE_SECONDS,
+    leader_only=True,
+)
+task_scheduler.add_job("refresh_stats", _refresh_stats, settings.STATS_REFRESH_SECONDS)
+task_scheduler.add_job("sample_stats", dns_stats.sample, 60)
+task_scheduler.add_job(
+    "checkpoint_zone", zone_index.checkpoint, settings.ZONE_SNAPSHOT_INTERVAL_SECONDS,
+    leader_only=True,
+)
+task_scheduler.add_job(
+    "replay_zone_changes", zone_index.replay, settings.ZONE_REPLAY_INTERVAL_SECONDS
+)
+task_scheduler.add_job(
+    "sweep_rate_limits", rate_limiter.sweep, settings.RATE_LIMIT_SWEEP_SECONDS
+)
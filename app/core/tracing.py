@@ -0,0 +1,341 @@
+"""Lightweight request tracing with W3C ``traceparent`` propagation.
+
+``TracingMiddleware`` starts a root span for every sampled HTTP request.
+An incoming ``traceparent`` header continues the caller's trace. Its
+sampled flag is a hint: it is honoured for up to
+``TRACING_PARENT_SAMPLES_PER_SECOND`` requests a second (or always, with
+``TRACING_TRUST_PARENT``), so outside callers cannot have every request
+traced. Other requests are sampled at ``TRACING_SAMPLE_RATE``. Code
+that wants a span for a phase of its work wraps it in
+``tracer.span(name, **attributes)``, and cursor execution hooks add a
+span for every database statement.
+
+The span being recorded is held in a context variable, so spans nest and
+follow a request into the thread pool. When the current request is not
+sampled there is no current span, and ``tracer.span`` returns a shared
+no-op context manager after a single context variable lookup.
+
+Finished spans go to every exporter of the tracer. ``RingBufferExporter``
+keeps the most recent spans in memory for ``/api/admin/traces``, and
+``JsonLinesExporter`` appends one JSON object per span to a local file
+from a background thread.
+"""
+import json
+import logging
+import math
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.ratelimit import Budget, TokenBuckets
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# version-trace_id-parent_id-flags, lower-case hex
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+SAMPLED_FLAG = 0x01
+
+
+@dataclass
+class Span:
+    """One timed operation within a trace."""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    # Wall-clock start, seconds since the epoch
+    start: float = 0.0
+    duration_ms: float = 0.0
+    status: str = "ok"
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    _started: float = field(default=0.0, repr=False)
+
+    def traceparent(self) -> str:
+        """This span as a sampled ``traceparent`` header value for downstream calls."""
+        return f"00-{self.trace_id}-{self.span_id}-{SAMPLED_FLAG:02x}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        del data["_started"]
+        return data
+
+
+class TraceContext(NamedTuple):
+    """Trace ID, parent span ID and sampled flag from a ``traceparent`` header."""
+    trace_id: str
+    parent_id: str
+    sampled: bool
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[TraceContext]:
+    """The trace context in a ``traceparent`` header, or None if absent or invalid."""
+    if not value:
+        return None
+    match = TRACEPARENT_RE.match(value.strip())
+    if match is None:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    # All-zero IDs are invalid per the W3C Trace Context spec
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return TraceContext(trace_id, parent_id, bool(int(flags, 16) & SAMPLED_FLAG))
+
+
+class SpanExporter:
+    """Receives every finished span; subclasses decide where it goes."""
+
+    def export(self, span: Span) -> None:
+        raise NotImplementedError
+
+
+class RingBufferExporter(SpanExporter):
+    """Keep the most recent ``size`` spans in memory."""
+
+    def __init__(self, size: int = settings.TRACING_BUFFER_SIZE):
+        self.spans: deque = deque(maxlen=size)
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def trace(self, trace_id: str) -> List[Span]:
+        """Buffered spans of one trace, in start order."""
+        return sorted(
+            (s for s in self.spans if s.trace_id == trace_id), key=lambda s: s.start
+        )
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+
+class JsonLinesExporter(SpanExporter):
+    """Append every span as one JSON line to a local file.
+
+    Spans are queued and written in batches by a background thread that
+    keeps the file open, so exporting never waits on the disk. When the
+    queue is full new spans are dropped and counted in ``dropped``.
+    """
+
+    def __init__(self, path: str = settings.TRACING_FILE, max_queued: int = 10_000):
+        self.path = path
+        self.dropped = 0
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+
+    def export(self, span: Span) -> None:
+        if self._writer is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """Wait until every queued span has been written."""
+        self._queue.join()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write, name="trace-writer", daemon=True
+                )
+                self._writer.start()
+
+    def _write(self) -> None:
+        f = None
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if f is None:
+                    f = open(self.path, "a", encoding="utf-8")
+                f.write(
+                    "".join(json.dumps(s.to_dict(), default=str) + "\n" for s in batch)
+                )
+                f.flush()
+            except Exception:
+                logger.exception("Error writing %d spans to %s", len(batch), self.path)
+                if f is not None:
+                    f.close()
+                    f = None
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+# Exporters selectable by name in TRACING_EXPORTERS
+EXPORTERS = {
+    "memory": RingBufferExporter,
+    "jsonl": JsonLinesExporter,
+}
+
+# The span being recorded in the current context, if the request is sampled
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+_NOOP = nullcontext()
+
+
+class Tracer:
+    """Start spans and hand finished ones to the exporters."""
+
+    def __init__(
+        self,
+        sample_rate: float = settings.TRACING_SAMPLE_RATE,
+        exporters: Optional[List[SpanExporter]] = None,
+        trust_parent: bool = settings.TRACING_TRUST_PARENT,
+        parent_samples_per_second: float = settings.TRACING_PARENT_SAMPLES_PER_SECOND,
+    ):
+        self.sample_rate = sample_rate
+        self.trust_parent = trust_parent
+        # Allowance for requests traced because their caller asked for it
+        self.parent_budget = (
+            Budget(
+                parent_samples_per_second, max(math.ceil(parent_samples_per_second), 1)
+            )
+            if parent_samples_per_second > 0
+            else None
+        )
+        self._parent_buckets = TokenBuckets(shards=1)
+        self.exporters: List[SpanExporter] = (
+            exporters if exporters is not None
+            else [EXPORTERS[name]() for name in settings.TRACING_EXPORTERS]
+        )
+
+    def add_exporter(self, exporter: SpanExporter) -> None:
+        self.exporters.append(exporter)
+
+    def remove_exporter(self, exporter: SpanExporter) -> None:
+        self.exporters.remove(exporter)
+
+    def exporter(self, kind: type) -> Optional[SpanExporter]:
+        """The first exporter of a given class, if any."""
+        return next((e for e in self.exporters if isinstance(e, kind)), None)
+
+    def should_sample(self, parent: Optional[TraceContext]) -> bool:
+        """Decide whether to trace a request continuing ``parent``, if any.
+
+        A caller's "not sampled" is always followed. Its "sampled" is followed
+        while the per-second allowance lasts, unless the caller is trusted;
+        past that the request is sampled at ``sample_rate`` like any other.
+        """
+        if parent is not None:
+            if not parent.sampled:
+                return False
+            if self.trust_parent:
+                return True
+            if self.parent_budget is not None:
+                if self._parent_buckets.take("parent", self.parent_budget) == 0:
+                    return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def span(self, name: str, **attributes: Any):
+        """Context manager recording a child of the current span.
+
+        Outside a sampled request this is a shared no-op and yields None.
+        """
+        if current_span.get() is None:
+            return _NOOP
+        return self._record(name, None, attributes)
+
+    def root_span(
+        self, name: str, parent: Optional[TraceContext] = None, **attributes: Any
+    ):
+        """Context manager recording the first span of this service in a trace."""
+        return self._record(name, parent, attributes)
+
+    @contextmanager
+    def _record(
+        self, name: str, remote: Optional[TraceContext], attributes: Dict[str, Any]
+    ) -> Iterator[Span]:
+        parent = current_span.get()
+        if parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        elif remote is not None:
+            trace_id, parent_id = remote.trace_id, remote.parent_id
+        else:
+            trace_id, parent_id = secrets.token_hex(16), None
+        span = Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=secrets.token_hex(8),
+            parent_id=parent_id,
+            start=time.time(),
+            attributes=attributes,
+            _started=time.perf_counter(),
+        )
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.attributes["error.type"] = type(e).__name__
+            raise
+        finally:
+            current_span.reset(token)
+            self.end(span)
+
+    def end(self, span: Span) -> None:
+        """Time a span and export it."""
+        span.duration_ms = round((time.perf_counter() - span._started) * 1000, 3)
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception:
+                logger.exception("Error exporting span %s", span.name)
+
+
+# Global tracer instance
+tracer = Tracer()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement_span(conn, cursor, statement, parameters, context, executemany):
+    parent = current_span.get()
+    if parent is None:
+        return
+    span = Span(
+        name="db.statement",
+        trace_id=parent.trace_id,
+        span_id=secrets.token_hex(8),
+        parent_id=parent.span_id,
+        start=time.time(),
+        attributes={"db.system": conn.dialect.name, "db.statement": statement[:500]},
+        _started=time.perf_counter(),
+    )
+    conn.info.setdefault("statement_spans", []).append(span)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_statement_span(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("statement_spans")
+    if spans:
+        tracer.end(spans.pop())
+
+
+@event.listens_for(Engine, "handle_error")
+def _fail_statement_span(exception_context):
+    conn = exception_context.connection
+    spans = conn.info.get("statement_spans") if conn is not None else None
+    if spans:
+        span = spans.pop()
+        span.status = "error"
+        error = exception_context.original_exception
+        span.attributes["error.type"] = type(error).__name__
+        tracer.end(span)
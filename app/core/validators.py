@@ -1,15 +1,34 @@
 """DNS record validation utilities."""
 import ipaddress
 import re
-from typing import Optional, Set
+from typing import Iterable, List, NamedTuple, Optional, Pattern, Sequence, Set, Union
 
-from sqlmodel import Session, select
+from sqlalchemy.engine import Connection
+from sqlmodel import Session
 
-from app.models import Host, Record, RecordType
+from app.core.statements import CNAMES_BY_HOSTNAME, RECORDS_BY_HOST_ID
+from app.models import RecordType, canonicalize_hostname
 
 # Constants
 MAX_CNAME_CHAIN_LENGTH = 8
 HOSTNAME_PATTERN = r'^([a-zA-Z0-9]|[a-zA-Z0-9][a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])(\.([a-zA-Z0-9]|[a-zA-Z0-9][a-zA-Z0-9\-]{0,61}[a-zA-Z0-9]))*$'
+MAX_HOSTNAME_LENGTH = 253
+HOSTNAME_RE = re.compile(HOSTNAME_PATTERN)
+
+# Line-anchored patterns for the batch validators, which scan many
+# newline-separated values with one regex call. Both accept exactly what
+# validate_hostname and ipaddress.IPv4Address accept: ASCII only, no
+# leading zeros in octets.
+_LABEL = r'[a-zA-Z0-9](?:[a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?'
+_OCTET = r'(?:25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])'
+HOSTNAME_LINES_RE = re.compile(rf'^{_LABEL}(?:\.{_LABEL})*$', re.MULTILINE)
+IPV4_LINES_RE = re.compile(rf'^{_OCTET}(?:\.{_OCTET}){{3}}$', re.MULTILINE)
+
+
+class BatchValidation(NamedTuple):
+    """Outcome of validating a column of values, row by row."""
+    valid: List[bool]
+    errors: List[Optional[str]]
 
 
 def validate_hostname(hostname: str) -> bool:
@@ -21,9 +40,9 @@ def validate_hostname(hostname: str) -> bool:
     Returns:
         bool: True if valid, False otherwise
     """
-    if not hostname or len(hostname) > 253:
+    if not hostname or len(hostname) > MAX_HOSTNAME_LENGTH:
         return False
-    return bool(re.fullmatch(HOSTNAME_PATTERN, hostname))
+    return bool(HOSTNAME_RE.fullmatch(hostname))
 
 
 def validate_ipv4(ip: str) -> bool:
@@ -62,8 +81,114 @@ def validate_record_value(record_type: RecordType, value: str) -> bool:
     return True
 
 
+def _matching(pattern: Pattern[str], values: Iterable[str]) -> Set[str]:
+    """The values ``pattern`` matches, found in a single scan over all of them."""
+    return set(pattern.findall("\n".join(v for v in values if "\n" not in v)))
+
+
+def _hostname_error(hostname: object) -> str:
+    if not isinstance(hostname, str) or not hostname:
+        return "hostname is required"
+    if len(hostname) > MAX_HOSTNAME_LENGTH:
+        return f"hostname is longer than {MAX_HOSTNAME_LENGTH} characters"
+    return "not a valid hostname"
+
+
+def validate_hostnames(hostnames: Sequence[object]) -> BatchValidation:
+    """Validate a column of hostnames like ``validate_hostname``.
+    
+    Each distinct hostname is checked once, and all of them with one regex
+    scan, which pays off when the column repeats values.
+    
+    Args:
+        hostnames: Hostnames to validate; non-strings are invalid
+        
+    Returns:
+        BatchValidation with a validity flag and an error reason per row
+    """
+    try:
+        distinct = set(hostnames)
+    except TypeError:
+        # An unhashable value; such values are invalid anyway
+        hostnames = [h if isinstance(h, str) else None for h in hostnames]
+        distinct = set(hostnames)
+    valid = _matching(
+        HOSTNAME_LINES_RE,
+        (h for h in distinct if isinstance(h, str) and len(h) <= MAX_HOSTNAME_LENGTH),
+    )
+    errors = [None if h in valid else _hostname_error(h) for h in hostnames]
+    return BatchValidation([e is None for e in errors], errors)
+
+
+def validate_record_values(
+    record_types: Sequence[object], values: Sequence[object]
+) -> BatchValidation:
+    """Validate columns of record types and values like ``validate_record_value``.
+    
+    Each distinct value is checked once, and all of them with one regex scan
+    per kind of check. Rows are then resolved with two dictionary lookups.
+    
+    Args:
+        record_types: ``RecordType`` members or their string values
+        values: Record values; non-strings are invalid
+        
+    Returns:
+        BatchValidation with a validity flag and an error reason per row
+        
+    Raises:
+        ValueError: If the columns differ in length
+    """
+    if len(record_types) != len(values):
+        raise ValueError("record_types and values must have the same length")
+    try:
+        distinct = set(values)
+    except TypeError:
+        # An unhashable value; such values are invalid anyway
+        values = [v if isinstance(v, str) else None for v in values]
+        distinct = set(values)
+    
+    strings = [v for v in distinct if isinstance(v, str) and v]
+    valid_ipv4 = _matching(IPV4_LINES_RE, strings)
+    valid_names = _matching(
+        HOSTNAME_LINES_RE, (v for v in strings if len(v) <= MAX_HOSTNAME_LENGTH)
+    )
+    missing = {
+        v: "value is required" for v in distinct if not (isinstance(v, str) and v)
+    }
+    ipv4_errors = {
+        v: None if v in valid_ipv4 else "not a valid IPv4 address" for v in strings
+    }
+    name_errors = {
+        v: None if v in valid_names else "not a valid hostname" for v in strings
+    }
+    ipv4_errors.update(missing)
+    name_errors.update(missing)
+    tables = {
+        RecordType.A.value: ipv4_errors,
+        RecordType.CNAME.value: name_errors,
+        RecordType.MX.value: name_errors,
+    }
+    
+    try:
+        errors = [
+            table[v] if table is not None else "unknown record type"
+            for table, v in zip(map(tables.get, record_types), values)
+        ]
+    except TypeError:
+        # An unhashable record type
+        errors = [
+            (
+                tables[t][v]
+                if isinstance(t, str) and t in tables
+                else "unknown record type"
+            )
+            for t, v in zip(record_types, values)
+        ]
+    return BatchValidation([e is None for e in errors], errors)
+
+
 def validate_no_conflicting_records(
-    session: Session, 
+    session: Union[Session, Connection], 
     host_id: int, 
     record_type: RecordType,
     record_value: str,
@@ -72,7 +197,7 @@ def validate_no_conflicting_records(
     """Check for conflicting records (e.g., CNAME with other records or duplicates).
     
     Args:
-        session: Database session
+        session: Database session or connection
         host_id: ID of the host
         record_type: Type of the record being added/updated
         record_value: Value of the record being added/updated
@@ -82,11 +207,10 @@ def validate_no_conflicting_records(
         bool: True if no conflicts, False otherwise
     """
     # Get all records for this host
-    stmt = select(Record).where(Record.host_id == host_id)
-    if record_id is not None:
-        stmt = stmt.where(Record.id != record_id)
-    
-    existing_records = session.exec(stmt).all()
+    existing_records = [
+        r for r in session.execute(RECORDS_BY_HOST_ID, {"host_id": host_id})
+        if r.id != record_id
+    ]
     
     # Check for duplicate record (same type and value)
     if any(r.type == record_type and r.value == record_value for r in existing_records):
@@ -105,16 +229,16 @@ def validate_no_conflicting_records(
 
 
 def detect_cname_chain_loop(
-    session: Session, 
+    session: Union[Session, Connection], 
     start_hostname: str, 
     visited: Optional[Set[str]] = None
 ) -> bool:
     """Detect if following CNAMEs creates a loop.
     
     Args:
-        session: Database session
+        session: Database session or connection
         start_hostname: Hostname to start checking from
-        visited: Set of already visited hostnames (used for recursion)
+        visited: Set of already visited canonical hostnames (used for recursion)
         
     Returns:
         bool: True if a loop is detected, False otherwise
@@ -122,6 +246,7 @@ def detect_cname_chain_loop(
     if visited is None:
         visited = set()
         
+    start_hostname = canonicalize_hostname(start_hostname)
     if start_hostname in visited:
         return True
         
@@ -130,15 +255,9 @@ def detect_cname_chain_loop(
         
     visited.add(start_hostname)
     
-    # Get all CNAME records for this hostname
-    host = session.exec(select(Host).where(Host.hostname == start_hostname)).first()
-    if not host:
-        return False
-        
-    cname_records = session.exec(
-        select(Record)
-        .where(Record.host_id == host.id)
-        .where(Record.type == RecordType.CNAME)
+    # Get all CNAME records for this hostname (none if the host doesn't exist)
+    cname_records = session.execute(
+        CNAMES_BY_HOSTNAME, {"hostname": start_hostname}
     ).all()
     
     for record in cname_records:
@@ -1,25 +1,40 @@
 import asyncio
+import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse
 from sqlmodel import Session, text
 
-from app.core import init_db, get_db_session, tasks
-from app.api import dns
-from app.core.settings import settings
-from app.core.exceptions import (
-    setup_exception_handlers,
-    DNSBaseError,
-    ValidationError,
-    NotFoundError,
-    ConflictError,
-    DNSError,
-    CNAMELoopError,
-    RecordValidationError,
-    HostnameValidationError,
-    RecordConflictError
+from app.api import admin, dns, stats
+from app.core.database import get_db_session, get_session, init_db
+from app.core.exceptions import setup_exception_handlers
+from app.core.metrics import registry, render_prometheus
+from app.core.middleware import (
+    MetricsMiddleware,
+    ProfilingMiddleware,
+    RateLimitMiddleware,
+    RecentWriteCookieMiddleware,
+    TracingMiddleware,
 )
+from app.core.openapi import install_openapi_cache
+from app.core.pool import pool_status
+from app.core.settings import settings
+from app.core.snapshot import zone_index
+from app.core.stats import dns_stats
+from app.core.tasks import task_scheduler
+
+logger = logging.getLogger(__name__)
+
+async def warm_zone_index():
+    """Map the zone snapshot and catch up on changes, off the event loop.
+
+    Until this finishes the index holds nothing and lookups go to the database.
+    """
+    try:
+        await asyncio.to_thread(zone_index.warm)
+    except Exception:
+        logger.exception("Error warming zone index")
 
 # Lifespan function for FastAPI
 @asynccontextmanager
@@ -27,13 +42,21 @@ async def lifespan(app: FastAPI):
     # Initialize database on startup
     init_db()
     
+    # Serve statistics from the shared counts from the first request on
+    with get_session() as session:
+        dns_stats.load(session, settings.STATS_RECONCILE_SECONDS)
+    
+    # Writing a first snapshot can take a while; serve requests meanwhile
+    warming = asyncio.create_task(warm_zone_index())
+    
     # Start background tasks
-    await tasks.task_scheduler.start()
+    await task_scheduler.start()
     
     yield
     
     # Clean up on shutdown
-    await tasks.task_scheduler.stop()
+    await task_scheduler.stop()
+    await warming
 
 # Create FastAPI app with lifespan
 app = FastAPI(
@@ -48,6 +71,9 @@ app = FastAPI(
 # Setup exception handlers
 setup_exception_handlers(app)
 
+# Serve /openapi.json from the prebuilt cache
+install_openapi_cache(app)
+
 # Set up CORS
 app.add_middleware(
     CORSMiddleware,
@@ -57,8 +83,25 @@ app.add_middleware(
     allow_headers=settings.CORS_HEADERS,
 )
 
+# Route a client's reads to the primary right after it writes
+app.add_middleware(RecentWriteCookieMiddleware)
+
+# Opt-in profiling of single requests (PROFILING_ENABLED + X-Profile-Token)
+app.add_middleware(ProfilingMiddleware)
+
+# Root span per sampled request, continuing the caller's traceparent
+app.add_middleware(TracingMiddleware)
+
+# Per-client token buckets; refused requests skip everything inside
+app.add_middleware(RateLimitMiddleware)
+
+# Per-route latency, size and database metrics; outermost, so it times the rest
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(dns.router, prefix="/api")
+app.include_router(stats.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
 
 # Health check endpoint
 @app.get("/health")
@@ -66,6 +109,15 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """All metrics in the Prometheus text exposition format."""
+    return PlainTextResponse(
+        render_prometheus(registry),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
 # Root endpoint with API information
 @app.get("/")
 async def root():
@@ -80,7 +132,7 @@ async def root():
 # Example of a protected endpoint that uses the database
 @app.get("/status")
 async def get_status(session: Session = Depends(get_db_session)):
-    """Get application status with database connectivity check."""
+    """Get application status with database connectivity and pool statistics."""
     try:
         # Simple query to check database connectivity
         result = session.execute(text("SELECT 1"))
@@ -91,5 +143,7 @@ async def get_status(session: Session = Depends(get_db_session)):
     return {
         "status": "running",
         "database": db_status,
+        "pools": pool_status(),
+        "zone_index": zone_index.status(),
         "environment": settings.ENVIRONMENT
     }
@@ -0,0 +1,55 @@
+"""Alembic environment for the DNS API schema.
+
+``app.core.migrations.migrate`` passes the connection to run on in
+``config.attributes``; the ``alembic`` command runs against the
+application database instead.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlmodel import SQLModel
+
+from app.models import BaseModel  # noqa: F401
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = SQLModel.metadata
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL without connecting to a database."""
+    from app.core.settings import settings
+
+    context.configure(
+        url=settings.SQLALCHEMY_DATABASE_URI,
+        target_metadata=target_metadata,
+        literal_binds=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run the migrations on the given connection or the application database."""
+    connection = config.attributes.get("connection")
+    if connection is None:
+        from app.core.database import engine
+
+        with engine.begin() as connection:
+            _run_migrations(connection)
+    else:
+        _run_migrations(connection)
+
+
+def _run_migrations(connection) -> None:
+    context.configure(connection=connection, target_metadata=target_metadata)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
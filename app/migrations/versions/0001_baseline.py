@@ -0,0 +1,68 @@
+"""Hosts and records as created before migrations were added
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 23:55:25
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "host",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            nullable=False,
+            server_default="CURRENT_TIMESTAMP",
+        ),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("hostname", sa.String(length=253), nullable=False),
+        sa.Column("description", sa.String(length=255), nullable=True),
+        sa.UniqueConstraint("hostname", name="uq_host_hostname"),
+    )
+    op.create_index("ix_host_created_at", "host", ["created_at"])
+    op.create_index("ix_host_hostname", "host", ["hostname"])
+
+    op.create_table(
+        "record",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            nullable=False,
+            server_default="CURRENT_TIMESTAMP",
+        ),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column(
+            "type", sa.Enum("A", "CNAME", "MX", name="recordtype"), nullable=False
+        ),
+        sa.Column("value", sa.String(length=1000), nullable=False),
+        sa.Column("ttl", sa.Integer(), nullable=False),
+        sa.Column("priority", sa.Integer(), nullable=True),
+        sa.Column("host_id", sa.Integer(), sa.ForeignKey("host.id"), nullable=False),
+        sa.CheckConstraint(
+            "(type != 'MX' AND priority IS NULL) "
+            "OR (type = 'MX' AND priority IS NOT NULL)",
+            name="check_mx_priority",
+        ),
+    )
+    op.create_index("ix_record_created_at", "record", ["created_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("record")
+    op.drop_table("host")
@@ -0,0 +1,34 @@
+"""Row versions for If-Match on hosts and records
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 23:55:25
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows start at version 1, like new ones
+    for table in ("host", "record"):
+        op.add_column(
+            table,
+            sa.Column("version", sa.Integer(), nullable=False, server_default="1"),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ("host", "record"):
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column("version")
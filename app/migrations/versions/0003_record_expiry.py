@@ -0,0 +1,32 @@
+"""Record expiry times, and an index on record host IDs
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:14:20
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("record", sa.Column("expires_at", sa.DateTime(), nullable=True))
+    op.create_index("ix_record_expires_at", "record", ["expires_at"])
+    op.create_index("ix_record_host_id", "record", ["host_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_record_host_id", table_name="record")
+    op.drop_index("ix_record_expires_at", table_name="record")
+    with op.batch_alter_table("record") as batch:
+        batch.drop_column("expires_at")
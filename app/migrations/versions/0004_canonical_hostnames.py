@@ -0,0 +1,82 @@
+"""Canonical hostnames with a unique index
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:43:31
+
+"""
+from collections import defaultdict
+from typing import Dict, List, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.host import canonicalize_hostname
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    hosts = bind.execute(sa.text("SELECT id, hostname FROM host")).all()
+    spellings: Dict[str, List[str]] = defaultdict(list)
+    for host in hosts:
+        spellings[canonicalize_hostname(host.hostname)].append(host.hostname)
+    collisions = {name: found for name, found in spellings.items() if len(found) > 1}
+    # Checked before any DDL, which SQLite commits as it goes
+    if collisions:
+        details = "; ".join(
+            f"{name}: {', '.join(sorted(found))}"
+            for name, found in sorted(collisions.items())
+        )
+        raise RuntimeError(
+            "Cannot add unique canonical hostnames, these hosts collide "
+            f"({details}). Rename or delete all but one host of each group "
+            "and restart."
+        )
+
+    op.add_column(
+        "host", sa.Column("canonical_hostname", sa.String(length=253), nullable=True)
+    )
+    if hosts:
+        bind.execute(
+            sa.text("UPDATE host SET canonical_hostname = :canonical WHERE id = :id"),
+            [
+                {"id": host.id, "canonical": canonicalize_hostname(host.hostname)}
+                for host in hosts
+            ],
+        )
+    op.create_index(
+        "ix_host_canonical_hostname", "host", ["canonical_hostname"], unique=True
+    )
+    op.drop_index("ix_host_hostname", table_name="host")
+    # Databases created from the models rather than migrated lack this one
+    record_indexes = {index["name"] for index in sa.inspect(bind).get_indexes("record")}
+    if "ix_record_host_id" not in record_indexes:
+        op.create_index("ix_record_host_id", "record", ["host_id"])
+    # SQLite would have to rebuild host, which record references, to make the
+    # column NOT NULL or drop the constraint. The ORM always sets the column,
+    # and unique canonical names imply unique hostnames, so both stay there.
+    if bind.dialect.name != "sqlite":
+        op.alter_column(
+            "host",
+            "canonical_hostname",
+            existing_type=sa.String(length=253),
+            nullable=False,
+        )
+        op.drop_constraint("uq_host_hostname", "host", type_="unique")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "sqlite":
+        op.create_unique_constraint("uq_host_hostname", "host", ["hostname"])
+    op.create_index("ix_host_hostname", "host", ["hostname"])
+    op.drop_index("ix_host_canonical_hostname", table_name="host")
+    with op.batch_alter_table("host") as batch:
+        batch.drop_column("canonical_hostname")
@@ -1,7 +1,16 @@
 """SQLModel database models."""
 
 from app.models.base import BaseModel
-from app.models.host import Host, HostCreate, HostRead, HostUpdate
+from app.models.host import (
+    Host,
+    HostCreate,
+    HostRead,
+    HostUpdate,
+    canonicalize_hostname,
+)
+from app.models.id_sequence import IdSequence
+from app.models.idempotency import IdempotencyKey
+from app.models.lease import SchedulerLease
 from app.models.record import (
     Record,
     RecordCreate,
@@ -11,6 +20,9 @@ from app.models.record import (
     ResolveResponse,
     RecordType,
 )
+from app.models.schema_version import SchemaVersion
+from app.models.stats_counts import StatsCounts
+from app.models.zone_change import ZoneChange
 
 __all__ = [
     "BaseModel",
@@ -18,6 +30,8 @@ __all__ = [
     "HostCreate",
     "HostRead",
     "HostUpdate",
+    "IdSequence",
+    "IdempotencyKey",
     "Record",
     "RecordCreate",
     "RecordRead",
@@ -25,4 +39,9 @@ __all__ = [
     "RecordList",
     "ResolveResponse",
     "RecordType",
+    "SchedulerLease",
+    "SchemaVersion",
+    "StatsCounts",
+    "ZoneChange",
+    "canonicalize_hostname",
 ]
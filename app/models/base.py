@@ -19,6 +19,12 @@ class BaseModel(SQLModel):
         default=None,
         sa_column_kwargs={"onupdate": "CURRENT_TIMESTAMP"}
     )
+    version: int = Field(
+        default=1,
+        nullable=False,
+        sa_column_kwargs={"server_default": "1"},
+        description="Row version used for optimistic concurrency (ETag / If-Match)",
+    )
 
     class Config:
         """Pydantic config."""
@@ -3,7 +3,7 @@
 from datetime import datetime
 from typing import List, Optional, TYPE_CHECKING
 
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import event
 from sqlmodel import Field, Relationship, SQLModel
 
 from app.models.base import BaseModel
@@ -11,10 +11,27 @@ from app.models.base import BaseModel
 if TYPE_CHECKING:
     from app.models.record import Record
 
+
+def canonicalize_hostname(hostname: str) -> str:
+    """Canonical form of a hostname, used for lookups and uniqueness.
+    
+    The trailing dot is stripped, internationalized labels are IDNA
+    (punycode) encoded and the result is lower-cased. Hostnames that cannot
+    be IDNA encoded are only lower-cased, so validation still rejects them.
+    """
+    if hostname.endswith("."):
+        hostname = hostname[:-1]
+    if hostname.isascii():
+        return hostname.lower()
+    try:
+        return hostname.encode("idna").decode("ascii").lower()
+    except UnicodeError:
+        return hostname.lower()
+
+
 class HostBase(SQLModel):
     """Base model for Host."""
     hostname: str = Field(
-        index=True,
         nullable=False,
         description="Fully qualified domain name (e.g., example.com)",
         max_length=253,
@@ -28,13 +45,25 @@ class HostBase(SQLModel):
 
 class Host(HostBase, BaseModel, table=True):
     """Database model for DNS Host."""
-    __table_args__ = (
-        UniqueConstraint("hostname", name="uq_host_hostname"),
+    canonical_hostname: str = Field(
+        default=None,
+        nullable=False,
+        unique=True,
+        index=True,
+        max_length=253,
+        description="Hostname as returned by canonicalize_hostname; set on every write",
     )
     
     # Relationships
     records: List["Record"] = Relationship(back_populates="host")
 
+
+@event.listens_for(Host, "before_insert")
+@event.listens_for(Host, "before_update")
+def _set_canonical_hostname(mapper, connection, target: Host) -> None:
+    """Keep the canonical hostname in step with ORM writes of ``hostname``."""
+    target.canonical_hostname = canonicalize_hostname(target.hostname)
+
 class HostCreate(HostBase):
     """Schema for creating a new Host."""
     pass
@@ -44,6 +73,7 @@ class HostRead(HostBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: int
 
 class HostUpdate(SQLModel):
     """Schema for updating a Host."""
@@ -52,3 +82,8 @@ class HostUpdate(SQLModel):
         max_length=253,
         description="New hostname"
     )
+    description: Optional[str] = Field(
+        default=None,
+        max_length=255,
+        description="New description"
+    )
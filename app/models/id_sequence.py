@@ -0,0 +1,23 @@
+"""Per-shard ID allocators for sharded tables."""
+
+from sqlmodel import Field, SQLModel
+
+
+class IdSequence(SQLModel, table=True):
+    """Database model for the next free sequence number of a sharded table.
+
+    Each shard has one row per sharded table. Reserving IDs is a single
+    ``UPDATE ... RETURNING``, so concurrent writers on a shard never get
+    the same ID.
+    """
+    __tablename__ = "id_sequence"
+
+    name: str = Field(
+        primary_key=True,
+        max_length=100,
+        description="Table the sequence hands out IDs for",
+    )
+    next_value: int = Field(
+        nullable=False,
+        description="Next sequence number not handed out yet",
+    )
@@ -0,0 +1,42 @@
+"""Stored responses for Idempotency-Key requests."""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import Field, SQLModel
+
+
+class IdempotencyKey(SQLModel, table=True):
+    """Database model for a stored Idempotency-Key response.
+    
+    A row is inserted with ``status_code`` unset when a request claims the
+    key and completed with the serialized response once the request succeeds.
+    """
+    __tablename__ = "idempotency_key"
+
+    key: str = Field(
+        primary_key=True,
+        max_length=300,
+        description="Endpoint scope and client-supplied key",
+    )
+    request_hash: str = Field(
+        max_length=64,
+        description="SHA-256 of the request payload",
+    )
+    status_code: Optional[int] = Field(
+        default=None,
+        description="Stored response status, NULL while the request is in flight",
+    )
+    response_body: Optional[str] = Field(
+        default=None,
+        description="Stored JSON response body",
+    )
+    created_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        nullable=False,
+        index=True,
+    )
+    expires_at: datetime = Field(
+        nullable=False,
+        index=True,
+    )
@@ -0,0 +1,28 @@
+"""Leases used to elect a single worker for background jobs."""
+
+from datetime import datetime
+
+from sqlmodel import Field, SQLModel
+
+
+class SchedulerLease(SQLModel, table=True):
+    """Database model for a named, time-limited lease.
+    
+    The worker named in ``holder`` owns the lease until ``expires_at`` and
+    must renew it before then; afterwards any worker may take it over.
+    """
+    __tablename__ = "scheduler_lease"
+
+    name: str = Field(
+        primary_key=True,
+        max_length=100,
+        description="Lease name, e.g. 'scheduler'",
+    )
+    holder: str = Field(
+        max_length=255,
+        description="Identity of the worker holding the lease",
+    )
+    expires_at: datetime = Field(
+        nullable=False,
+        description="Time after which the lease may be taken over",
+    )
@@ -1,6 +1,6 @@
 """DNS Record model."""
 
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
 from typing import Optional, TYPE_CHECKING
 
@@ -45,8 +45,14 @@ class RecordBase(SQLModel):
     )
     host_id: int = Field(
         foreign_key="host.id",
+        index=True,
         description="ID of the host this record belongs to",
     )
+    expires_at: Optional[datetime] = Field(
+        default=None,
+        index=True,
+        description="Optional UTC time at which the record is deleted",
+    )
 
     @validator("value")
     def validate_value(cls, v: str, values: dict) -> str:
@@ -65,6 +71,13 @@ class RecordBase(SQLModel):
             return v.lower()
         return v
 
+    @validator("expires_at")
+    def validate_expires_at(cls, v: Optional[datetime]) -> Optional[datetime]:
+        """Store expiry times as naive UTC, like the other timestamps."""
+        if v is not None and v.tzinfo is not None:
+            return v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
     @validator("priority")
     def validate_priority(cls, v: Optional[int], values: dict) -> Optional[int]:
         """Validate priority is provided for MX records."""
@@ -98,6 +111,7 @@ class RecordRead(RecordBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: int
 
 
 class RecordUpdate(SQLModel):
@@ -106,6 +120,7 @@ class RecordUpdate(SQLModel):
     value: Optional[str] = None
     ttl: Optional[int] = None
     priority: Optional[int] = None
+    expires_at: Optional[datetime] = None
 
 
 class RecordList(SQLModel):
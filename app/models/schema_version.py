@@ -0,0 +1,25 @@
+"""Fingerprint of the schema a database was last brought up to date with."""
+
+from datetime import datetime
+
+from sqlmodel import Field, SQLModel
+
+
+class SchemaVersion(SQLModel, table=True):
+    """Database model for the single row recording the applied schema.
+    
+    Startup compares ``fingerprint`` with the fingerprint of the current
+    models and only runs ``create_all`` when they differ.
+    """
+    __tablename__ = "schema_version"
+
+    id: int = Field(default=1, primary_key=True)
+    fingerprint: str = Field(
+        max_length=64,
+        description="SHA-256 of the DDL the models compile to",
+    )
+    applied_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        nullable=False,
+        description="Time the schema was last applied",
+    )
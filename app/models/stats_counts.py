@@ -0,0 +1,41 @@
+"""Shared statistics counters, one row for every worker."""
+
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import JSON, Column
+from sqlmodel import Field, SQLModel
+
+STATS_COUNTS_ID = 1
+
+
+class StatsCounts(SQLModel, table=True):
+    """Database model for the counts behind ``/api/stats``.
+
+    The counts are recounted periodically and stamped with ``counted_at``,
+    taken before the counting queries ran. ``writes`` is a running total
+    that every worker adds its committed writes to.
+    """
+    __tablename__ = "stats_counts"
+
+    id: int = Field(default=STATS_COUNTS_ID, primary_key=True)
+    hosts: int = Field(default=0, nullable=False)
+    records_by_type: Dict[str, int] = Field(
+        default_factory=dict,
+        sa_column=Column(JSON, nullable=False),
+        description="Number of records per type value",
+    )
+    cname_chain_depths: Dict[str, int] = Field(
+        default_factory=dict,
+        sa_column=Column(JSON, nullable=False),
+        description="Number of CNAME hosts per chain depth",
+    )
+    counted_at: datetime = Field(
+        nullable=False,
+        description="Time the counts were taken",
+    )
+    writes: int = Field(
+        default=0,
+        nullable=False,
+        description="Writes committed by all workers since the row was created",
+    )
@@ -0,0 +1,33 @@
+"""Log of changed hosts, used to bring zone snapshots up to date."""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import Field, SQLModel
+
+
+class ZoneChange(SQLModel, table=True):
+    """Database model for one change to a host or its records.
+    
+    Every write adds a row naming the host it touched. ``serial`` increases
+    with every change, so "everything after serial N" is a range scan.
+    """
+    __tablename__ = "zone_change"
+    # Never reuse the serial of a pruned change
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    serial: Optional[int] = Field(
+        default=None,
+        primary_key=True,
+        description="Change sequence number",
+    )
+    host_id: int = Field(
+        index=True,
+        description="ID of the host that was created, changed or deleted",
+    )
+    changed_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        nullable=False,
+        index=True,
+        description="Time the change was made",
+    )
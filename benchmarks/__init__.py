@@ -0,0 +1,4 @@
+"""Performance benchmarks for the Mini DNS API.
+
+Run individual benchmarks as modules, e.g. ``python -m benchmarks.sqlite_profiles``.
+"""
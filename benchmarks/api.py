@@ -0,0 +1,340 @@
+"""Benchmark the API end to end at several zone sizes.
+
+Each zone size runs in its own worker process with a fresh database, so
+every size starts cold and reports its own peak RSS. The worker seeds the
+database with Core bulk inserts, then drives the FastAPI app in-process
+through its ASGI interface, with the lifespan started as under a server.
+Requests are sent one at a time, so latencies are free of queueing.
+
+Each zone has ``--records`` records. Most hosts carry two A records. For
+every hop count in ``--hops`` there are ``CHAINS_PER_DEPTH`` CNAME chains
+of that length ending at a host with one A record, and there is one empty
+host per CNAME to be created. Operations:
+
+* ``resolve_hops_N``: ``GET /api/resolve/{hostname}`` through N CNAMEs
+* ``cname_chain``: ``GET /api/cname-chain/{hostname}`` on the longest chains
+* ``create_record_a``: ``POST /api/records/`` adding an A record
+* ``create_record_cname``: ``POST /api/records/`` adding a CNAME, which
+  also runs CNAME loop detection
+* ``list_records``: ``GET /api/records/?after=N&limit=100`` at random offsets
+
+Usage:
+    python -m benchmarks.api [--sizes 1000,100000,1000000] [--hops 0,1,2,4,8]
+                             [--iterations 2000] [--json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CHAINS_PER_DEPTH = 10
+INSERT_BATCH = 10_000
+WARMUP = 100
+LIST_PAGE = 100
+DOMAIN = "bench.example"
+
+
+def _ip(n: int, first_octet: int = 10) -> str:
+    return f"{first_octet}.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Zone:
+    """Hostnames of a seeded zone, for picking request targets."""
+
+    def __init__(self, records: int, hops: List[int], spare_hosts: int):
+        self.hops = hops
+        self.chain_records = sum((depth + 1) * CHAINS_PER_DEPTH for depth in hops)
+        self.plain_hosts = max((records - self.chain_records) // 2, 1)
+        self.spare_hosts = spare_hosts
+
+    def plain(self, i: int) -> str:
+        return f"host{i}.{DOMAIN}"
+
+    def plain_id(self, i: int) -> int:
+        # Hosts are inserted plain, chains, spares into a fresh database
+        return i + 1
+
+    def chain(self, depth: int, chain: int, hop: int = 0) -> str:
+        """Hostname ``hop`` steps into chain ``chain`` of length ``depth``."""
+        return f"c{depth}-{chain}-{hop}.{DOMAIN}"
+
+    def spare(self, i: int) -> str:
+        return f"spare{i}.{DOMAIN}"
+
+    def spare_id(self, i: int) -> int:
+        return self.plain_hosts + self.chain_records + i + 1
+
+
+def seed(zone: Zone) -> Tuple[int, int]:
+    """Bulk insert the zone; returns the number of hosts and records."""
+    from sqlalchemy import insert
+
+    from app.core.database import create_db_and_tables, engine
+    from app.models import Host, Record, RecordType, canonicalize_hostname
+
+    create_db_and_tables()
+    now = datetime.utcnow()
+    hosts: List[Dict[str, Any]] = []
+    # (host index, type, value) with host index into ``hosts``
+    records: List[Tuple[int, RecordType, str]] = []
+
+    def add_host(hostname: str) -> int:
+        hosts.append({
+            "hostname": hostname,
+            "canonical_hostname": canonicalize_hostname(hostname),
+            "created_at": now,
+            "updated_at": now,
+            "version": 1,
+        })
+        return len(hosts) - 1
+
+    for i in range(zone.plain_hosts):
+        index = add_host(zone.plain(i))
+        records.append((index, RecordType.A, _ip(2 * i)))
+        records.append((index, RecordType.A, _ip(2 * i + 1)))
+    for depth in zone.hops:
+        for chain in range(CHAINS_PER_DEPTH):
+            for hop in range(depth):
+                index = add_host(zone.chain(depth, chain, hop))
+                records.append(
+                    (index, RecordType.CNAME, zone.chain(depth, chain, hop + 1))
+                )
+            index = add_host(zone.chain(depth, chain, depth))
+            records.append((index, RecordType.A, _ip(chain, 192)))
+    for i in range(zone.spare_hosts):
+        add_host(zone.spare(i))
+
+    with engine.begin() as conn:
+        for start in range(0, len(hosts), INSERT_BATCH):
+            conn.execute(insert(Host), hosts[start:start + INSERT_BATCH])
+        # Host IDs follow insertion order in a fresh database
+        rows = [
+            {"host_id": index + 1, "type": record_type, "value": value, "ttl": 300,
+             "created_at": now, "updated_at": now, "version": 1}
+            for index, record_type, value in records
+        ]
+        for start in range(0, len(rows), INSERT_BATCH):
+            conn.execute(insert(Record), rows[start:start + INSERT_BATCH])
+    return len(hosts), len(records)
+
+
+async def call(
+    app, method: str, target: str, body: Optional[Dict[str, Any]] = None
+) -> int:
+    """Send one request to ``app`` through ASGI and return the response status."""
+    path, _, query = target.partition("?")
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/json")],
+        "server": ("bench", 80),
+        "client": ("127.0.0.1", 50000),
+    }
+    sent = False
+    status = 0
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(
+    app,
+    iterations: int,
+    request: Callable[[int], Tuple[str, str, Optional[Dict]]],
+    expected: int,
+) -> Dict[str, Any]:
+    """Time ``iterations`` requests built by ``request(i)`` after a warm-up."""
+    for i in range(WARMUP):
+        await call(app, *request(i))
+    latencies: List[float] = []
+    errors = 0
+    started = time.perf_counter()
+    for i in range(WARMUP, WARMUP + iterations):
+        before = time.perf_counter()
+        status = await call(app, *request(i))
+        latencies.append(time.perf_counter() - before)
+        errors += status != expected
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "ops_per_sec": round(iterations / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+        "errors": errors,
+    }
+
+
+async def run_operations(
+    zone: Zone, iterations: int, records: int
+) -> Dict[str, Dict[str, Any]]:
+    """Benchmark every operation against the seeded zone."""
+    from app.main import app
+
+    rng = random.Random(0)
+
+    def random_host() -> str:
+        return zone.plain(rng.randrange(zone.plain_hosts))
+
+    def resolve(depth: int) -> Callable[[int], Tuple[str, str, None]]:
+        if depth == 0:
+            return lambda i: ("GET", f"/api/resolve/{random_host()}", None)
+        return lambda i: (
+            "GET",
+            f"/api/resolve/{zone.chain(depth, rng.randrange(CHAINS_PER_DEPTH))}",
+            None,
+        )
+
+    def cname_chain(i: int) -> Tuple[str, str, None]:
+        hostname = zone.chain(max(zone.hops), rng.randrange(CHAINS_PER_DEPTH))
+        return "GET", f"/api/cname-chain/{hostname}", None
+
+    def create_a(i: int) -> Tuple[str, str, Dict[str, Any]]:
+        host_id = zone.plain_id(rng.randrange(zone.plain_hosts))
+        body = {"host_id": host_id, "type": "A", "value": _ip(i, 172)}
+        return "POST", "/api/records/", body
+
+    def create_cname(i: int) -> Tuple[str, str, Dict[str, Any]]:
+        body = {"host_id": zone.spare_id(i), "type": "CNAME", "value": random_host()}
+        return "POST", "/api/records/", body
+
+    def list_page(i: int) -> Tuple[str, str, None]:
+        after = rng.randrange(records)
+        return "GET", f"/api/records/?after={after}&limit={LIST_PAGE}", None
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        for depth in zone.hops:
+            results[f"resolve_hops_{depth}"] = await measure(
+                app, iterations, resolve(depth), 200
+            )
+        results["cname_chain"] = await measure(app, iterations, cname_chain, 200)
+        results["create_record_a"] = await measure(app, iterations, create_a, 201)
+        results["create_record_cname"] = await measure(
+            app, iterations, create_cname, 201
+        )
+        results["list_records"] = await measure(app, iterations, list_page, 200)
+    return results
+
+
+def worker(records: int, hops: List[int], iterations: int, output: str) -> None:
+    """Seed and benchmark one zone size in this process, writing JSON to ``output``."""
+    zone = Zone(records, hops, spare_hosts=WARMUP + iterations)
+    started = time.perf_counter()
+    hosts, seeded = seed(zone)
+    seed_seconds = time.perf_counter() - started
+    operations = asyncio.run(run_operations(zone, iterations, seeded))
+    result = {
+        "records": seeded,
+        "hosts": hosts,
+        "seed_seconds": round(seed_seconds, 2),
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "operations": operations,
+    }
+    Path(output).write_text(json.dumps(result))
+
+
+def run_size(records: int, hops: List[int], iterations: int) -> Dict[str, Any]:
+    """Benchmark one zone size in a fresh worker process and working directory."""
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        output = workdir / "result.json"
+        env = {
+            **os.environ,
+            "PYTHONPATH": str(ROOT),
+            "DB_NAME": str(workdir / "bench.db"),
+            "ZONE_SNAPSHOT_PATH": str(workdir / "zone.snapshot"),
+            "OPENAPI_CACHE_PATH": str(workdir / "openapi.cache.json"),
+            # One client drives every request; measure the endpoints, not 429s
+            "RATE_LIMIT_ENABLED": "false",
+        }
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.api", "--worker",
+             "--sizes", str(records), "--hops", ",".join(map(str, hops)),
+             "--iterations", str(iterations), "--output", str(output)],
+            cwd=workdir, env=env, check=True,
+        )
+        return json.loads(output.read_text())
+
+
+def _ints(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=_ints, default=[1000, 100_000, 1_000_000],
+                        help="comma-separated zone sizes in records")
+    parser.add_argument("--hops", type=_ints, default=[0, 1, 2, 4, 8],
+                        help="comma-separated CNAME chain lengths to resolve through")
+    parser.add_argument(
+        "--iterations", type=int, default=2000, help="timed requests per operation"
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="emit machine-readable JSON"
+    )
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        worker(args.sizes[0], args.hops, args.iterations, args.output)
+        return
+
+    sizes = [run_size(records, args.hops, args.iterations) for records in args.sizes]
+    if args.json:
+        print(json.dumps({"iterations": args.iterations, "sizes": sizes}, indent=2))
+        return
+    for size in sizes:
+        print(f"{size['records']} records on {size['hosts']} hosts: "
+              f"seeded in {size['seed_seconds']} s, peak RSS {size['peak_rss_mb']} MB")
+        print(
+            f"  {'operation':<22} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} "
+            f"{'errors':>7}"
+        )
+        for name, op in size["operations"].items():
+            print(f"  {name:<22} {op['ops_per_sec']:>10} {op['p50_ms']:>9} "
+                  f"{op['p99_ms']:>9} {op['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
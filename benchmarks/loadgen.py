@@ -0,0 +1,353 @@
+"""Closed-loop load generator for the DNS API.
+
+``--concurrency`` workers each send a request, wait for its response and
+immediately send the next, until ``--duration`` seconds have passed. Every
+request is drawn from the ``--mix`` of operations:
+
+* ``resolve``: ``GET /api/resolve/{hostname}``
+* ``create``: ``POST /api/records/`` adding an A record to a host
+* ``list``: ``GET /api/records/?after=N&limit=100`` at a random offset
+
+Target hosts are read from the API before the run (up to ``--hosts``) and
+shuffled, then picked with Zipf-distributed popularity: the k-th host is
+requested with weight ``1 / k ** --zipf``, so a few hot names take most
+of the traffic.
+Load a zone first, e.g. with ``python -m app.cli.zone load``.
+
+Without ``--url`` the app runs in-process on the configured database,
+through ``httpx.ASGITransport`` with its lifespan started. Latencies go
+into log-linear histograms, like HdrHistogram with two significant digits,
+so percentiles stay within 1% at any duration without keeping samples.
+Each operation reports throughput, latency percentiles, status codes and
+its error rate. Responses other than 2xx and transport failures count as
+errors.
+
+Usage:
+    python -m benchmarks.loadgen [--url http://127.0.0.1:8000] [--concurrency 32]
+                                 [--duration 30] [--mix resolve=90,create=2,list=8]
+                                 [--zipf 1.1] [--hosts 10000] [--seed 0] [--json]
+"""
+import argparse
+import asyncio
+import bisect
+import contextlib
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter as CounterDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+OPERATIONS = ("resolve", "create", "list")
+PAGE = 1000
+LIST_LIMIT = 100
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+class LatencyHistogram:
+    """Log-linear histogram of microsecond latencies.
+
+    Values below ``2 ** SUB_BITS`` are counted exactly; larger ones share
+    a bucket with values within 1/128 of them, as in HdrHistogram.
+    """
+
+    SUB_BITS = 8
+
+    def __init__(self):
+        self.counts: CounterDict = CounterDict()
+        self.total = 0
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        exact = 1 << self.SUB_BITS
+        if value < exact:
+            return value
+        shift = value.bit_length() - self.SUB_BITS
+        half = exact >> 1
+        return exact + (shift - 1) * half + (value >> shift) - half
+
+    def _highest(self, index: int) -> int:
+        """Largest value counted in bucket ``index``."""
+        exact = 1 << self.SUB_BITS
+        if index < exact:
+            return index
+        half = exact >> 1
+        shift, offset = divmod(index - exact, half)
+        shift += 1
+        return ((offset + half + 1) << shift) - 1
+
+    def record(self, microseconds: int) -> None:
+        self.counts[self._index(microseconds)] += 1
+        self.total += 1
+        self.max = max(self.max, microseconds)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent: float) -> int:
+        """Latency at or below which ``percent`` of recorded values fall."""
+        if not self.total:
+            return 0
+        rank = max(1, round(percent / 100 * self.total))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._highest(index), self.max)
+        return self.max
+
+
+class Zipf:
+    """Pick indices ``0..n-1`` with probability proportional to ``1 / (i + 1) ** s``."""
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self.cumulative = list(
+            itertools.accumulate(1 / (k**s) for k in range(1, n + 1))
+        )
+        self.rng = rng
+
+    def pick(self) -> int:
+        return bisect.bisect_left(
+            self.cumulative, self.rng.random() * self.cumulative[-1]
+        )
+
+
+class OperationStats:
+    """Outcomes of one operation."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.statuses: CounterDict = CounterDict()
+        self.errors = 0
+
+    def merge(self, other: "OperationStats") -> None:
+        self.latency.merge(other.latency)
+        self.statuses.update(other.statuses)
+        self.errors += other.errors
+
+    def report(self, seconds: float) -> Dict[str, Any]:
+        requests = self.latency.total
+        return {
+            "requests": requests,
+            "throughput_rps": round(requests / seconds, 1) if seconds else 0.0,
+            "errors": self.errors,
+            "error_rate": round(self.errors / requests, 4) if requests else 0.0,
+            "statuses": dict(sorted(self.statuses.items())),
+            "latency_ms": {
+                **{f"p{p:g}": self.latency.percentile(p) / 1000 for p in PERCENTILES},
+                "max": self.latency.max / 1000,
+            },
+        }
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """``resolve=90,create=2,list=8`` as weights by operation."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}")
+        mix[name] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError("the mix needs a positive weight")
+    return mix
+
+
+async def discover(
+    client: httpx.AsyncClient, limit: int
+) -> Tuple[List[Tuple[int, str]], int]:
+    """Up to ``limit`` (host ID, hostname) pairs and the number of records."""
+    hosts: List[Tuple[int, str]] = []
+    after: Optional[int] = None
+    while len(hosts) < limit:
+        params = {"limit": min(PAGE, limit - len(hosts))}
+        if after is not None:
+            params["after"] = after
+        response = await client.get("/api/hosts/", params=params)
+        response.raise_for_status()
+        page = response.json()
+        if not page:
+            break
+        hosts.extend((host["id"], host["hostname"]) for host in page)
+        after = page[-1]["id"]
+    stats = await client.get("/api/stats")
+    records = stats.json().get("records", 0) if stats.status_code == 200 else 0
+    return hosts, records
+
+
+class LoadGenerator:
+    """Run the closed loop and collect per-operation statistics."""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        hosts: List[Tuple[int, str]],
+        records: int,
+        mix: Dict[str, float],
+        zipf: float,
+        rng: random.Random,
+    ):
+        self.client = client
+        # Popularity should not follow host ID order
+        self.hosts = rng.sample(hosts, len(hosts))
+        self.records = max(records, 1)
+        self.operations = list(mix)
+        self.weights = list(itertools.accumulate(mix.values()))
+        self.popularity = Zipf(len(hosts), zipf, rng)
+        self.rng = rng
+        self.stats = {name: OperationStats() for name in self.operations}
+        # Unique A values for creates, from the 100.64.0.0/10 shared space
+        self._addresses = itertools.count(rng.randrange(1 << 21))
+
+    def _request(self, operation: str) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+        host_id, hostname = self.hosts[self.popularity.pick()]
+        if operation == "resolve":
+            return "GET", f"/api/resolve/{hostname}", None
+        if operation == "create":
+            n = next(self._addresses) % (1 << 22)
+            value = f"100.{64 + (n >> 16)}.{n >> 8 & 255}.{n & 255}"
+            body = {"host_id": host_id, "type": "A", "value": value}
+            return "POST", "/api/records/", body
+        after = self.rng.randrange(self.records)
+        return "GET", f"/api/records/?after={after}&limit={LIST_LIMIT}", None
+
+    async def worker(self, deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            roll = self.rng.random() * self.weights[-1]
+            operation = self.operations[bisect.bisect_right(self.weights, roll)]
+            method, path, body = self._request(operation)
+            stats = self.stats[operation]
+            started = time.perf_counter()
+            try:
+                response = await self.client.request(method, path, json=body)
+            except httpx.HTTPError as e:
+                stats.statuses[type(e).__name__] += 1
+                stats.errors += 1
+            else:
+                stats.statuses[str(response.status_code)] += 1
+                stats.errors += not response.is_success
+            stats.latency.record(int((time.perf_counter() - started) * 1_000_000))
+
+    async def run(self, concurrency: int, duration: float) -> Dict[str, Any]:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(self.worker(deadline) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        total = OperationStats()
+        for stats in self.stats.values():
+            total.merge(stats)
+        return {
+            "seconds": round(elapsed, 2),
+            "concurrency": concurrency,
+            "total": total.report(elapsed),
+            "operations": {
+                name: stats.report(elapsed) for name, stats in self.stats.items()
+            },
+        }
+
+
+@contextlib.asynccontextmanager
+async def open_client(url: Optional[str], concurrency: int, timeout: float):
+    """An HTTP client for ``url``, or for the app served in-process."""
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    if url:
+        async with httpx.AsyncClient(
+            base_url=url, limits=limits, timeout=timeout
+        ) as client:
+            yield client
+        return
+    # Every request comes from this one client, so leave rate limiting to --url runs
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://loadgen", timeout=timeout
+        ) as client:
+            yield client
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    async with open_client(args.url, args.concurrency, args.timeout) as client:
+        hosts, records = await discover(client, args.hosts)
+        if not hosts:
+            raise SystemExit("No hosts to send load to; load a zone first")
+        generator = LoadGenerator(
+            client, hosts, records, args.mix, args.zipf, random.Random(args.seed)
+        )
+        result = await generator.run(args.concurrency, args.duration)
+    result.update(
+        target=args.url or "in-process",
+        mix=args.mix,
+        zipf=args.zipf,
+        hosts=len(hosts),
+    )
+    return result
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--url", help="base URL of a running server; in-process if omitted"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=32, help="requests in flight"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=30.0, help="seconds to send load for"
+    )
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=parse_mix("resolve=90,create=2,list=8"),
+        help="operation weights, e.g. resolve=90,create=2,list=8",
+    )
+    parser.add_argument(
+        "--zipf", type=float, default=1.1, help="Zipf exponent of host popularity"
+    )
+    parser.add_argument(
+        "--hosts", type=int, default=10_000, help="hosts to spread load over"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=10.0, help="per-request timeout, seconds"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument(
+        "--json", action="store_true", help="emit machine-readable JSON"
+    )
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(
+        f"{result['target']}: {result['concurrency']} workers "
+        f"for {result['seconds']} s over {result['hosts']} hosts "
+        f"(zipf {result['zipf']:g})"
+    )
+    columns = " ".join(f"{f'p{p:g} ms':>9}" for p in PERCENTILES)
+    print(
+        f"  {'operation':<10} {'requests':>9} {'req/s':>9} {'errors':>8} {columns} "
+        f"{'max ms':>9}"
+    )
+    rows = [*result["operations"].items(), ("total", result["total"])]
+    for name, op in rows:
+        latency = " ".join(f"{op['latency_ms'][f'p{p:g}']:>9.2f}" for p in PERCENTILES)
+        print(f"  {name:<10} {op['requests']:>9} {op['throughput_rps']:>9} "
+              f"{op['error_rate']:>8.2%} {latency} {op['latency_ms']['max']:>9.2f}")
+    if result["total"]["errors"]:
+        sys.stderr.write(f"statuses: {json.dumps(result['total']['statuses'])}\n")
+
+
+if __name__ == "__main__":
+    main()
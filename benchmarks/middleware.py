@@ -0,0 +1,102 @@
+"""Microbenchmark: per-request overhead of ``MetricsMiddleware``.
+
+Drives a minimal ASGI app directly, without a server or the FastAPI stack,
+once bare and once wrapped in the middleware. The inner app marks a route
+as matched and sends a small JSON body, like a routed endpoint would. The
+difference per request is the middleware's own cost: the context variable,
+the send wrapper, the in-flight gauge and four histogram updates.
+
+Usage:
+    python -m benchmarks.middleware [--requests 100000] [--target-us 20] [--json]
+
+Exits with status 1 when the overhead exceeds ``--target-us``.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import List
+
+from app.core.middleware import MetricsMiddleware
+
+
+class _Route:
+    path = "/api/bench/{item_id}"
+
+
+ROUTE = _Route()
+BODY = b'{"hostname": "www.example.com", "records": []}'
+
+
+async def endpoint(scope, receive, send) -> None:
+    """A routed endpoint returning a small JSON body."""
+    scope["route"] = ROUTE
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": BODY})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message) -> None:
+    pass
+
+
+async def drive(app, requests: int) -> float:
+    """Mean microseconds per request through ``app``."""
+    started = time.perf_counter()
+    for _ in range(requests):
+        scope = {"type": "http", "method": "GET", "path": "/api/bench/1"}
+        await app(scope, _receive, _send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument(
+        "--target-us", type=float, default=20.0, help="overhead budget per request"
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="emit machine-readable JSON"
+    )
+    args = parser.parse_args(argv)
+
+    wrapped = MetricsMiddleware(endpoint)
+
+    async def run():
+        # Warm up both paths so metric handles and caches exist
+        await drive(endpoint, 1000)
+        await drive(wrapped, 1000)
+        return await drive(endpoint, args.requests), await drive(wrapped, args.requests)
+
+    bare_us, wrapped_us = asyncio.run(run())
+    overhead_us = wrapped_us - bare_us
+    result = {
+        "requests": args.requests,
+        "bare_us_per_request": round(bare_us, 2),
+        "wrapped_us_per_request": round(wrapped_us, 2),
+        "overhead_us": round(overhead_us, 2),
+        "target_us": args.target_us,
+        "within_target": overhead_us <= args.target_us,
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        verdict = "within" if result["within_target"] else "OVER"
+        print(
+            f"bare {bare_us:.2f} us/request, with MetricsMiddleware {wrapped_us:.2f} "
+            "us/request"
+        )
+        print(
+            f"overhead: {overhead_us:.2f} us/request, {verdict} the {args.target_us:g} "
+            "us target"
+        )
+    if not result["within_target"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Microbenchmark: per-resolve Python overhead of the ORM path vs. the Core fast path.
+
+The ORM path reproduces the resolver as it was before the Core fast path:
+a Session per request, ``select(Host)`` and ``select(Record)`` built on every
+hop, and ORM objects hydrated into the identity map. The fast path runs the
+pre-built statements from ``app.core.statements`` on a plain connection.
+
+Usage:
+    python -m benchmarks.resolver_fastpath [--iterations 5000] [--depth 3] [--json]
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from sqlmodel import Session, SQLModel, select
+
+from app.core.database import build_engine
+from app.core.resolver import resolve_hostname
+from app.models import Host, Record, RecordType
+
+
+def orm_resolve(engine, hostname: str) -> List[Dict]:
+    """Resolve the way the pre-fast-path resolver did."""
+    with Session(engine) as session:
+        visited = set()
+        while True:
+            visited.add(hostname)
+            host = session.exec(select(Host).where(Host.hostname == hostname)).first()
+            records = session.exec(
+                select(Record).where(Record.host_id == host.id)
+            ).all()
+            cnames = [r for r in records if r.type == RecordType.CNAME]
+            if not cnames:
+                return [
+                    {
+                        "type": r.type,
+                        "value": r.value,
+                        "ttl": r.ttl,
+                        "priority": r.priority,
+                    }
+                    for r in records
+                ]
+            hostname = cnames[0].value
+
+
+def populate(engine, depth: int) -> str:
+    """Create a CNAME chain of ``depth`` hops ending at an A record."""
+    SQLModel.metadata.create_all(engine)
+    names = [f"c{i}.example.com" for i in range(depth)] + ["target.example.com"]
+    with Session(engine) as session:
+        for i, name in enumerate(names):
+            host = Host(hostname=name)
+            session.add(host)
+            session.flush()
+            if i < depth:
+                session.add(
+                    Record(
+                        type=RecordType.CNAME,
+                        value=names[i + 1],
+                        ttl=300,
+                        host_id=host.id,
+                    )
+                )
+            else:
+                session.add(
+                    Record(
+                        type=RecordType.A, value="10.0.0.1", ttl=300, host_id=host.id
+                    )
+                )
+        session.commit()
+    return names[0]
+
+
+def timed(fn, iterations: int) -> float:
+    """Return mean microseconds per call."""
+    fn()  # warm caches
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument(
+        "--depth", type=int, default=3, help="CNAME hops before the A record"
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="emit machine-readable JSON"
+    )
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'bench.db'}"
+        engine = build_engine(url)
+        start_name = populate(engine, args.depth)
+        reader = build_engine(url, read_only=True)
+
+        orm_us = timed(lambda: orm_resolve(reader, start_name), args.iterations)
+        with reader.connect() as conn:
+            core_us = timed(lambda: resolve_hostname(conn, start_name), args.iterations)
+        engine.dispose()
+        reader.dispose()
+
+    result = {
+        "depth": args.depth,
+        "iterations": args.iterations,
+        "orm_us_per_resolve": round(orm_us, 1),
+        "core_us_per_resolve": round(core_us, 1),
+        "speedup": round(orm_us / core_us, 2),
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(
+            f"depth={args.depth}: ORM {orm_us:.1f} us/resolve, "
+            f"Core {core_us:.1f} us/resolve ({result['speedup']}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+"""Record benchmark runs and compare them for regressions.
+
+``record`` runs a benchmark module ``--repeat`` times with ``--json`` and
+stores every numeric metric's samples in one JSON file, together with the
+environment: Python version, CPU, database driver and git commit. Metrics
+are the numeric leaves of the benchmark's JSON, named by their path, e.g.
+``sizes.1000.operations.resolve_hops_0.p99_ms``. Whether lower or higher
+is better follows from the name: ``*_ms``, ``*_us``, ``*_seconds``,
+``*_mb`` and ``*_per_request`` are costs, and ``*_per_sec``, ``*_per_s``,
+``*_rps`` and ``speedup`` are rates. Other numbers, such as iteration
+counts and ``target_*`` settings, are not metrics.
+
+A run only counts if the benchmark succeeded: ``record`` stops when a run
+exits with an error status or reports failed requests in an ``errors``
+field. Exit status 1 is accepted only from a run whose output says it
+missed its target (``within_target`` false), as that is how benchmarks
+report being over target. Every run's exit status and error counts are
+stored, and ``compare`` refuses result files holding a failed run.
+
+``compare`` puts a confidence interval (Welch's t) around the change of
+each metric's mean between a baseline and a candidate run. A metric has
+regressed when the whole interval is worse than the baseline and the
+change is larger than ``--threshold`` percent. The exit status is 1 when
+any metric regressed and 2 when either file holds a failed run, so the
+comparison can gate a change locally.
+
+Usage:
+    python -m benchmarks.results record [--repeat 5] [--out FILE] \\
+        -- benchmarks.api --sizes 1000
+    python -m benchmarks.results compare BASELINE CANDIDATE \\
+        [--threshold 5] [--confidence 0.95]
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+LOWER_IS_BETTER = re.compile(r"(_ms|_us|_seconds|_mb|_per_request|_per_resolve)$")
+HIGHER_IS_BETTER = re.compile(r"(_per_sec|_per_s|_rps|^speedup)$")
+# Keys naming the items of a list of results, in order of preference
+LIST_LABELS = ("name", "profile", "records")
+
+# Two-sided Student t critical values by degrees of freedom
+T_TABLE = {
+    1: (6.314, 12.706, 63.657),
+    2: (2.920, 4.303, 9.925),
+    3: (2.353, 3.182, 5.841),
+    4: (2.132, 2.776, 4.604),
+    5: (2.015, 2.571, 4.032),
+    6: (1.943, 2.447, 3.707),
+    7: (1.895, 2.365, 3.499),
+    8: (1.860, 2.306, 3.355),
+    9: (1.833, 2.262, 3.250),
+    10: (1.812, 2.228, 3.169),
+    12: (1.782, 2.179, 3.055),
+    15: (1.753, 2.131, 2.947),
+    20: (1.725, 2.086, 2.845),
+    30: (1.697, 2.042, 2.750),
+}
+CONFIDENCE_LEVELS = (0.90, 0.95, 0.99)
+
+
+def t_critical(df: float, confidence: float) -> float:
+    """Critical t value, rounding ``df`` down to a tabulated one to be conservative."""
+    column = CONFIDENCE_LEVELS.index(confidence)
+    tabulated = max(d for d in T_TABLE if d <= max(df, 1))
+    return T_TABLE[tabulated][column]
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", *args], cwd=ROOT, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def environment() -> Dict[str, Any]:
+    """Where and on what code a benchmark ran."""
+    from app.core.settings import settings
+
+    driver = settings.db.DB_DRIVER
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "recorded_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": f"{platform.python_implementation()} {platform.python_version()}",
+        "platform": platform.platform(),
+        "cpu": _cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "db_driver": driver,
+        "db_version": sqlite3.sqlite_version if driver == "sqlite" else None,
+        "sqlite_profile": settings.db.DB_SQLITE_PROFILE if driver == "sqlite" else None,
+        "git_sha": _git("rev-parse", "HEAD"),
+        "git_dirty": bool(status) if status is not None else None,
+    }
+
+
+def direction(name: str) -> Optional[str]:
+    """Whether ``lower`` or ``higher`` is better for a metric path, or None."""
+    parts = name.split(".")
+    if any(part.startswith("target") for part in parts):
+        return None
+    # The innermost named quantity decides, e.g. latency_ms.p50 is a cost
+    for part in reversed(parts):
+        if LOWER_IS_BETTER.search(part):
+            return "lower"
+        if HIGHER_IS_BETTER.search(part):
+            return "higher"
+    return None
+
+
+def flatten(value: Any, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    """Numeric leaves of a benchmark's JSON output as ``(path, value)``."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}{key}.")
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            label = index
+            if isinstance(item, dict):
+                label = next((item[k] for k in LIST_LABELS if k in item), index)
+            yield from flatten(item, f"{prefix}{label}.")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix[:-1], float(value)
+
+
+def error_counts(output: Any) -> Dict[str, float]:
+    """Every ``errors`` count in a benchmark's JSON output, by path."""
+    return {
+        name: value
+        for name, value in flatten(output)
+        if name.rsplit(".", 1)[-1] == "errors"
+    }
+
+
+def run_failure(
+    exit_status: int, within_target: Any, errors: Dict[str, float]
+) -> Optional[str]:
+    """Why a run's numbers cannot be used, or None if the run succeeded."""
+    # Benchmarks exit 1 when over their target; their output still counts
+    if exit_status != 0 and not (exit_status == 1 and within_target is False):
+        return f"exited with status {exit_status}"
+    failed = {name: value for name, value in errors.items() if value}
+    if failed:
+        counts = ", ".join(f"{name}={value:g}" for name, value in failed.items())
+        return f"reported errors: {counts}"
+    return None
+
+
+def failed_runs(result: Dict[str, Any]) -> List[str]:
+    """Failed runs in a recorded result, as ``run N: reason``."""
+    failures = []
+    for i, run in enumerate(result.get("runs", [])):
+        reason = run_failure(
+            run["exit_status"], run.get("within_target"), run["errors"]
+        )
+        if reason is not None:
+            failures.append(f"run {i + 1}: {reason}")
+    return failures
+
+
+def record(module: str, args: List[str], repeat: int) -> Dict[str, Any]:
+    """Run a benchmark ``repeat`` times and collect the samples of each metric.
+
+    Raises:
+        SystemExit: If a run fails, prints no JSON or reports errors
+    """
+    command = [sys.executable, "-m", module, *args]
+    if "--json" not in args:
+        command.append("--json")
+    metrics: Dict[str, Dict[str, Any]] = {}
+    runs: List[Dict[str, Any]] = []
+    for run in range(repeat):
+        result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+        try:
+            output = json.loads(result.stdout)
+        except json.JSONDecodeError:
+            sys.stderr.write(result.stderr)
+            raise SystemExit(f"Run {run + 1} of {module} printed no JSON")
+        summary = output if isinstance(output, dict) else {}
+        outcome = {
+            "exit_status": result.returncode,
+            "within_target": summary.get("within_target"),
+            "errors": error_counts(output),
+        }
+        failure = run_failure(**outcome)
+        if failure is not None:
+            sys.stderr.write(result.stderr)
+            raise SystemExit(f"Run {run + 1} of {module} {failure}")
+        runs.append(outcome)
+        for name, value in flatten(output):
+            better = direction(name)
+            if better is not None:
+                samples = metrics.setdefault(name, {"better": better, "samples": []})
+                samples["samples"].append(value)
+        print(f"run {run + 1}/{repeat} done", file=sys.stderr)
+    return {
+        "benchmark": module,
+        "args": args,
+        "repeat": repeat,
+        "environment": environment(),
+        "runs": runs,
+        "metrics": metrics,
+    }
+
+
+def compare_metric(
+    base: List[float],
+    head: List[float],
+    better: str,
+    threshold: float,
+    confidence: float,
+) -> Dict[str, Any]:
+    """Change of a metric's mean and its confidence interval, in percent of baseline.
+
+    Positive changes are worse, whichever direction is better.
+    """
+    base_mean, head_mean = statistics.fmean(base), statistics.fmean(head)
+    sign = 1 if better == "lower" else -1
+    result = {
+        "baseline": round(base_mean, 4),
+        "candidate": round(head_mean, 4),
+        "better": better,
+    }
+    if len(base) < 2 or len(head) < 2 or base_mean == 0:
+        return {
+            **result,
+            "change_pct": None,
+            "ci_pct": None,
+            "verdict": "not enough samples",
+        }
+
+    base_var, head_var = statistics.variance(base), statistics.variance(head)
+    se = math.sqrt(base_var / len(base) + head_var / len(head))
+    diff = head_mean - base_mean
+    if se == 0:
+        low = high = diff
+    else:
+        # Welch-Satterthwaite degrees of freedom
+        df = se ** 4 / (
+            (base_var / len(base)) ** 2 / (len(base) - 1)
+            + (head_var / len(head)) ** 2 / (len(head) - 1)
+        )
+        margin = t_critical(df, confidence) * se
+        low, high = diff - margin, diff + margin
+    change, low, high = (sign * 100 * x / base_mean for x in (diff, low, high))
+    low, high = min(low, high), max(low, high)
+
+    if low > 0 and change > threshold:
+        verdict = "regression"
+    elif high < 0 and -change > threshold:
+        verdict = "improvement"
+    else:
+        verdict = "unchanged"
+    return {
+        **result,
+        "change_pct": round(change, 2),
+        "ci_pct": [round(low, 2), round(high, 2)],
+        "verdict": verdict,
+    }
+
+
+def compare(
+    baseline: Dict[str, Any],
+    candidate: Dict[str, Any],
+    threshold: float,
+    confidence: float,
+) -> Dict[str, Any]:
+    """Compare every metric present in both runs.
+
+    ``failed_runs`` lists runs of either file that failed; their numbers
+    should not be trusted.
+    """
+    shared = [name for name in baseline["metrics"] if name in candidate["metrics"]]
+    metrics = {
+        name: compare_metric(
+            baseline["metrics"][name]["samples"],
+            candidate["metrics"][name]["samples"],
+            baseline["metrics"][name]["better"],
+            threshold,
+            confidence,
+        )
+        for name in shared
+    }
+    env_a, env_b = baseline["environment"], candidate["environment"]
+    return {
+        "baseline": env_a.get("git_sha"),
+        "candidate": env_b.get("git_sha"),
+        "threshold_pct": threshold,
+        "confidence": confidence,
+        # Numbers from different machines or setups are not comparable
+        "environment_differences": {
+            key: [env_a.get(key), env_b.get(key)]
+            for key in (
+                "python",
+                "cpu",
+                "cpu_count",
+                "db_driver",
+                "db_version",
+                "sqlite_profile",
+            )
+            if env_a.get(key) != env_b.get(key)
+        },
+        "failed_runs": {
+            "baseline": failed_runs(baseline),
+            "candidate": failed_runs(candidate),
+        },
+        "regressions": [
+            name for name, m in metrics.items() if m["verdict"] == "regression"
+        ],
+        "metrics": metrics,
+    }
+
+
+def _default_path(module: str, env: Dict[str, Any]) -> Path:
+    stamp = env["recorded_at"].replace(":", "").replace("-", "")
+    sha = (env["git_sha"] or "nogit")[:8]
+    return RESULTS_DIR / f"{module.rsplit('.', 1)[-1]}-{stamp}-{sha}.json"
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser(
+        "record", help="run a benchmark and store its samples"
+    )
+    record_parser.add_argument("--repeat", type=int, default=5, help="runs to sample")
+    record_parser.add_argument(
+        "--out", help="result file; default under benchmarks/results/"
+    )
+    record_parser.add_argument(
+        "benchmark", help="benchmark module, e.g. benchmarks.api"
+    )
+    record_parser.add_argument(
+        "args", nargs=argparse.REMAINDER, help="arguments for the benchmark"
+    )
+
+    compare_parser = commands.add_parser("compare", help="compare two recorded runs")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=5.0,
+                                help="smallest change in percent that counts")
+    compare_parser.add_argument("--confidence", type=float, default=0.95,
+                                choices=CONFIDENCE_LEVELS)
+    compare_parser.add_argument(
+        "--json", action="store_true", help="emit machine-readable JSON"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        if args.repeat < 2:
+            parser.error("--repeat must be at least 2 to estimate variance")
+        bench_args = args.args[1:] if args.args[:1] == ["--"] else args.args
+        result = record(args.benchmark, bench_args, args.repeat)
+        path = (
+            Path(args.out)
+            if args.out
+            else _default_path(args.benchmark, result["environment"])
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(result, indent=2))
+        print(f"Recorded {len(result['metrics'])} metrics to {path}")
+        return
+
+    baseline = json.loads(Path(args.baseline).read_text())
+    candidate = json.loads(Path(args.candidate).read_text())
+    report = compare(baseline, candidate, args.threshold, args.confidence)
+    failures = [
+        f"{side} {failure}"
+        for side, runs in report["failed_runs"].items()
+        for failure in runs
+    ]
+    if failures and not args.json:
+        raise SystemExit("Cannot compare failed runs:\n" + "\n".join(failures))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, (a, b) in report["environment_differences"].items():
+            print(f"warning: {key} differs: {a} vs {b}")
+        print(f"{'metric':<60} {'baseline':>12} {'candidate':>12} {'change':>9} "
+              f"{f'{args.confidence:.0%} CI':>18}  verdict")
+        for name, m in report["metrics"].items():
+            change = f"{m['change_pct']:+.1f}%" if m["change_pct"] is not None else "-"
+            ci = (
+                f"[{m['ci_pct'][0]:+.1f}, {m['ci_pct'][1]:+.1f}]"
+                if m["ci_pct"]
+                else "-"
+            )
+            print(
+                f"{name[-60:]:<60} {m['baseline']:>12g} {m['candidate']:>12g} "
+                f"{change:>9} {ci:>18}  {m['verdict']}"
+            )
+        print(f"{len(report['regressions'])} regression(s) beyond {args.threshold:g}% "
+              "(positive changes are worse)")
+    if failures:
+        sys.exit(2)
+    if report["regressions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
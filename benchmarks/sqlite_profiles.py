@@ -0,0 +1,109 @@
+"""Benchmark insert and resolve throughput for each SQLite performance profile.
+
+Each profile gets a fresh database file. Inserts commit one host plus one A
+record per transaction, the same shape as the API write path. Resolves go
+through ``app.core.resolver.resolve_hostname`` on the read-only engine.
+
+Usage:
+    python -m benchmarks.sqlite_profiles [--hosts 2000] [--resolves 20000] [--json]
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sqlmodel import Session, SQLModel
+
+from app.core.database import build_engine
+from app.core.resolver import resolve_hostname
+from app.core.settings import SQLITE_PROFILES, DatabaseSettings
+from app.models import Host, Record, RecordType
+
+
+def bench_profile(
+    profile: str, hosts: int, resolves: int, workdir: Path
+) -> Dict[str, Any]:
+    """Run the insert and resolve benchmark against one profile."""
+    url = f"sqlite:///{workdir / f'{profile}.db'}"
+    pragmas = DatabaseSettings(DB_SQLITE_PROFILE=profile).SQLITE_PRAGMAS
+    writer = build_engine(url, pragmas=pragmas)
+    SQLModel.metadata.create_all(writer)
+
+    start = time.perf_counter()
+    for i in range(hosts):
+        with Session(writer) as session:
+            host = Host(hostname=f"host{i}.example.com")
+            session.add(host)
+            session.flush()
+            session.add(
+                Record(
+                    type=RecordType.A,
+                    value=f"10.0.{i // 256 % 256}.{i % 256}",
+                    ttl=300,
+                    host_id=host.id,
+                )
+            )
+            session.commit()
+    insert_elapsed = time.perf_counter() - start
+
+    reader = build_engine(url, read_only=True, pragmas=pragmas)
+    rng = random.Random(42)
+    names = [f"host{rng.randrange(hosts)}.example.com" for _ in range(resolves)]
+    start = time.perf_counter()
+    with Session(reader) as session:
+        for name in names:
+            resolve_hostname(session, name)
+    resolve_elapsed = time.perf_counter() - start
+
+    writer.dispose()
+    reader.dispose()
+    return {
+        "profile": profile,
+        "hosts": hosts,
+        "resolves": resolves,
+        "insert_ops_per_sec": round(hosts / insert_elapsed, 1),
+        "resolve_ops_per_sec": round(resolves / resolve_elapsed, 1),
+    }
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--hosts", type=int, default=2000, help="hosts to insert per profile"
+    )
+    parser.add_argument(
+        "--resolves", type=int, default=20000, help="resolves per profile"
+    )
+    parser.add_argument(
+        "--profiles",
+        nargs="+",
+        default=list(SQLITE_PROFILES),
+        choices=list(SQLITE_PROFILES),
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="emit machine-readable JSON"
+    )
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [
+            bench_profile(p, args.hosts, args.resolves, Path(tmp))
+            for p in args.profiles
+        ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'profile':<10} {'insert ops/s':>14} {'resolve ops/s':>14}")
+    for r in results:
+        print(
+            f"{r['profile']:<10} {r['insert_ops_per_sec']:>14} "
+            f"{r['resolve_ops_per_sec']:>14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
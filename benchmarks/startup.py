@@ -0,0 +1,173 @@
+"""Measure worker cold start: imports, time to first request and OpenAPI.
+
+Import cost comes from ``python -X importtime -c "import app.main"``, summed
+by top-level package. Time to first request is measured by starting
+``uvicorn app.main:app`` and polling ``/health`` until it answers. The clock
+runs from process spawn, so it includes interpreter start, imports and the
+lifespan startup. Each run then times the first ``/openapi.json``.
+
+All runs share one fresh working directory. The first run starts against
+an empty database, so it pays for schema creation and the zone snapshot
+build. Later runs reuse the database, snapshot and OpenAPI cache, like a
+worker started by an autoscaler.
+
+Usage:
+    python -m benchmarks.startup [--runs 5] [--target-ms 1500] [--json]
+
+Exits with status 1 when the median warm time to first request exceeds
+``--target-ms``.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+POLL_INTERVAL = 0.005
+START_TIMEOUT = 60.0
+
+
+def import_profile(module: str = "app.main", top: int = 10) -> Dict[str, Any]:
+    """Self time of every import of ``module``, summed by top-level package."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    by_package: Dict[str, int] = defaultdict(int)
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (
+            part.strip() for part in line[len("import time:") :].split("|")
+        )
+        by_package[name.split(".")[0]] += int(self_us)
+        if name == module:
+            total_us = int(cumulative_us)
+    heaviest = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "total_ms": round(total_us / 1000, 1),
+        "packages_ms": {name: round(us / 1000, 1) for name, us in heaviest},
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str) -> Optional[int]:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            response.read()
+            return response.status
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return None
+
+
+def first_request(workdir: Path) -> Dict[str, float]:
+    """Start a worker in ``workdir`` and time its first responses."""
+    port = _free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(ROOT),
+        "DB_NAME": str(workdir / "startup.db"),
+        "ZONE_SNAPSHOT_PATH": str(workdir / "zone.snapshot"),
+        "OPENAPI_CACHE_PATH": str(workdir / "openapi.cache.json"),
+    }
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while _get(f"http://127.0.0.1:{port}/health") != 200:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+            if time.perf_counter() - started > START_TIMEOUT:
+                raise RuntimeError(f"worker did not answer within {START_TIMEOUT}s")
+            time.sleep(POLL_INTERVAL)
+        ready = time.perf_counter() - started
+
+        before = time.perf_counter()
+        _get(f"http://127.0.0.1:{port}/openapi.json")
+        openapi = time.perf_counter() - before
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        "first_request_ms": round(ready * 1000, 1),
+        "openapi_ms": round(openapi * 1000, 1),
+    }
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="worker starts to time")
+    parser.add_argument(
+        "--target-ms", type=float, default=1500.0, help="budget for the warm median"
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="emit machine-readable JSON"
+    )
+    args = parser.parse_args(argv)
+
+    imports = import_profile()
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = [first_request(Path(tmp)) for _ in range(max(args.runs, 2))]
+    warm = runs[1:]
+    result = {
+        "imports": imports,
+        "cold": runs[0],
+        "warm_median": {
+            key: round(statistics.median(run[key] for run in warm), 1)
+            for key in runs[0]
+        },
+        "target_ms": args.target_ms,
+    }
+    result["within_target"] = (
+        result["warm_median"]["first_request_ms"] <= args.target_ms
+    )
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"import app.main: {imports['total_ms']} ms")
+        for name, ms in imports["packages_ms"].items():
+            print(f"  {name:<24} {ms:>8} ms")
+        print(f"{'':<8} {'first request ms':>18} {'openapi ms':>12}")
+        for label, run in (("cold", result["cold"]), ("warm", result["warm_median"])):
+            print(f"{label:<8} {run['first_request_ms']:>18} {run['openapi_ms']:>12}")
+        verdict = "within" if result["within_target"] else "OVER"
+        print(f"time to first request: {result['warm_median']['first_request_ms']} ms, "
+              f"{verdict} the {args.target_ms:.0f} ms target")
+    if not result["within_target"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Microbenchmark: per-item validators vs. the batch (columnar) validators.
+
+Generates a column of record types and values shaped like a zone import,
+drawn from a pool of ``--distinct`` values with about one in twenty invalid,
+and times ``validate_record_value`` and ``validate_hostname`` row by row
+against ``validate_record_values`` and ``validate_hostnames`` on the whole
+column. Both sides must agree on every row.
+
+Usage:
+    python -m benchmarks.validators [--rows 200000] [--distinct 20000] [--json]
+"""
+import argparse
+import json
+import random
+import time
+from typing import Callable, List, Tuple
+
+from app.core.validators import (
+    validate_hostname,
+    validate_hostnames,
+    validate_record_value,
+    validate_record_values,
+)
+from app.models import RecordType
+
+INVALID_VALUES = [
+    "256.1.1.1",
+    "01.2.3.4",
+    "bad_name.example",
+    "-lead.example",
+    "",
+    "a..b",
+]
+
+
+def generate(rows: int, distinct: int, seed: int = 0) -> Tuple[List[str], List[str]]:
+    """Record types and values for ``rows`` rows drawn from ``distinct`` values."""
+    rng = random.Random(seed)
+    pool = []
+    for i in range(distinct):
+        if rng.random() < 0.05:
+            pool.append((rng.choice(["A", "CNAME"]), rng.choice(INVALID_VALUES)))
+        elif i % 3 == 0:
+            pool.append(("A", f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"))
+        elif i % 3 == 1:
+            pool.append(("CNAME", f"host{i}.example.com"))
+        else:
+            pool.append(("MX", f"mail{i % 97}.example.com"))
+    picked = [rng.choice(pool) for _ in range(rows)]
+    return [t for t, _ in picked], [v for _, v in picked]
+
+
+def timed(func: Callable[[], List[bool]]) -> Tuple[float, List[bool]]:
+    """Seconds one call of ``func`` takes, and its result."""
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument(
+        "--distinct", type=int, default=20_000, help="size of the value pool"
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="emit machine-readable JSON"
+    )
+    args = parser.parse_args(argv)
+
+    types, values = generate(args.rows, args.distinct)
+    hostnames = [v for t, v in zip(types, values) if t != "A"]
+
+    per_item_values_s, expected = timed(
+        lambda: [validate_record_value(RecordType(t), v) for t, v in zip(types, values)]
+    )
+    batch_values_s, got = timed(lambda: validate_record_values(types, values).valid)
+    assert got == expected, "batch value verdicts differ from validate_record_value"
+
+    per_item_hosts_s, expected = timed(
+        lambda: [validate_hostname(h) for h in hostnames]
+    )
+    batch_hosts_s, got = timed(lambda: validate_hostnames(hostnames).valid)
+    assert got == expected, "batch hostname verdicts differ from validate_hostname"
+
+    result = {
+        "rows": args.rows,
+        "distinct": args.distinct,
+        "record_values": {
+            "per_item_rows_per_s": round(args.rows / per_item_values_s),
+            "batch_rows_per_s": round(args.rows / batch_values_s),
+            "speedup": round(per_item_values_s / batch_values_s, 2),
+        },
+        "hostnames": {
+            "per_item_rows_per_s": round(len(hostnames) / per_item_hosts_s),
+            "batch_rows_per_s": round(len(hostnames) / batch_hosts_s),
+            "speedup": round(per_item_hosts_s / batch_hosts_s, 2),
+        },
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for name in ("record_values", "hostnames"):
+            r = result[name]
+            print(f"{name}: per-item {r['per_item_rows_per_s']:,} rows/s, "
+                  f"batch {r['batch_rows_per_s']:,} rows/s ({r['speedup']}x)")
+
+
+if __name__ == "__main__":
+    main()
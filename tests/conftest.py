@@ -1,7 +1,11 @@
 """Pytest configuration and fixtures."""
 import asyncio
+import atexit
 import os
-from typing import AsyncGenerator, Generator
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import AsyncGenerator, Callable, ContextManager, Generator
 
 import pytest
 from fastapi import FastAPI
@@ -9,7 +13,30 @@ from fastapi.testclient import TestClient
 from sqlmodel import Session, SQLModel, create_engine
 from sqlmodel.pool import StaticPool
 
-from app.core.database import get_db_session
+# Tests send bursts from one client; rate limiting has its own tests
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+# Admin endpoints are tested without a token; the token check has its own tests
+os.environ.setdefault("ADMIN_API_OPEN", "true")
+
+# Keep what the lifespan touches (the app database used by background jobs,
+# the zone snapshot and the OpenAPI cache) out of the working directory
+STATE_DIR = tempfile.mkdtemp(prefix="dns-api-tests-")
+atexit.register(shutil.rmtree, STATE_DIR, ignore_errors=True)
+os.environ.setdefault("DB_NAME", os.path.join(STATE_DIR, "app.db"))
+os.environ.setdefault("ZONE_SNAPSHOT_PATH", os.path.join(STATE_DIR, "zone.snapshot"))
+os.environ.setdefault(
+    "OPENAPI_CACHE_PATH", os.path.join(STATE_DIR, "openapi.cache.json")
+)
+os.environ.setdefault("TRACING_FILE", os.path.join(STATE_DIR, "traces.jsonl"))
+os.environ.setdefault("PROFILING_DIR", os.path.join(STATE_DIR, "profiles"))
+
+from app.core.database import (
+    build_engine,
+    get_db_session,
+    get_read_connection,
+    get_read_session,
+)
 from app.main import app
 
 # Use an in-memory SQLite database for testing
@@ -30,6 +57,8 @@ def override_get_db_session() -> Generator[Session, None, None]:
 
 # Apply the override
 app.dependency_overrides[get_db_session] = override_get_db_session
+app.dependency_overrides[get_read_session] = override_get_db_session
+app.dependency_overrides[get_read_connection] = override_get_db_session
 
 @pytest.fixture(scope="session")
 def event_loop():
@@ -64,6 +93,8 @@ def client(db: Session) -> Generator[TestClient, None, None]:
         yield db
     
     app.dependency_overrides[get_db_session] = override_get_db
+    app.dependency_overrides[get_read_session] = override_get_db
+    app.dependency_overrides[get_read_connection] = override_get_db
     
     with TestClient(app) as test_client:
         yield test_client
@@ -71,6 +102,27 @@ def client(db: Session) -> Generator[TestClient, None, None]:
     # Clean up overrides
     app.dependency_overrides.clear()
 
+@pytest.fixture(scope="function")
+def session_factory(
+    tmp_path,
+) -> Generator[Callable[[], ContextManager[Session]], None, None]:
+    """Session factory over a fresh file database, for code run outside requests.
+    
+    Background workers open their own sessions; several of them can share
+    the factory, as workers share the application database.
+    """
+    engine = build_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    SQLModel.metadata.create_all(engine)
+    
+    @contextmanager
+    def factory() -> Generator[Session, None, None]:
+        with Session(engine) as session:
+            yield session
+            session.commit()
+    
+    yield factory
+    engine.dispose()
+
 @pytest.fixture(scope="function")
 def sample_host_data():
     """Return sample host data for testing."""
@@ -0,0 +1,93 @@
+"""Tests for recording and comparing benchmark results."""
+import subprocess
+
+import pytest
+
+from benchmarks import results
+from benchmarks.results import compare, compare_metric, direction, record, t_critical
+
+
+def _result(samples, runs=None):
+    """A recorded result with one latency metric."""
+    return {
+        "environment": {"git_sha": "abc"},
+        "runs": runs or [],
+        "metrics": {"latency_ms": {"better": "lower", "samples": samples}},
+    }
+
+
+def test_direction_follows_the_innermost_named_quantity():
+    """Test costs, rates, targets and plain counts are told apart."""
+    # Act / Assert
+    assert direction("operations.resolve.p99_ms") == "lower"
+    assert direction("latency_ms.p50") == "lower"
+    assert direction("total.throughput_rps") == "higher"
+    assert direction("speedup") == "higher"
+    assert direction("target_ms") is None
+    assert direction("operations.resolve.iterations") is None
+
+
+def test_t_critical_rounds_degrees_of_freedom_down():
+    """Test untabulated degrees of freedom use the next smaller table row."""
+    # Act / Assert
+    assert t_critical(4, 0.95) == 2.776
+    assert t_critical(4.9, 0.95) == 2.776
+    assert t_critical(25, 0.99) == 2.845
+    assert t_critical(0.5, 0.90) == 6.314
+    assert t_critical(1000, 0.95) == 2.042
+
+
+def test_compare_metric_verdicts():
+    """Test clear changes beyond the threshold count and noise does not."""
+    # Act
+    slower = compare_metric([10, 10.2, 9.8], [12, 12.2, 11.8], "lower", 5, 0.95)
+    faster = compare_metric([100, 102, 98], [130, 128, 132], "higher", 5, 0.95)
+    noisy = compare_metric([10, 14, 6], [11, 15, 7], "lower", 5, 0.95)
+    single = compare_metric([10], [12], "lower", 5, 0.95)
+
+    # Assert
+    assert slower["verdict"] == "regression"
+    assert slower["change_pct"] == 20.0
+    assert slower["ci_pct"][0] > 0
+    assert faster["verdict"] == "improvement"
+    assert faster["change_pct"] == -30.0
+    assert noisy["verdict"] == "unchanged"
+    assert single["verdict"] == "not enough samples"
+
+
+def test_compare_lists_failed_runs():
+    """Test runs that errored or crashed are reported for either file."""
+    # Arrange
+    ok = {"exit_status": 0, "within_target": None, "errors": {"total.errors": 0}}
+    over_target = {"exit_status": 1, "within_target": False, "errors": {}}
+    crashed = {"exit_status": 1, "within_target": None, "errors": {}}
+    errored = {"exit_status": 0, "within_target": None, "errors": {"total.errors": 3}}
+    baseline = _result([10, 11], runs=[ok, over_target])
+    candidate = _result([10, 11], runs=[crashed, errored])
+
+    # Act
+    report = compare(baseline, candidate, 5, 0.95)
+
+    # Assert
+    assert report["failed_runs"] == {
+        "baseline": [],
+        "candidate": [
+            "run 1: exited with status 1",
+            "run 2: reported errors: total.errors=3",
+        ],
+    }
+
+
+def test_record_stops_at_a_run_with_errors(monkeypatch):
+    """Test recording refuses a benchmark run that reported failed requests."""
+    # Arrange
+    def run(command, **kwargs):
+        return subprocess.CompletedProcess(
+            command, 0, stdout='{"total": {"errors": 2, "p50_ms": 1.0}}', stderr=""
+        )
+
+    monkeypatch.setattr(results.subprocess, "run", run)
+
+    # Act / Assert
+    with pytest.raises(SystemExit, match="reported errors: total.errors=2"):
+        record("benchmarks.loadgen", [], repeat=2)
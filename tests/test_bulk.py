@@ -0,0 +1,244 @@
+"""Tests for bulk import and restore."""
+import io
+import json
+
+import pytest
+from sqlalchemy import func, select
+from sqlmodel import SQLModel
+
+from app.core.bulk import _CopyBuffer, bulk_load, read_dump, write_dump
+from app.core.database import build_engine
+from app.core.exceptions import BulkLoadError
+from app.core.validators import MAX_CNAME_CHAIN_LENGTH
+from app.models import Host, Record
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Engine for an empty file database with the schema created."""
+    engine = build_engine(f"sqlite:///{tmp_path / 'bulk.db'}")
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def _dump(*hosts):
+    return io.StringIO("".join(json.dumps(h) + "\n" for h in hosts))
+
+
+def _cname(hostname, target):
+    """A host whose only record is a CNAME to ``target``."""
+    return {
+        "hostname": hostname,
+        "records": [{"type": "CNAME", "value": target, "ttl": 300}],
+    }
+
+
+def _counts(engine):
+    with engine.connect() as conn:
+        return (
+            conn.execute(select(func.count()).select_from(Host)).scalar(),
+            conn.execute(select(func.count()).select_from(Record)).scalar(),
+        )
+
+
+def _rejected(engine, *hosts):
+    with pytest.raises(BulkLoadError) as exc_info:
+        bulk_load(engine, read_dump(_dump(*hosts)))
+    return exc_info.value.extra["errors"]
+
+
+def test_bulk_load_and_dump_round_trip(engine, tmp_path):
+    """Test a loaded dump can be dumped and restored into another database."""
+    # Arrange
+    source = _dump(
+        {"hostname": "example.com", "description": "apex", "records": [
+            {"type": "A", "value": "192.168.1.1", "ttl": 300},
+            {"type": "MX", "value": "Mail.example.com", "ttl": 300, "priority": 10},
+        ]},
+        {"hostname": "www.example.com", "records": [
+            {"type": "CNAME", "value": "example.com", "ttl": 300},
+        ]},
+        {"hostname": "empty.example.com"},
+    )
+    
+    # Act
+    result = bulk_load(engine, read_dump(source))
+    dumped = io.StringIO()
+    with engine.connect() as conn:
+        write_dump(conn, dumped)
+    restored = build_engine(f"sqlite:///{tmp_path / 'restored.db'}")
+    SQLModel.metadata.create_all(restored)
+    bulk_load(restored, read_dump(io.StringIO(dumped.getvalue())))
+    
+    # Assert
+    assert (result.hosts_inserted, result.records_inserted) == (3, 3)
+    assert _counts(restored) == (3, 3)
+    lines = [json.loads(line) for line in dumped.getvalue().splitlines()]
+    assert [h["hostname"] for h in lines] == [
+        "empty.example.com",
+        "example.com",
+        "www.example.com",
+    ]
+    assert lines[1]["records"][1]["value"] == "mail.example.com"
+
+
+def test_bulk_load_adds_records_to_existing_host(engine):
+    """Test records for an existing host attach to it."""
+    # Arrange
+    bulk_load(engine, read_dump(_dump({"hostname": "example.com"})))
+    
+    # Act
+    result = bulk_load(engine, read_dump(_dump({"hostname": "example.com", "records": [
+        {"type": "A", "value": "192.168.1.1", "ttl": 300},
+    ]})))
+    
+    # Assert
+    assert (result.hosts_inserted, result.records_inserted) == (0, 1)
+    assert _counts(engine) == (1, 1)
+
+
+def test_bulk_load_matches_hosts_by_canonical_hostname(engine):
+    """Test other spellings of a hostname load into the same host."""
+    # Arrange
+    bulk_load(engine, read_dump(_dump({"hostname": "Example.com"})))
+    
+    # Act
+    result = bulk_load(engine, read_dump(_dump({"hostname": "example.COM.", "records": [
+        {"type": "A", "value": "192.168.1.1", "ttl": 300},
+    ]})))
+    errors = _rejected(
+        engine, {"hostname": "dup.example.com"}, {"hostname": "DUP.example.com"}
+    )
+    
+    # Assert
+    assert (result.hosts_inserted, result.records_inserted) == (0, 1)
+    assert errors == ["line 2: dup.example.com: hostname appears more than once"]
+    with engine.connect() as conn:
+        assert conn.execute(select(Host.hostname, Host.canonical_hostname)).one() == (
+            "Example.com", "example.com"
+        )
+
+
+def test_bulk_load_rejects_invalid_rows(engine):
+    """Test per-row format errors reject the whole load."""
+    # Act
+    errors = _rejected(
+        engine,
+        {"hostname": "ok.example.com"},
+        {"hostname": "bad_host!"},
+        {
+            "hostname": "a.example.com",
+            "records": [{"type": "A", "value": "not.an.ip", "ttl": 300}],
+        },
+        {
+            "hostname": "m.example.com",
+            "records": [{"type": "MX", "value": "mail.example.com"}],
+        },
+    )
+    
+    # Assert
+    assert len(errors) == 3
+    assert "line 2" in errors[0]
+    assert _counts(engine) == (0, 0)
+
+
+def test_bulk_load_rejects_conflicts_with_existing_data(engine):
+    """Test duplicate and CNAME conflicts are found across staged and existing rows."""
+    # Arrange
+    bulk_load(engine, read_dump(_dump({"hostname": "example.com", "records": [
+        {"type": "A", "value": "192.168.1.1", "ttl": 300},
+    ]})))
+    
+    # Act
+    errors = _rejected(
+        engine,
+        {"hostname": "example.com", "records": [
+            {"type": "A", "value": "192.168.1.1", "ttl": 300},
+            {"type": "CNAME", "value": "other.example.com", "ttl": 300},
+        ]},
+        {"hostname": "dup.example.com"},
+        {"hostname": "dup.example.com"},
+    )
+    
+    # Assert
+    assert any("hostname appears more than once" in e for e in errors)
+    assert any("duplicate A record" in e for e in errors)
+    assert any("CNAME must be the only record" in e for e in errors)
+    assert _counts(engine) == (1, 1)
+
+
+def test_bulk_load_rejects_cname_loop_through_existing_hosts(engine):
+    """Test a staged CNAME closing a loop over existing CNAMEs is rejected."""
+    # Arrange
+    bulk_load(engine, read_dump(_dump(
+        _cname("b.example.com", "c.example.com"),
+        _cname("c.example.com", "a.example.com"),
+    )))
+    
+    # Act
+    errors = _rejected(engine, _cname("a.example.com", "b.example.com"))
+    
+    # Assert
+    assert errors == ["a.example.com: CNAME chain loops or is longer than 8"]
+
+
+def _chain(hops):
+    """A chain of ``hops`` CNAMEs, c{hops} -> ... -> c1 -> end."""
+    cnames = [
+        {
+            "hostname": f"c{i}.example.com",
+            "records": [
+                {"type": "CNAME", "value": f"c{i - 1}.example.com", "ttl": 300}
+            ],
+        }
+        for i in range(2, hops + 1)
+    ]
+    return [
+        {
+            "hostname": "end.example.com",
+            "records": [{"type": "A", "value": "10.0.0.1"}],
+        },
+        {
+            "hostname": "c1.example.com",
+            "records": [{"type": "CNAME", "value": "end.example.com", "ttl": 300}],
+        },
+        *cnames,
+    ]
+
+
+def test_bulk_load_accepts_chains_of_the_maximum_length(engine):
+    """Test a chain of MAX_CNAME_CHAIN_LENGTH hops loads and one more hop does not."""
+    # Act
+    result = bulk_load(engine, read_dump(_dump(*_chain(MAX_CNAME_CHAIN_LENGTH))))
+    errors = _rejected(
+        engine,
+        {
+            "hostname": "too-long.example.com",
+            "records": [
+                {
+                    "type": "CNAME",
+                    "value": f"c{MAX_CNAME_CHAIN_LENGTH}.example.com",
+                    "ttl": 300,
+                }
+            ],
+        },
+    )
+
+    # Assert
+    assert result.records_inserted == MAX_CNAME_CHAIN_LENGTH + 1
+    assert errors == [
+        f"too-long.example.com: CNAME chain loops or is longer than "
+        f"{MAX_CNAME_CHAIN_LENGTH}"
+    ]
+
+
+def test_copy_buffer_encodes_csv_with_nulls():
+    """Test COPY input quotes strings and leaves NULLs as empty fields."""
+    # Arrange
+    buffer = _CopyBuffer([(1, "a,b", None, ""), (2, 'say "hi"', 3, 1.5)])
+    
+    # Act
+    data = b"".join(iter(lambda: buffer.read(5), b""))
+    
+    # Assert
+    assert data == b'1,"a,b",,""\n2,"say ""hi""",3,"1.5"\n'
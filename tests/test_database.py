@@ -0,0 +1,75 @@
+"""Tests for engine construction and SQLite performance profiles."""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core.database import build_engine, is_memory_sqlite, sqlite_read_only_url
+from app.core.settings import SQLITE_PROFILES, DatabaseSettings
+
+
+def test_profile_pragmas_applied_per_connection(tmp_path):
+    """Test the selected profile is applied to new writer connections."""
+    # Arrange
+    url = f"sqlite:///{tmp_path / 'dns.db'}"
+    pragmas = DatabaseSettings(DB_SQLITE_PROFILE="balanced").SQLITE_PRAGMAS
+    
+    # Act
+    engine = build_engine(url, pragmas=pragmas)
+    with engine.connect() as conn:
+        journal_mode = conn.execute(text("PRAGMA journal_mode")).scalar()
+        synchronous = conn.execute(text("PRAGMA synchronous")).scalar()
+        cache_size = conn.execute(text("PRAGMA cache_size")).scalar()
+        busy_timeout = conn.execute(text("PRAGMA busy_timeout")).scalar()
+    
+    # Assert
+    assert journal_mode == "wal"
+    assert synchronous == 1  # NORMAL
+    assert cache_size == SQLITE_PROFILES["balanced"]["cache_size"]
+    assert busy_timeout == pragmas["busy_timeout"]
+
+
+def test_pragma_overrides():
+    """Test explicit settings override the profile values."""
+    # Act
+    pragmas = DatabaseSettings(
+        DB_SQLITE_PROFILE="fast", DB_SQLITE_CACHE_SIZE=-1000
+    ).SQLITE_PRAGMAS
+    
+    # Assert
+    assert pragmas["cache_size"] == -1000
+    assert pragmas["synchronous"] == "OFF"
+
+
+def test_unknown_profile_rejected():
+    """Test an unknown profile name fails validation."""
+    with pytest.raises(ValueError):
+        DatabaseSettings(DB_SQLITE_PROFILE="turbo")
+
+
+def test_read_only_engine_rejects_writes(tmp_path):
+    """Test the reader engine sees committed data but cannot write."""
+    # Arrange
+    url = f"sqlite:///{tmp_path / 'dns.db'}"
+    writer = build_engine(url)
+    with writer.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (1)"))
+    reader = build_engine(url, read_only=True)
+    
+    # Act & Assert
+    with reader.connect() as conn:
+        assert conn.execute(text("SELECT x FROM t")).scalar() == 1
+        assert conn.execute(text("PRAGMA query_only")).scalar() == 1
+        with pytest.raises(OperationalError):
+            conn.execute(text("INSERT INTO t VALUES (2)"))
+
+
+def test_url_helpers():
+    """Test SQLite URL classification and read-only rewriting."""
+    assert is_memory_sqlite("sqlite:///:memory:")
+    assert is_memory_sqlite("sqlite://")
+    assert not is_memory_sqlite("sqlite:///sql_app.db")
+    assert (
+        sqlite_read_only_url("sqlite:///sql_app.db")
+        == "sqlite:///file:sql_app.db?mode=ro&uri=true"
+    )
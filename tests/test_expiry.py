@@ -0,0 +1,175 @@
+"""Tests for deadline-driven record expiry."""
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import status
+from sqlalchemy import update
+from sqlmodel import select
+
+from app.core.expiry import RecordExpiry
+from app.models import Host, Record, RecordType
+from tests.test_utils import create_test_host
+
+
+@pytest.fixture
+def expiry(session_factory):
+    """RecordExpiry over a fresh file database."""
+    return RecordExpiry(
+        session_factory=session_factory, horizon_seconds=60, chunk_size=2
+    )
+
+
+def _add_records(expiry, *offsets):
+    """Add one A record per offset (seconds from now, or None); return their IDs."""
+    now = datetime.utcnow()
+    with expiry.session_factory() as session:
+        host = Host(hostname="example.com")
+        session.add(host)
+        session.flush()
+        records = [
+            Record(
+                type=RecordType.A,
+                value=f"192.168.1.{i}",
+                ttl=300,
+                host_id=host.id,
+                expires_at=None if offset is None else now + timedelta(seconds=offset),
+            )
+            for i, offset in enumerate(offsets, start=1)
+        ]
+        session.add_all(records)
+        session.flush()
+        return [r.id for r in records]
+
+
+def _add_records_to_existing_host(expiry, offset):
+    with expiry.session_factory() as session:
+        host = session.exec(select(Host)).first()
+        record = Record(
+            type=RecordType.A,
+            value="10.0.0.1",
+            ttl=300,
+            host_id=host.id,
+            expires_at=datetime.utcnow() + timedelta(seconds=offset),
+        )
+        session.add(record)
+        session.flush()
+        return [record.id]
+
+
+def _remaining(expiry):
+    with expiry.session_factory() as session:
+        return set(session.exec(select(Record.id)).all())
+
+
+def test_expire_due_deletes_in_chunks(expiry, monkeypatch):
+    """Test due records are deleted chunk by chunk."""
+    # Arrange
+    ids = _add_records(expiry, -5, -4, -3, -2, -1, None, 3600)
+    chunks = []
+    delete_chunk = expiry.delete_chunk
+    
+    def record_chunk(record_ids):
+        chunks.append(len(record_ids))
+        return delete_chunk(record_ids)
+    
+    monkeypatch.setattr(expiry, "delete_chunk", record_chunk)
+    
+    # Act
+    loaded = expiry.refill()
+    backlog = expiry.backlog()
+    deleted = asyncio.run(expiry.expire_due())
+    
+    # Assert
+    assert loaded == 5
+    assert backlog == 5
+    assert deleted == 5
+    assert _remaining(expiry) == set(ids[5:])
+    assert chunks == [2, 2, 1]
+    assert expiry.lag.count >= 5
+
+
+def test_extended_expiry_is_not_deleted(expiry):
+    """Test a record whose expiry moved later survives its stale deadline."""
+    # Arrange
+    [record_id] = _add_records(expiry, -1)
+    expiry.refill()
+    with expiry.session_factory() as session:
+        session.execute(
+            update(Record)
+            .where(Record.id == record_id)
+            .values(
+                expires_at=datetime.utcnow() + timedelta(hours=1),
+                updated_at=datetime.utcnow(),
+            )
+        )
+    
+    # Act
+    deleted = asyncio.run(expiry.expire_due())
+    
+    # Assert
+    assert deleted == 0
+    assert _remaining(expiry) == {record_id}
+
+
+def test_run_fires_within_a_second_of_deadline(expiry):
+    """Test a record scheduled while the worker sleeps is deleted on time."""
+    # Arrange
+    _add_records(expiry, None)
+    
+    async def scenario():
+        worker = asyncio.create_task(expiry.run())
+        await asyncio.sleep(0.05)
+        [record_id] = _add_records_to_existing_host(expiry, 0.3)
+        expiry.schedule(record_id, datetime.utcnow() + timedelta(seconds=0.3))
+        started = time.monotonic()
+        while record_id in _remaining(expiry) and time.monotonic() - started < 3:
+            await asyncio.sleep(0.05)
+        worker.cancel()
+        return time.monotonic() - started
+    
+    # Act
+    elapsed = asyncio.run(scenario())
+    
+    # Assert
+    assert elapsed < 1.3
+
+
+def test_leader_and_scheduling_worker_expire_a_record_once(expiry):
+    """Test a record expired by both its own worker and the leader counts once."""
+    # Arrange
+    [record_id] = _add_records(expiry, -1)
+    worker = RecordExpiry(session_factory=expiry.session_factory, horizon_seconds=60)
+    worker.schedule(record_id, datetime.utcnow() - timedelta(seconds=1))
+    expiry.lead(True)
+    expiry.refill()
+
+    # Act
+    by_worker = asyncio.run(worker.expire_due())
+    by_leader = asyncio.run(expiry.expire_due())
+
+    # Assert
+    assert (by_worker, by_leader) == (1, 0)
+    assert _remaining(expiry) == set()
+
+
+def test_create_record_with_expiry(client):
+    """Test records accept a future expiry time and reject a past one."""
+    # Arrange
+    host = create_test_host(client, "example.com")
+    record = {"type": "A", "value": "192.168.1.1", "ttl": 300, "host_id": host["id"]}
+    future = (datetime.utcnow() + timedelta(hours=1)).isoformat() + "Z"
+    past = (datetime.utcnow() - timedelta(hours=1)).isoformat() + "Z"
+    
+    # Act
+    created = client.post("/api/records/", json={**record, "expires_at": future})
+    rejected = client.post(
+        "/api/records/", json={**record, "value": "192.168.1.2", "expires_at": past}
+    )
+    
+    # Assert
+    assert created.status_code == status.HTTP_201_CREATED
+    assert created.json()["expires_at"] is not None
+    assert rejected.status_code == status.HTTP_400_BAD_REQUEST
+    assert rejected.json()["error"]["code"] == "INVALID_EXPIRES_AT"
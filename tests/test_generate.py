@@ -0,0 +1,105 @@
+"""Tests for the synthetic zone generator."""
+import pytest
+from sqlalchemy import func, select
+from sqlmodel import SQLModel
+
+from app.cli.generate import ZoneGenerator, ZoneShape
+from app.core.bulk import bulk_load
+from app.core.database import build_engine
+from app.core.validators import MAX_CNAME_CHAIN_LENGTH
+from app.models import Record
+
+
+def _zone(**options):
+    return list(ZoneGenerator(ZoneShape(**options)).hosts())
+
+
+def test_generator_is_deterministic_by_seed():
+    """Test the same seed gives the same zone and another seed a different one."""
+    # Act
+    first = _zone(hosts=500, seed=7)
+    again = _zone(hosts=500, seed=7)
+    other = _zone(hosts=500, seed=8)
+
+    # Assert
+    assert first == again
+    assert first != other
+
+
+def test_generated_chains_have_their_depth_and_share_tails():
+    """Test every CNAME chain is as long as its depth and popular tails are shared."""
+    # Arrange
+    hosts = _zone(
+        hosts=2000, mix={"a": 50, "mx": 10, "cname": 40}, chain_depth={1: 50, 3: 50}
+    )
+    cnames = {
+        host["hostname"]: host["records"][0]["value"]
+        for host in hosts if host["records"][0]["type"] == "CNAME"
+    }
+
+    # Act
+    depths = {}
+    for hostname in cnames:
+        hops, name = 0, hostname
+        while name in cnames:
+            hops, name = hops + 1, cnames[name]
+        depths[hostname] = hops
+
+    # Assert
+    assert all(depths[name] == int(name[1:name.index("-")]) for name in cnames)
+    assert set(depths.values()) == {1, 2, 3}
+    targets = [cnames[name] for name in cnames if name.startswith("c1-")]
+    assert max(targets.count(t) for t in set(targets)) > 10
+
+
+def test_generated_zone_loads_in_bulk(tmp_path):
+    """Test a generated zone passes the bulk load checks with shared MX sets."""
+    # Arrange
+    engine = build_engine(f"sqlite:///{tmp_path / 'generated.db'}")
+    SQLModel.metadata.create_all(engine)
+    generator = ZoneGenerator(ZoneShape(hosts=1000, mx_sets=5))
+
+    # Act
+    result = bulk_load(engine, enumerate(generator.hosts(), start=1))
+
+    # Assert
+    assert (result.hosts_inserted, result.records_inserted) == (
+        generator.host_count, generator.record_count
+    )
+    with engine.connect() as conn:
+        mail_servers, mail_domains = conn.execute(
+            select(
+                func.count(func.distinct(Record.value)),
+                func.count(func.distinct(Record.host_id)),
+            ).where(Record.type == "MX")
+        ).one()
+    # Sets of 1, 2, 3, 1 and 2 servers, shared by the 100 mail domains
+    assert (mail_servers, mail_domains) == (9, 100)
+
+
+def test_generated_chains_of_the_maximum_depth_load_in_bulk(tmp_path):
+    """Test chains of MAX_CNAME_CHAIN_LENGTH hops pass the bulk load checks."""
+    # Arrange
+    engine = build_engine(f"sqlite:///{tmp_path / 'deep.db'}")
+    SQLModel.metadata.create_all(engine)
+    generator = ZoneGenerator(
+        ZoneShape(
+            hosts=200,
+            mix={"a": 50, "cname": 50},
+            chain_depth={MAX_CNAME_CHAIN_LENGTH: 1},
+        )
+    )
+
+    # Act
+    result = bulk_load(engine, enumerate(generator.hosts(), start=1))
+
+    # Assert
+    assert result.hosts_inserted == generator.host_count
+    assert generator.cnames_by_depth[MAX_CNAME_CHAIN_LENGTH] > 1
+
+
+def test_generator_rejects_chains_longer_than_allowed():
+    """Test chain depths beyond MAX_CNAME_CHAIN_LENGTH are refused."""
+    # Act / Assert
+    with pytest.raises(ValueError, match="--chain-depth"):
+        ZoneGenerator(ZoneShape(hosts=10, chain_depth={99: 1}))
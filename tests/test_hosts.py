@@ -2,7 +2,7 @@
 import pytest
 from fastapi import status
 
-from tests.test_utils import assert_error_response, create_test_host
+from tests.test_utils import assert_error_response, create_test_host, create_test_record
 
 
 def test_create_host_success(client):
@@ -39,6 +39,41 @@ def test_create_duplicate_host(client):
     )
 
 
+def test_create_host_duplicate_in_other_spelling(client):
+    """Test hostnames differing only in case or a trailing dot are the same host."""
+    # Arrange
+    create_test_host(client, "example.com")
+    
+    # Act
+    responses = [
+        client.post("/api/hosts/", json={"hostname": hostname})
+        for hostname in ("Example.COM", "example.com.")
+    ]
+    
+    # Assert
+    for response in responses:
+        assert_error_response(
+            response,
+            status_code=status.HTTP_409_CONFLICT,
+            error_code="HOST_EXISTS"
+        )
+
+
+def test_create_host_internationalized(client):
+    """Test an IDN hostname is stored as given and found by its IDNA form."""
+    # Arrange
+    host = create_test_host(client, "bücher.example")
+    create_test_record(client, host["id"], "A", "192.168.1.1")
+    
+    # Act
+    response = client.get("/api/resolve/xn--bcher-kva.example")
+    
+    # Assert
+    assert host["hostname"] == "bücher.example"
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["records"][0]["value"] == "192.168.1.1"
+
+
 def test_create_host_invalid_hostname(client):
     """Test creating a host with an invalid hostname."""
     # Arrange & Act
@@ -107,3 +142,121 @@ def test_get_host_success(client):
     assert host["hostname"] == "example.com"
     assert host["description"] == "Test host"
     assert "created_at" in host
+
+
+def test_get_host_returns_etag(client):
+    """Test getting a host exposes its version as an ETag."""
+    # Arrange
+    created_host = create_test_host(client, "example.com")
+    
+    # Act
+    response = client.get(f"/api/hosts/{created_host['id']}")
+    
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] == '"1"'
+    assert response.json()["version"] == 1
+
+
+def test_update_host_with_if_match(client):
+    """Test updating a host with a matching If-Match bumps the version."""
+    # Arrange
+    host = create_test_host(client, "example.com")
+    
+    # Act
+    response = client.patch(
+        f"/api/hosts/{host['id']}",
+        json={"hostname": "renamed.example.com"},
+        headers={"If-Match": '"1"'}
+    )
+    
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["hostname"] == "renamed.example.com"
+    assert data["version"] == 2
+    assert response.headers["etag"] == '"2"'
+
+
+def test_update_host_stale_if_match(client):
+    """Test updating a host with a stale If-Match fails with 412."""
+    # Arrange
+    host = create_test_host(client, "example.com")
+    client.patch(f"/api/hosts/{host['id']}", json={"description": "changed"})
+    
+    # Act
+    response = client.patch(
+        f"/api/hosts/{host['id']}",
+        json={"description": "stale write"},
+        headers={"If-Match": '"1"'}
+    )
+    
+    # Assert
+    assert_error_response(
+        response,
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        error_code="VERSION_MISMATCH"
+    )
+
+
+def test_update_host_duplicate_hostname(client):
+    """Test renaming a host onto an existing hostname fails."""
+    # Arrange
+    create_test_host(client, "example.com")
+    other = create_test_host(client, "other.com")
+    
+    # Act
+    response = client.patch(
+        f"/api/hosts/{other['id']}", json={"hostname": "example.com"}
+    )
+    
+    # Assert
+    assert_error_response(
+        response,
+        status_code=status.HTTP_409_CONFLICT,
+        error_code="HOST_EXISTS"
+    )
+
+
+def test_update_host_changes_case_of_own_hostname(client):
+    """Test a host can be renamed to another spelling of its own hostname."""
+    # Arrange
+    host = create_test_host(client, "example.com")
+    
+    # Act
+    response = client.patch(
+        f"/api/hosts/{host['id']}", json={"hostname": "Example.com"}
+    )
+    
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["hostname"] == "Example.com"
+
+
+def test_delete_host(client):
+    """Test deleting a host removes it and its records."""
+    # Arrange
+    host = create_test_host(client, "example.com")
+    create_test_record(client, host["id"], "A", "192.168.1.1")
+    
+    # Act
+    response = client.delete(f"/api/hosts/{host['id']}", headers={"If-Match": '"1"'})
+    
+    # Assert
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert (
+        client.get(f"/api/hosts/{host['id']}").status_code == status.HTTP_404_NOT_FOUND
+    )
+    assert client.get("/api/records/").json() == []
+
+
+def test_delete_host_stale_if_match(client):
+    """Test deleting a host with a stale If-Match fails with 412."""
+    # Arrange
+    host = create_test_host(client, "example.com")
+    
+    # Act
+    response = client.delete(f"/api/hosts/{host['id']}", headers={"If-Match": '"7"'})
+    
+    # Assert
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
@@ -0,0 +1,140 @@
+"""Tests for Idempotency-Key handling on POST endpoints."""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import status
+
+from app.core.idempotency import idempotency_store
+from app.models import IdempotencyKey
+from tests.test_utils import create_test_host
+
+
+@pytest.fixture(autouse=True)
+def clear_idempotency_cache():
+    """Keep the in-process response cache from leaking between tests."""
+    idempotency_store.clear_cache()
+    yield
+    idempotency_store.clear_cache()
+
+
+def test_create_host_retry_replays_response(client):
+    """Test a retried create_host replays the first response."""
+    # Arrange
+    headers = {"Idempotency-Key": "deploy-1"}
+    host_data = {"hostname": "example.com", "description": "Test host"}
+    
+    # Act
+    first = client.post("/api/hosts/", json=host_data, headers=headers)
+    second = client.post("/api/hosts/", json=host_data, headers=headers)
+    
+    # Assert
+    assert first.status_code == status.HTTP_201_CREATED
+    assert second.status_code == status.HTTP_201_CREATED
+    assert second.json() == first.json()
+    assert second.headers["idempotency-replayed"] == "true"
+    assert len(client.get("/api/hosts/").json()) == 1
+
+
+def test_replay_from_table_without_cache(client):
+    """Test a retry is answered from the stored row after the cache is dropped."""
+    # Arrange
+    host = create_test_host(client, "example.com")
+    headers = {"Idempotency-Key": "record-1"}
+    record_data = {
+        "type": "A",
+        "value": "192.168.1.1",
+        "ttl": 300,
+        "host_id": host["id"],
+    }
+    first = client.post("/api/records/", json=record_data, headers=headers)
+    idempotency_store.clear_cache()
+    
+    # Act
+    second = client.post("/api/records/", json=record_data, headers=headers)
+    
+    # Assert
+    assert second.status_code == status.HTTP_201_CREATED
+    assert second.json()["id"] == first.json()["id"]
+
+
+def test_key_reused_with_different_payload(client):
+    """Test reusing a key with a different body is rejected."""
+    # Arrange
+    headers = {"Idempotency-Key": "deploy-1"}
+    client.post("/api/hosts/", json={"hostname": "example.com"}, headers=headers)
+    
+    # Act
+    response = client.post(
+        "/api/hosts/", json={"hostname": "other.com"}, headers=headers
+    )
+    
+    # Assert
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["error"]["code"] == "IDEMPOTENCY_KEY_REUSED"
+
+
+def test_failed_request_releases_key(client):
+    """Test a failed request does not store a response for its key."""
+    # Arrange
+    headers = {"Idempotency-Key": "bad-1"}
+    
+    # Act
+    first = client.post(
+        "/api/hosts/", json={"hostname": "invalid hostname!"}, headers=headers
+    )
+    retry = client.post(
+        "/api/hosts/", json={"hostname": "invalid hostname!"}, headers=headers
+    )
+    
+    # Assert
+    assert first.status_code == status.HTTP_400_BAD_REQUEST
+    assert retry.status_code == status.HTTP_400_BAD_REQUEST
+    assert "idempotency-replayed" not in retry.headers
+
+
+def test_prune_drops_expired_keys(db):
+    """Test pruning removes expired rows."""
+    # Arrange
+    now = datetime.utcnow()
+    db.add(IdempotencyKey(
+        key="POST /hosts/:old", request_hash="x", status_code=201,
+        response_body="{}", expires_at=now - timedelta(seconds=1),
+    ))
+    db.add(IdempotencyKey(
+        key="POST /hosts/:new", request_hash="x", status_code=201,
+        response_body="{}", expires_at=now + timedelta(hours=1),
+    ))
+    db.commit()
+    
+    # Act
+    deleted = idempotency_store.prune(db)
+    
+    # Assert
+    assert deleted == 1
+    assert db.get(IdempotencyKey, "POST /hosts/:new") is not None
+
+
+def test_claim_of_a_dead_request_is_taken_over(client, db):
+    """Test a pending claim older than its lease no longer blocks the key."""
+    # Arrange
+    headers = {"Idempotency-Key": "crashed-1"}
+    host_data = {"hostname": "example.com"}
+    claimed_at = datetime.utcnow() - timedelta(
+        seconds=idempotency_store.claim_lease.total_seconds() + 1
+    )
+    db.add(IdempotencyKey(
+        key="POST /hosts/:crashed-1", request_hash="from-the-dead-request",
+        created_at=claimed_at, expires_at=claimed_at + timedelta(hours=1),
+    ))
+    db.commit()
+    
+    # Act
+    taken_over = client.post("/api/hosts/", json=host_data, headers=headers)
+    retry = client.post("/api/hosts/", json=host_data, headers=headers)
+    
+    # Assert
+    assert taken_over.status_code == status.HTTP_201_CREATED
+    assert "idempotency-replayed" not in taken_over.headers
+    assert retry.headers["idempotency-replayed"] == "true"
+    assert retry.json() == taken_over.json()
+    assert len(client.get("/api/hosts/").json()) == 1
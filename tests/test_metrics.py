@@ -0,0 +1,139 @@
+"""Tests for metrics, their exposition and the metrics middleware."""
+import asyncio
+import json
+import logging
+import threading
+
+from fastapi import status
+from sqlalchemy import text
+
+from app.core.database import build_engine
+from app.core.metrics import Counter, Histogram, MetricsRegistry, render_prometheus
+from app.core.middleware import MetricsMiddleware
+from tests.test_utils import create_test_host, create_test_record
+
+
+def test_metrics_count_updates_from_many_threads():
+    """Test lock-free counters and histograms lose no updates across threads."""
+    # Arrange
+    counter = Counter()
+    histogram = Histogram(buckets=(1.0,))
+
+    def work():
+        for _ in range(10_000):
+            counter.inc()
+            histogram.observe(0.5)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+
+    # Act
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Assert
+    assert counter.value == 80_000
+    assert histogram.count == 80_000
+    assert histogram.cumulative_buckets() == [(1.0, 80_000), (float("inf"), 80_000)]
+
+
+def test_render_prometheus_exposition_format():
+    """Test every metric kind renders with HELP, TYPE and escaped labels."""
+    # Arrange
+    metrics = MetricsRegistry()
+    metrics.counter("jobs_total", "Jobs run", job='say "hi"').inc(2)
+    metrics.gauge("queue_depth", "Queued jobs").set(3)
+    metrics.histogram("job_seconds", "Job duration", buckets=(0.1, 1.0)).observe(0.5)
+
+    # Act
+    text = render_prometheus(metrics)
+
+    # Assert
+    assert text.splitlines() == [
+        "# HELP job_seconds Job duration",
+        "# TYPE job_seconds histogram",
+        'job_seconds_bucket{le="0.1"} 0',
+        'job_seconds_bucket{le="1.0"} 1',
+        'job_seconds_bucket{le="+Inf"} 1',
+        "job_seconds_sum 0.5",
+        "job_seconds_count 1",
+        "# HELP jobs_total Jobs run",
+        "# TYPE jobs_total counter",
+        'jobs_total{job="say \\"hi\\""} 2.0',
+        "# HELP queue_depth Queued jobs",
+        "# TYPE queue_depth gauge",
+        "queue_depth 3.0",
+    ]
+
+
+def test_metrics_endpoint_reports_routes_queries_and_hops(client):
+    """Test /metrics exposes per-route latency, database work and resolver hops."""
+    # Arrange
+    www = create_test_host(client, "www.metrics.example")
+    apex = create_test_host(client, "metrics.example")
+    create_test_record(client, www["id"], "CNAME", "metrics.example")
+    create_test_record(client, apex["id"], "A", "192.168.1.1")
+    client.get("/api/resolve/www.metrics.example")
+
+    # Act
+    response = client.get("/metrics")
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    route = 'method="GET",route="/api/resolve/{hostname}"'
+    assert f'http_request_duration_seconds_count{{{route},status="200"}}' in text
+    assert f"http_request_db_queries_sum{{{route}}}" in text
+    assert 'resolver_cname_hops_bucket{le="1.0"}' in text
+    assert "http_requests_in_flight " in text
+    assert 'sqlalchemy_statement_cache_total{result="hit"}' in text
+
+
+def test_responses_carry_server_timing_and_log_a_line(client, caplog):
+    """Test each response reports its database time and query count."""
+    # Arrange
+    host = create_test_host(client, "timing.example")
+    create_test_record(client, host["id"], "A", "192.168.1.1")
+    caplog.set_level(logging.INFO, logger="app.requests")
+
+    # Act
+    response = client.get("/api/resolve/timing.example")
+
+    # Assert
+    db, app = response.headers["server-timing"].split(", ")
+    assert db.startswith("db;dur=") and db.endswith(';desc="1 queries"')
+    assert app.startswith("app;dur=")
+    line = json.loads(caplog.records[-1].getMessage())
+    assert line["route"] == "/api/resolve/{hostname}"
+    assert (line["status"], line["queries"]) == (200, 1)
+
+
+def test_requests_over_the_query_budget_are_logged(tmp_path, caplog):
+    """Test a request over its query budget logs the repeated statement."""
+    # Arrange
+    engine = build_engine(f"sqlite:///{tmp_path / 'budget.db'}")
+
+    async def endpoint(scope, receive, send):
+        with engine.connect() as conn:
+            for i in range(3):
+                conn.execute(text("SELECT :i"), {"i": i})
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def noop(message):
+        pass
+
+    middleware = MetricsMiddleware(endpoint, query_budget=2)
+    scope = {"type": "http", "method": "GET", "path": "/budget"}
+
+    # Act
+    asyncio.run(middleware(scope, None, noop))
+
+    # Assert
+    warnings = [r for r in caplog.records if r.levelno == logging.WARNING]
+    assert len(warnings) == 1
+    assert "ran 3 queries, over the budget of 2; most repeated (3x): SELECT ?" in (
+        warnings[0].getMessage()
+    )
@@ -0,0 +1,125 @@
+"""Tests for schema migrations."""
+import pytest
+from alembic import command
+from sqlalchemy import create_engine, inspect, text
+
+from app.core.migrations import (
+    BASELINE_REVISION,
+    alembic_config,
+    current_revision,
+    head_revision,
+    migrate,
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """A file-backed SQLite engine with an empty database."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def baseline(engine):
+    """A database created before migrations were added, holding one host."""
+    with engine.begin() as conn:
+        command.upgrade(alembic_config(conn), BASELINE_REVISION)
+        conn.execute(text("DROP TABLE alembic_version"))
+        conn.execute(text("INSERT INTO host (hostname) VALUES ('example.com')"))
+        conn.execute(text(
+            "INSERT INTO record (type, value, ttl, host_id) "
+            "VALUES ('A', '192.0.2.1', 300, 1)"
+        ))
+    return engine
+
+
+def _columns(engine, table):
+    return {column["name"] for column in inspect(engine).get_columns(table)}
+
+
+def test_migrate_creates_and_stamps_an_empty_database(engine):
+    """Test an empty database gets the current schema at the latest revision."""
+    # Act
+    migrate(engine)
+
+    # Assert
+    assert {"host", "record"} <= set(inspect(engine).get_table_names())
+    with engine.connect() as conn:
+        assert current_revision(conn) == head_revision()
+
+
+def test_migrate_upgrades_a_baseline_database(baseline):
+    """Test a database created before migrations gains the new columns."""
+    # Act
+    migrate(baseline)
+
+    # Assert
+    assert "version" in _columns(baseline, "host")
+    assert "version" in _columns(baseline, "record")
+    with baseline.connect() as conn:
+        assert conn.execute(text("SELECT version FROM host")).scalar() == 1
+        assert conn.execute(text("SELECT version FROM record")).scalar() == 1
+        assert current_revision(conn) == head_revision()
+
+
+def test_migrate_is_a_no_op_at_the_latest_revision(baseline):
+    """Test migrating twice leaves the database as it was."""
+    # Arrange
+    migrate(baseline)
+
+    # Act
+    migrate(baseline)
+
+    # Assert
+    with baseline.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM host")).scalar() == 1
+        assert current_revision(conn) == head_revision()
+
+
+def test_migrate_adds_record_expiry(baseline):
+    """Test records gain a nullable, indexed expiry time."""
+    # Act
+    migrate(baseline)
+
+    # Assert
+    columns = {c["name"]: c for c in inspect(baseline).get_columns("record")}
+    indexes = {i["name"] for i in inspect(baseline).get_indexes("record")}
+    assert columns["expires_at"]["nullable"] is True
+    assert {"ix_record_expires_at", "ix_record_host_id"} <= indexes
+    with baseline.connect() as conn:
+        assert conn.execute(text("SELECT expires_at FROM record")).scalar() is None
+
+
+def test_migrate_backfills_canonical_hostnames(baseline):
+    """Test existing hosts get their canonical hostname and a unique index."""
+    # Arrange
+    with baseline.begin() as conn:
+        conn.execute(text("INSERT INTO host (hostname) VALUES ('WWW.Example.com.')"))
+
+    # Act
+    migrate(baseline)
+
+    # Assert
+    indexes = {i["name"]: i for i in inspect(baseline).get_indexes("host")}
+    assert indexes["ix_host_canonical_hostname"]["unique"]
+    with baseline.connect() as conn:
+        rows = conn.execute(
+            text("SELECT hostname, canonical_hostname FROM host ORDER BY id")
+        ).all()
+    assert rows == [
+        ("example.com", "example.com"),
+        ("WWW.Example.com.", "www.example.com"),
+    ]
+
+
+def test_migrate_refuses_hosts_with_the_same_canonical_hostname(baseline):
+    """Test colliding hostnames stop the migration before the schema changes."""
+    # Arrange
+    with baseline.begin() as conn:
+        conn.execute(text("INSERT INTO host (hostname) VALUES ('Example.COM.')"))
+
+    # Act / Assert
+    with pytest.raises(RuntimeError, match="example.com: Example.COM., example.com"):
+        migrate(baseline)
+    assert "canonical_hostname" not in _columns(baseline, "host")
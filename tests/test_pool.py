@@ -0,0 +1,86 @@
+"""Tests for connection pool instrumentation."""
+import logging
+
+import pytest
+from fastapi import status
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.database import build_engine
+from app.core.metrics import registry
+from app.core.pool import InstrumentedQueuePool, pool_status
+from app.core.settings import settings
+
+
+@pytest.fixture
+def tiny_pool(request, tmp_path, monkeypatch):
+    """Engine whose pool holds one connection and gives up after 50 ms."""
+    monkeypatch.setattr(settings.db, "DB_POOL_SIZE", 1)
+    monkeypatch.setattr(settings.db, "DB_MAX_OVERFLOW", 0)
+    monkeypatch.setattr(settings.db, "DB_POOL_TIMEOUT", 0.05)
+    engine = build_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", pool_size=1, name=request.node.name
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_pool_records_checkouts_and_timeouts(tiny_pool):
+    """Test checkouts, in-use gauges and timeouts are recorded."""
+    # Arrange
+    held = tiny_pool.connect()
+    
+    # Act
+    with pytest.raises(PoolTimeoutError):
+        tiny_pool.connect()
+    snapshot = pool_status()[tiny_pool.pool.stats.name]
+    held.close()
+    
+    # Assert
+    assert isinstance(tiny_pool.pool, InstrumentedQueuePool)
+    assert snapshot["checked_out"] == 1
+    assert snapshot["checkouts"] == 1
+    assert snapshot["timeouts"] == 1
+    assert snapshot["wait_seconds"]["count"] == 2
+    assert snapshot["wait_seconds"]["max"] >= 0.05
+    gauge = registry.gauge("db_pool_checked_out", pool=tiny_pool.pool.stats.name)
+    assert gauge.value == 0
+
+
+def test_pool_stats_survive_dispose(tiny_pool):
+    """Test a recreated pool keeps counting into the same metrics."""
+    # Arrange
+    tiny_pool.connect().close()
+    
+    # Act
+    tiny_pool.dispose()
+    tiny_pool.connect().close()
+    
+    # Assert
+    assert pool_status()[tiny_pool.pool.stats.name]["checkouts"] == 2
+
+
+def test_pool_warns_when_wait_p95_is_high(tiny_pool, caplog):
+    """Test a warning is logged once the p95 wait crosses the threshold."""
+    # Arrange
+    stats = tiny_pool.pool.stats
+    stats.warn_threshold = 0.01
+    stats.wait.observe(0.5)
+    
+    # Act
+    with caplog.at_level(logging.WARNING, logger="app.core.pool"):
+        tiny_pool.connect().close()
+    
+    # Assert
+    assert f"Connection pool {stats.name} is saturated" in caplog.text
+
+
+def test_status_reports_pools(client):
+    """Test /status includes the writer pool statistics."""
+    # Act
+    response = client.get("/status")
+    
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert "writer" in response.json()["pools"]
+    writer = response.json()["pools"]["writer"]
+    assert {"size", "checked_out", "timeouts", "wait_seconds"} <= set(writer)
@@ -0,0 +1,108 @@
+"""Tests for on-demand request profiling."""
+import asyncio
+import time
+
+from fastapi import status
+
+from app.core.middleware import ProfilingMiddleware
+from app.core.profiling import ProfileGate, ProfileStore, profile_store
+
+
+def _busy_endpoint_for_profiling():
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def endpoint(scope, receive, send):
+    _busy_endpoint_for_profiling()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def _request(middleware, token=None):
+    """Headers of the response to one request through ``middleware``."""
+    headers = [(b"x-profile-token", token.encode())] if token else []
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": headers}
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, None, send))
+    return dict(sent[0]["headers"])
+
+
+def test_profiles_requests_with_the_token(tmp_path):
+    """Test a request with the token is profiled and the next one is rate limited."""
+    # Arrange
+    store = ProfileStore(str(tmp_path), max_files=10)
+    middleware = ProfilingMiddleware(
+        endpoint,
+        enabled=True,
+        token="secret",
+        store=store,
+        gate=ProfileGate(min_interval=60),
+    )
+
+    # Act
+    unprofiled = _request(middleware)
+    wrong_token = _request(middleware, token="guess")
+    profiled = _request(middleware, token="secret")
+    limited = _request(middleware, token="secret")
+
+    # Assert
+    assert unprofiled == {} and wrong_token == {}
+    profile = store.path(profiled[b"x-profile-id"].decode()).read_text()
+    assert "_busy_endpoint_for_profiling" in profile
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in profile.splitlines())
+    assert limited == {b"x-profile-skipped": b"rate-limited"}
+
+
+def test_profiling_is_off_unless_enabled(tmp_path):
+    """Test the token does nothing while profiling is disabled."""
+    # Arrange
+    store = ProfileStore(str(tmp_path))
+    middleware = ProfilingMiddleware(
+        endpoint, enabled=False, token="secret", store=store
+    )
+
+    # Act
+    headers = _request(middleware, token="secret")
+
+    # Assert
+    assert headers == {}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_profile_store_keeps_newest_files(tmp_path):
+    """Test the profile directory is pruned to its maximum size."""
+    # Arrange
+    store = ProfileStore(str(tmp_path), max_files=2)
+    ids = [store.new_id() for _ in range(3)]
+
+    # Act
+    for i, profile_id in enumerate(ids):
+        store.write(profile_id, {"main;work": i + 1})
+        time.sleep(0.01)
+
+    # Assert
+    assert store.path(ids[0]) is None
+    assert store.path(ids[2]).read_text() == "main;work 3\n"
+
+
+def test_admin_serves_profiles(client, tmp_path, monkeypatch):
+    """Test stored profiles can be downloaded and unknown IDs are 404."""
+    # Arrange
+    monkeypatch.setattr(profile_store, "directory", tmp_path)
+    profile_id = profile_store.new_id()
+    profile_store.write(profile_id, {"main;resolve": 7})
+
+    # Act
+    found = client.get(f"/api/admin/profiles/{profile_id}")
+    missing = client.get("/api/admin/profiles/..%2Fsecrets")
+
+    # Assert
+    assert found.status_code == status.HTTP_200_OK
+    assert found.text == "main;resolve 7\n"
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,143 @@
+"""Tests for per-client token-bucket rate limiting."""
+import asyncio
+import json
+
+from app.core.middleware import RateLimitMiddleware
+from app.core.ratelimit import Budget, RateLimiter, SharedTokenBuckets, TokenBuckets
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def _request(
+    middleware, method="GET", path="/api/records/", api_key=None, ip="10.0.0.1"
+):
+    """Status, headers and body of one request through ``middleware``."""
+    headers = [(b"x-api-key", api_key.encode())] if api_key else []
+    scope = {
+        "type": "http", "method": method, "path": path, "headers": headers,
+        "client": (ip, 50000),
+    }
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, None, send))
+    body = b"".join(message.get("body", b"") for message in sent[1:])
+    return sent[0]["status"], dict(sent[0]["headers"]), body
+
+
+def test_bucket_allows_a_burst_then_refills_at_its_rate():
+    """Test a bucket gives its burst, refuses with the wait, refills and is swept."""
+    # Arrange
+    clock = Clock()
+    buckets = TokenBuckets(shards=4, clock=clock)
+    budget = Budget(rate=2.0, burst=3)
+
+    # Act
+    burst = [buckets.take("client", budget) for _ in range(3)]
+    refused = buckets.take("client", budget)
+    clock.now += 0.5
+    refilled = buckets.take("client", budget)
+    clock.now += 10
+    swept = buckets.sweep()
+
+    # Assert
+    assert burst == [0.0, 0.0, 0.0]
+    assert refused == 0.5
+    assert refilled == 0.0
+    assert swept == 1 and len(buckets) == 0
+
+
+def test_shared_buckets_limit_across_workers(tmp_path):
+    """Test two workers sharing a bucket file draw on one budget."""
+    # Arrange
+    clock = Clock()
+    path = str(tmp_path / "ratelimit.db")
+    workers = [SharedTokenBuckets(path, clock=clock) for _ in range(2)]
+    budget = Budget(rate=1.0, burst=4)
+
+    # Act
+    waits = [workers[i % 2].take("client", budget) for i in range(5)]
+    clock.now += 60
+    swept = workers[0].sweep()
+
+    # Assert
+    assert waits[:4] == [0.0] * 4
+    assert waits[4] == 1.0
+    assert swept == 1
+
+
+def test_middleware_refuses_over_budget_with_retry_after():
+    """Test reads and writes have separate budgets and refusals carry Retry-After."""
+    # Arrange
+    limiter = RateLimiter(
+        TokenBuckets(clock=Clock()), read=Budget(10.0, 2), write=Budget(0.5, 1)
+    )
+    middleware = RateLimitMiddleware(endpoint, enabled=True, limiter=limiter)
+
+    # Act
+    write = _request(middleware, method="POST")
+    refused_write = _request(middleware, method="POST")
+    reads = [_request(middleware)[0] for _ in range(3)]
+
+    # Assert
+    assert write[0] == 200
+    status, headers, body = refused_write
+    assert status == 429
+    assert headers[b"retry-after"] == b"2"
+    assert json.loads(body)["error"]["code"] == "RATE_LIMIT_EXCEEDED"
+    assert json.loads(body)["error"]["retry_after"] == 2
+    assert reads == [200, 200, 429]
+
+
+def test_middleware_keys_on_known_api_keys_and_exempts_health():
+    """Test known API keys get their own buckets and health checks are never limited."""
+    # Arrange
+    limiter = RateLimiter(
+        TokenBuckets(clock=Clock()), read=Budget(1.0, 1), write=Budget(1.0, 1)
+    )
+    middleware = RateLimitMiddleware(
+        endpoint, enabled=True, limiter=limiter, api_keys=["team-a"]
+    )
+
+    # Act
+    by_ip = [_request(middleware)[0] for _ in range(2)]
+    by_key = [_request(middleware, api_key="team-a")[0] for _ in range(2)]
+    health = [_request(middleware, path="/health")[0] for _ in range(3)]
+
+    # Assert
+    assert by_ip == [200, 429]
+    assert by_key == [200, 429]
+    assert health == [200, 200, 200]
+
+
+def test_middleware_limits_rotating_unknown_api_keys_by_ip():
+    """Test a client sending a new made-up API key each time is still limited."""
+    # Arrange
+    buckets = TokenBuckets(clock=Clock())
+    limiter = RateLimiter(buckets, read=Budget(1.0, 1), write=Budget(1.0, 1))
+    middleware = RateLimitMiddleware(
+        endpoint, enabled=True, limiter=limiter, api_keys=["team-a"]
+    )
+
+    # Act
+    statuses = [
+        _request(middleware, method="POST", api_key=f"made-up-{i}")[0]
+        for i in range(20)
+    ]
+
+    # Assert
+    assert statuses == [200] + [429] * 19
+    assert len(buckets) == 1
@@ -113,6 +113,26 @@ def test_create_cname_record(client):
     assert response.json()["type"] == "CNAME"
 
 
+def test_create_cname_record_loop(client):
+    """Test creating a CNAME that points back at its own host fails."""
+    # Arrange
+    host_a = create_test_host(client, "a.example.com")
+    host_b = create_test_host(client, "b.example.com")
+    create_test_record(client, host_a["id"], "CNAME", "b.example.com")
+    
+    # Act
+    response = client.post("/api/records/", json={
+        "type": "CNAME",
+        "value": "a.example.com",
+        "ttl": 300,
+        "host_id": host_b["id"]
+    })
+    
+    # Assert
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["error"]["code"] == "CNAME_LOOP_DETECTED"
+
+
 def test_create_duplicate_record(client):
     """Test creating a duplicate record fails."""
     # Arrange
@@ -192,3 +212,105 @@ def test_get_record_success(client):
     assert record["value"] == "192.168.1.1"
     assert record["host_id"] == host["id"]
     assert "created_at" in record
+
+
+def test_update_record_value(client):
+    """Test updating a record value with a matching If-Match."""
+    # Arrange
+    host = create_test_host(client, "example.com")
+    record = create_test_record(client, host["id"], "A", "192.168.1.1")
+    
+    # Act
+    response = client.patch(
+        f"/api/records/{record['id']}",
+        json={"value": "192.168.1.2"},
+        headers={"If-Match": f'"{record["version"]}"'}
+    )
+    
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["value"] == "192.168.1.2"
+    assert data["version"] == record["version"] + 1
+
+
+def test_update_record_stale_if_match(client):
+    """Test updating a record with a stale If-Match fails with 412."""
+    # Arrange
+    host = create_test_host(client, "example.com")
+    record = create_test_record(client, host["id"], "A", "192.168.1.1")
+    client.patch(f"/api/records/{record['id']}", json={"ttl": 600})
+    
+    # Act
+    response = client.patch(
+        f"/api/records/{record['id']}",
+        json={"ttl": 900},
+        headers={"If-Match": '"1"'}
+    )
+    
+    # Assert
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    assert response.json()["error"]["code"] == "VERSION_MISMATCH"
+
+
+def test_update_record_conflict(client):
+    """Test updating a record onto a duplicate value fails."""
+    # Arrange
+    host = create_test_host(client, "example.com")
+    create_test_record(client, host["id"], "A", "192.168.1.1")
+    record = create_test_record(client, host["id"], "A", "192.168.1.2")
+    
+    # Act
+    response = client.patch(
+        f"/api/records/{record['id']}", json={"value": "192.168.1.1"}
+    )
+    
+    # Assert
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.json()["error"]["code"] == "RECORD_CONFLICT"
+
+
+def test_update_record_cname_loop(client):
+    """Test updating a CNAME so that it closes a loop fails."""
+    # Arrange
+    host_a = create_test_host(client, "a.example.com")
+    host_b = create_test_host(client, "b.example.com")
+    create_test_record(client, host_b["id"], "CNAME", "a.example.com")
+    record = create_test_record(client, host_a["id"], "CNAME", "c.example.com")
+    
+    # Act
+    response = client.patch(
+        f"/api/records/{record['id']}", json={"value": "b.example.com"}
+    )
+    
+    # Assert
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["error"]["code"] == "CNAME_LOOP_DETECTED"
+
+
+def test_delete_record(client):
+    """Test deleting a record."""
+    # Arrange
+    host = create_test_host(client, "example.com")
+    record = create_test_record(client, host["id"], "A", "192.168.1.1")
+    
+    # Act
+    response = client.delete(
+        f"/api/records/{record['id']}", headers={"If-Match": '"1"'}
+    )
+    
+    # Assert
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert (
+        client.get(f"/api/records/{record['id']}").status_code
+        == status.HTTP_404_NOT_FOUND
+    )
+
+
+def test_delete_record_not_found(client):
+    """Test deleting a non-existent record."""
+    # Act
+    response = client.delete("/api/records/999")
+    
+    # Assert
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,106 @@
+"""Tests for read/write routing across primary and replica databases.
+
+Separate SQLite files stand in for the primary and its replicas; each holds
+a marker row so the tests can tell which database served a read.
+"""
+import pytest
+from fastapi import status
+from sqlalchemy import text
+from starlette.requests import Request
+
+from app.core.database import (
+    RECENT_WRITE_COOKIE,
+    ReplicaRouter,
+    build_engine,
+    wants_primary,
+)
+
+
+def _make_db(path, marker):
+    """Create a SQLite file holding a single marker row."""
+    engine = build_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE marker (name TEXT)"))
+        conn.execute(text("INSERT INTO marker VALUES (:name)"), {"name": marker})
+    return engine
+
+
+def _served_by(router, use_primary=False):
+    with router.connect(use_primary=use_primary) as conn:
+        return conn.execute(text("SELECT name FROM marker")).scalar()
+
+
+def _request(headers=None):
+    raw = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+@pytest.fixture
+def router(tmp_path):
+    """Router over a primary and two read-only replicas."""
+    primary = _make_db(tmp_path / "primary.db", "primary")
+    replicas = []
+    for name in ("replica1", "replica2"):
+        _make_db(tmp_path / f"{name}.db", name)
+        replicas.append(
+            build_engine(f"sqlite:///{tmp_path / f'{name}.db'}", read_only=True)
+        )
+    return ReplicaRouter(primary, replicas, retry_after=60)
+
+
+def test_reads_round_robin_across_replicas(router):
+    """Test consecutive reads alternate between replicas."""
+    # Act
+    served = [_served_by(router) for _ in range(4)]
+    
+    # Assert
+    assert served == ["replica1", "replica2", "replica1", "replica2"]
+
+
+def test_unhealthy_replica_is_skipped(router, tmp_path):
+    """Test a replica that fails to connect is taken out of rotation."""
+    # Arrange
+    router.replicas[0] = build_engine(
+        f"sqlite:///{tmp_path / 'missing.db'}", read_only=True
+    )
+    
+    # Act
+    served = [_served_by(router) for _ in range(3)]
+    
+    # Assert
+    assert served == ["replica2", "replica2", "replica2"]
+    assert len(router.healthy_replicas()) == 1
+
+
+def test_all_replicas_down_falls_back_to_primary(router):
+    """Test reads use the primary when no replica is healthy."""
+    # Arrange
+    for replica in router.replicas:
+        router.mark_down(replica)
+    
+    # Act & Assert
+    assert _served_by(router) == "primary"
+
+
+def test_read_your_writes_uses_primary(router):
+    """Test requests flagged for read-your-writes go to the primary."""
+    assert _served_by(router, use_primary=True) == "primary"
+
+
+def test_wants_primary_flags():
+    """Test the header and the recent-write cookie both select the primary."""
+    assert not wants_primary(_request())
+    assert wants_primary(_request({"X-Read-Your-Writes": "true"}))
+    assert wants_primary(_request({"Cookie": f"{RECENT_WRITE_COOKIE}=1"}))
+
+
+def test_write_sets_recent_write_cookie(client):
+    """Test a successful write marks the client with the recent-write cookie."""
+    # Act
+    created = client.post("/api/hosts/", json={"hostname": "example.com"})
+    rejected = client.post("/api/hosts/", json={"hostname": "invalid hostname!"})
+    
+    # Assert
+    assert created.status_code == status.HTTP_201_CREATED
+    assert RECENT_WRITE_COOKIE in created.cookies
+    assert RECENT_WRITE_COOKIE not in rejected.headers.get("set-cookie", "")
@@ -2,7 +2,7 @@
 import pytest
 from fastapi import status
 
-from app.models import RecordType
+from app.models import Record, RecordType
 from tests.test_utils import (
     assert_error_response,
     create_test_host,
@@ -52,6 +52,24 @@ def test_resolve_hostname_cname_chain(client):
     assert data["canonical_name"] == "example.com"
 
 
+def test_resolve_ignores_case_and_trailing_dot(client):
+    """Test hostnames and CNAME targets match in any case and with a trailing dot."""
+    # Arrange
+    www = create_test_host(client, "WWW.Example.com")
+    apex = create_test_host(client, "example.com")
+    create_test_record(client, www["id"], "CNAME", "EXAMPLE.com")
+    create_test_record(client, apex["id"], "A", "192.168.1.1")
+    
+    # Act
+    response = client.get("/api/resolve/www.example.COM.")
+    
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["canonical_name"] == "example.com"
+    assert data["records"][0]["value"] == "192.168.1.1"
+
+
 def test_resolve_nonexistent_hostname(client):
     """Test resolving a non-existent hostname."""
     # Act
@@ -103,14 +121,18 @@ def test_get_cname_chain_simple(client):
     assert data["resolved"] is True
 
 
-def test_get_cname_chain_with_loop(client):
+def test_get_cname_chain_with_loop(client, db):
     """Test getting a CNAME chain with a loop."""
     # Arrange
     host1 = create_test_host(client, "a.example.com")
     host2 = create_test_host(client, "b.example.com")
     
     create_test_record(client, host1["id"], "CNAME", "b.example.com")
-    create_test_record(client, host2["id"], "CNAME", "a.example.com")
+    # The API refuses to close the loop, so write the last CNAME directly
+    db.add(Record(
+        type=RecordType.CNAME, value="a.example.com", ttl=300, host_id=host2["id"]
+    ))
+    db.commit()
     
     # Act
     response = client.get("/api/cname-chain/a.example.com")
@@ -0,0 +1,254 @@
+"""Tests for hostname-hash sharding across SQLite files."""
+from collections import Counter
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.ext.horizontal_shard import set_shard_id
+
+from app.cli.reshard import move_host, reshard
+from app.core.database import (
+    build_engine,
+    build_shard_set,
+    get_db_session,
+    get_read_connection,
+    get_read_session,
+)
+from app.core.resolver import resolve_hostname
+from app.core.sharding import (
+    SHARD_ID_STRIDE,
+    jump_hash,
+    shard_for_hostname,
+    shard_for_id,
+)
+from app.main import app
+from app.models import Host, Record, RecordType
+
+
+def _shard_set(tmp_path, count, previous_count=None):
+    urls = [f"sqlite:///{tmp_path / f'shard{i}.db'}" for i in range(count)]
+    shards = build_shard_set(urls, previous_count=previous_count)
+    shards.primary = build_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    shards.create_all()
+    return shards
+
+
+def _add_host(shards, hostname, rtype=RecordType.A, value="10.0.0.1"):
+    with shards.session() as session:
+        host = Host(hostname=hostname)
+        session.add(host)
+        session.flush()
+        session.add(Record(type=rtype, value=value, ttl=300, host_id=host.id))
+        session.commit()
+        return host.id
+
+
+def test_jump_hash_moves_keys_only_to_new_bucket():
+    """Test growing the bucket count only moves keys onto the new bucket."""
+    # Act
+    moves = [(jump_hash(k, 4), jump_hash(k, 5)) for k in range(10000)]
+    
+    # Assert
+    moved = [(a, b) for a, b in moves if a != b]
+    assert all(b == 4 for _, b in moved)
+    assert 1500 < len(moved) < 2500
+
+
+def test_hosts_are_spread_and_ids_encode_shard(tmp_path):
+    """Test hosts land on their owner shard with shard-tagged IDs."""
+    # Arrange
+    shards = _shard_set(tmp_path, 3)
+    
+    # Act
+    ids = {
+        f"h{i}.example.com": _add_host(shards, f"h{i}.example.com") for i in range(30)
+    }
+    
+    # Assert
+    for hostname, host_id in ids.items():
+        assert shard_for_id(host_id) == shard_for_hostname(hostname, 3)
+    assert len(Counter(shard_for_id(i) for i in ids.values())) == 3
+    assert len(set(ids.values())) == 30
+
+
+def test_resolve_follows_cname_across_shards(tmp_path):
+    """Test the resolver follows a CNAME chain spanning several shards."""
+    # Arrange
+    shards = _shard_set(tmp_path, 3)
+    names = [f"c{i}.example.com" for i in range(5)]
+    for current, target in zip(names, names[1:]):
+        _add_host(shards, current, RecordType.CNAME, target)
+    _add_host(shards, names[-1], RecordType.A, "192.168.1.1")
+    assert len({shard_for_hostname(n, 3) for n in names}) > 1
+    
+    # Act
+    with shards.session(read_only=True) as session:
+        result = resolve_hostname(session, names[0])
+    
+    # Assert
+    assert result["canonical_name"] == names[-1]
+    assert result["records"][0]["value"] == "192.168.1.1"
+
+
+def test_reshard_moves_hosts_to_new_owner(tmp_path):
+    """Test growing from 2 to 3 shards moves only the re-owned hosts."""
+    # Arrange
+    old = _shard_set(tmp_path, 2)
+    for i in range(40):
+        _add_host(old, f"h{i}.example.com")
+    grown = _shard_set(tmp_path, 3, previous_count=2)
+    expected = sum(
+        1 for i in range(40) if shard_for_hostname(f"h{i}.example.com", 3) == 2
+    )
+    
+    # Act
+    moved = reshard(grown, batch_size=7)
+    
+    # Assert
+    assert moved == expected
+    with grown.session() as session:
+        for shard_id in grown.writers:
+            hosts = (
+                session.execute(select(Host).options(set_shard_id(shard_id)))
+                .scalars()
+                .all()
+            )
+            assert all(grown.owner(h.hostname) == shard_id for h in hosts)
+            records = (
+                session.execute(select(Record).options(set_shard_id(shard_id)))
+                .scalars()
+                .all()
+            )
+            assert {r.host_id for r in records} == {h.id for h in hosts}
+    assert reshard(grown) == 0
+
+
+def test_id_reservations_never_repeat(tmp_path):
+    """Test IDs reserved by one transaction are not handed out again."""
+    # Arrange
+    shards = _shard_set(tmp_path, 2)
+    
+    # Act
+    with shards.session() as first:
+        reserved = shards.allocate_ids(first, Host.__table__, "1", count=3)
+        first.commit()
+    with shards.session() as second:
+        following = shards.allocate_ids(second, Host.__table__, "1")
+    
+    # Assert
+    assert shard_for_id(reserved) == 1
+    assert following == reserved + 3 * SHARD_ID_STRIDE
+
+
+def test_move_host_replaces_records_of_an_interrupted_copy(tmp_path):
+    """Test a host copied by an interrupted run is moved with its current records."""
+    # Arrange
+    old = _shard_set(tmp_path, 2)
+    hostname = next(
+        f"h{i}.example.com"
+        for i in range(100)
+        if shard_for_hostname(f"h{i}.example.com", 3) == 2
+    )
+    host_id = _add_host(old, hostname, value="10.0.0.1")
+    grown = _shard_set(tmp_path, 3, previous_count=2)
+    with grown.session() as session:
+        # What an earlier run copied before it was interrupted
+        stale = Host(hostname=hostname)
+        session.add(stale)
+        session.flush()
+        session.add(
+            Record(type=RecordType.A, value="10.0.0.9", ttl=300, host_id=stale.id)
+        )
+        session.commit()
+    with old.session() as session:
+        session.add(
+            Record(type=RecordType.A, value="10.0.0.2", ttl=300, host_id=host_id)
+        )
+        session.commit()
+    
+    # Act
+    new_id = move_host(grown, host_id)
+    
+    # Assert
+    with grown.session() as session:
+        hosts = session.execute(
+            select(Host).where(Host.canonical_hostname == hostname)
+        ).scalars().all()
+        values = session.execute(
+            select(Record.value).where(Record.host_id == new_id)
+        ).scalars().all()
+    assert [h.id for h in hosts] == [new_id]
+    assert sorted(values) == ["10.0.0.1", "10.0.0.2"]
+
+
+@pytest.fixture
+def sharded_client(tmp_path):
+    """API client whose sessions are routed across three shards."""
+    shards = _shard_set(tmp_path, 3)
+    
+    def write_session():
+        with shards.session() as session:
+            yield session
+            session.commit()
+    
+    def read_session():
+        with shards.session(read_only=True) as session:
+            yield session
+    
+    app.dependency_overrides[get_db_session] = write_session
+    app.dependency_overrides[get_read_session] = read_session
+    app.dependency_overrides[get_read_connection] = read_session
+    with TestClient(app) as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+def test_sharded_api_scatter_gather_pagination(sharded_client):
+    """Test list endpoints merge per-shard keyset pages in ID order."""
+    # Arrange
+    created = [
+        sharded_client.post(
+            "/api/hosts/", json={"hostname": f"h{i}.example.com"}
+        ).json()["id"]
+        for i in range(12)
+    ]
+    
+    # Act
+    pages, after = [], None
+    while True:
+        params = {"limit": 5} if after is None else {"limit": 5, "after": after}
+        page = sharded_client.get("/api/hosts/", params=params).json()
+        if not page:
+            break
+        pages.append([h["id"] for h in page])
+        after = page[-1]["id"]
+    
+    # Assert
+    flat = [i for page in pages for i in page]
+    assert flat == sorted(created)
+    assert [len(p) for p in pages] == [5, 5, 2]
+
+
+def test_sharded_api_record_write_and_resolve(sharded_client):
+    """Test record writes route to the host's shard and resolve across shards."""
+    # Arrange
+    www = sharded_client.post(
+        "/api/hosts/", json={"hostname": "www.example.com"}
+    ).json()
+    apex = sharded_client.post("/api/hosts/", json={"hostname": "example.com"}).json()
+    
+    # Act
+    cname = sharded_client.post("/api/records/", json={
+        "type": "CNAME", "value": "example.com", "ttl": 300, "host_id": www["id"]
+    })
+    sharded_client.post("/api/records/", json={
+        "type": "A", "value": "192.168.1.1", "ttl": 300, "host_id": apex["id"]
+    })
+    response = sharded_client.get("/api/resolve/www.example.com")
+    
+    # Assert
+    assert cname.status_code == status.HTTP_201_CREATED
+    assert shard_for_id(cname.json()["id"]) == shard_for_id(www["id"])
+    assert response.json()["canonical_name"] == "example.com"
+    assert response.json()["records"][0]["value"] == "192.168.1.1"
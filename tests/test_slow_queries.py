@@ -0,0 +1,96 @@
+"""Tests for the slow query log."""
+import pytest
+from fastapi import status
+from sqlalchemy import text
+
+from app.core.database import SlowQueryLog, build_engine, normalize_sql, slow_query_log
+from tests.test_utils import create_test_host
+
+
+@pytest.fixture
+def log_everything(monkeypatch):
+    """Treat every statement as slow, starting from an empty log."""
+    slow_query_log.clear()
+    monkeypatch.setattr(slow_query_log, "threshold_ms", 0.0)
+    yield slow_query_log
+    slow_query_log.clear()
+
+
+def test_normalize_sql_folds_whitespace_and_in_lists():
+    """Test statements differing only in IN-list length share a shape."""
+    # Act
+    shapes = {
+        normalize_sql("SELECT id\n  FROM host WHERE id IN (?, ?)"),
+        normalize_sql("SELECT id FROM host WHERE id IN (?, ?, ?, ?)"),
+    }
+
+    # Assert
+    assert shapes == {"SELECT id FROM host WHERE id IN (...)"}
+
+
+def test_slow_statements_are_kept_with_their_plan(
+    log_everything, tmp_path, monkeypatch
+):
+    """Test a slow statement is recorded once per execution with a plan per shape."""
+    # Arrange
+    monkeypatch.setattr(log_everything, "redact_parameters", False)
+    engine = build_engine(f"sqlite:///{tmp_path / 'slow.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT)"))
+    log_everything.clear()
+
+    # Act
+    with engine.connect() as conn:
+        for name in ("a", "b"):
+            conn.execute(text("SELECT id FROM item WHERE name = :name"), {"name": name})
+    snapshot = log_everything.snapshot()
+
+    # Assert
+    entries = snapshot["entries"]
+    selects = [e for e in entries if e["statement"].startswith("SELECT id FROM item")]
+    assert [e["parameters"] for e in selects] == [["b"], ["a"]]
+    assert selects[0]["endpoint"] == "background"
+    assert selects[0]["full_scan"] is True
+    assert any(step.startswith("SCAN item") for step in selects[0]["plan"])
+    plans = [s for s in log_everything.plans if s.startswith("SELECT id FROM item")]
+    assert len(plans) == 1
+
+
+def test_failed_explain_leaves_the_transaction_usable(tmp_path):
+    """Test an EXPLAIN that fails mid-transaction keeps the work done so far."""
+    # Arrange
+    engine = build_engine(f"sqlite:///{tmp_path / 'explain.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT)"))
+
+    # Act
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO item (name) VALUES ('kept')"))
+        plan = SlowQueryLog._explain(conn, "SELECT id FROM missing", None)
+        conn.execute(text("INSERT INTO item (name) VALUES ('after')"))
+    with engine.connect() as conn:
+        names = conn.execute(text("SELECT name FROM item ORDER BY id")).scalars().all()
+
+    # Assert
+    assert plan["plan"] is None
+    assert "missing" in plan["error"]
+    assert names == ["kept", "after"]
+
+
+def test_admin_lists_slow_queries_by_endpoint(client, log_everything):
+    """Test the admin endpoint names the endpoint and redacts parameters by default."""
+    # Arrange
+    create_test_host(client, "slow.example.com")
+
+    # Act
+    response = client.get("/api/admin/slow-queries")
+
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["threshold_ms"] == 0.0
+    inserts = [
+        e for e in data["entries"] if e["statement"].startswith("INSERT INTO host ")
+    ]
+    assert inserts[0]["endpoint"] == "POST /api/hosts/"
+    assert inserts[0]["parameters"] is None
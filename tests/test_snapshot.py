@@ -0,0 +1,231 @@
+"""Tests for zone snapshots and the zone index."""
+import logging
+from datetime import datetime
+
+import pytest
+from fastapi import status
+from sqlalchemy import delete, func, update
+from sqlmodel import select
+
+from app.core.resolver import resolve_hostname
+from app.core.snapshot import (
+    SnapshotError,
+    ZoneIndex,
+    ZoneSnapshot,
+    note_changes,
+    write_snapshot,
+)
+from app.models import Host, Record, RecordType, ZoneChange
+from tests.test_utils import create_test_host
+
+
+def _add_host(session, hostname, *records):
+    """Add a host with ``(type, value, priority)`` records and log the change."""
+    host = Host(hostname=hostname)
+    session.add(host)
+    session.flush()
+    for record_type, value, priority in records:
+        session.add(
+            Record(
+                host_id=host.id,
+                type=record_type,
+                value=value,
+                ttl=300,
+                priority=priority,
+            )
+        )
+    session.flush()
+    note_changes(session, [host.id])
+    return host.id
+
+
+def test_snapshot_round_trip(session_factory, tmp_path):
+    """Test a written snapshot maps back to the same hosts and records."""
+    # Arrange
+    path = str(tmp_path / "zone.snapshot")
+    with session_factory() as session:
+        _add_host(session, "b.example.com", (RecordType.MX, "mail.example.com", 10))
+        _add_host(
+            session,
+            "a.example.com",
+            (RecordType.A, "192.0.2.1", None),
+            (RecordType.A, "192.0.2.2", None),
+        )
+        _add_host(session, "empty.example.com")
+    
+    # Act
+    with session_factory() as session:
+        serial = write_snapshot(session, path, settle_seconds=0)
+    snapshot = ZoneSnapshot(path)
+    
+    # Assert
+    assert serial == 3
+    assert snapshot.serial == 3
+    assert snapshot.hosts == 3
+    a = snapshot.find("a.example.com")
+    assert [(r.type, r.value, r.priority) for r in a.records] == [
+        (RecordType.A, "192.0.2.1", None), (RecordType.A, "192.0.2.2", None)
+    ]
+    assert snapshot.find("b.example.com").records[0].priority == 10
+    assert snapshot.find("empty.example.com").records == ()
+    assert snapshot.find("missing.example.com") is None
+    assert snapshot.find("zzz.example.com") is None
+
+
+def test_corrupt_snapshot_is_rejected(session_factory, tmp_path):
+    """Test a snapshot with a flipped byte or a foreign header fails to open."""
+    # Arrange
+    path = tmp_path / "zone.snapshot"
+    with session_factory() as session:
+        _add_host(session, "example.com", (RecordType.A, "192.0.2.1", None))
+        write_snapshot(session, str(path), settle_seconds=0)
+    data = bytearray(path.read_bytes())
+    
+    # Act / Assert
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(SnapshotError, match="checksum"):
+        ZoneSnapshot(str(path))
+    
+    path.write_bytes(b"NOPE" + bytes(data[4:]))
+    with pytest.raises(SnapshotError, match="not a zone snapshot"):
+        ZoneSnapshot(str(path))
+
+
+def test_index_replays_changes_after_snapshot(session_factory, tmp_path):
+    """Test creates, renames and deletes after the snapshot show up on replay."""
+    # Arrange
+    index = ZoneIndex(
+        str(tmp_path / "zone.snapshot"), session_factory, settle_seconds=0
+    )
+    with session_factory() as session:
+        kept = _add_host(session, "kept.example.com", (RecordType.A, "192.0.2.1", None))
+        renamed = _add_host(session, "old.example.com")
+        deleted = _add_host(session, "gone.example.com")
+    index.warm()
+    assert index.get("old.example.com").id == renamed
+    
+    # Act
+    with session_factory() as session:
+        session.execute(
+            update(Host)
+            .where(Host.id == renamed)
+            .values(
+                hostname="new.example.com",
+                canonical_hostname="new.example.com",
+                updated_at=datetime.utcnow(),
+            )
+        )
+        session.execute(delete(Host).where(Host.id == deleted))
+        session.add(Record(host_id=kept, type=RecordType.A, value="192.0.2.9", ttl=60))
+        note_changes(session, [renamed, deleted, kept])
+        added = _add_host(session, "old.example.com")
+    applied = index.replay()
+    
+    # Assert
+    assert applied == 4
+    assert index.serial == 7
+    assert index.get("old.example.com").id == added
+    assert index.get("new.example.com").id == renamed
+    assert index.get("gone.example.com") is None
+    kept = index.get("kept.example.com")
+    assert {r.value for r in kept.records} == {"192.0.2.1", "192.0.2.9"}
+    
+    # A checkpoint folds the overlay into a new snapshot and prunes the log
+    index.retention_seconds = 0
+    assert index.checkpoint() == 7
+    assert index.status()["overlay_hosts"] == 0
+    assert index.get("new.example.com").id == renamed
+    with session_factory() as session:
+        assert session.exec(select(func.count()).select_from(ZoneChange)).one() == 1
+
+
+def test_index_rebuilds_snapshot_of_another_database(session_factory, tmp_path):
+    """Test a snapshot ahead of the change log is replaced instead of trusted."""
+    # Arrange
+    path = str(tmp_path / "zone.snapshot")
+    with session_factory() as session:
+        for i in range(3):
+            _add_host(session, f"host{i}.example.com")
+        write_snapshot(session, path, settle_seconds=0)
+        session.execute(delete(ZoneChange))
+        session.execute(delete(Host).where(Host.hostname != "host0.example.com"))
+    index = ZoneIndex(path, session_factory, settle_seconds=0)
+    
+    # Act
+    index.warm()
+    
+    # Assert
+    assert index.get("host0.example.com") is not None
+    assert index.get("host1.example.com") is None
+
+
+def test_warm_writes_the_first_snapshot_quietly(session_factory, tmp_path, caplog):
+    """Test a missing snapshot is written on first boot without a warning."""
+    # Arrange
+    path = tmp_path / "zone.snapshot"
+    with session_factory() as session:
+        _add_host(session, "example.com")
+    index = ZoneIndex(str(path), session_factory, settle_seconds=0)
+    
+    # Act
+    with caplog.at_level(logging.INFO, logger="app.core.snapshot"):
+        index.warm()
+    
+    # Assert
+    assert path.exists()
+    assert index.get("example.com") is not None
+    assert "Writing the first zone snapshot" in caplog.text
+    assert not [r for r in caplog.records if r.levelno >= logging.WARNING]
+
+
+def test_resolver_uses_index_until_a_host_changes_locally(session_factory, tmp_path):
+    """Test resolution reads the index, and the database for hosts changed here."""
+    # Arrange
+    index = ZoneIndex(
+        str(tmp_path / "zone.snapshot"), session_factory, settle_seconds=0
+    )
+    with session_factory() as session:
+        _add_host(session, "www.example.com", (RecordType.CNAME, "example.com", None))
+        apex = _add_host(session, "example.com", (RecordType.A, "192.0.2.1", None))
+    index.warm()
+    
+    # Act
+    indexed = resolve_hostname(None, "WWW.example.com", index=index.get)
+    with session_factory() as session:
+        session.execute(
+            update(Record)
+            .where(Record.host_id == apex)
+            .values(value="192.0.2.2", updated_at=datetime.utcnow())
+        )
+        note_changes(session, [apex])
+    index.mark_changed([apex])
+    with session_factory() as session:
+        changed = resolve_hostname(session, "www.example.com", index=index.get)
+    index.replay()
+    replayed = resolve_hostname(None, "www.example.com", index=index.get)
+    
+    # Assert
+    assert indexed["canonical_name"] == "example.com"
+    assert [r["value"] for r in indexed["records"]] == ["192.0.2.1"]
+    assert [r["value"] for r in changed["records"]] == ["192.0.2.2"]
+    assert [r["value"] for r in replayed["records"]] == ["192.0.2.2"]
+    assert index.get("missing.example.com") is None
+
+
+def test_api_writes_are_logged(client, db):
+    """Test host and record writes through the API log zone changes."""
+    # Arrange
+    host = create_test_host(client, hostname="logged.example.com")
+    
+    # Act
+    created = client.post("/api/records/", json={
+        "host_id": host["id"], "type": "A", "value": "192.0.2.1", "ttl": 300
+    })
+    deleted = client.delete(f"/api/records/{created.json()['id']}")
+    
+    # Assert
+    assert created.status_code == status.HTTP_201_CREATED
+    assert deleted.status_code == status.HTTP_204_NO_CONTENT
+    host_ids = db.exec(select(ZoneChange.host_id)).all()
+    assert host_ids == [host["id"]] * 3
@@ -0,0 +1,96 @@
+"""Tests for the startup path: schema version check and OpenAPI cache."""
+import json
+
+import pytest
+from alembic import command
+from fastapi import FastAPI
+from sqlalchemy import inspect, text, update
+from sqlmodel import Session, SQLModel
+
+from app.core import migrations
+from app.core.database import build_engine, ensure_schema
+from app.core.openapi import install_openapi_cache, source_fingerprint
+from app.models import SchemaVersion
+
+
+def test_ensure_schema_skips_current_database(tmp_path):
+    """Test migrate only runs when the stored fingerprint is missing or stale."""
+    # Arrange
+    engine = build_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    
+    # Act / Assert
+    assert ensure_schema(engine) is True
+    assert set(SQLModel.metadata.tables) <= set(inspect(engine).get_table_names())
+    assert ensure_schema(engine) is False
+    
+    with Session(engine) as session:
+        session.execute(update(SchemaVersion).values(fingerprint="stale"))
+        session.commit()
+    assert ensure_schema(engine) is True
+    assert ensure_schema(engine) is False
+    engine.dispose()
+
+
+def test_ensure_schema_migrates_before_storing_the_fingerprint(
+    tmp_path, monkeypatch
+):
+    """Test a database missing model columns is migrated, or never marked current."""
+    # Arrange
+    engine = build_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    with engine.begin() as conn:
+        command.upgrade(
+            migrations.alembic_config(conn), migrations.BASELINE_REVISION
+        )
+        conn.execute(text("DROP TABLE alembic_version"))
+    migrate = migrations.migrate
+    monkeypatch.setattr(migrations, "migrate", lambda engine: None)
+    
+    # Act / Assert
+    with pytest.raises(RuntimeError, match="host.version"):
+        ensure_schema(engine)
+    assert "schema_version" not in inspect(engine).get_table_names()
+    
+    monkeypatch.setattr(migrations, "migrate", migrate)
+    assert ensure_schema(engine) is True
+    assert "version" in {c["name"] for c in inspect(engine).get_columns("host")}
+    assert ensure_schema(engine) is False
+    engine.dispose()
+
+
+def test_openapi_schema_is_served_from_cache(tmp_path):
+    """Test the first schema request writes the cache and later apps reuse it."""
+    # Arrange
+    path = str(tmp_path / "openapi.cache.json")
+    first, second = FastAPI(title="first"), FastAPI(title="first")
+    first.get("/ping")(lambda: "pong")
+    
+    # Act
+    install_openapi_cache(first, path)
+    built = first.openapi()
+    install_openapi_cache(second, path)
+    cached = second.openapi()
+    
+    # Assert
+    assert "/ping" in built["paths"]
+    assert cached == built  # second app has no routes, so this came from the cache
+    with open(path) as f:
+        assert json.load(f)["fingerprint"] == source_fingerprint()
+
+
+def test_stale_openapi_cache_is_rebuilt(tmp_path):
+    """Test a cache written for other sources is ignored and replaced."""
+    # Arrange
+    path = tmp_path / "openapi.cache.json"
+    path.write_text(
+        json.dumps({"fingerprint": "old", "schema": {"paths": {"/old": {}}}})
+    )
+    app = FastAPI()
+    app.get("/new")(lambda: "new")
+    install_openapi_cache(app, str(path))
+    
+    # Act
+    schema = app.openapi()
+    
+    # Assert
+    assert list(schema["paths"]) == ["/new"]
+    assert json.loads(path.read_text())["fingerprint"] == source_fingerprint()
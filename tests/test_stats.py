@@ -0,0 +1,130 @@
+"""Tests for incrementally maintained statistics."""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import status
+
+from app.core.stats import MINUTE_SAMPLES, DNSStats, dns_stats
+from tests.test_utils import create_test_host, create_test_record
+
+
+@pytest.fixture(autouse=True)
+def reset_stats(client, db):
+    """Start every test from counters reconciled with the empty database."""
+    dns_stats.reconcile(db)
+    yield
+
+
+def test_stats_follow_committed_writes(client):
+    """Test creates, type changes and deletes update the counters."""
+    # Arrange
+    writes_before = dns_stats.writes_per_minute()
+    www = create_test_host(client, "www.example.com")
+    apex = create_test_host(client, "example.com")
+    create_test_record(client, www["id"], "CNAME", "example.com")
+    a_record = create_test_record(client, apex["id"], "A", "192.168.1.1")
+    create_test_record(client, apex["id"], "A", "192.168.1.2")
+    
+    # Act
+    client.delete(f"/api/records/{a_record['id']}")
+    client.delete(f"/api/hosts/{www['id']}")
+    response = client.get("/api/stats")
+    
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["hosts"] == 1
+    assert data["records_by_type"] == {"A": 1, "CNAME": 0, "MX": 0}
+    assert data["writes_per_minute"] - writes_before == 7
+
+
+def test_failed_write_is_not_counted(client):
+    """Test a rejected write leaves the counters unchanged."""
+    # Arrange
+    create_test_host(client, "example.com")
+    
+    # Act
+    client.post("/api/hosts/", json={"hostname": "example.com"})
+    
+    # Assert
+    assert client.get("/api/stats").json()["hosts"] == 1
+
+
+def test_reconcile_corrects_drift_and_counts_chain_depths(client, db):
+    """Test reconciliation recounts rows and CNAME chain depths."""
+    # Arrange
+    names = ["a.example.com", "b.example.com", "c.example.com"]
+    hosts = [create_test_host(client, name) for name in names]
+    create_test_record(client, hosts[0]["id"], "CNAME", "b.example.com")
+    create_test_record(client, hosts[1]["id"], "CNAME", "c.example.com")
+    create_test_record(client, hosts[2]["id"], "A", "192.168.1.1")
+    dns_stats.apply(hosts=5)
+    
+    # Act
+    drift = dns_stats.reconcile(db)
+    
+    # Assert
+    assert drift == {"hosts": -5}
+    assert dns_stats.hosts == 3
+    assert client.get("/api/stats").json()["cname_chain_depths"] == {"1": 1, "2": 1}
+
+
+def test_reconcile_keeps_writes_committed_while_counting(db, monkeypatch):
+    """Test a write committed during a recount is neither lost nor drift."""
+    # Arrange
+    stats = DNSStats()
+    count_chain_depths = DNSStats._chain_depths
+
+    def commit_while_counting(session):
+        stats.apply(hosts=1, records={"A": 1}, writes=1)
+        return count_chain_depths(session)
+
+    monkeypatch.setattr(stats, "_chain_depths", commit_while_counting)
+    
+    # Act
+    drift = stats.reconcile(db)
+    
+    # Assert
+    assert drift == {}
+    assert stats.hosts == 1
+    assert stats.records_by_type["A"] == 1
+
+
+def test_workers_share_counts_and_writes(client, db):
+    """Test one worker's recount and writes are served by another."""
+    # Arrange
+    worker_a, worker_b = DNSStats(), DNSStats()
+    create_test_host(client, "example.com")
+    worker_b.refresh(db)
+    
+    # Act
+    worker_a.reconcile(db)
+    worker_a.apply(hosts=1, writes=3)
+    worker_a.refresh(db)
+    worker_b.refresh(db)
+    
+    # Assert
+    assert worker_b.hosts == 1
+    assert worker_b.reconciled_at == worker_a.reconciled_at
+    assert worker_a.hosts == 2
+    assert worker_b.writes_per_minute() == 3
+
+
+def test_history_rolls_minutes_into_hours(client):
+    """Test every 60 minute samples produce one hourly sample."""
+    # Arrange
+    stats = DNSStats()
+    start = datetime(2024, 1, 1)
+    
+    # Act
+    for minute in range(MINUTE_SAMPLES * 2 + 5):
+        stats.apply(writes=1)
+        stats.sample(start + timedelta(minutes=minute))
+    
+    # Assert
+    assert len(stats.history("minute")) == MINUTE_SAMPLES
+    hours = stats.history("hour")
+    assert len(hours) == 2
+    assert all(h["writes"] == MINUTE_SAMPLES for h in hours)
+    response = client.get("/api/stats/history", params={"resolution": "hour"})
+    assert response.status_code == 200
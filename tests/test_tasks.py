@@ -0,0 +1,112 @@
+"""Tests for the background task scheduler and leader election."""
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi import status
+from sqlalchemy import update
+
+from app.core.leader import LeaderLease
+from app.core.metrics import registry
+from app.core.settings import settings
+from app.core.tasks import TaskScheduler
+from app.models import SchedulerLease
+
+
+def test_only_one_worker_holds_the_lease(session_factory):
+    """Test a second worker cannot take the lease until the first releases it."""
+    # Arrange
+    first = LeaderLease(session_factory=session_factory, ttl_seconds=30)
+    second = LeaderLease(session_factory=session_factory, ttl_seconds=30)
+    
+    # Act / Assert
+    assert first.try_acquire() is True
+    assert second.try_acquire() is False
+    assert first.try_acquire() is True  # renewal
+    
+    first.release()
+    assert first.is_leader is False
+    assert second.try_acquire() is True
+    assert first.try_acquire() is False
+
+
+def test_expired_lease_is_taken_over(session_factory):
+    """Test another worker takes over once the holder stops renewing."""
+    # Arrange
+    first = LeaderLease(session_factory=session_factory, ttl_seconds=30)
+    second = LeaderLease(session_factory=session_factory, ttl_seconds=30)
+    assert first.try_acquire() is True
+    with session_factory() as session:
+        session.execute(
+            update(SchedulerLease).values(
+                expires_at=datetime.utcnow() - timedelta(seconds=1)
+            )
+        )
+    
+    # Act / Assert
+    assert second.try_acquire() is True
+    assert first.try_acquire() is False
+
+
+def test_run_job_records_outcome_and_metrics(request, session_factory):
+    """Test run_job runs jobs off the event loop and records their outcome."""
+    # Arrange
+    scheduler = TaskScheduler(lease=LeaderLease(session_factory=session_factory))
+    calls = []
+    ok, failing = f"{request.node.name}_ok", f"{request.node.name}_failing"
+    scheduler.add_job(ok, lambda: calls.append(1), interval=60)
+    scheduler.add_job(failing, lambda: 1 / 0, interval=60, leader_only=True)
+    
+    # Act
+    ok_run = asyncio.run(scheduler.run_job(ok))
+    failed_run = asyncio.run(scheduler.run_job(failing))
+    
+    # Assert
+    assert calls == [1]
+    assert ok_run["runs"] == 1
+    assert ok_run["last_status"] == "success"
+    assert failed_run["last_status"] == "error"
+    assert "division by zero" in failed_run["last_error"]
+    assert registry.counter("task_runs_total", "", job=ok, status="success").value == 1
+    assert (
+        registry.counter("task_runs_total", "", job=failing, status="error").value == 1
+    )
+    assert registry.histogram("task_run_seconds", "", job=ok).count == 1
+
+
+def test_admin_task_endpoints(client, monkeypatch):
+    """Test listing and triggering jobs, unknown jobs and the admin token."""
+    # Act
+    listing = client.get("/api/admin/tasks")
+    run = client.post("/api/admin/tasks/sample_stats/run")
+    missing = client.post("/api/admin/tasks/nope/run")
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    denied = client.get("/api/admin/tasks")
+    allowed = client.get("/api/admin/tasks", headers={"X-Admin-Token": "secret"})
+    
+    # Assert
+    assert listing.status_code == status.HTTP_200_OK
+    jobs = {job["name"]: job for job in listing.json()["jobs"]}
+    assert jobs["prune_idempotency_keys"]["leader_only"] is True
+    assert jobs["reconcile_stats"]["leader_only"] is True
+    assert jobs["refresh_stats"]["leader_only"] is False
+    assert jobs["sample_stats"]["leader_only"] is False
+    assert run.status_code == status.HTTP_200_OK
+    assert run.json()["last_status"] == "success"
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
+    assert missing.json()["error"]["code"] == "TASK_NOT_FOUND"
+    assert denied.status_code == status.HTTP_403_FORBIDDEN
+    assert allowed.status_code == status.HTTP_200_OK
+
+
+def test_admin_endpoints_are_closed_without_a_token(client, monkeypatch):
+    """Test admin endpoints refuse requests when no token is configured."""
+    # Arrange
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", None)
+    monkeypatch.setattr(settings, "ADMIN_API_OPEN", False)
+    
+    # Act
+    response = client.get("/api/admin/tasks")
+    
+    # Assert
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert response.json()["error"]["code"] == "ADMIN_TOKEN_NOT_CONFIGURED"
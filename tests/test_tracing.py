@@ -0,0 +1,149 @@
+"""Tests for request tracing."""
+import json
+
+from fastapi import status
+
+from app.core.tracing import (
+    JsonLinesExporter,
+    RingBufferExporter,
+    Tracer,
+    current_span,
+    parse_traceparent,
+    tracer,
+)
+from tests.test_utils import create_test_host, create_test_record
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def test_parse_traceparent():
+    """Test valid headers are parsed and malformed or all-zero ones ignored."""
+    # Act
+    sampled = parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01")
+    unsampled = parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00")
+
+    # Assert
+    assert sampled == (TRACE_ID, PARENT_ID, True)
+    assert unsampled.sampled is False
+    assert parse_traceparent(f"00-{TRACE_ID.upper()}-{PARENT_ID}-01") is None
+    assert parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+    assert parse_traceparent("garbage") is None
+
+
+def test_sampled_request_records_create_record_phases(client):
+    """Test a sampled traceparent continues the trace with a span per phase."""
+    # Arrange
+    target = create_test_host(client, "target.trace.example")
+    host = create_test_host(client, "www.trace.example")
+    headers = {"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"}
+
+    # Act
+    response = client.post(
+        "/api/records/",
+        json={"host_id": host["id"], "type": "CNAME", "value": target["hostname"]},
+        headers=headers,
+    )
+    trace = client.get(f"/api/admin/traces/{TRACE_ID}")
+
+    # Assert
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.headers["traceresponse"].startswith(f"00-{TRACE_ID}-")
+    spans = trace.json()
+    root = next(s for s in spans if s["name"] == "POST /api/records/")
+    assert root["parent_id"] == PARENT_ID
+    assert root["attributes"]["http.status_code"] == 201
+    phases = [s["name"] for s in spans if s["name"].startswith("create_record.")]
+    assert phases == [
+        "create_record.host_lookup",
+        "create_record.validate_value",
+        "create_record.conflict_check",
+        "create_record.loop_detection",
+        "create_record.commit",
+    ]
+    lookup = next(s for s in spans if s["name"] == "create_record.host_lookup")
+    statements = [s for s in spans if s["name"] == "db.statement"]
+    assert any(s["parent_id"] == lookup["span_id"] for s in statements)
+
+
+def test_resolver_hops_are_traced(client):
+    """Test each CNAME hop of a resolution gets its own span."""
+    # Arrange
+    www = create_test_host(client, "www.hops.example")
+    apex = create_test_host(client, "hops.example")
+    create_test_record(client, www["id"], "CNAME", "hops.example")
+    create_test_record(client, apex["id"], "A", "192.168.1.1")
+    trace_id = "a" * 32
+
+    # Act
+    client.get(
+        "/api/resolve/www.hops.example",
+        headers={"traceparent": f"00-{trace_id}-{PARENT_ID}-01"},
+    )
+
+    # Assert
+    spans = tracer.exporter(RingBufferExporter).trace(trace_id)
+    hops = [s for s in spans if s.name == "resolver.hop"]
+    assert [(s.attributes["hostname"], s.attributes["depth"]) for s in hops] == [
+        ("www.hops.example", 0),
+        ("hops.example", 1),
+    ]
+
+
+def test_unsampled_requests_record_nothing(client):
+    """Test requests the caller did not sample get no spans or trace header."""
+    # Arrange
+    buffer = tracer.exporter(RingBufferExporter)
+    buffer.clear()
+
+    # Act
+    response = client.get(
+        "/health", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"}
+    )
+    with tracer.span("outside.request") as span:
+        pass
+
+    # Assert
+    assert "traceresponse" not in response.headers
+    assert span is None
+    assert list(buffer.spans) == []
+
+
+def test_json_lines_exporter_writes_a_line_per_span(tmp_path):
+    """Test spans are appended to the file as JSON, children before their parent."""
+    # Arrange
+    path = tmp_path / "traces.jsonl"
+    exporter = JsonLinesExporter(str(path))
+    local = Tracer(sample_rate=1.0, exporters=[exporter])
+
+    # Act
+    with local.root_span("job") as root:
+        with local.span("job.step", item=3):
+            pass
+    exporter.flush()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+
+    # Assert
+    assert current_span.get() is None
+    assert [line["name"] for line in lines] == ["job.step", "job"]
+    assert lines[0]["parent_id"] == root.span_id
+    assert lines[0]["attributes"] == {"item": 3}
+    assert lines[1]["parent_id"] is None
+
+
+def test_caller_sampling_is_capped_unless_trusted():
+    """Test a caller's sampled flag is honoured only within the allowance."""
+    # Arrange
+    sampled = parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01")
+    unsampled = parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00")
+    capped = Tracer(sample_rate=0.0, exporters=[], parent_samples_per_second=2)
+    trusted = Tracer(sample_rate=0.0, exporters=[], trust_parent=True)
+
+    # Act
+    capped_decisions = [capped.should_sample(sampled) for _ in range(5)]
+    trusted_decisions = [trusted.should_sample(sampled) for _ in range(5)]
+
+    # Assert
+    assert capped_decisions == [True, True, False, False, False]
+    assert trusted_decisions == [True] * 5
+    assert trusted.should_sample(unsampled) is False
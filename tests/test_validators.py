@@ -0,0 +1,68 @@
+"""Tests for the batch validators."""
+import pytest
+
+from app.core.validators import (
+    validate_hostname,
+    validate_hostnames,
+    validate_record_value,
+    validate_record_values,
+)
+from app.models import RecordType
+
+EDGE_CASES = [
+    "192.168.1.1", "0.0.0.0", "255.255.255.255", "256.1.1.1", "01.2.3.4", "1.2.3",
+    "1.2.3.4.5", "١.٢.٣.٤", "1.2.3.4\n", "example.com", "Mail.Example.COM",
+    "-bad.example.com", "bad-.example.com", "a..b", "a_b.example.com", "ünï.example",
+    "a" * 63 + ".com", "a" * 64 + ".com", ".".join(["a" * 63] * 4), "x", "",
+]
+
+
+def test_record_values_agree_with_per_item_validator():
+    """Test every row gets the verdict validate_record_value gives it."""
+    # Arrange
+    types = [t for t in RecordType for _ in EDGE_CASES]
+    values = EDGE_CASES * len(RecordType)
+
+    # Act
+    result = validate_record_values(types, values)
+
+    # Assert
+    assert result.valid == [validate_record_value(t, v) for t, v in zip(types, values)]
+    assert all(
+        (error is None) == valid for error, valid in zip(result.errors, result.valid)
+    )
+
+
+def test_hostnames_agree_with_per_item_validator():
+    """Test every hostname gets the verdict validate_hostname gives it."""
+    # Act
+    result = validate_hostnames(EDGE_CASES)
+
+    # Assert
+    assert result.valid == [validate_hostname(h) for h in EDGE_CASES]
+
+
+def test_batch_validators_report_reasons():
+    """Test invalid rows carry a reason, including non-strings and unknown types."""
+    # Act
+    values = validate_record_values(
+        ["A", "A", "CNAME", "TXT", RecordType.MX],
+        ["10.0.0.1", "10.0.0.256", None, "text", ["mail.example.com"]],
+    )
+    hostnames = validate_hostnames(["ok.example.com", "x" * 254, None, "bad_name"])
+
+    # Assert
+    assert values.errors == [
+        None, "not a valid IPv4 address", "value is required", "unknown record type",
+        "value is required",
+    ]
+    assert hostnames.errors == [
+        None, "hostname is longer than 253 characters", "hostname is required",
+        "not a valid hostname",
+    ]
+
+
+def test_record_values_reject_columns_of_different_length():
+    """Test mismatched type and value columns are rejected."""
+    with pytest.raises(ValueError):
+        validate_record_values(["A"], [])